@@ -19,7 +19,7 @@ from airflow_code_editor.utils import (
 from airflow_code_editor.git import (
     execute_git_command,
 )
-from airflow_code_editor.fs import RootFS
+from airflow_code_editor.fs import get_root_fs
 from airflow_code_editor.scan_forbidden import find_forbidden
 
 __all__ = ["AbstractCodeEditorView"]
@@ -63,7 +63,7 @@ class AbstractCodeEditorView(object):
             # else:  # Binary file
             #     raise RuntimeError("Don't upload binary files")
             #     data = request.get_data()
-            root_fs = RootFS()
+            root_fs = get_root_fs()
             # root_fs.path(path).write_file(data=data, is_text=is_text)
             root_fs.path(path).write_file(data=data, is_text=True)
             return prepare_api_response(path=normalize_path(path))
@@ -120,7 +120,7 @@ class AbstractCodeEditorView(object):
                 return self._git_repo_get(path)
             else:
                 # Download file
-                root_fs = RootFS()
+                root_fs = get_root_fs()
                 return root_fs.path(path).send_file(as_attachment=True)
         except Exception as ex:
             logging.error(ex)
@@ -3,17 +3,20 @@
 """
 import os
 import errno
+import threading
 import fs
 from fnmatch import fnmatch
 from fs.mountfs import MountFS, MountError
 from fs.multifs import MultiFS
+from fs.info import Info
 from fs.path import abspath, forcedir, normpath
-from typing import Any, List, Optional, Union
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 from flask import send_file, stream_with_context, Response
-from airflow_code_editor.utils import read_mount_points_config, get_plugin_config
+from airflow_code_editor.utils import MountPoint, read_mount_points_config, get_plugin_config
 
 __all__ = [
     'RootFS',
+    'get_root_fs',
 ]
 
 STAT_FIELDS = [
@@ -42,12 +45,19 @@ def split(pathname: str):
         return pathname[: i - 1], pathname[i:]
 
 
+def mounts_key(mounts: Dict[str, MountPoint]) -> Tuple[Tuple[str, str, bool], ...]:
+    "Hashable snapshot of a mount points configuration"
+    return tuple(sorted((name, str(v.path), bool(v.default)) for name, v in mounts.items()))
+
+
 class RootFS(MountFS):
     "Root filesystem with mountpoints"
 
-    def __init__(self):
+    def __init__(self, mounts: Optional[Dict[str, MountPoint]] = None):
         super().__init__()
-        mounts = read_mount_points_config()
+        if mounts is None:
+            mounts = read_mount_points_config()
+        self.mounts_key = mounts_key(mounts)
         # Set default fs (root)
         self.default_fs = MultiFS()
         self.tmp_fs = fs.open_fs("mem://")
@@ -76,6 +86,31 @@ class RootFS(MountFS):
         return FSPath(*parts, root_fs=self)
 
 
+_root_fs: Optional[RootFS] = None
+_root_fs_lock = threading.Lock()
+
+
+def get_root_fs() -> RootFS:
+    """
+    Return the root filesystem shared by all the requests of the process.
+    The mounted filesystems stay open and the instance is rebuilt only
+    when the mount points configuration changes.
+    The shared instance must not be re-mounted, use RootFS() for that.
+    """
+    global _root_fs
+    mounts = read_mount_points_config()
+    key = mounts_key(mounts)
+    root_fs = _root_fs
+    if root_fs is not None and root_fs.mounts_key == key:
+        return root_fs
+    with _root_fs_lock:
+        if _root_fs is None or _root_fs.mounts_key != key:
+            # The previous instance can still be in use by other threads,
+            # it is released with the last reference
+            _root_fs = RootFS(mounts)
+        return _root_fs
+
+
 class FSPath(object):
     def __init__(self, *parts: List[str], root_fs: RootFS) -> None:
         self.root_fs = root_fs
@@ -147,24 +182,44 @@ class FSPath(object):
         "Check if this path exists"
         return self.root_fs.exists(self.path)
 
+    def _entry_filter(self, show_ignored_entries: bool) -> Callable[[str], bool]:
+        "Return a function telling if a directory entry has to be listed"
+        if show_ignored_entries:
+            return lambda name: True
+        ignored_entries = get_plugin_config('ignored_entries').split(',')
+        mount_points = {x[0].rstrip('/') for x in self.root_fs.mounts}
+
+        def keep(name: str) -> bool:
+            fullpath = os.path.join(self.path, name)
+            # Skip mount points
+            if fullpath in mount_points:
+                return False
+            # Ship hidden files
+            for patter in ignored_entries:
+                if fnmatch(fullpath if patter.startswith('/') else name, patter.strip()):
+                    return False
+            return True
+
+        return keep
+
     def iterdir(self, show_ignored_entries=False):
         "Iterate over the files in this directory"
-        ignored_entries = get_plugin_config('ignored_entries').split(',')
-        mount_points = [x[0].rstrip('/') for x in self.root_fs.mounts]
+        keep = self._entry_filter(show_ignored_entries)
         for name in sorted(self.root_fs.listdir(self.path)):
-            skip = False
-            if not show_ignored_entries:
-                fullpath = os.path.join(self.path, name)
-                # Skip mount points
-                if fullpath in mount_points:
-                    skip = True
-                # Ship hidden files
-                for patter in ignored_entries:
-                    if fnmatch(fullpath if patter.startswith('/') else name, patter.strip()):
-                        skip = True
-            if not skip:
+            if keep(name):
                 yield self.root_fs.path(self.path, name)
 
+    def scandir(self, show_ignored_entries=False) -> Iterator[Tuple['FSPath', Info]]:
+        """
+        Iterate over the files in this directory, yield (path, info) tuples.
+        The info has the details and stat namespaces, reading it doesn't access the filesystem.
+        """
+        keep = self._entry_filter(show_ignored_entries)
+        infos = self.root_fs.scandir(self.path, namespaces=['details', 'stat'])
+        for info in sorted(infos, key=lambda x: x.name):
+            if keep(info.name):
+                yield self.root_fs.path(self.path, info.name), info
+
     def size(self) -> Optional[int]:
         "Return file size for files and number of files for directories"
         try:
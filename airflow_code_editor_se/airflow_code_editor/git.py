@@ -6,8 +6,9 @@ import logging
 import subprocess
 import threading
 import shlex
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Set, Tuple
 from datetime import datetime
 from flask import make_response, Response
 from flask_login import current_user  # type: ignore
@@ -26,20 +27,74 @@ from airflow_code_editor.utils import (
     read_mount_points_config,
     prepare_api_response,
 )
-from airflow_code_editor.fs import RootFS
+from airflow_code_editor.fs import get_root_fs
 
 __all__ = [
     'git_enabled',
     'execute_git_command',
+    'GitExecutor',
+    'RWLock',
+    'READ_ONLY_GIT_COMMANDS',
 ]
 
+# Commands that don't change the repository or the working tree, they can run in parallel
+READ_ONLY_GIT_COMMANDS = {
+    'cat-file',
+    'diff',
+    'log',
+    'ls-files',
+    'ls-tree',
+    'show',
+    'status',
+    'ls-local',
+    'mounts',
+}
+
 
 def git_enabled() -> bool:
     "Return true if git is enabled in the configuration"
     return get_plugin_boolean_config('git_enabled')
 
 
-_execute_git_command_lock = threading.Lock()
+class RWLock:
+    "Readers-writer lock: many readers or one writer, a waiting writer blocks new readers"
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._cond:
+            self._writers_waiting += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
 
 
 class CompletedGitCommand:
@@ -80,28 +135,65 @@ class CompletedGitCommand:
         return response
 
 
-def execute_git_command(git_args: List[str]) -> CompletedGitCommand:
-    with _execute_git_command_lock:
+class GitExecutor:
+    """
+    Execute git commands and local file commands.
+    Commands on the same repository (root folder) are serialized with a reader/writer lock:
+    read-only commands run in parallel, the others run alone.
+    The repository is initialized once per root folder (and git configuration).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._repo_locks: Dict[str, RWLock] = {}
+        self._initialized: Set[Tuple[str, bool, bool]] = set()
+
+    def repo_lock(self, repo: Path) -> RWLock:
+        "Return the lock of a repository"
+        key = str(repo)
+        with self._lock:
+            lock = self._repo_locks.get(key)
+            if lock is None:
+                lock = self._repo_locks[key] = RWLock()
+            return lock
+
+    def init_repo(self, repo: Path) -> None:
+        "Initialize the git repository, if it was not done yet"
+        key = (str(repo), git_enabled(), get_plugin_boolean_config('git_init_repo'))
+        if key in self._initialized:
+            return
+        with self.repo_lock(repo).write():
+            if key not in self._initialized:
+                init_git_repo()
+                self._initialized.add(key)
+
+    def execute(self, git_args: List[str]) -> CompletedGitCommand:
         logging.info(' '.join(git_args))
         git_cmd = git_args[0] if git_args else None
         stdout: GitOutput = None
         stderr: GitOutput = None
         returncode = 0
         try:
+            repo = get_root_folder()
             # Init git repo
-            init_git_repo()
-            # Local commands
-            if git_cmd in LOCAL_COMMANDS:
-                handler = LOCAL_COMMANDS[git_cmd]
-                stdout = handler(git_args)
-            # Git commands
-            elif git_cmd in SUPPORTED_GIT_COMMANDS:
-                git_default_args = shlex.split(get_plugin_config('git_default_args'))
-                returncode, stdout, stderr = git_call(git_default_args + git_args, capture_output=True)
-            else:
-                stdout = None
-                stderr = 'Command not supported: git {0}'.format(' '.join(git_args))
-                returncode = 1
+            self.init_repo(repo)
+            lock = self.repo_lock(repo)
+            read_only = git_cmd in READ_ONLY_GIT_COMMANDS
+            with lock.read() if read_only else lock.write():
+                # Local commands
+                if git_cmd in LOCAL_COMMANDS:
+                    handler = LOCAL_COMMANDS[git_cmd]
+                    stdout = handler(git_args)
+                # Git commands
+                elif git_cmd in SUPPORTED_GIT_COMMANDS:
+                    git_default_args = shlex.split(get_plugin_config('git_default_args'))
+                    returncode, stdout, stderr = git_call(
+                        git_default_args + git_args, capture_output=True, read_only=read_only
+                    )
+                else:
+                    stdout = None
+                    stderr = 'Command not supported: git {0}'.format(' '.join(git_args))
+                    returncode = 1
         except OSError as ex:
             logging.error(ex)
             stdout = None
@@ -116,6 +208,14 @@ def execute_git_command(git_args: List[str]) -> CompletedGitCommand:
             return CompletedGitCommand(git_args, returncode, stdout, stderr)
 
 
+_git_executor = GitExecutor()
+
+
+def execute_git_command(git_args: List[str]) -> CompletedGitCommand:
+    "Execute a git command or a local command"
+    return _git_executor.execute(git_args)
+
+
 def git_ls_local(git_args: List[str]) -> str:
     "'git ls-tree' like output for local folders"
     long_ = False  # long format
@@ -129,7 +229,7 @@ def git_ls_local(git_args: List[str]) -> str:
     path = git_args[1] if len(git_args) > 1 else ''
     path = normalize_path(path.split('#', 1)[0])
     result = []
-    root_fs = RootFS()
+    root_fs = get_root_fs()
     for item in root_fs.path(path).iterdir(show_ignored_entries=all_):
         if item.is_dir():
             type_ = 'tree'
@@ -152,7 +252,7 @@ def git_mounts(git_args: List[str]) -> str:
 
 def git_rm_local(git_args: List[str]) -> str:
     "Delete local files/directories"
-    root_fs = RootFS()
+    root_fs = get_root_fs()
     for arg in git_args[1:]:
         if arg:
             root_fs.path(arg).delete()
@@ -163,7 +263,7 @@ def git_mv_local(git_args: List[str]) -> str:
     "Rename/Move local files"
     if len(git_args) < 3:
         raise Exception('Missing source/destination args')
-    root_fs = RootFS()
+    root_fs = get_root_fs()
     target = git_args[-1]
     for arg in git_args[1:-1]:
         source = root_fs.path(arg)
@@ -179,13 +279,18 @@ LOCAL_COMMANDS = {
 }
 
 
-def git_call(argv: List[str], capture_output: bool = False) -> Tuple[int, bytes, bytes]:
-    "Run git command. If capture_output is true, stdout and stderr will be captured."
+def git_call(argv: List[str], capture_output: bool = False, read_only: bool = False) -> Tuple[int, bytes, bytes]:
+    """
+    Run git command. If capture_output is true, stdout and stderr will be captured.
+    If read_only is true, git doesn't take optional locks (e.g. status doesn't refresh the index).
+    """
     if not git_enabled():
         return 1, b'', b'git is disabled'
     cmd: List[str] = [get_plugin_config('git_cmd')] + argv
     cwd: Path = get_root_folder()
     env: Dict[str, str] = prepare_git_env()
+    if read_only:
+        env['GIT_OPTIONAL_LOCKS'] = '0'
     try:
         completed = subprocess.run(
             args=cmd,
@@ -1,9 +1,19 @@
 """
 
 """
+import argparse
 import ast
+import json
 import logging
-from typing import Optional, Iterable, Tuple, Set
+import os
+import re
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from hashlib import sha256
+from threading import Lock
+from typing import Optional, Iterable, Tuple, Set, FrozenSet, Dict, List, Any, NamedTuple
 from flask import session
 
 from airflow_code_editor.commons import (
@@ -14,29 +24,111 @@ from airflow_code_editor.commons import (
     FORBIDDEN_FUNCTIONS_PATTERNS,
 )
 
-__all__ = ['find_forbidden', 'Visitor', ]
+__all__ = [
+    'find_forbidden',
+    'get_scanner',
+    'Visitor',
+    'ForbiddenMatcher',
+    'ForbiddenScanner',
+    'SourceScan',
+    'ScanResult',
+]
 
 log = logging.getLogger(__name__)
 
 
+class ForbiddenMatcher(object):
+    """
+    Проверка имени функции: точное совпадение с запрещённой функцией
+    или вхождение любого из запрещённых шаблонов (одно регулярное выражение на все шаблоны).
+    Результаты проверки имён запоминаются.
+    """
+    def __init__(
+            self,
+            forbidden_functions: Iterable[str] = FORBIDDEN_FUNCTIONS,
+            forbidden_functions_patterns: Iterable[str] = FORBIDDEN_FUNCTIONS_PATTERNS
+    ) -> None:
+        self.forbidden_functions: FrozenSet[str] = frozenset(forbidden_functions)
+        self.forbidden_functions_patterns: Tuple[str, ...] = tuple(forbidden_functions_patterns)
+        self.regex = re.compile('|'.join(map(re.escape, self.forbidden_functions_patterns)))
+        self._names: Dict[str, bool] = dict()
+
+    def __call__(self, name: str) -> bool:
+        """
+        Возвращает True, если имя запрещено.
+        """
+        forbidden = self._names.get(name)
+        if forbidden is None:
+            forbidden = name in self.forbidden_functions or \
+                (bool(self.forbidden_functions_patterns) and self.regex.search(name) is not None)
+            if len(self._names) < 100000:
+                self._names[name] = forbidden
+        return forbidden
+
+
 class Visitor(ast.NodeVisitor):
     """
     Пользовательский AST Visitor для анализа и обработки python-кода.
     """
     def __init__(
             self,
-            ext_user_login: str,
+            ext_user_login: Optional[str],
             legal_imports: Iterable[str] = LEGAL_IMPORTS,
             forbidden_functions: Iterable[str] = FORBIDDEN_FUNCTIONS,
-            forbidden_functions_patterns: Iterable[str] = FORBIDDEN_FUNCTIONS_PATTERNS
+            forbidden_functions_patterns: Iterable[str] = FORBIDDEN_FUNCTIONS_PATTERNS,
+            matcher: Optional[ForbiddenMatcher] = None
     ) -> None:
+        """
+        :ext_user_login: логин пользователя для проверки владельца, None - только собрать значения owner
+        :matcher: готовая проверка имён, по умолчанию собирается из forbidden_functions и шаблонов
+        """
         self.ext_user_login = ext_user_login
-        self.legal_imports = legal_imports
-        self.forbidden_functions = forbidden_functions
-        self.forbidden_functions_patterns = forbidden_functions_patterns
+        self.legal_imports = legal_imports if isinstance(legal_imports, (set, frozenset)) else frozenset(legal_imports)
+        self.matcher = matcher or ForbiddenMatcher(forbidden_functions, forbidden_functions_patterns)
+        self.forbidden_functions = self.matcher.forbidden_functions
+        self.forbidden_functions_patterns = self.matcher.forbidden_functions_patterns
         self.imports = set()
         self.functions = set()
+        self.owners = set()  # все найденные значения owner
         self.owner = False
+        self._walking = False
+
+    def scan(self, tree: ast.AST) -> None:
+        """
+        Обходит дерево плоским ast.walk вместо рекурсивного visit (те же visit_*, но без generic_visit).
+        """
+        visitors = {
+            node_type: getattr(self, 'visit_' + node_type.__name__)
+            for node_type in (ast.Import, ast.ImportFrom, ast.Call, ast.Name, ast.Assign, ast.Dict)
+        }
+        self._walking = True
+        try:
+            for node in ast.walk(tree):
+                visitor = visitors.get(node.__class__)
+                if visitor is not None:
+                    visitor(node)
+        finally:
+            self._walking = False
+
+    def generic_visit(self, node: ast.AST) -> None:
+        if not self._walking:
+            super().generic_visit(node)
+
+    def check_function(self, name: Any) -> None:
+        """
+        Запоминает имя функции, если оно запрещено.
+        """
+        if isinstance(name, str) and self.matcher(name):
+            self.functions.add(name)
+
+    def check_owner(self, value: Any) -> None:
+        """
+        Запоминает значение owner и сверяет его с логином пользователя.
+        """
+        if isinstance(value, str):
+            self.owners.add(value)
+            if value == self.ext_user_login:
+                self.owner = True
 
     def visit_Import(self, node: ast.Import) -> None:
         """
@@ -59,12 +151,8 @@ class Visitor(ast.NodeVisitor):
         if isinstance(node.module, str) and \
                 not (node.module in self.legal_imports or node.module == 'se' or node.module.startswith('se.')):
             self.imports.add(node.module)
-        if node.names in self.forbidden_functions:
-            self.functions.add(node.names)
-        for x in self.forbidden_functions_patterns:
-            for y in node.names:
-                if x in y.name:
-                    self.functions.add(y.name)
+        for alias in node.names:
+            self.check_function(alias.name)
         # [fix] Скорее всего, не нужно будет заходить внутри, поэтому не вызываю метод generic_visit [fix]
         self.generic_visit(node)  # Обход дочерних узлов ноды
 
@@ -76,25 +164,13 @@ class Visitor(ast.NodeVisitor):
             log.info(f'{ast.dump(node)}')
         # вызов функции
         if isinstance(node.func, ast.Attribute):  # если функция вызывается как атрибут
-            if isinstance(node.func.attr, str):
-                if node.func.attr in self.forbidden_functions:
-                    self.functions.add(node.func.attr)
-                for x in self.forbidden_functions_patterns:
-                    if x in node.func.attr:
-                        self.functions.add(node.func.attr)
-        if hasattr(node.func, 'id') and isinstance(node.func.id, str):
-            if node.func.id in self.forbidden_functions:
-                self.functions.add(node.func.id)
-            for x in self.forbidden_functions_patterns:
-                if x in node.func.id:
-                    self.functions.add(node.func.id)
+            self.check_function(node.func.attr)
+        self.check_function(getattr(node.func, 'id', None))
         # Поиск owner внутри словаря, созданного с помощью вызова dict(), и проверка его значения
-        if not self.owner:
-            if isinstance(node.func, ast.Name) and node.func.id == 'dict':
-                for keyword in node.keywords:
-                    if keyword.arg == 'owner' and hasattr(keyword.value, 'value'):
-                        if keyword.value.value == self.ext_user_login:
-                            self.owner = True
+        if isinstance(node.func, ast.Name) and node.func.id == 'dict':
+            for keyword in node.keywords:
+                if keyword.arg == 'owner' and hasattr(keyword.value, 'value'):
+                    self.check_owner(keyword.value.value)
         self.generic_visit(node)  # Обход дочерних узлов ноды
 
     def visit_Name(self, node: ast.Name) -> None:
@@ -104,19 +180,7 @@ class Visitor(ast.NodeVisitor):
         if DEBUG is True:
             log.info(f'{ast.dump(node)}')
         # создание alias на функцию
-        if isinstance(node, ast.Attribute):  # если alias смотрит на атрибут
-            if isinstance(node.attr, str):
-                if node.attr in self.forbidden_functions:
-                    self.functions.add(node.attr)
-                for x in self.forbidden_functions_patterns:
-                    if x in node.attr:
-                        self.functions.add(node.attr)
-        if hasattr(node, 'id') and isinstance(node.id, str):
-            if node.id in self.forbidden_functions:
-                self.functions.add(node.id)
-            for x in self.forbidden_functions_patterns:
-                if x in node.id:
-                    self.functions.add(node.id)
+        self.check_function(node.id)
         # [fix] Скорее всего, не нужно будет заходить внутри, поэтому не вызываю метод generic_visit [fix]
         self.generic_visit(node)  # Обход дочерних узлов ноды
 
@@ -127,11 +191,9 @@ class Visitor(ast.NodeVisitor):
         if DEBUG is True:
             log.info(f'{ast.dump(node)}')
         # Поиск owner среди переменных и проверка его значения
-        if not self.owner:
-            for target in node.targets:
-                if isinstance(target, ast.Name) and target.id == 'owner':
-                    if isinstance(node.value, ast.Str) and node.value.s == self.ext_user_login:
-                        self.owner = True
+        for target in node.targets:
+            if isinstance(target, ast.Name) and target.id == 'owner' and isinstance(node.value, ast.Constant):
+                self.check_owner(node.value.value)
         self.generic_visit(node)  # Обход дочерних узлов ноды
 
     def visit_Dict(self, node: ast.Dict) -> None:
@@ -141,16 +203,222 @@ class Visitor(ast.NodeVisitor):
         if DEBUG is True:
             log.info(f'{ast.dump(node)}')
         # Поиск owner в словаре, созданном при помощи фигурных скобок, и проверка его значения
-        if not self.owner:
-            for k, v in zip(node.keys, node.values):
-                if DEBUG is True:
-                    log.info(f'{k=}; {v=}')
-                if hasattr(k, 'value') and hasattr(v, 'value') and k.value and v.value and \
-                        k.value == 'owner' and v.value == self.ext_user_login:
-                    self.owner = True
+        for k, v in zip(node.keys, node.values):
+            if DEBUG is True:
+                log.info(f'{k=}; {v=}')
+            if hasattr(k, 'value') and hasattr(v, 'value') and k.value and v.value and k.value == 'owner':
+                self.check_owner(v.value)
         self.generic_visit(node)  # Обход дочерних узлов ноды
 
 
+class SourceScan(NamedTuple):
+    """
+    Результат сканирования кода, не зависящий от пользователя (кэшируется по хэшу содержимого).
+    """
+    imports: FrozenSet[str]
+    functions: FrozenSet[str]
+    owners: FrozenSet[str]
+    error: Optional[str]
+
+
+class ScanResult(NamedTuple):
+    """
+    Результат проверки кода для пользователя, см. find_forbidden.
+    """
+    imports: Optional[Set[str]]
+    functions: Optional[Set[str]]
+    owner: Optional[bool]
+    error: Optional[str]
+
+
+def _scan_source(
+        source: str,
+        legal_imports: FrozenSet[str],
+        matcher: ForbiddenMatcher
+) -> SourceScan:
+    """
+    Разбирает код и собирает запрещённые импорты, функции и значения owner.
+    """
+    try:
+        tree: ast.Module = ast.parse(source)
+        if DEBUG is True:
+            log.info(f'{ast.dump(tree)}')
+        visitor = Visitor(None, legal_imports, matcher=matcher)
+        visitor.scan(tree)
+        return SourceScan(frozenset(visitor.imports), frozenset(visitor.functions), frozenset(visitor.owners), None)
+    except Exception as e:
+        return SourceScan(frozenset(), frozenset(), frozenset(), str(e))
+
+
+def _scan_file(args: Tuple[str, Tuple[str, ...], Tuple[str, ...], Tuple[str, ...]]) -> Tuple[str, str, SourceScan]:
+    """
+    Сканирует файл (в процессе пула), возвращает путь, хэш содержимого и результат.
+    Ошибки чтения и декодирования возвращаются в результате, как при сканировании без пула
+    (хэш пустой, если файл не прочитан).
+    """
+    path, legal_imports, forbidden_functions, forbidden_functions_patterns = args
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        return path, '', SourceScan(frozenset(), frozenset(), frozenset(), str(e))
+    digest = sha256(data).hexdigest()
+    try:
+        source = data.decode('utf-8')
+    except UnicodeDecodeError as e:
+        return path, digest, SourceScan(frozenset(), frozenset(), frozenset(), str(e))
+    matcher = ForbiddenMatcher(forbidden_functions, forbidden_functions_patterns)
+    return path, digest, _scan_source(source, frozenset(legal_imports), matcher)
+
+
+class ForbiddenScanner(object):
+    """
+    Сканер запрещённого кода.
+    Шаблоны запрещённых функций собраны в одну проверку (ForbiddenMatcher),
+    результаты сканирования кэшируются по хэшу содержимого (LRU на cache_size записей),
+    поэтому повторное сохранение или сканирование того же кода не разбирает его снова.
+    """
+    def __init__(
+            self,
+            legal_imports: Iterable[str] = LEGAL_IMPORTS,
+            forbidden_functions: Iterable[str] = FORBIDDEN_FUNCTIONS,
+            forbidden_functions_patterns: Iterable[str] = FORBIDDEN_FUNCTIONS_PATTERNS,
+            cache_size: int = 4096
+    ) -> None:
+        self.legal_imports: FrozenSet[str] = frozenset(legal_imports)
+        self.matcher = ForbiddenMatcher(forbidden_functions, forbidden_functions_patterns)
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[str, SourceScan]' = OrderedDict()
+        self._lock = Lock()
+
+    def _cache_get(self, digest: str) -> Optional[SourceScan]:
+        with self._lock:
+            result = self._cache.get(digest)
+            if result is not None:
+                self._cache.move_to_end(digest)
+            return result
+
+    def _cache_put(self, digest: str, result: SourceScan) -> None:
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            self._cache[digest] = result
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def scan_source(self, source: str) -> SourceScan:
+        """
+        Сканирует код (или берёт результат из кэша).
+        """
+        digest = sha256(source.encode('utf-8')).hexdigest()
+        result = self._cache_get(digest)
+        if result is None:
+            result = _scan_source(source, self.legal_imports, self.matcher)
+            self._cache_put(digest, result)
+        return result
+
+    def scan(self, source: str, ext_user_login: Optional[str]) -> ScanResult:
+        """
+        Проверяет код для пользователя, результат в формате find_forbidden.
+        """
+        result = self.scan_source(source)
+        if result.error is not None:
+            return ScanResult(None, None, None, result.error)
+        return ScanResult(
+            set(result.imports) or None,
+            set(result.functions) or None,
+            ext_user_login in result.owners,
+            None,
+        )
+
+    def scan_folder(self, folder: str, workers: int = 1) -> Dict[str, Any]:
+        """
+        Сканирует все .py файлы директории (рекурсивно).
+        workers > 1 - файлы, которых нет в кэше, разбираются в пуле процессов.
+        Возвращает отчёт (сериализуется в JSON):
+            files - список по файлам: path (относительно folder), sha256, imports, functions, owners, error
+            summary - количество файлов, файлов с запрещённым кодом и файлов с ошибками разбора
+        """
+        paths: List[str] = []
+        for dir_path, dir_names, file_names in os.walk(folder):
+            dir_names[:] = sorted(d for d in dir_names if d != '__pycache__' and not d.startswith('.'))
+            paths.extend(os.path.join(dir_path, f) for f in sorted(file_names) if f.endswith('.py'))
+        scans: Dict[str, Tuple[str, SourceScan]] = dict()
+        missed: List[str] = []
+        for path in paths:
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError as e:
+                scans[path] = ('', SourceScan(frozenset(), frozenset(), frozenset(), str(e)))
+                continue
+            digest = sha256(data).hexdigest()
+            result = self._cache_get(digest)
+            if result is not None:
+                scans[path] = (digest, result)
+            elif workers > 1:
+                missed.append(path)
+            else:
+                try:
+                    result = _scan_source(data.decode('utf-8'), self.legal_imports, self.matcher)
+                except UnicodeDecodeError as e:
+                    result = SourceScan(frozenset(), frozenset(), frozenset(), str(e))
+                self._cache_put(digest, result)
+                scans[path] = (digest, result)
+        if missed:
+            args = (
+                tuple(self.legal_imports),
+                tuple(self.matcher.forbidden_functions),
+                self.matcher.forbidden_functions_patterns,
+            )
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for path, digest, result in executor.map(_scan_file, ((p, ) + args for p in missed), chunksize=64):
+                    if digest:
+                        self._cache_put(digest, result)
+                    scans[path] = (digest, result)
+        files = []
+        for path in paths:
+            digest, result = scans[path]
+            files.append({
+                'path': os.path.relpath(path, folder),
+                'sha256': digest,
+                'imports': sorted(result.imports),
+                'functions': sorted(result.functions),
+                'owners': sorted(result.owners),
+                'error': result.error,
+            })
+        return {
+            'folder': folder,
+            'files': files,
+            'summary': {
+                'files': len(files),
+                'forbidden': sum(1 for x in files if x['imports'] or x['functions']),
+                'errors': sum(1 for x in files if x['error']),
+            },
+        }
+
+
+@lru_cache(maxsize=16)
+def _get_scanner(
+        legal_imports: Tuple[str, ...],
+        forbidden_functions: Tuple[str, ...],
+        forbidden_functions_patterns: Tuple[str, ...]
+) -> ForbiddenScanner:
+    return ForbiddenScanner(legal_imports, forbidden_functions, forbidden_functions_patterns)
+
+
+def get_scanner(
+        legal_imports: Iterable[str] = LEGAL_IMPORTS,
+        forbidden_functions: Iterable[str] = FORBIDDEN_FUNCTIONS,
+        forbidden_functions_patterns: Iterable[str] = FORBIDDEN_FUNCTIONS_PATTERNS
+) -> ForbiddenScanner:
+    """
+    Возвращает общий (на процесс) сканер для набора правил.
+    """
+    return _get_scanner(tuple(legal_imports), tuple(forbidden_functions), tuple(forbidden_functions_patterns))
+
+
 def find_forbidden(
         source: str,
         legal_imports: Iterable[str] = LEGAL_IMPORTS,
@@ -159,7 +427,7 @@ def find_forbidden(
 ) -> Tuple[Optional[Set[str]], Optional[Set[str]], Optional[bool], Optional[str]]:
     """
     Сканирует на запрещённое.
-    Возвращает Tuple из 4 элементов.
+    Возвращает Tuple из 4 элементов (ScanResult).
         По позициям:
             0 - список запрещённых импортов или None, если не найдено
             1 - список запрещённых функций или None, если не найдено
@@ -167,24 +435,43 @@ def find_forbidden(
             3 - текст ошибки, если таковая возникла
     """
     if IS_ENABLE_SCAN is False:
-        return None, None, True, None
+        return ScanResult(None, None, True, None)
     try:
         ext_user = session.get('ext_user')
         if not ext_user:
             raise RuntimeError('Sorry, plugin not work without package "airflow_se"')
         ext_user_login = ext_user.get('login')
 
-        tree: ast.Module = ast.parse(source)
-        if DEBUG is True:
-            log.info(f'{ast.dump(tree)}')
-        visitor = Visitor(ext_user_login, legal_imports, forbidden_functions, forbidden_functions_patterns)
-        visitor.visit(tree)
-
-        imports, functions, owner = visitor.imports, visitor.functions, visitor.owner
+        scanner = get_scanner(legal_imports, forbidden_functions, forbidden_functions_patterns)
+        result = scanner.scan(source, ext_user_login)
 
         if DEBUG is True:
             log.info(f'{session=}')
-        return imports if len(imports) > 0 else None, functions if len(functions) > 0 else None, owner, None
+        return result
     except Exception as e:
-        return None, None, None, str(e)
+        return ScanResult(None, None, None, str(e))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Сканирование директории DAG из командной строки, отчёт в JSON.
+    Код возврата 1, если найден запрещённый код или ошибки разбора.
+    """
+    parser = argparse.ArgumentParser(description='Scan a DAG folder for forbidden imports and functions')
+    parser.add_argument('folder')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('-o', '--output', help='report file, default stdout')
+    args = parser.parse_args(argv)
+    report = get_scanner().scan_folder(args.folder, workers=args.workers)
+    data = json.dumps(report, indent=1, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(data)
+    else:
+        print(data)
+    summary = report['summary']
+    return 1 if summary['forbidden'] or summary['errors'] else 0
+
 
+if __name__ == '__main__':
+    sys.exit(main())
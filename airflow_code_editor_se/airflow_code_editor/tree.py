@@ -24,7 +24,7 @@ from airflow_code_editor.git import (
     git_enabled,
     execute_git_command,
 )
-from airflow_code_editor.fs import RootFS
+from airflow_code_editor.fs import get_root_fs
 
 __all__ = ['get_tree']
 
@@ -91,19 +91,21 @@ def get_files_node(path: Optional[str], args: Args) -> TreeOutput:
     long_ = 'long' in args  # long format
     all_ = 'all' in args  # do not ignore entries
 
-    for item in RootFS().path(path).iterdir(show_ignored_entries=all_):
-        s = item.stat()
-        leaf = not item.is_dir()
+    # One directory scan instead of a stat call per entry
+    for item, info in get_root_fs().path(path).scandir(show_ignored_entries=all_):
+        leaf = not info.is_dir
         if long_:  # Long format
-            size = item.size()
+            s = info.raw.get('stat') or {}
+            size = info.size if leaf and info.has_namespace('details') else item.size()
+            mtime = s.get('st_mtime')
             result.append(
                 {
                     'id': item.name,
                     'leaf': leaf,
                     'size': size,
-                    'mode': s.st_mode,
-                    'mtime': datetime.fromtimestamp(int(s.st_mtime)).isoformat()
-                    if s.st_mtime
+                    'mode': s.get('st_mode'),
+                    'mtime': datetime.fromtimestamp(int(mtime)).isoformat()
+                    if mtime
                     else None,
                 }
             )
@@ -1,10 +1,14 @@
 #!/usr/bin/env python
 
 import fs
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
 from pathlib import Path
 from flask import Flask
 from airflow_code_editor.commons import PLUGIN_NAME
-from airflow_code_editor.fs import split, RootFS
+from airflow_code_editor.fs import split, RootFS, get_root_fs
+from airflow_code_editor.tree import get_tree
 from airflow import configuration
 
 app = Flask(__name__)
@@ -71,3 +75,84 @@ def test_mem():
     root_fs.mount("/~mem", "mem://")
     root_fs.path("/~mem/f.txt").write_file("data", is_text=True)
     root_fs.path("/~mem/f.bin").write_file(b"data", is_text=False)
+
+
+def test_get_root_fs():
+    root_dir = Path(__file__).parent
+    configuration.conf.set(PLUGIN_NAME, 'root_directory', str(root_dir))
+    root_fs = get_root_fs()
+    assert get_root_fs() is root_fs
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert all(x is root_fs for x in executor.map(lambda _: get_root_fs(), range(32)))
+    assert root_fs.path("/folder/1").exists()
+    # A mount configuration change rebuilds the shared filesystem
+    configuration.conf.set(PLUGIN_NAME, 'root_directory', str(root_dir / "folder"))
+    try:
+        other = get_root_fs()
+        assert other is not root_fs
+        assert other.path("/1").exists()
+        assert get_root_fs() is other
+    finally:
+        configuration.conf.set(PLUGIN_NAME, 'root_directory', str(root_dir))
+    assert get_root_fs() is not other
+
+
+@pytest.fixture(scope="module")
+def big_folder(tmp_path_factory):
+    "Root directory with 10k files"
+    root_dir = tmp_path_factory.mktemp("big_folder")
+    for i in range(10000):
+        (root_dir / f"file_{i:05}.py").write_text("")
+    return root_dir
+
+
+def list_per_entry(path):
+    "Long listing as done before the shared RootFS: new RootFS and stat calls for every entry"
+    result = []
+    for item in RootFS().path(path).iterdir():
+        s = item.stat()
+        result.append({'id': item.name, 'leaf': not item.is_dir(), 'size': item.size(), 'mode': s.st_mode})
+    return result
+
+
+requires_benchmark = pytest.mark.skipif(find_spec("pytest_benchmark") is None, reason="pytest-benchmark not installed")
+
+
+@requires_benchmark
+@pytest.mark.benchmark(group="list-10k-files")
+def test_list_10k_files_per_entry(benchmark, big_folder):
+    configuration.conf.set(PLUGIN_NAME, 'root_directory', str(big_folder))
+    try:
+        assert len(benchmark(list_per_entry, "/")) == 10000
+    finally:
+        configuration.conf.set(PLUGIN_NAME, 'root_directory', str(Path(__file__).parent))
+
+
+@requires_benchmark
+@pytest.mark.benchmark(group="list-10k-files")
+def test_list_10k_files_tree(benchmark, big_folder):
+    configuration.conf.set(PLUGIN_NAME, 'root_directory', str(big_folder))
+    try:
+        with app.app_context():
+            t = benchmark(get_tree, "files", ["long"])
+        assert len(t) == 10000
+        assert all(x['leaf'] and x['size'] == 0 and x['mode'] for x in t)
+    finally:
+        configuration.conf.set(PLUGIN_NAME, 'root_directory', str(Path(__file__).parent))
+
+
+@requires_benchmark
+@pytest.mark.benchmark(group="tree-request")
+def test_tree_request_new_root_fs(benchmark, monkeypatch):
+    configuration.conf.set(PLUGIN_NAME, 'root_directory', str(Path(__file__).parent))
+    monkeypatch.setattr("airflow_code_editor.tree.get_root_fs", RootFS)
+    with app.app_context():
+        assert benchmark(get_tree, "files/folder")
+
+
+@requires_benchmark
+@pytest.mark.benchmark(group="tree-request")
+def test_tree_request_shared_root_fs(benchmark):
+    configuration.conf.set(PLUGIN_NAME, 'root_directory', str(Path(__file__).parent))
+    with app.app_context():
+        assert benchmark(get_tree, "files/folder")
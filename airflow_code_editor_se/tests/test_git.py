@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+import shutil
+import tempfile
+import threading
+import time
+import airflow
+import airflow.plugins_manager
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from airflow import configuration
+from flask import Flask
+from unittest import TestCase, mock
+from airflow_code_editor.commons import PLUGIN_NAME
+from airflow_code_editor.git import (
+    GitExecutor,
+    RWLock,
+    execute_git_command,
+)
+
+assert airflow.plugins_manager
+app = Flask(__name__)
+
+
+class TestRWLock(TestCase):
+    def test_readers_in_parallel(self):
+        lock = RWLock()
+        barrier = threading.Barrier(3, timeout=5)
+
+        def reader():
+            with lock.read():
+                barrier.wait()  # all readers are holding the lock at the same time
+
+        threads = [threading.Thread(target=reader) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert not barrier.broken
+
+    def test_writer_excludes_readers(self):
+        lock = RWLock()
+        events = []
+
+        def writer():
+            with lock.write():
+                events.append('write-start')
+                time.sleep(0.1)
+                events.append('write-end')
+
+        def reader():
+            with lock.read():
+                events.append('read')
+
+        with lock.read():
+            w = threading.Thread(target=writer)
+            w.start()
+            time.sleep(0.05)
+            # the writer is waiting, a new reader waits for it
+            r = threading.Thread(target=reader)
+            r.start()
+            time.sleep(0.05)
+            assert events == []
+        w.join()
+        r.join()
+        assert events == ['write-start', 'write-end', 'read']
+
+
+class TestGitExecutor(TestCase):
+    def setUp(self):
+        self.root_dir = tempfile.mkdtemp()
+        configuration.conf.set(PLUGIN_NAME, 'git_enabled', 'True')
+        configuration.conf.set(PLUGIN_NAME, 'git_init_repo', 'True')
+        configuration.conf.set(PLUGIN_NAME, 'git_author_name', 'Test')
+        configuration.conf.set(PLUGIN_NAME, 'git_author_email', 'test@example.com')
+        configuration.conf.set(PLUGIN_NAME, 'root_directory', self.root_dir)
+
+    def tearDown(self):
+        configuration.conf.set(PLUGIN_NAME, 'git_author_name', '')
+        configuration.conf.set(PLUGIN_NAME, 'git_author_email', '')
+        shutil.rmtree(self.root_dir)
+
+    def test_init_once(self):
+        executor = GitExecutor()
+        with mock.patch('airflow_code_editor.git.init_git_repo') as init_git_repo:
+            with app.app_context():
+                for _ in range(3):
+                    executor.execute(['mounts'])
+        assert init_git_repo.call_count == 1
+
+    def test_read_commands_in_parallel(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def git_call(*args, **kwargs):
+            barrier.wait()  # returns only if the three commands are running at the same time
+            return 0, b'', b''
+
+        def read(cmd):
+            with app.app_context():
+                return execute_git_command([cmd])
+
+        read('mounts')  # init the repository
+        with mock.patch('airflow_code_editor.git.git_call', git_call):
+            with ThreadPoolExecutor(max_workers=3) as pool:
+                results = list(pool.map(read, ['log', 'status', 'diff']))
+        assert [r.returncode for r in results] == [0, 0, 0]
+
+    def test_mixed_commands(self):
+        def commit(i):
+            with app.app_context():
+                Path(self.root_dir, 'file%d.py' % i).write_text('x = %d\n' % i)
+                r = execute_git_command(['add', 'file%d.py' % i])
+                assert r.returncode == 0, r.stderr
+                return execute_git_command(['commit', '-m', 'commit %d' % i, '--', 'file%d.py' % i])
+
+        read_commands = [['log'], ['status'], ['show', 'HEAD'], ['ls-tree', 'HEAD']]
+
+        def read(i):
+            with app.app_context():
+                return execute_git_command(read_commands[i % len(read_commands)])
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(commit if i % 3 == 0 else read, i) for i in range(30)]
+            results = [f.result() for f in futures]
+        for r in results:
+            assert r.returncode == 0, r.stderr
+        with app.app_context():
+            r = execute_git_command(['log', '--oneline'])
+        # initial commit and one commit for each writer
+        assert len(r.stdout.strip().split('\n')) == 1 + len(range(0, 30, 3))
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+
+import ast
+import json
+import pytest
+from importlib.util import find_spec
+from flask import Flask, session
+from airflow_code_editor.commons import LEGAL_IMPORTS
+from airflow_code_editor.scan_forbidden import (
+    ForbiddenMatcher,
+    ForbiddenScanner,
+    Visitor,
+    _scan_file,
+    find_forbidden,
+    main,
+)
+
+app = Flask(__name__)
+app.secret_key = 'test'
+
+requires_benchmark = pytest.mark.skipif(find_spec("pytest_benchmark") is None, reason="pytest-benchmark not installed")
+
+DAG = '''
+from datetime import datetime
+from airflow import DAG
+from airflow.operators.python import PythonOperator
+
+default_args = {{'owner': '{owner}', 'retries': 1}}
+
+
+def task_{n}(**context):
+    x = [i * {n} for i in range(10)]
+    return sum(x)
+
+
+with DAG('dag_{n}', default_args=default_args, start_date=datetime(2024, 1, 1), schedule=None) as dag:
+    t1 = PythonOperator(task_id='task_{n}', python_callable=task_{n})
+    t2 = PythonOperator(task_id='next_{n}', python_callable=task_{n})
+    t1 >> t2
+{extra}'''
+
+
+def make_dag(n: int, owner: str = 'user', extra: str = '') -> str:
+    return DAG.format(n=n, owner=owner, extra=extra)
+
+
+def make_corpus(folder, count: int) -> None:
+    for n in range(count):
+        sub = folder / ('team_%d' % (n % 20))
+        sub.mkdir(exist_ok=True)
+        extra = ''
+        if n % 50 == 0:
+            extra = 'import os\nos.system("ls")\n'
+        elif n % 50 == 1:
+            extra = 'print(open("/etc/passwd").read())\n'
+        (sub / ('dag_%d.py' % n)).write_text(make_dag(n, extra=extra))
+
+
+def test_matcher():
+    matcher = ForbiddenMatcher()
+    assert matcher('open')
+    assert matcher('read_csv')
+    assert matcher('xcom_push')
+    assert not matcher('opener')
+    assert not matcher('PythonOperator')
+    assert not ForbiddenMatcher(['open'], [])('read')
+
+
+def test_find_forbidden():
+    source = make_dag(1, extra='import os\nfrom pickle import loads\ndf.to_csv()\nprint(read_file())\n')
+    with app.test_request_context():
+        session['ext_user'] = {'login': 'user'}
+        imports, functions, owner, err = find_forbidden(source)
+        assert err is None
+        assert imports == {'os', 'pickle'}
+        assert functions == {'loads', 'print', 'read_file'}
+        assert owner is True
+        session['ext_user'] = {'login': 'other'}
+        assert find_forbidden(source).owner is False
+        assert find_forbidden(make_dag(1)) == (None, None, False, None)
+        assert find_forbidden('def (').error
+
+
+def test_scan_same_as_visit(tmp_path):
+    make_corpus(tmp_path, 100)
+    for path in tmp_path.rglob('*.py'):
+        tree = ast.parse(path.read_text())
+        visited, scanned = Visitor('user'), Visitor('user')
+        visited.visit(tree)
+        scanned.scan(tree)
+        assert (visited.imports, visited.functions, visited.owner) == (scanned.imports, scanned.functions, True)
+
+
+def test_owner_forms():
+    scanner = ForbiddenScanner()
+    assert scanner.scan("owner = 'u1'", 'u1').owner
+    assert scanner.scan("args = dict(owner='u2')", 'u2').owner
+    assert scanner.scan("args = {'owner': 'u3'}", 'u3').owner
+    assert scanner.scan_source("owner = 'a'\nargs = {'owner': 'b'}").owners == {'a', 'b'}
+
+
+def test_cache():
+    scanner = ForbiddenScanner(cache_size=2)
+    first = scanner.scan_source(make_dag(1))
+    assert scanner.scan_source(make_dag(1)) is first
+    scanner.scan_source(make_dag(2))
+    scanner.scan_source(make_dag(3))
+    assert scanner.scan_source(make_dag(1)) is not first
+    assert scanner.scan_source(make_dag(1)) == first
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_scan_folder(tmp_path, workers):
+    make_corpus(tmp_path, 100)
+    (tmp_path / 'broken.py').write_text('def (')
+    (tmp_path / 'latin1.py').write_bytes(b'# \xe9t\xe9\n')
+    report = ForbiddenScanner().scan_folder(str(tmp_path), workers=workers)
+    assert report['summary'] == {'files': 102, 'forbidden': 4, 'errors': 2}
+    by_path = {x['path']: x for x in report['files']}
+    assert by_path['team_0/dag_0.py']['imports'] == ['os']
+    assert by_path['team_1/dag_1.py']['functions'] == ['open', 'print', 'read']
+    assert by_path['team_2/dag_2.py']['owners'] == ['user']
+    assert by_path['broken.py']['error']
+    assert 'utf-8' in by_path['latin1.py']['error']
+    json.dumps(report)
+
+
+def test_scan_file_errors(tmp_path):
+    # файл, удалённый между обходом директории и разбором в пуле
+    path, digest, result = _scan_file((str(tmp_path / 'deleted.py'), (), (), ()))
+    assert digest == '' and result.error
+
+
+def test_main(tmp_path):
+    (tmp_path / 'dags').mkdir()
+    make_corpus(tmp_path / 'dags', 3)
+    output = tmp_path / 'report.json'
+    assert main([str(tmp_path / 'dags'), '-j', '1', '-o', str(output)]) == 1
+    assert json.loads(output.read_text())['summary']['files'] == 3
+
+
+class PatternLoop(ForbiddenMatcher):
+    "Name check as done before the compiled matcher: every pattern is checked for every name"
+
+    def __call__(self, name: str) -> bool:
+        if name in self.forbidden_functions:
+            return True
+        for x in self.forbidden_functions_patterns:
+            if x in name:
+                return True
+        return False
+
+
+def scan_per_node(path) -> set:
+    "Scan as done before the scanner engine: recursive visit, pattern loop and no cache"
+    visitor = Visitor(None, matcher=PatternLoop())
+    visitor.visit(ast.parse(path.read_text()))
+    return visitor.functions
+
+
+@pytest.fixture(scope="module")
+def dag_corpus(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("dag_corpus")
+    make_corpus(folder, 3000)
+    return folder
+
+
+@requires_benchmark
+@pytest.mark.benchmark(group="scan-3000-dags")
+def test_scan_3000_dags_per_node(benchmark, dag_corpus):
+    def scan():
+        return [scan_per_node(path) for path in sorted(dag_corpus.rglob('*.py'))]
+
+    assert len(benchmark(scan)) == 3000
+
+
+@requires_benchmark
+@pytest.mark.benchmark(group="scan-3000-dags")
+def test_scan_3000_dags_cold(benchmark, dag_corpus):
+    def scan():
+        return ForbiddenScanner(LEGAL_IMPORTS).scan_folder(str(dag_corpus))
+
+    assert benchmark(scan)['summary']['forbidden'] == 120
+
+
+@requires_benchmark
+@pytest.mark.benchmark(group="scan-3000-dags")
+def test_scan_3000_dags_cached(benchmark, dag_corpus):
+    scanner = ForbiddenScanner(LEGAL_IMPORTS)
+    scanner.scan_folder(str(dag_corpus))
+    assert benchmark(scanner.scan_folder, str(dag_corpus))['summary']['forbidden'] == 120
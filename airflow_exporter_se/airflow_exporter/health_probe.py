@@ -0,0 +1,162 @@
+"""
+Проверка состояния планировщика в фоне, независимо от скрейпа метрик
+"""
+import logging
+import threading
+
+from bisect import bisect_left
+from time import monotonic
+from typing import Callable, List, Optional, Tuple
+
+import requests
+
+log = logging.getLogger(__name__)
+
+DEFAULT_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def get_scheduler_status(
+        host: str,
+        port: int,
+        session: Optional[requests.Session] = None,
+        timeout: Optional[float] = None,
+) -> Optional[float]:
+    """get scheduler status
+    :param host: host where airflow is deployed
+    :param port: port where airflow is deployed
+    :param session: HTTP session to reuse connections, new connection for each call if not set
+    :param timeout: request timeout in seconds, no timeout if not set
+    :return: 1.0 if scheduler status is healthy or 0.0 otherwise or None"""
+    url = f"https://{host}:{port}/api/v1/health"
+    try:
+        if session is None:
+            response = requests.get(url, verify=False, timeout=timeout)
+        else:
+            response = session.get(url, timeout=timeout)
+        response.raise_for_status()
+        health_data = response.json()
+
+        scheduler_status = health_data.get("scheduler", {}).get("status", "unknown")
+
+        if scheduler_status == "healthy":
+            return 1.0
+        return 0.0
+    except requests.exceptions.HTTPError as http_err:
+        log.error(f"There was HTTP error: {http_err}")
+    except requests.exceptions.RequestException as req_err:
+        log.error(f"There was query error: {req_err}")
+    except ValueError as json_err:
+        log.error(f"There was invalid health response: {json_err}")
+    return None
+
+
+class SchedulerHealthProbe(object):
+    """polls the health endpoint in a background thread
+
+    The thread waits `interval` seconds after a successful probe and backs off
+    exponentially (up to `max_backoff`) after consecutive failures.
+    """
+
+    def __init__(
+            self,
+            interval: float,
+            timeout: float,
+            max_backoff: float,
+            latency_buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS,
+            clock: Callable[[], float] = monotonic,
+    ):
+        """
+        :param interval: seconds between two probes of a healthy endpoint
+        :param timeout: request timeout in seconds
+        :param max_backoff: maximum seconds between two probes of a failing endpoint
+        :param latency_buckets: upper bounds of the probe latency histogram buckets
+        :param clock: monotonic time source, replaceable in tests
+        """
+        self.interval = interval
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.latency_buckets = tuple(sorted(latency_buckets))
+        self.clock = clock
+        self.host: Optional[str] = None
+        self.port: Optional[int] = None
+        self.status: Optional[float] = None
+        self.consecutive_failures: int = 0
+        self._lock = threading.Lock()
+        self._bucket_counts: List[int] = [0] * (len(self.latency_buckets) + 1)
+        self._latency_sum: float = 0.0
+        self._session: Optional[requests.Session] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def session(self) -> requests.Session:
+        """pooled HTTP session, TLS certificate isn't verified (as before)"""
+        if self._session is None:
+            self._session = requests.Session()
+            self._session.verify = False
+        return self._session
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def next_delay(self) -> float:
+        """seconds to wait before the next probe"""
+        if self.consecutive_failures == 0:
+            return self.interval
+        return min(self.interval * 2 ** self.consecutive_failures, self.max_backoff)
+
+    def latency_histogram(self) -> Tuple[List[Tuple[str, int]], float]:
+        """cumulative histogram buckets and the sum of probe latencies"""
+        with self._lock:
+            buckets, cumulative = [], 0
+            for bound, count in zip(self.latency_buckets + (float("inf"),), self._bucket_counts):
+                cumulative += count
+                buckets.append(("+Inf" if bound == float("inf") else str(bound), cumulative))
+            return buckets, self._latency_sum
+
+    def probe(self) -> Optional[float]:
+        """run one probe and publish its result"""
+        started = self.clock()
+        status = get_scheduler_status(host=self.host, port=self.port, session=self.session, timeout=self.timeout)
+        latency = self.clock() - started
+        with self._lock:
+            self._bucket_counts[bisect_left(self.latency_buckets, latency)] += 1
+            self._latency_sum += latency
+            if status is None:
+                # the last good status must not hide an outage, the metric is not published
+                self.consecutive_failures += 1
+                self.status = None
+            else:
+                self.consecutive_failures = 0
+                self.status = status
+        return status
+
+    def start(self, host: str, port: int):
+        """start polling the health endpoint of the given webserver"""
+        with self._lock:
+            if self.is_running():
+                return
+            self.host, self.port = host, port
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                name="airflow-exporter-se-health-probe",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """stop polling"""
+        self._stop_event.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self._thread = None
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.probe()
+            self._stop_event.wait(self.next_delay())
@@ -2,16 +2,19 @@
 Метрики по DAGs и Tasks
 """
 import logging
+import threading
 
-from typing import List, Tuple, Optional, Union, Generator, NamedTuple, Dict
+from typing import List, Tuple, Optional, Union, Generator, NamedTuple, Dict, Callable
 
 from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import partial
 from itertools import groupby as it_group_by
+from time import monotonic
 from urllib.parse import urlparse
 
-import requests
 from psutil import Process, process_iter, NoSuchProcess, AccessDenied, ZombieProcess, disk_usage
-from sqlalchemy import func
+from sqlalchemy import and_, func, or_
 from sqlalchemy import text
 
 from flask import Response, current_app, request
@@ -26,9 +29,12 @@ from airflow.configuration import conf
 
 # Importing base classes that we need to derive
 from prometheus_client import generate_latest, REGISTRY
-from prometheus_client.core import GaugeMetricFamily, Metric
+from prometheus_client.core import GaugeMetricFamily, HistogramMetricFamily, Metric
 from prometheus_client.samples import Sample
 
+from .snapshot import SnapshotRefresher
+from .health_probe import SchedulerHealthProbe
+
 log = logging.getLogger(__name__)
 
 try:
@@ -164,40 +170,147 @@ class TaskStatusInfo:
     owner: str
 
 
-def get_task_status_info() -> List[TaskStatusInfo]:
-    """get task info
-    :return task_info
+class TaskStatusAggregator(object):
+    """incremental per (dag_id, task_id, state) counters of task instances
+
+    Only task instances whose `updated_at` is within `updated_at_lag` of the watermark
+    are read, and their (state, updated_at) is kept until they leave this window.
+    Tasks with a task instance not seen with the same (state, updated_at) on the
+    previous refresh are recounted with a GROUP BY restricted to these tasks, so
+    a cleared or re-run task instance is counted once whatever its previous state
+    was. Rows deleted without any other change of their task are dropped by the
+    periodic full reconciliation (plain GROUP BY).
     """
-    assert (Session is not None)
 
-    task_status_query = Session.query(  # pylint: disable=no-member
-        TaskInstance.dag_id, TaskInstance.task_id,
-        TaskInstance.state, func.count(TaskInstance.dag_id).label('cnt')
-    ).group_by(TaskInstance.dag_id, TaskInstance.task_id, TaskInstance.state).subquery()
+    # tasks per recount query
+    chunk_size = 500
+
+    def __init__(self, reconcile_interval: float, updated_at_lag: float, clock: Callable[[], float] = monotonic):
+        """
+        :param reconcile_interval: seconds between two full reconciliations
+        :param updated_at_lag: seconds to re-read before the watermark,
+            covers transactions committed later than their `updated_at`
+        :param clock: monotonic time source, replaceable in tests
+        """
+        self.reconcile_interval = reconcile_interval
+        self.updated_at_lag = timedelta(seconds=updated_at_lag)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._counts: Dict[Tuple[str, str, Optional[str]], int] = {}
+        self._recent: Dict[tuple, Tuple[Optional[str], datetime]] = {}
+        self._watermark: Optional[datetime] = None
+        self._reconciled_at: Optional[float] = None
 
-    sql_res = (
-        Session.query(  # pylint: disable=no-member
-            task_status_query.c.dag_id, task_status_query.c.task_id,
-            task_status_query.c.state, task_status_query.c.cnt, DagModel.owners
+    @staticmethod
+    def _key_columns() -> list:
+        columns = [TaskInstance.dag_id, TaskInstance.task_id, TaskInstance.run_id]
+        # Airflow version 2.3+
+        if hasattr(TaskInstance, 'map_index'):
+            columns.append(TaskInstance.map_index)
+        return columns
+
+    def _read_recent(self, watermark: datetime) -> Dict[tuple, Tuple[Optional[str], datetime]]:
+        """(state, updated_at) of task instances updated since `watermark - updated_at_lag`"""
+        key_columns = self._key_columns()
+        key_len = len(key_columns)
+        sql_res = (
+            Session.query(*key_columns, TaskInstance.state, TaskInstance.updated_at)
+            .filter(TaskInstance.updated_at >= watermark - self.updated_at_lag)
+            .yield_per(10000)
         )
-        .join(DagModel, DagModel.dag_id == task_status_query.c.dag_id)
-        .join(SerializedDagModel, SerializedDagModel.dag_id == task_status_query.c.dag_id)
-        .order_by(task_status_query.c.dag_id)
-        .all()
-    )
+        return {row[:key_len]: row[key_len:] for row in map(tuple, sql_res)}
 
-    res = [
-        TaskStatusInfo(
-            dag_id=i.dag_id,
-            task_id=i.task_id,
-            status=i.state or 'none',
-            cnt=i.cnt,
-            owner=i.owners
+    @staticmethod
+    def _count(tasks: Optional[List[Tuple[str, str]]] = None) -> Dict[Tuple[str, str, Optional[str]], int]:
+        """GROUP BY (dag_id, task_id, state) of all task instances or of the given tasks only"""
+        query = Session.query(  # pylint: disable=no-member
+            TaskInstance.dag_id, TaskInstance.task_id,
+            TaskInstance.state, func.count(TaskInstance.dag_id).label('cnt')
+        )
+        if tasks is not None:
+            query = query.filter(or_(*(
+                and_(TaskInstance.dag_id == dag_id, TaskInstance.task_id == task_id) for dag_id, task_id in tasks
+            )))
+        sql_res = query.group_by(TaskInstance.dag_id, TaskInstance.task_id, TaskInstance.state).all()
+        return {(i.dag_id, i.task_id, i.state): i.cnt for i in sql_res}
+
+    def reconcile(self):
+        """recompute all counters with a full GROUP BY"""
+        assert (Session is not None)
+
+        watermark = Session.query(func.max(TaskInstance.updated_at)).scalar()
+        # read before the GROUP BY: a row changed in between differs from it and its task is recounted
+        self._recent = self._read_recent(watermark) if watermark is not None else {}
+        self._counts = self._count()
+        self._watermark = watermark
+        self._reconciled_at = self.clock()
+
+    def apply_changes(self):
+        """recount the tasks with task instances changed since the previous refresh"""
+        assert (Session is not None)
+
+        recent = self._read_recent(self._watermark)
+        watermark = self._watermark
+        tasks = set()
+        for key, seen in recent.items():
+            if self._recent.get(key) != seen:
+                tasks.add(key[:2])
+            if seen[1] > watermark:
+                watermark = seen[1]
+
+        if tasks:
+            chunks = sorted(tasks)
+            counts = {key: cnt for key, cnt in self._counts.items() if key[:2] not in tasks}
+            for i in range(0, len(chunks), self.chunk_size):
+                counts.update(self._count(chunks[i:i + self.chunk_size]))
+            self._counts = counts
+        self._recent = recent
+        self._watermark = watermark
+
+    def refresh(self):
+        """update counters: full reconciliation when it is due, otherwise incremental"""
+        with self._lock:
+            if (
+                    self._watermark is None
+                    or self._reconciled_at is None
+                    or self.clock() - self._reconciled_at >= self.reconcile_interval
+            ):
+                self.reconcile()
+            else:
+                self.apply_changes()
+
+    def get_task_status_info(self) -> List[TaskStatusInfo]:
+        """refresh counters and get task info
+        :return task_info
+        """
+        self.refresh()
+
+        owners = dict(
+            Session.query(DagModel.dag_id, DagModel.owners)  # pylint: disable=no-member
+            .join(SerializedDagModel, SerializedDagModel.dag_id == DagModel.dag_id)
+            .all()
         )
-        for i in sql_res
-    ]
 
-    return res
+        res = [
+            TaskStatusInfo(
+                dag_id=dag_id,
+                task_id=task_id,
+                status=state or 'none',
+                cnt=cnt,
+                owner=owners[dag_id]
+            )
+            for (dag_id, task_id, state), cnt in self._counts.items()
+            if dag_id in owners
+        ]
+        res.sort(key=lambda x: x.dag_id)
+
+        return res
+
+
+task_status_aggregator = TaskStatusAggregator(
+    reconcile_interval=conf.getfloat("exporter_se", "task_status_reconcile_interval", fallback=600.0),
+    updated_at_lag=conf.getfloat("exporter_se", "task_status_updated_at_lag", fallback=60.0),
+)
 
 
 @dataclass
@@ -349,28 +462,6 @@ def calculate_airflow_disk_util(logs_directory: str) -> Optional[float]:
         log.error(f"An error occurred while calculating disk util: {e}")
         return None
 
-def get_scheduler_status(host: str, port: int) -> Optional[float]:
-    """get scheduler status
-    :param host: host where airflow is deployed
-    :param port: port where airflow is deployed
-    :return: 1.0 if scheduler status is healthy or 0.0 otherwise or None"""
-    url = f"https://{host}:{port}/api/v1/health"
-    try:
-        response = requests.get(url, verify=False)
-        response.raise_for_status()
-        health_data = response.json()
-
-        scheduler_status = health_data.get("scheduler", {}).get("status", "unknown")
-
-        if scheduler_status == "healthy":
-            return 1.0
-        return 0.0
-    except requests.exceptions.HTTPError as http_err:
-        log.error(f"There was HTTP error: {http_err}")
-    except requests.exceptions.RequestException as req_err:
-        log.error(f"There was query error: {req_err}")
-    return None
-
 def _add_gauge_metric(metric, labels, value):
     metric.samples.append(Sample(
         metric.name, labels,
@@ -379,134 +470,195 @@ def _add_gauge_metric(metric, labels, value):
     ))
 
 
-class MetricsCollector(object):
-    """collection of metrics for prometheus"""
+def collect_db_metrics() -> Generator[Metric, None, None]:
+    """collect metrics from airflow metadata DB"""
 
-    @staticmethod
-    def describe():
-        return []
+    # Dag Metrics and collect all labels
+    dag_info = get_dag_status_info()
 
-    @staticmethod
-    def collect() -> Generator[Metric, None, None]:
-        """collect metrics"""
+    dag_status_metric = GaugeMetricFamily(
+        'airflow_dag_status',
+        'Shows the number of dag starts with this status',
+        labels=['dag_id', 'owner', 'status']
+    )
 
-        # Dag Metrics and collect all labels
-        dag_info = get_dag_status_info()
+    for dag in dag_info:
+        labels = get_dag_labels(dag.dag_id)
 
-        dag_status_metric = GaugeMetricFamily(
-            'airflow_dag_status',
-            'Shows the number of dag starts with this status',
-            labels=['dag_id', 'owner', 'status']
+        _add_gauge_metric(
+            dag_status_metric,
+            {
+                'dag_id': dag.dag_id,
+                'owner': dag.owner,
+                'status': dag.status,
+                **labels
+            },
+            dag.cnt,
         )
 
-        for dag in dag_info:
-            labels = get_dag_labels(dag.dag_id)
+    yield dag_status_metric
+
+    # Count of active dags metric
+    count_of_active_dags_metric = GaugeMetricFamily(
+        'airflow_count_of_active_dags',
+        'Shows the number of active dags (is_paused=false)',
+        labels=[]
+    )
 
+    count_of_active_dags = 0.0
+
+    dags = get_dag_info()
+    for dag in dags:
+        if not dag.is_paused:
+            count_of_active_dags += 1
+
+    _add_gauge_metric(
+        count_of_active_dags_metric,
+        {},
+        count_of_active_dags
+    )
+
+    yield count_of_active_dags_metric
+
+    # Last DagRun Metrics
+    last_dagrun_info = get_last_dagrun_info()
+
+    dag_last_status_metric = GaugeMetricFamily(
+        'airflow_dag_last_status',
+        'Shows the status of last dagrun',
+        labels=['dag_id', 'owner', 'status']
+    )
+
+    for dag in last_dagrun_info:
+        labels = get_dag_labels(dag.dag_id)
+
+        for status in State.dag_states:
             _add_gauge_metric(
-                dag_status_metric,
+                dag_last_status_metric,
                 {
                     'dag_id': dag.dag_id,
                     'owner': dag.owner,
-                    'status': dag.status,
+                    'status': status,
                     **labels
                 },
-                dag.cnt,
+                int(dag.status == status)
             )
 
-        yield dag_status_metric
+    yield dag_last_status_metric
 
-        # Count of active dags metric
-        count_of_active_dags_metric = GaugeMetricFamily(
-            'airflow_count_of_active_dags',
-            'Shows the number of active dags (is_paused=false)',
-            labels=[]
+    # DagRun metrics
+    dag_duration_metric = GaugeMetricFamily(
+        'airflow_dag_run_duration',
+        'Maximum duration of currently running dag_runs for each DAG in seconds',
+        labels=['dag_id']
+    )
+    for dag_duration in get_dag_duration_info():
+        labels = get_dag_labels(dag_duration.dag_id)
+
+        _add_gauge_metric(
+            dag_duration_metric,
+            {
+                'dag_id': dag_duration.dag_id,
+                **labels
+            },
+            dag_duration.duration
         )
 
-        count_of_active_dags = 0.0
+    yield dag_duration_metric
 
-        dags = get_dag_info()
-        for dag in dags:
-            if not dag.is_paused:
-                count_of_active_dags += 1
+    # Task metrics
+    task_status_metric = GaugeMetricFamily(
+        'airflow_task_status',
+        'Shows the number of task starts with this status',
+        labels=['dag_id', 'task_id', 'owner', 'status']
+    )
 
-        _add_gauge_metric(
-            count_of_active_dags_metric,
-            {},
-            count_of_active_dags
-        )
+    for dag_id, tasks in it_group_by(task_status_aggregator.get_task_status_info(), lambda x: x.dag_id):
+        labels = get_dag_labels(dag_id)
 
-        yield count_of_active_dags_metric
+        for task in tasks:
+            _add_gauge_metric(
+                task_status_metric,
+                {
+                    'dag_id': task.dag_id,
+                    'task_id': task.task_id,
+                    'owner': task.owner,
+                    'status': task.status,
+                    **labels
+                },
+                task.cnt
+            )
 
-        # Last DagRun Metrics
-        last_dagrun_info = get_last_dagrun_info()
+    yield task_status_metric
 
-        dag_last_status_metric = GaugeMetricFamily(
-            'airflow_dag_last_status',
-            'Shows the status of last dagrun',
-            labels=['dag_id', 'owner', 'status']
-        )
 
-        for dag in last_dagrun_info:
-            labels = get_dag_labels(dag.dag_id)
+def build_db_metrics(app) -> List[Metric]:
+    """collect metrics from airflow metadata DB outside of request
+    :param app: flask application, its dag_bag is used for DAG labels
+    :return: list of metric families"""
+    with app.app_context():
+        try:
+            return list(collect_db_metrics())
+        finally:
+            Session.remove()
 
-            for status in State.dag_states:
-                _add_gauge_metric(
-                    dag_last_status_metric,
-                    {
-                        'dag_id': dag.dag_id,
-                        'owner': dag.owner,
-                        'status': status,
-                        **labels
-                    },
-                    int(dag.status == status)
-                )
 
-        yield dag_last_status_metric
+scheduler_health_probe = SchedulerHealthProbe(
+    interval=conf.getfloat("exporter_se", "health_probe_interval", fallback=15.0),
+    timeout=conf.getfloat("exporter_se", "health_probe_timeout", fallback=5.0),
+    max_backoff=conf.getfloat("exporter_se", "health_probe_max_backoff", fallback=300.0),
+)
 
-        # DagRun metrics
-        dag_duration_metric = GaugeMetricFamily(
-            'airflow_dag_run_duration',
-            'Maximum duration of currently running dag_runs for each DAG in seconds',
-            labels=['dag_id']
-        )
-        for dag_duration in get_dag_duration_info():
-            labels = get_dag_labels(dag_duration.dag_id)
+snapshot_refresher = SnapshotRefresher(
+    interval=conf.getfloat("exporter_se", "snapshot_refresh_interval", fallback=30.0)
+)
 
-            _add_gauge_metric(
-                dag_duration_metric,
-                {
-                    'dag_id': dag_duration.dag_id,
-                    **labels
-                },
-                dag_duration.duration
+
+class MetricsCollector(object):
+    """collection of metrics for prometheus"""
+
+    @staticmethod
+    def describe():
+        return []
+
+    @staticmethod
+    def collect() -> Generator[Metric, None, None]:
+        """collect metrics"""
+
+        # Metadata DB metrics are served from the last snapshot
+        snapshot_refresher.start(partial(build_db_metrics, current_app._get_current_object()))
+
+        snapshot = snapshot_refresher.snapshot
+        if snapshot is not None:
+            yield from snapshot.metrics
+
+            snapshot_age_metric = GaugeMetricFamily(
+                'airflow_metrics_snapshot_age_seconds',
+                'Shows seconds since the metadata DB metrics snapshot was taken',
+                labels=[]
             )
 
-        yield dag_duration_metric
+            _add_gauge_metric(
+                snapshot_age_metric,
+                {},
+                snapshot_refresher.age()
+            )
 
-        # Task metrics
-        task_status_metric = GaugeMetricFamily(
-            'airflow_task_status',
-            'Shows the number of task starts with this status',
-            labels=['dag_id', 'task_id', 'owner', 'status']
-        )
+            yield snapshot_age_metric
 
-        for dag_id, tasks in it_group_by(get_task_status_info(), lambda x: x.dag_id):
-            labels = get_dag_labels(dag_id)
+            snapshot_refresh_duration_metric = GaugeMetricFamily(
+                'airflow_metrics_snapshot_refresh_duration_seconds',
+                'Shows duration of the last metadata DB metrics snapshot refresh in seconds',
+                labels=[]
+            )
 
-            for task in tasks:
-                _add_gauge_metric(
-                    task_status_metric,
-                    {
-                        'dag_id': task.dag_id,
-                        'task_id': task.task_id,
-                        'owner': task.owner,
-                        'status': task.status,
-                        **labels
-                    },
-                    task.cnt
-                )
+            _add_gauge_metric(
+                snapshot_refresh_duration_metric,
+                {},
+                snapshot.refresh_duration
+            )
 
-        yield task_status_metric
+            yield snapshot_refresh_duration_metric
 
         # Webserver resources utilization metrics
         webserver_processes_info = get_processes_info_by_keywords("gunicorn")
@@ -612,23 +764,47 @@ class MetricsCollector(object):
             yield disk_util_metric
 
         # Availability of services metrics
+        if not scheduler_health_probe.is_running():
+            base_url = urlparse(request.base_url)
+            scheduler_health_probe.start(host=base_url.hostname, port=base_url.port)
+
         healthcheck_metric = GaugeMetricFamily(
             'airflow_healthcheck',
             'Shows scheduler status (healthy is 1.0)',
             labels=[]
         )
 
-        base_url = urlparse(request.base_url)
-        scheduler_status = get_scheduler_status(host=base_url.hostname, port=base_url.port)
-
-        if scheduler_status is not None:
+        if scheduler_health_probe.status is not None:
             _add_gauge_metric(
                 healthcheck_metric,
                 {},
-                scheduler_status
+                scheduler_health_probe.status
             )
             yield healthcheck_metric
 
+        healthcheck_failures_metric = GaugeMetricFamily(
+            'airflow_healthcheck_consecutive_failures',
+            'Shows the number of consecutive failed scheduler health probes',
+            labels=[]
+        )
+
+        _add_gauge_metric(
+            healthcheck_failures_metric,
+            {},
+            scheduler_health_probe.consecutive_failures
+        )
+
+        yield healthcheck_failures_metric
+
+        buckets, latency_sum = scheduler_health_probe.latency_histogram()
+
+        yield HistogramMetricFamily(
+            'airflow_healthcheck_probe_latency_seconds',
+            'Latency of scheduler health probes in seconds',
+            buckets=buckets,
+            sum_value=latency_sum
+        )
+
 
 REGISTRY.register(MetricsCollector())
 
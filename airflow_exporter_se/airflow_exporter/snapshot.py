@@ -0,0 +1,107 @@
+"""
+Снимок метрик из БД метаданных и его фоновое обновление
+"""
+import logging
+import threading
+
+from dataclasses import dataclass
+from time import monotonic
+from typing import Callable, Iterable, Optional, Tuple
+
+from prometheus_client.core import Metric
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class MetricsSnapshot:
+    """immutable set of metric families computed in one refresh"""
+    metrics: Tuple[Metric, ...]
+    created_at: float
+    refresh_duration: float
+
+
+class SnapshotRefresher(object):
+    """computes metric families in a background thread at a fixed interval
+
+    Scrapes read the last published snapshot and never touch the DB. A failed
+    refresh is logged and the previous snapshot stays published.
+    """
+
+    def __init__(self, interval: float, clock: Callable[[], float] = monotonic):
+        """
+        :param interval: seconds between two refreshes
+        :param clock: monotonic time source, replaceable in tests
+        """
+        self.interval = interval
+        self.clock = clock
+        self._build: Optional[Callable[[], Iterable[Metric]]] = None
+        self._snapshot: Optional[MetricsSnapshot] = None
+        self._start_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def snapshot(self) -> Optional[MetricsSnapshot]:
+        """last published snapshot (None until the first successful refresh)"""
+        return self._snapshot
+
+    def age(self) -> Optional[float]:
+        """seconds since the last published snapshot was created"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        return self.clock() - snapshot.created_at
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def refresh(self) -> Optional[MetricsSnapshot]:
+        """compute a new snapshot and publish it
+        :return: published snapshot or None if the refresh failed"""
+        if self._build is None:
+            raise RuntimeError("SnapshotRefresher is not started: metrics builder is not set")
+        started = self.clock()
+        try:
+            metrics = tuple(self._build())
+        except Exception as e:
+            log.error(f"Metrics snapshot refresh failed, previous snapshot is kept: {e}")
+            return None
+        finished = self.clock()
+        snapshot = MetricsSnapshot(
+            metrics=metrics,
+            created_at=finished,
+            refresh_duration=finished - started,
+        )
+        # присваивание ссылки атомарно, читатели видят либо старый, либо новый снимок целиком
+        self._snapshot = snapshot
+        return snapshot
+
+    def start(self, build: Callable[[], Iterable[Metric]]):
+        """compute the first snapshot synchronously and start the background thread
+        :param build: callable returning all metric families of one snapshot"""
+        with self._start_lock:
+            if self.is_running():
+                return
+            self._build = build
+            self._stop_event.clear()
+            if self._snapshot is None:
+                self.refresh()
+            self._thread = threading.Thread(
+                target=self._run,
+                name="airflow-exporter-se-snapshot",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """stop the background thread"""
+        self._stop_event.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.refresh()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+Сравнение полного (GROUP BY по всей task_instance) и инкрементального (GROUP BY только задач, строки
+которых изменились по `updated_at`) пересчёта счётчиков `TaskStatusAggregator` на синтетической таблице SQLite.
+
+Запуск:
+    python benchmarks/task_status_sqlite.py [--task-instances 500000] [--changes 500] [--rounds 10] [--db /tmp/ti.db]
+"""
+import argparse
+import os
+import random
+import sys
+from collections import deque
+from datetime import timedelta
+from tempfile import mkdtemp
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, update  # noqa: E402
+
+from airflow import settings  # noqa: E402
+from airflow.models import import_all_models  # noqa: E402
+from airflow.models.base import Base  # noqa: E402
+from airflow.utils import timezone  # noqa: E402
+
+from airflow_exporter.prometheus_exporter import TaskInstance, TaskStatusAggregator  # noqa: E402
+
+DAGS = 200
+TASKS = 20
+FINISHED = ("success",) * 97 + ("failed",) * 2 + ("upstream_failed",)
+UNFINISHED = ("running", "queued", "scheduled")
+
+
+def fill(engine, count: int, rng: random.Random) -> deque:
+    """Заполняет task_instance, возвращает ключи незавершённых task instances"""
+    import_all_models()
+    table = TaskInstance.__table__
+    Base.metadata.drop_all(engine, tables=[table])
+    Base.metadata.create_all(engine, tables=[table])
+    started_at = timezone.utcnow() - timedelta(days=30)
+    runs = max(1, count // (DAGS * TASKS))
+    unfinished = deque()
+    rows = list()
+    with engine.begin() as conn:
+        for run in range(runs):
+            last = run == runs - 1
+            for dag in range(DAGS):
+                for task in range(TASKS):
+                    key = (f"dag_{dag}", f"task_{task}", f"run_{run}")
+                    state = rng.choice(UNFINISHED if last else FINISHED)
+                    if last:
+                        unfinished.append(key)
+                    rows.append(dict(
+                        dag_id=key[0], task_id=key[1], run_id=key[2], map_index=-1, pool="default_pool",
+                        state=state, updated_at=started_at + timedelta(seconds=run * 60 + task),
+                    ))
+                    if len(rows) >= 10000:
+                        conn.execute(table.insert(), rows)
+                        rows = list()
+        if rows:
+            conn.execute(table.insert(), rows)
+    return unfinished
+
+
+def change(engine, unfinished: deque, count: int, round_no: int, rng: random.Random):
+    """Завершает `count` незавершённых task instances и ставит в очередь столько же новых"""
+    table = TaskInstance.__table__
+    now = timezone.utcnow()
+    with engine.begin() as conn:
+        for _ in range(min(count, len(unfinished))):
+            dag_id, task_id, run_id = unfinished.popleft()
+            conn.execute(
+                update(table)
+                .where(table.c.dag_id == dag_id, table.c.task_id == task_id, table.c.run_id == run_id)
+                .values(state=rng.choice(FINISHED), updated_at=now)
+            )
+        rows = list()
+        for i in range(count):
+            key = (f"dag_{i % DAGS}", f"task_{i // DAGS % TASKS}", f"new_{round_no}_{i}")
+            unfinished.append(key)
+            rows.append(dict(dag_id=key[0], task_id=key[1], run_id=key[2], map_index=-1,
+                             pool="default_pool", state="queued", updated_at=now))
+        conn.execute(table.insert(), rows)
+
+
+def timed(func) -> float:
+    started = perf_counter()
+    func()
+    return perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--task-instances", type=int, default=500000)
+    parser.add_argument("--changes", type=int, default=500, help="changed task instances between two refreshes")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--db", default=os.path.join(mkdtemp(prefix="task_status_bench_"), "ti.db"))
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{args.db}")
+    settings.Session.remove()
+    settings.Session.configure(bind=engine)
+    rng = random.Random(0)
+    unfinished = fill(engine, args.task_instances, rng)
+    total = settings.Session.query(TaskInstance).count()
+
+    full = TaskStatusAggregator(reconcile_interval=0, updated_at_lag=60)
+    incremental = TaskStatusAggregator(reconcile_interval=float("inf"), updated_at_lag=60)
+    incremental.refresh()
+    t_full = t_incremental = 0.0
+    for round_no in range(args.rounds):
+        change(engine, unfinished, args.changes, round_no, rng)
+        t_incremental += timed(incremental.refresh)
+        t_full += timed(full.refresh)
+        assert incremental._counts == full._counts, "incremental counters drifted from the full GROUP BY"
+
+    print(f"task instances: {total}, changed per refresh: {args.changes}, refreshes: {args.rounds}, db: {args.db}")
+    print(f"full:        {t_full / args.rounds * 1000:10.1f} ms per refresh")
+    print(f"incremental: {t_incremental / args.rounds * 1000:10.1f} ms per refresh")
+    print(f"speedup:     {t_full / t_incremental:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
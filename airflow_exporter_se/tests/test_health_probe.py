@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+
+import requests
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_exporter_se_tests_"))
+
+from airflow_exporter.health_probe import SchedulerHealthProbe, get_scheduler_status  # noqa: E402
+
+
+class Response(object):
+    def __init__(self, status_code=200, data=None, text=None):
+        self.status_code = status_code
+        self.data = data
+        self.text = text
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error")
+
+    def json(self):
+        if self.data is None:
+            raise ValueError(f"Expecting value: {self.text!r}")
+        return self.data
+
+
+class Session(object):
+    """HTTP session answering with the queued responses (an exception is raised)"""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.urls = []
+
+    def get(self, url, timeout=None):
+        self.urls.append((url, timeout))
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    def close(self):
+        pass
+
+
+def healthy(status="healthy"):
+    return Response(data={"metadatabase": {"status": "healthy"}, "scheduler": {"status": status}})
+
+
+def make_probe(session, clock=None):
+    probe = SchedulerHealthProbe(interval=15, timeout=5, max_backoff=300, latency_buckets=(0.1, 1.0),
+                                 clock=clock or (lambda: 0.0))
+    probe._session = session
+    probe.host, probe.port = "airflow.local", 8443
+    return probe
+
+
+def test_get_scheduler_status():
+    session = Session(healthy(), healthy("unhealthy"), Response(503), Response(text="<html>"),
+                      requests.exceptions.ConnectionError("refused"))
+    assert get_scheduler_status("airflow.local", 8443, session=session, timeout=5) == 1.0
+    assert session.urls[0] == ("https://airflow.local:8443/api/v1/health", 5)
+    assert get_scheduler_status("airflow.local", 8443, session=session) == 0.0
+    assert get_scheduler_status("airflow.local", 8443, session=session) is None
+    assert get_scheduler_status("airflow.local", 8443, session=session) is None
+    assert get_scheduler_status("airflow.local", 8443, session=session) is None
+
+
+def test_failed_probe_does_not_keep_the_last_status():
+    probe = make_probe(Session(healthy(), requests.exceptions.Timeout("timed out"), Response(500), healthy()))
+    assert probe.probe() == 1.0
+    assert (probe.status, probe.consecutive_failures) == (1.0, 0)
+    probe.probe()
+    assert (probe.status, probe.consecutive_failures) == (None, 1)
+    probe.probe()
+    assert (probe.status, probe.consecutive_failures) == (None, 2)
+    probe.probe()
+    assert (probe.status, probe.consecutive_failures) == (1.0, 0)
+
+
+def test_backoff():
+    probe = make_probe(Session(*[requests.exceptions.ConnectionError("refused")] * 6))
+    delays = [probe.next_delay()]
+    for _ in range(6):
+        probe.probe()
+        delays.append(probe.next_delay())
+    assert delays == [15, 30, 60, 120, 240, 300, 300]
+
+
+def test_latency_histogram():
+    now = [0.0]
+
+    class SlowSession(Session):
+        def get(self, url, timeout=None):
+            now[0] += self.answers.pop(0)
+            return healthy()
+
+    probe = make_probe(SlowSession(0.05, 0.5, 2.0), clock=lambda: now[0])
+    for _ in range(3):
+        probe.probe()
+    buckets, latency_sum = probe.latency_histogram()
+    assert buckets == [("0.1", 1), ("1.0", 2), ("+Inf", 3)]
+    assert abs(latency_sum - 2.55) < 1e-9
+
+
+def test_background_thread():
+    probe = make_probe(Session(*[healthy()] * 100))
+    probe.interval = 0.01
+    probe.start("airflow.local", 8443)
+    try:
+        for _ in range(500):
+            if probe.status == 1.0:
+                break
+            probe._stop_event.wait(0.01)
+        assert probe.status == 1.0 and probe.is_running()
+    finally:
+        probe.stop(timeout=5)
+    assert not probe.is_running()
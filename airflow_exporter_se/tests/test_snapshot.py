@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+import threading
+
+import pytest
+from prometheus_client.core import GaugeMetricFamily
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_exporter_se_tests_"))
+
+from airflow_exporter.snapshot import SnapshotRefresher  # noqa: E402
+
+
+class Clock(object):
+    def __init__(self, step=0.0):
+        self.now = 100.0
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+
+def gauge(value):
+    metric = GaugeMetricFamily("airflow_test", "test gauge")
+    metric.add_metric([], value)
+    return metric
+
+
+class Builder(object):
+    """metric families builder: the queued values are published, an exception is raised"""
+
+    def __init__(self, *values):
+        self.values = list(values)
+        self.calls = 0
+        self.called = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.called.set()
+        value = self.values.pop(0) if len(self.values) > 1 else self.values[0]
+        if isinstance(value, Exception):
+            raise value
+        return [gauge(value)]
+
+
+def value_of(snapshot):
+    return snapshot.metrics[0].samples[0].value
+
+
+def test_refresh_requires_start():
+    with pytest.raises(RuntimeError):
+        SnapshotRefresher(interval=30).refresh()
+
+
+def test_start_publishes_first_snapshot_synchronously():
+    refresher = SnapshotRefresher(interval=3600, clock=Clock(step=0.5))
+    assert refresher.snapshot is None
+    assert refresher.age() is None
+    refresher.start(Builder(1.0))
+    try:
+        snapshot = refresher.snapshot
+        assert value_of(snapshot) == 1.0
+        assert snapshot.refresh_duration == 0.5
+        assert refresher.age() == 0.5
+        assert refresher.is_running()
+    finally:
+        refresher.stop(timeout=5)
+    assert not refresher.is_running()
+
+
+def test_failed_refresh_keeps_previous_snapshot():
+    refresher = SnapshotRefresher(interval=3600, clock=Clock())
+    refresher._build = Builder(1.0, RuntimeError("db is down"), 2.0)
+    first = refresher.refresh()
+    assert refresher.refresh() is None
+    assert refresher.snapshot is first
+    assert value_of(refresher.refresh()) == 2.0
+    assert value_of(refresher.snapshot) == 2.0
+
+
+def test_snapshot_is_immutable():
+    refresher = SnapshotRefresher(interval=3600, clock=Clock())
+    refresher._build = Builder(1.0)
+    snapshot = refresher.refresh()
+    assert isinstance(snapshot.metrics, tuple)
+    with pytest.raises(AttributeError):
+        snapshot.created_at = 0.0
+
+
+def test_start_is_idempotent_and_refreshes_in_background():
+    refresher = SnapshotRefresher(interval=0.01)
+    builder = Builder(1.0)
+    refresher.start(builder)
+    try:
+        thread = refresher._thread
+        refresher.start(Builder(2.0))
+        assert refresher._thread is thread
+        builder.called.clear()
+        assert builder.called.wait(5)
+        assert builder.calls >= 2
+        assert value_of(refresher.snapshot) == 1.0
+    finally:
+        refresher.stop(timeout=5)
+
+
+def test_scrape_does_not_wait_for_refresh():
+    refresher = SnapshotRefresher(interval=0.01)
+    release = threading.Event()
+    started = threading.Event()
+
+    def build():
+        if refresher.snapshot is not None:
+            started.set()
+            release.wait(5)
+        return [gauge(1.0)]
+
+    refresher.start(build)
+    try:
+        assert started.wait(5)
+        # a refresh is in progress, the published snapshot is still readable
+        assert value_of(refresher.snapshot) == 1.0
+    finally:
+        release.set()
+        refresher.stop(timeout=5)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import create_engine, delete, update
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_exporter_se_tests_"))
+
+from airflow import settings  # noqa: E402
+from airflow.models import import_all_models  # noqa: E402
+from airflow.models.base import Base  # noqa: E402
+from airflow.utils import timezone  # noqa: E402
+
+from airflow_exporter.prometheus_exporter import TaskInstance, TaskStatusAggregator  # noqa: E402
+
+LAG = 60
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def table(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ti.db'}")
+    import_all_models()
+    table = TaskInstance.__table__
+    Base.metadata.create_all(engine, tables=[table])
+    settings.Session.remove()
+    settings.Session.configure(bind=engine)
+    yield engine, table
+    settings.Session.remove()
+
+
+def put(engine, table, run_id, state, updated_at, task_id="task"):
+    with engine.begin() as conn:
+        conn.execute(table.insert(), [dict(dag_id="dag", task_id=task_id, run_id=run_id, map_index=-1,
+                                           pool="default_pool", state=state, updated_at=updated_at)])
+
+
+def set_state(engine, table, run_id, state, updated_at, task_id="task"):
+    with engine.begin() as conn:
+        conn.execute(
+            update(table)
+            .where(table.c.dag_id == "dag", table.c.task_id == task_id, table.c.run_id == run_id)
+            .values(state=state, updated_at=updated_at)
+        )
+
+
+def full_counts():
+    aggregator = TaskStatusAggregator(reconcile_interval=0, updated_at_lag=LAG)
+    aggregator.refresh()
+    return aggregator._counts
+
+
+def make_aggregator(clock=None):
+    aggregator = TaskStatusAggregator(reconcile_interval=600, updated_at_lag=LAG, clock=clock or Clock())
+    aggregator.refresh()
+    return aggregator
+
+
+def test_cleared_finished_task_instance_counted_once(table):
+    engine, table = table
+    now = timezone.utcnow()
+    put(engine, table, "old", "success", now - timedelta(days=3))
+    put(engine, table, "new", "running", now)
+    aggregator = make_aggregator()
+    assert aggregator._counts == {("dag", "task", "success"): 1, ("dag", "task", "running"): 1}
+
+    # a task instance finished long before the updated_at_lag window is cleared and re-run
+    set_state(engine, table, "old", None, now + timedelta(seconds=1))
+    aggregator.refresh()
+    assert aggregator._counts == {("dag", "task", None): 1, ("dag", "task", "running"): 1}
+
+    set_state(engine, table, "old", "running", now + timedelta(seconds=2))
+    aggregator.refresh()
+    aggregator.refresh()
+    assert aggregator._counts == {("dag", "task", "running"): 2}
+    assert aggregator._counts == full_counts()
+
+
+def test_new_and_changed_task_instances(table):
+    engine, table = table
+    now = timezone.utcnow()
+    put(engine, table, "r1", "success", now - timedelta(hours=1), task_id="a")
+    put(engine, table, "r1", "queued", now - timedelta(hours=1), task_id="b")
+    aggregator = make_aggregator()
+
+    set_state(engine, table, "r1", "failed", now, task_id="b")
+    put(engine, table, "r2", "scheduled", now, task_id="a")
+    put(engine, table, "r2", "scheduled", now, task_id="c")
+    aggregator.refresh()
+    assert aggregator._counts == {
+        ("dag", "a", "success"): 1, ("dag", "a", "scheduled"): 1,
+        ("dag", "b", "failed"): 1, ("dag", "c", "scheduled"): 1,
+    }
+    assert aggregator._counts == full_counts()
+
+
+def test_unchanged_rows_in_window_are_not_recounted(table):
+    engine, table = table
+    now = timezone.utcnow()
+    put(engine, table, "r1", "running", now, task_id="a")
+    put(engine, table, "r1", "running", now, task_id="b")
+    aggregator = make_aggregator()
+
+    recounted = []
+    count = aggregator._count
+    aggregator._count = lambda tasks=None: recounted.append(tasks) or count(tasks)
+    aggregator.refresh()
+    assert recounted == []
+
+    set_state(engine, table, "r1", "success", now + timedelta(seconds=1), task_id="b")
+    aggregator.refresh()
+    assert recounted == [[("dag", "b")]]
+    assert aggregator._counts == {("dag", "a", "running"): 1, ("dag", "b", "success"): 1}
+
+
+def test_recent_rows_are_bounded_by_the_window(table):
+    engine, table = table
+    now = timezone.utcnow()
+    put(engine, table, "old", "success", now - timedelta(days=1))
+    put(engine, table, "r1", "running", now)
+    aggregator = make_aggregator()
+    assert set(aggregator._recent) == {("dag", "task", "r1", -1)}
+
+    put(engine, table, "r2", "queued", now + timedelta(seconds=LAG * 2))
+    aggregator.refresh()
+    aggregator.refresh()
+    assert set(aggregator._recent) == {("dag", "task", "r2", -1)}
+    assert aggregator._counts == {
+        ("dag", "task", "success"): 1, ("dag", "task", "running"): 1, ("dag", "task", "queued"): 1,
+    }
+
+
+def test_deleted_rows_dropped_by_reconciliation(table):
+    engine, table = table
+    now = timezone.utcnow()
+    put(engine, table, "r1", "success", now - timedelta(days=1))
+    put(engine, table, "r2", "success", now - timedelta(days=1))
+    clock = Clock()
+    aggregator = make_aggregator(clock)
+
+    with engine.begin() as conn:
+        conn.execute(delete(table).where(table.c.run_id == "r1"))
+    aggregator.refresh()
+    assert aggregator._counts == {("dag", "task", "success"): 2}
+
+    clock.now += aggregator.reconcile_interval
+    aggregator.refresh()
+    assert aggregator._counts == {("dag", "task", "success"): 1}
@@ -0,0 +1,318 @@
+"""
+Потоковый COPY для Greenplum: загрузка из любого итерируемого набора строк или файлоподобного объекта
+и выгрузка порциями через ограниченную очередь (без временных файлов на диске воркера).
+"""
+from __future__ import annotations
+
+import json
+import re
+from datetime import date, datetime, time, timedelta
+from queue import Queue, Empty, Full
+from threading import Event, Thread
+from typing import Optional, Callable, Iterable, Iterator, Dict, Tuple, List, Any
+
+from airflow_se.config import get_config_value
+
+__all__ = [
+    "COPY_FORMATS",
+    "CopyCancelled",
+    "copy_sql",
+    "format_cell",
+    "encode_text_row",
+    "encode_csv_row",
+    "RowReader",
+    "ChunkWriter",
+    "iter_copy_out",
+    "parse_text_rows",
+    "default_copy_format",
+    "default_chunk_size",
+    "default_queue_size",
+]
+
+COPY_FORMATS = ("text", "csv", "binary", )
+
+_TEXT_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+_TEXT_UNESCAPE = re.compile(rb"\\(x[0-9a-fA-F]{1,2}|[0-7]{1,3}|.)")
+_TEXT_UNESCAPE_MAP = {b"b": b"\b", b"f": b"\f", b"n": b"\n", b"r": b"\r", b"t": b"\t", b"v": b"\v"}
+
+
+class CopyCancelled(Exception):
+    """Потребитель выгрузки перестал читать порции"""
+
+
+def default_copy_format() -> str:
+    return get_config_value("PROVIDER_GP_COPY_FORMAT", default="csv")
+
+
+def default_chunk_size() -> int:
+    return int(get_config_value("PROVIDER_GP_COPY_CHUNK_SIZE", default=64 * 1024))
+
+
+def default_queue_size() -> int:
+    return int(get_config_value("PROVIDER_GP_COPY_QUEUE_SIZE", default=8))
+
+
+def _option(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (list, tuple)):
+        return f"({', '.join(value)})"
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return str(value)
+
+
+def copy_sql(
+        source: str,
+        direction: str,
+        fmt: str,
+        columns: Optional[Iterable[str]] = None,
+        options: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Команда COPY
+    :source: таблица или запрос (SELECT/WITH/VALUES, только для выгрузки)
+    :direction: "FROM STDIN" или "TO STDOUT"
+    :fmt: формат, см. COPY_FORMATS
+    :columns: список колонок таблицы
+    :options: прочие параметры COPY (DELIMITER, NULL, HEADER, FORCE_QUOTE и т.п.)
+    """
+    if fmt not in COPY_FORMATS:
+        raise ValueError(f"Unknown COPY format \"{fmt}\", must be one of {COPY_FORMATS}")
+    if source.lstrip().lower().startswith(("select", "with", "values", )):
+        target = f"({source})"
+    else:
+        target = source
+        if columns:
+            target += f" ({', '.join(columns)})"
+    with_options = [f"FORMAT {fmt}"] + [f"{k.upper()} {_option(v)}" for k, v in (options or dict()).items()]
+    return f"COPY {target} {direction} WITH ({', '.join(with_options)})"
+
+
+def _format_array(cell: Any) -> str:
+    items = list()
+    for item in cell:
+        value = format_cell(item)
+        items.append("NULL" if value is None else '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"')
+    return "{" + ",".join(items) + "}"
+
+
+def _formatter(tp: type) -> Callable[[Any], str]:
+    if issubclass(tp, str):
+        return str.__str__
+    if issubclass(tp, bool):
+        return lambda cell: "t" if cell else "f"
+    if issubclass(tp, (datetime, date, time)):
+        return tp.isoformat
+    if issubclass(tp, timedelta):
+        return lambda cell: f"{cell.total_seconds()} seconds"
+    if issubclass(tp, (bytes, bytearray, memoryview)):
+        return lambda cell: "\\x" + bytes(cell).hex()
+    if issubclass(tp, (list, tuple)):
+        return _format_array
+    if issubclass(tp, dict):
+        return lambda cell: json.dumps(cell, default=str)
+    return str
+
+
+# преобразование по типу значения (находится один раз для каждого типа)
+_formatters: Dict[type, Callable[[Any], str]] = dict()
+
+
+def format_cell(cell: Any) -> Optional[str]:
+    """
+    Текстовое представление значения для COPY (None - NULL), значения приводятся так же,
+    как их адаптирует psycopg2 в execute()
+    """
+    if cell is None:
+        return None
+    tp = type(cell)
+    formatter = _formatters.get(tp)
+    if formatter is None:
+        formatter = _formatters[tp] = _formatter(tp)
+    return formatter(cell)
+
+
+def encode_text_row(cells: Iterable[Optional[str]]) -> str:
+    return "\t".join(["\\N" if c is None else c.translate(_TEXT_ESCAPES) for c in cells]) + "\n"
+
+
+def encode_csv_row(cells: Iterable[Optional[str]], delimiter: str = ",") -> str:
+    # значения всегда в кавычках: пустая строка и NULL (пусто без кавычек) различаются
+    return delimiter.join(["" if c is None else '"' + c.replace('"', '""') + '"' for c in cells]) + "\n"
+
+
+class RowReader:
+    """
+    Файлоподобный объект для `copy_expert` поверх итерируемого набора строк таблицы:
+    строки кодируются по мере чтения, в памяти не больше одной порции.
+    """
+    def __init__(
+            self,
+            rows: Iterable[Iterable[Any]],
+            fmt: str = "csv",
+            serialize: Optional[Callable[[Any], Any]] = None,
+            delimiter: Optional[str] = None,
+    ):
+        """
+        :rows: строки (последовательности значений колонок)
+        :fmt: text или csv
+        :serialize: преобразование значения перед форматированием (GreenplumHookSE._serialize_cell)
+        :delimiter: разделитель колонок (для csv), по умолчанию ","
+        """
+        if fmt == "text":
+            if delimiter not in (None, "\t"):
+                raise ValueError("Delimiter of text format rows is always a tab")
+            self._encode: Callable[[List[Optional[str]]], str] = encode_text_row
+        elif fmt == "csv":
+            _delimiter = delimiter or ","
+            self._encode = lambda cells: encode_csv_row(cells, _delimiter)
+        else:
+            raise ValueError(f"Rows can be encoded only in text or csv format, not \"{fmt}\"")
+        self._rows: Iterator[Iterable[Any]] = iter(rows)
+        self._serialize: Optional[Callable[[Any], Any]] = serialize
+        self._buffer: str = ""
+        self.rows: int = 0
+
+    def read(self, size: int = -1) -> str:
+        parts, length = [self._buffer], len(self._buffer)
+        serialize, encode, rows = self._serialize, self._encode, self._rows
+        while size < 0 or length < size:
+            row = next(rows, None)
+            if row is None:
+                break
+            if serialize is None:
+                line = encode([format_cell(cell) for cell in row])
+            else:
+                line = encode([format_cell(serialize(cell)) for cell in row])
+            parts.append(line)
+            length += len(line)
+            self.rows += 1
+        data = "".join(parts)
+        if 0 <= size < len(data):
+            data, self._buffer = data[:size], data[size:]
+        else:
+            self._buffer = ""
+        return data
+
+
+class ChunkWriter:
+    """
+    Файлоподобный объект для `copy_expert`, собирающий выгрузку в порции по `chunk_size` байт.
+    Готовая порция кладётся в ограниченную очередь: пока потребитель не забрал порции, COPY ждёт.
+    """
+    def __init__(self, queue: Queue, chunk_size: int, cancelled: Event):
+        self.queue: Queue = queue
+        self.chunk_size: int = chunk_size
+        self.cancelled: Event = cancelled
+        self._parts: List[bytes] = list()
+        self._length: int = 0
+
+    def _put(self, item: Any):
+        while True:
+            if self.cancelled.is_set():
+                raise CopyCancelled("COPY output is no longer consumed")
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except Full:
+                continue
+
+    def write(self, data: Any) -> int:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._parts.append(data)
+        self._length += len(data)
+        if self._length >= self.chunk_size:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self._parts:
+            chunk, self._parts, self._length = b"".join(self._parts), list(), 0
+            self._put(chunk)
+
+
+_DONE = object()
+
+
+def iter_copy_out(
+        run: Callable[[ChunkWriter], None],
+        cancel: Optional[Callable[[], None]] = None,
+        chunk_size: int = 64 * 1024,
+        queue_size: int = 8,
+) -> Iterator[bytes]:
+    """
+    Порции выгрузки COPY TO STDOUT.
+    :run: выполняет COPY в файлоподобный объект (вызывается в отдельном потоке)
+    :cancel: прерывает COPY на сервере, если потребитель остановился раньше конца выгрузки
+    :chunk_size: размер порции (байт)
+    :queue_size: сколько готовых порций ждут потребителя, дальше COPY приостанавливается
+    В памяти не больше (`queue_size` + 2) * `chunk_size` байт.
+    """
+    queue: Queue = Queue(maxsize=max(1, queue_size))
+    cancelled = Event()
+    errors: List[BaseException] = list()
+    writer = ChunkWriter(queue, chunk_size, cancelled)
+
+    def target():
+        try:
+            run(writer)
+            writer.flush()
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            try:
+                writer._put(_DONE)
+            except CopyCancelled:
+                pass
+
+    thread = Thread(target=target, name="greenplum_se_copy_out", daemon=True)
+    thread.start()
+    try:
+        while True:
+            try:
+                chunk = queue.get(timeout=0.1)
+            except Empty:
+                if not thread.is_alive() and queue.empty():
+                    break
+                continue
+            if chunk is _DONE:
+                break
+            yield chunk
+    finally:
+        if thread.is_alive():
+            cancelled.set()
+            if cancel is not None:
+                try:
+                    cancel()
+                except Exception:
+                    pass
+        thread.join()
+    if errors and not isinstance(errors[0], CopyCancelled):
+        raise errors[0]
+
+
+def _unescape(match) -> bytes:
+    esc = match.group(1)
+    if esc[:1] == b"x" and len(esc) > 1:
+        return bytes([int(esc[1:], 16)])
+    if esc[:1].isdigit() and esc[:1] < b"8":
+        return bytes([int(esc, 8) & 0xFF])
+    return _TEXT_UNESCAPE_MAP.get(esc, esc)
+
+
+def parse_text_rows(chunks: Iterable[bytes], encoding: str = "utf-8") -> Iterator[Tuple[Optional[str], ...]]:
+    """Строки выгрузки COPY в формате text (значения - строки, NULL - None)"""
+    tail = b""
+    for chunk in chunks:
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+        for line in lines:
+            yield tuple(
+                None if field == b"\\N" else
+                (_TEXT_UNESCAPE.sub(_unescape, field) if b"\\" in field else field).decode(encoding)
+                for field in line.split(b"\t")
+            )
+    if tail:
+        raise ValueError("COPY output is truncated (the last row has no line end)")
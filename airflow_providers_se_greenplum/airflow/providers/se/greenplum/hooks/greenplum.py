@@ -7,8 +7,12 @@ warnings_simplefilter("ignore")
 
 import os
 import datetime, time
+import threading
+from collections import OrderedDict
 from contextlib import closing
-from typing import Optional, Mapping, Iterable, List, Tuple, Dict
+from itertools import islice
+from typing import Optional, Mapping, Iterable, Iterator, Sequence, List, Tuple, Dict, Union, IO, Callable
+from uuid import uuid4
 
 import psycopg2
 import psycopg2.extensions
@@ -31,6 +35,7 @@ from airflow_se.utils import (
     add_env,
     pop_env,
     timedelta_to_human_format,
+    get_ticket_expiry,
 )
 from airflow_se.config import get_config_value
 from airflow_se.parse import parse_tgs
@@ -47,11 +52,64 @@ from ..exception.exception import (
     GreenplumSESetRoleError,
 )
 from ..commons import name_provider, connection_type
+from .pool import PoolKey, Credential, greenplum_pool
+from .copy_stream import (
+    RowReader,
+    copy_sql,
+    iter_copy_out,
+    parse_text_rows,
+    default_copy_format,
+    default_chunk_size,
+    default_queue_size,
+)
+from .merge import MergeResult, MergeStatements, default_merge_batch_size
 
 __all__ = [
     'GreenplumHookSE',
 ]
 
+# сколько запусков DAG помнить в процессе и сколько хранить пользователя запуска (секунд)
+DEF_RUN_USERS_MAX_SIZE = 1024
+DEF_RUN_USER_TTL = 7 * 24 * 3600
+
+
+class _RunUsers:
+    """
+    Пользователи, запустившие DAG run (ключ - dag_id и run_id), чтоб не искать их в таблице Log
+    на каждое подключение. Хранится не больше `max_size` последних запусков и не дольше `ttl` секунд.
+    """
+    def __init__(self, max_size: int = DEF_RUN_USERS_MAX_SIZE, ttl: float = DEF_RUN_USER_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_size: int = max_size
+        self.ttl: float = ttl
+        self.clock: Callable[[], float] = clock
+        self._users: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def get(self, key: Tuple[str, str]) -> Optional[str]:
+        with self._lock:
+            item = self._users.get(key)
+            if item is None:
+                return None
+            if item[1] <= self.clock():
+                del self._users[key]
+                return None
+            self._users.move_to_end(key)
+            return item[0]
+
+    def put(self, key: Tuple[str, str], user: str) -> None:
+        with self._lock:
+            self._users[key] = (user, self.clock() + self.ttl)
+            self._users.move_to_end(key)
+            while len(self._users) > self.max_size:
+                self._users.popitem(last=False)
+
+
+_users_of_runs = _RunUsers()
+
 
 class GreenplumHookSE(DbApiHook):
     """
@@ -143,7 +201,7 @@ class GreenplumHookSE(DbApiHook):
         #     else:
         #         return self.conn
 
-        dp: Optional[DataPaths] = None
+        raw_conn: Optional[connection] = None
 
         conn_id = getattr(self, self.conn_name_attr)
         conn = self.connection or self.get_connection(conn_id)
@@ -186,7 +244,10 @@ class GreenplumHookSE(DbApiHook):
 
         self.log.info(f'DAG run type is "{dag_run.run_type}" ({dag_run.conf=})')
 
-        if dag_run.run_type == 'scheduled':
+        user_of_run = _users_of_runs.get((dag.dag_id, dag_run.run_id))
+        if user_of_run:
+            pass
+        elif dag_run.run_type == 'scheduled':
             user_of_run = dag_run.conf.get('user') or dag.owner
         elif dag_run.run_type == 'manual':
             user_of_run = dag_run.conf.get('user')
@@ -210,6 +271,9 @@ class GreenplumHookSE(DbApiHook):
                         raise AirflowException('Records of DAG run not fount in table Log')
         else:
             raise AirflowException(f'Unknown run type "{dag_run.run_type}"')
+        if user_of_run:
+            # пользователь запуска не меняется, повторно в таблицу Log не ходим
+            _users_of_runs.put((dag.dag_id, dag_run.run_id), user_of_run)
 
         if user_of_run:  # если пользователь определён, то переопределяем на него
             prm['user'] = user_of_run
@@ -217,6 +281,13 @@ class GreenplumHookSE(DbApiHook):
             conn_args['user'] = user_of_run
             krb_args['user'] = user_of_run
 
+        pool_key = (conn_id, conn_args.get("user"))
+        pooled = greenplum_pool.acquire(pool_key)
+        if pooled is not None:
+            self.conn = pooled
+            return self.conn
+
+        is_new_ticket: bool = True  # признак, что тикет не взят из кэша пула (нужно собрать TGS-ы)
         if krb_args.get("keytab") and not krb_args.get("keytab").isspace():  # если есть кейтаб, то работаем с ним
             is_start_krb: bool = False  # признак, надо получать тикет или ещё старый не протух
             tgt = krb_args.get("ticket")
@@ -284,23 +355,13 @@ class GreenplumHookSE(DbApiHook):
             #     self.log.info(f'{self.context.get("dag_run").run_type=}')
 
             k = f"{TICKET_PREFIX}{prm.get('owner')}"
-            sm_tgt = get_secman_data(SECMAN_KEY_FOR_TGT, auth_secman())
-            if sm_tgt is None:
-                sm_tgt: Dict[str, str] = dict()
-            v = sm_tgt.get(k)
-            if v:
-                dp = DataPaths(
-                    base_path=get_config_value("SECRET_PATH") or "/tmp",
-                    name="ProviderGreenplumSE",
-                )
-                _k = dp.get(k)
-                with open(_k, "wb") as f:
-                    f.write(decrypt(v))
-                os.chmod(_k, 0o600)
-                krb_args["ticket"] = _k
-                self.log.info(f"For connect to Greenplum use ticket from SecMan \"{k}\"")
+            cred = greenplum_pool.get_credential(pool_key)
+            if cred is not None:
+                krb_args["ticket"] = cred.ticket
+                is_new_ticket = False
+                self.log.info(f"For connect to Greenplum use cached ticket from SecMan \"{k}\"")
             else:
-                raise AirflowException(f"Ticket \"{k}\" for user \"{prm.get('owner')}\" is not found in SecMan")
+                krb_args["ticket"] = self._get_ticket_from_secman(k, prm.get("owner"), pool_key)
 
         prev_krb5ccname = pop_env("KRB5CCNAME")
         prev_krb5_ktname = pop_env("KRB5_KTNAME")
@@ -323,7 +384,7 @@ class GreenplumHookSE(DbApiHook):
             try:
                 # пробуем подключиться под УЗП (как есть)
                 self.log.info(f"(step 1) For GSSAPI authentication use login \"{conn_args.get('user')}\" and ticket")
-                self.conn = psycopg2.connect(**conn_args)
+                raw_conn = psycopg2.connect(**conn_args)
             except Exception as ex1:
                 # пробуем подключиться под AD УЗП (откусываем хвостик IPA от УЗП)
                 self.log.warning(f" --- Exception: {ex1}")
@@ -334,19 +395,27 @@ class GreenplumHookSE(DbApiHook):
                     if new_user.isdigit() and len(new_user) > 6:
                         conn_args["user"] = new_user
                 self.log.info(f"(step 2) For GSSAPI authentication use login \"{conn_args.get('user')}\" and ticket")
-                self.conn = psycopg2.connect(**conn_args)
+                raw_conn = psycopg2.connect(**conn_args)
             self.log.info(f"Successful connected to server {conn_args.get('host')}:{conn_args.get('port')}")
 
-            newln = '\n'
-            ret = run_klist(ticket=krb_args.get('ticket'))
-            msg = f'KLIST return code {ret.get("returncode")}: [ {" ".join(ret.get("command"))} ]' \
-                  f'{newln + ret.get("stdout").strip() if ret.get("stdout").strip() else ""}' \
-                  f'{newln + ret.get("stderr").strip() if ret.get("stderr").strip() else ""}'
-            self.log.debug(msg)
-            for match in parse_tgs(msg):
-                self.log.debug(f'Find match: {match}')
-                TGSList.push_tgs(match)
-            # self.log.debug(f'List TGS\'s in DB: {TGSList.get_tgs_list()}')
+            if is_new_ticket:
+                newln = '\n'
+                ret = run_klist(ticket=krb_args.get('ticket'))
+                msg = f'KLIST return code {ret.get("returncode")}: [ {" ".join(ret.get("command"))} ]' \
+                      f'{newln + ret.get("stdout").strip() if ret.get("stdout").strip() else ""}' \
+                      f'{newln + ret.get("stderr").strip() if ret.get("stderr").strip() else ""}'
+                self.log.debug(msg)
+                for match in parse_tgs(msg):
+                    self.log.debug(f'Find match: {match}')
+                    TGSList.push_tgs(match)
+                # self.log.debug(f'List TGS\'s in DB: {TGSList.get_tgs_list()}')
+
+            ticket = krb_args.get("ticket")
+            self.conn = greenplum_pool.add(
+                pool_key,
+                raw_conn,
+                expires_at=get_ticket_expiry(ticket) if ticket and not ticket.isspace() else None,
+            )
 
         except Exception as e:
             _conn_args = {k: "*******" if k in ("pwd", "password", ) and v else v for k, v in conn_args.items()}
@@ -359,8 +428,6 @@ class GreenplumHookSE(DbApiHook):
                 add_env("KRB5CCNAME", prev_krb5ccname)
             if prev_krb5_ktname:
                 add_env("KRB5_KTNAME", prev_krb5_ktname)
-            if dp:
-                del dp
 
         # sr = prm.get("setrole") or self.setrole or self.dag_def_args.get("setrole")
         # if isinstance(sr, str) and not sr.isspace():
@@ -380,6 +447,27 @@ class GreenplumHookSE(DbApiHook):
 
         return self.conn
 
+    def _get_ticket_from_secman(self, key: str, owner: Optional[str], pool_key: PoolKey) -> str:
+        """Получает тикет пользователя из SecMan, записывает во временный файл и кладёт в кэш пула"""
+        sm_tgt = get_secman_data(SECMAN_KEY_FOR_TGT, auth_secman())
+        if sm_tgt is None:
+            sm_tgt: Dict[str, str] = dict()
+        v = sm_tgt.get(key)
+        if not v:
+            raise AirflowException(f"Ticket \"{key}\" for user \"{owner}\" is not found in SecMan")
+        dp = DataPaths(
+            base_path=get_config_value("SECRET_PATH") or "/tmp",
+            name="ProviderGreenplumSE",
+        )
+        _k = dp.get(key)
+        with open(_k, "wb") as f:
+            f.write(decrypt(v))
+        os.chmod(_k, 0o600)
+        # файл тикета живёт, пока жив объект DataPaths (его держит кэш пула)
+        greenplum_pool.put_credential(pool_key, Credential(ticket=_k, expires_at=get_ticket_expiry(_k), data_paths=dp))
+        self.log.info(f"For connect to Greenplum use ticket from SecMan \"{key}\"")
+        return _k
+
     def copy_expert(self, sql: str, filename: str) -> None:
         """
         Executes SQL using psycopg2 copy_expert method.
@@ -411,13 +499,154 @@ class GreenplumHookSE(DbApiHook):
             return f"{uri}?client_encoding={charset}"
         return uri
 
-    def bulk_load(self, table: str, tmp_file: str) -> None:
-        """Loads a tab-delimited file into a database table"""
-        self.copy_expert(f"COPY {table} FROM STDIN", tmp_file)
+    def bulk_load(self, table: str, tmp_file: Union[str, IO, Iterable[Iterable[object]]]) -> None:
+        """
+        Loads a tab-delimited file into a database table.
+        Instead of a file name, a file-like object or an iterable of rows can be passed,
+        they are streamed without a temporary file (see :meth:`copy_from`).
+        """
+        if isinstance(tmp_file, str):
+            self.copy_expert(f"COPY {table} FROM STDIN", tmp_file)
+        else:
+            self.copy_from(table, tmp_file, fmt="text")
+
+    def bulk_dump(self, table: str, tmp_file: Union[str, IO]) -> None:
+        """
+        Dumps a database table into a tab-delimited file.
+        Instead of a file name, a writable binary file-like object can be passed (see :meth:`copy_to`).
+        """
+        if isinstance(tmp_file, str):
+            self.copy_expert(f"COPY {table} TO STDOUT", tmp_file)
+        else:
+            for chunk in self.copy_to(table, fmt="text"):
+                tmp_file.write(chunk)
+
+    def copy_from(
+        self,
+        table: str,
+        source: Union[IO, Iterable[Iterable[object]]],
+        columns: Optional[Iterable[str]] = None,
+        fmt: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        **options,
+    ) -> int:
+        """
+        Streams rows into a table with ``COPY ... FROM STDIN``, nothing is staged on the local disk.
 
-    def bulk_dump(self, table: str, tmp_file: str) -> None:
-        """Dumps a database table into a tab-delimited file"""
-        self.copy_expert(f"COPY {table} TO STDOUT", tmp_file)
+        :param table: Name of the target table
+        :type table: str
+        :param source: A file-like object with data in the ``fmt`` format, or an iterable of rows
+            (sequences of cells). Cells are converted by :meth:`_serialize_cell` and then
+            to the COPY text representation, ``None`` is loaded as NULL
+        :param columns: The names of the columns to fill in the table
+        :type columns: iterable of strings
+        :param fmt: COPY format: ``text``, ``csv`` or ``binary`` (only for file-like sources),
+            by default the SE config parameter PROVIDER_GP_COPY_FORMAT (``csv``)
+        :type fmt: str
+        :param chunk_size: Size of the blocks read from the source,
+            by default PROVIDER_GP_COPY_CHUNK_SIZE (64 KiB)
+        :type chunk_size: int
+        :param options: Other COPY options, e.g. ``delimiter=";"``, ``header=True``
+        :return: The number of loaded rows
+        :rtype: int
+        """
+        fmt = fmt or default_copy_format()
+        sql = copy_sql(table, "FROM STDIN", fmt, columns, options)
+        with closing(self.get_conn()) as conn:
+            with closing(conn.cursor()) as cur:
+                rowcount = self._copy_in(conn, cur, sql, source, fmt, chunk_size, options.get("delimiter"))
+            conn.commit()
+        self.log.info(f"Loaded {rowcount} rows into {table}")
+        return rowcount
+
+    def _copy_in(
+        self,
+        conn: connection,
+        cur,
+        sql: str,
+        source: Union[IO, Iterable[Iterable[object]]],
+        fmt: str,
+        chunk_size: Optional[int] = None,
+        delimiter: Optional[str] = None,
+    ) -> int:
+        self.log.info(f"Running streaming copy: {sql}")
+        if hasattr(source, "read"):
+            file = source
+        else:
+            serialize = None
+            if type(self)._serialize_cell is not GreenplumHookSE._serialize_cell:
+                # the base _serialize_cell returns the cell as is, it is called only if overridden
+                serialize = lambda cell: self._serialize_cell(cell, conn)  # noqa: E731
+            file = RowReader(source, fmt, serialize=serialize, delimiter=delimiter)
+        cur.copy_expert(sql, file, size=chunk_size or default_chunk_size())
+        return cur.rowcount
+
+    def copy_to(
+        self,
+        source: str,
+        columns: Optional[Iterable[str]] = None,
+        fmt: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        **options,
+    ) -> Iterator[bytes]:
+        """
+        Streams a table or a query result with ``COPY ... TO STDOUT`` as chunks of bytes.
+
+        COPY runs in a background thread and stops while ``queue_size`` chunks are waiting
+        for the consumer, so memory doesn't depend on the size of the data.
+        If the consumer stops early, COPY is cancelled on the server.
+
+        :param source: Name of the table or a query (``SELECT``/``WITH``/``VALUES``)
+        :type source: str
+        :param columns: The names of the table columns to dump
+        :type columns: iterable of strings
+        :param fmt: COPY format: ``text``, ``csv`` or ``binary``,
+            by default the SE config parameter PROVIDER_GP_COPY_FORMAT (``csv``)
+        :type fmt: str
+        :param chunk_size: Size of the chunks, by default PROVIDER_GP_COPY_CHUNK_SIZE (64 KiB)
+        :type chunk_size: int
+        :param queue_size: Chunks buffered ahead of the consumer, by default PROVIDER_GP_COPY_QUEUE_SIZE (8)
+        :type queue_size: int
+        :param options: Other COPY options, e.g. ``delimiter=";"``, ``header=True``
+        """
+        fmt = fmt or default_copy_format()
+        sql = copy_sql(source, "TO STDOUT", fmt, columns, options)
+        with closing(self.get_conn()) as conn:
+            yield from self._copy_out(conn, sql, chunk_size, queue_size)
+
+    def copy_to_rows(
+        self,
+        source: str,
+        columns: Optional[Iterable[str]] = None,
+        chunk_size: Optional[int] = None,
+        queue_size: Optional[int] = None,
+    ) -> Iterator[Tuple[Optional[str], ...]]:
+        """
+        Streams a table or a query result row by row (see :meth:`copy_to`).
+        Cells are strings in the COPY text representation, NULL is ``None``.
+        """
+        sql = copy_sql(source, "TO STDOUT", "text", columns)
+        with closing(self.get_conn()) as conn:
+            encoding = psycopg2.extensions.encodings.get(conn.encoding, "utf-8")
+            yield from parse_text_rows(self._copy_out(conn, sql, chunk_size, queue_size), encoding)
+
+    def _copy_out(
+        self, conn: connection, sql: str, chunk_size: Optional[int], queue_size: Optional[int]
+    ) -> Iterator[bytes]:
+        self.log.info(f"Running streaming copy: {sql}")
+
+        def run(writer):
+            with closing(conn.cursor()) as cur:
+                cur.copy_expert(sql, writer)
+            conn.commit()
+
+        yield from iter_copy_out(
+            run,
+            cancel=conn.cancel,
+            chunk_size=chunk_size or default_chunk_size(),
+            queue_size=queue_size or default_queue_size(),
+        )
 
     @staticmethod
     def _serialize_cell(cell: object, conn: Optional[connection] = None) -> object:
@@ -443,25 +672,118 @@ class GreenplumHookSE(DbApiHook):
 
         :param table: Name of the target table
         :type table: str
-        :param table: Name of the target schema, public by default
-        :type table: str
-        :param schema: Schema name
+        :param schema: Name of the target schema, public by default
         :type schema: str
         :return: Primary key columns list
         :rtype: List[str]
         """
-        sql = "select kcu.column_name"\
-              "from information_schema.table_constraints tco"\
-              "  join information_schema.key_column_usage kcu"\
-              "    on kcu.constraint_name = tco.constraint_name"\
-              "      and kcu.constraint_schema = tco.constraint_schema"\
-              "      and kcu.constraint_name = tco.constraint_name"\
-              "where tco.constraint_type = \"PRIMARY KEY\""\
-              "  and kcu.table_schema = %s"\
-              "  and kcu.table_name = %s"
+        sql = "select kcu.column_name " \
+              "from information_schema.table_constraints tco " \
+              "  join information_schema.key_column_usage kcu " \
+              "    on kcu.constraint_name = tco.constraint_name " \
+              "      and kcu.constraint_schema = tco.constraint_schema " \
+              "      and kcu.constraint_name = tco.constraint_name " \
+              "where tco.constraint_type = 'PRIMARY KEY' " \
+              "  and kcu.table_schema = %s " \
+              "  and kcu.table_name = %s " \
+              "order by kcu.ordinal_position"
         pk_columns = [row[0] for row in self.get_records(sql, (schema, table))]
         return pk_columns or None
 
+    def merge_rows(
+        self,
+        table: str,
+        rows: Iterable[Iterable[object]],
+        target_fields: Sequence[str],
+        key_fields: Optional[Sequence[str]] = None,
+        delete_missing: bool = False,
+        delete_condition: Optional[str] = None,
+        update_changed_only: bool = True,
+        batch_size: Optional[int] = None,
+    ) -> MergeResult:
+        """
+        Bulk upsert (and optionally sync) of rows into a table, instead of row by row
+        ``INSERT ... ON CONFLICT`` of :meth:`insert_rows`.
+
+        Each batch of rows is loaded with COPY into a temporary staging table, then the target
+        is changed by set-based statements: ``UPDATE`` of the existing rows whose values differ
+        and ``INSERT`` of the new ones. With ``delete_missing`` the rows of the target whose keys
+        are absent from all the batches are deleted at the end. Everything runs in one transaction.
+        On Greenplum the staging tables are distributed by the key columns.
+
+        :param table: Name of the target table (``schema.table`` or ``table``)
+        :type table: str
+        :param rows: The rows to merge, cells in the order of ``target_fields``; keys must be unique
+        :type rows: iterable of rows
+        :param target_fields: The names of the columns to fill in the table
+        :type target_fields: sequence of strings
+        :param key_fields: The columns identifying a row, by default the table primary key
+        :type key_fields: sequence of strings
+        :param delete_missing: Delete the rows of the table which are absent from ``rows``
+        :type delete_missing: bool
+        :param delete_condition: SQL condition on the target rows (alias ``t``) limiting the delete,
+            e.g. ``"t.load_date = '2024-01-01'"``
+        :type delete_condition: str
+        :param update_changed_only: Update only the rows where a value differs
+        :type update_changed_only: bool
+        :param batch_size: Rows per batch, by default the SE config parameter
+            PROVIDER_GP_MERGE_BATCH_SIZE (100000)
+        :type batch_size: int
+        :return: The counts of merged, inserted, updated and deleted rows
+        :rtype: MergeResult
+        """
+        if not key_fields:
+            schema, _, name = table.rpartition(".")
+            key_fields = self.get_table_primary_key(name, schema or "public")
+            if not key_fields:
+                raise ValueError(f"Table {table} has no primary key, key_fields must be passed")
+        batch_size = batch_size or default_merge_batch_size()
+        suffix = uuid4().hex[:12]
+        result = MergeResult()
+        rows = iter(rows)
+        with closing(self.get_conn()) as conn:
+            with closing(conn.cursor()) as cur:
+                cur.execute("SELECT version()")
+                stmt = MergeStatements(
+                    table, target_fields, key_fields,
+                    stage=f"se_merge_stage_{suffix}",
+                    seen=f"se_merge_seen_{suffix}",
+                    greenplum="greenplum" in str(cur.fetchone()[0]).lower(),
+                    update_changed_only=update_changed_only,
+                    delete_condition=delete_condition,
+                )
+                cur.execute(stmt.create_stage())
+                if delete_missing:
+                    cur.execute(stmt.create_seen())
+                copy = copy_sql(stmt.stage, "FROM STDIN", "csv", stmt.columns)
+                update = stmt.update()
+                while True:
+                    if result.batches:
+                        cur.execute(stmt.truncate_stage())
+                    loaded = self._copy_in(conn, cur, copy, islice(rows, batch_size), "csv")
+                    if loaded <= 0:
+                        break
+                    result.rows += loaded
+                    result.batches += 1
+                    cur.execute(stmt.analyze(stmt.stage))
+                    if update:
+                        cur.execute(update)
+                        result.updated += cur.rowcount
+                    cur.execute(stmt.insert())
+                    result.inserted += cur.rowcount
+                    if delete_missing:
+                        cur.execute(stmt.remember_keys())
+                    self.log.info(f"Merged batch {result.batches} into {table}: {result}")
+                    if loaded < batch_size:
+                        break
+                if delete_missing:
+                    cur.execute(stmt.analyze(stmt.seen))
+                    cur.execute(stmt.delete_missing())
+                    result.deleted = cur.rowcount
+            conn.commit()
+        self.log.info(f"Merged into {table}: {result}")
+        return result
+
     @staticmethod
     def _generate_insert_sql(
         table: str, values: Tuple[str, ...], target_fields: Iterable[str], replace: bool, **kwargs
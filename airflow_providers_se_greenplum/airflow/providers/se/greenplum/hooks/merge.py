@@ -0,0 +1,120 @@
+"""
+Слияние набора строк с таблицей через временную промежуточную таблицу:
+пачка строк загружается COPY, затем изменения применяются к целевой таблице множественными запросами
+(UPDATE изменившихся строк, INSERT новых, в конце - DELETE строк, которых нет в наборе).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional, Sequence, List
+
+from airflow_se.config import get_config_value
+
+__all__ = [
+    "MergeResult",
+    "MergeStatements",
+    "default_merge_batch_size",
+]
+
+
+def default_merge_batch_size() -> int:
+    return int(get_config_value("PROVIDER_GP_MERGE_BATCH_SIZE", default=100000))
+
+
+@dataclass
+class MergeResult:
+    """Итог слияния"""
+    rows: int = 0
+    batches: int = 0
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+
+
+class MergeStatements:
+    """
+    Запросы слияния для целевой таблицы.
+    Промежуточная таблица пачки `stage` и таблица ключей всех пачек `seen` (нужна только для удаления
+    отсутствующих строк) - временные, удаляются по окончании транзакции.
+    Ключи внутри набора должны быть уникальны (как в самой таблице).
+    """
+    def __init__(
+            self,
+            table: str,
+            columns: Sequence[str],
+            keys: Sequence[str],
+            stage: str,
+            seen: str,
+            greenplum: bool = False,
+            update_changed_only: bool = True,
+            delete_condition: Optional[str] = None,
+    ):
+        """
+        :table: целевая таблица
+        :columns: загружаемые колонки
+        :keys: ключевые колонки (первичный ключ или заданные вызывающим), входят в `columns`
+        :stage: имя промежуточной таблицы
+        :seen: имя таблицы ключей
+        :greenplum: распределять временные таблицы по ключу (DISTRIBUTED BY), соединения выполняются без пересылки
+        :update_changed_only: обновлять только строки, в которых отличается хоть одно значение
+        :delete_condition: условие на строки целевой таблицы (`t.`), среди которых удаляются отсутствующие в наборе
+        """
+        missing = [k for k in keys if k not in columns]
+        if not keys or missing:
+            raise ValueError(f"Key columns {list(keys)} must be set and be among the loaded columns {list(columns)}")
+        self.table: str = table
+        self.columns: List[str] = list(columns)
+        self.keys: List[str] = list(keys)
+        self.values: List[str] = [c for c in self.columns if c not in self.keys]
+        self.stage: str = stage
+        self.seen: str = seen
+        self.greenplum: bool = greenplum
+        self.update_changed_only: bool = update_changed_only
+        self.delete_condition: Optional[str] = delete_condition
+
+    @property
+    def _distributed(self) -> str:
+        return f" DISTRIBUTED BY ({', '.join(self.keys)})" if self.greenplum else ""
+
+    def _join(self, left: str, right: str) -> str:
+        return " AND ".join(f"{left}.{k} = {right}.{k}" for k in self.keys)
+
+    def create_stage(self) -> str:
+        # CTAS, а не LIKE: ограничения NOT NULL не нужны, колонки только загружаемые
+        return f"CREATE TEMP TABLE {self.stage} ON COMMIT DROP AS " \
+               f"SELECT {', '.join(self.columns)} FROM {self.table} WITH NO DATA{self._distributed}"
+
+    def create_seen(self) -> str:
+        return f"CREATE TEMP TABLE {self.seen} ON COMMIT DROP AS " \
+               f"SELECT {', '.join(self.keys)} FROM {self.table} WITH NO DATA{self._distributed}"
+
+    def truncate_stage(self) -> str:
+        return f"TRUNCATE {self.stage}"
+
+    @staticmethod
+    def analyze(name: str) -> str:
+        # у временной таблицы нет статистики, без неё планировщик ошибается с планом соединения
+        return f"ANALYZE {name}"
+
+    def update(self) -> Optional[str]:
+        if not self.values:
+            return None
+        sql = f"UPDATE {self.table} t SET {', '.join(f'{c} = s.{c}' for c in self.values)} " \
+              f"FROM {self.stage} s WHERE {self._join('t', 's')}"
+        if self.update_changed_only:
+            sql += f" AND ({' OR '.join(f't.{c} IS DISTINCT FROM s.{c}' for c in self.values)})"
+        return sql
+
+    def insert(self) -> str:
+        return f"INSERT INTO {self.table} ({', '.join(self.columns)}) " \
+               f"SELECT {', '.join(f's.{c}' for c in self.columns)} FROM {self.stage} s " \
+               f"WHERE NOT EXISTS (SELECT 1 FROM {self.table} t WHERE {self._join('t', 's')})"
+
+    def remember_keys(self) -> str:
+        return f"INSERT INTO {self.seen} ({', '.join(self.keys)}) SELECT {', '.join(self.keys)} FROM {self.stage}"
+
+    def delete_missing(self) -> str:
+        sql = f"DELETE FROM {self.table} t WHERE NOT EXISTS (SELECT 1 FROM {self.seen} s WHERE {self._join('t', 's')})"
+        if self.delete_condition:
+            sql += f" AND ({self.delete_condition})"
+        return sql
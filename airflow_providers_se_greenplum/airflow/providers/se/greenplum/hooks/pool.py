@@ -0,0 +1,235 @@
+"""
+Пул подключений к Greenplum и кэш тикетов Kerberos в пределах процесса
+(ключ - идентификатор коннекшена и эффективный пользователь).
+"""
+from __future__ import annotations
+
+import atexit
+from contextlib import closing
+from dataclasses import dataclass, field
+from threading import RLock
+from time import monotonic, time
+from typing import Optional, Callable, List, Dict, Tuple, Any
+
+from psycopg2.extensions import connection, TRANSACTION_STATUS_IDLE
+
+from airflow.utils.log.logging_mixin import LoggingMixin
+
+from airflow_se.utils import DataPaths
+from airflow_se.config import get_config_value
+
+__all__ = [
+    "PoolKey",
+    "Credential",
+    "PooledConnection",
+    "GreenplumConnectionPool",
+    "greenplum_pool",
+]
+
+PoolKey = Tuple[str, str]
+
+
+@dataclass
+class Credential:
+    """Тикет Kerberos пользователя, записанный в файл"""
+    ticket: str
+    expires_at: Optional[float] = None  # unix timestamp, None - неизвестно
+    data_paths: Optional[DataPaths] = None  # владелец временного файла тикета (удаляет файл при сборке мусора)
+
+    def is_valid(self, margin: float, now: Optional[float] = None) -> bool:
+        if self.expires_at is None:
+            return False
+        return self.expires_at - margin > (time() if now is None else now)
+
+
+@dataclass
+class _Entry:
+    key: PoolKey
+    conn: connection
+    expires_at: Optional[float]
+    last_used: float
+    last_checked: float
+    in_use: bool = field(default=True)
+
+
+class PooledConnection:
+    """
+    Обёртка над подключением psycopg2, которую выдаёт пул.
+    Метод close() возвращает подключение в пул (DbApiHook закрывает подключение после каждого запроса).
+    """
+    def __init__(self, pool: GreenplumConnectionPool, entry: _Entry):
+        self.__dict__["_pool"] = pool
+        self.__dict__["_entry"] = entry
+        self.__dict__["_released"] = False
+
+    @property
+    def raw(self) -> connection:
+        """Исходное подключение psycopg2"""
+        return self._entry.conn
+
+    @property
+    def closed(self) -> int:
+        return 1 if self._released else self._entry.conn.closed
+
+    def close(self):
+        if not self._released:
+            self.__dict__["_released"] = True
+            self._pool.release(self._entry)
+
+    def __getattr__(self, item) -> Any:
+        return getattr(self._entry.conn, item)
+
+    def __setattr__(self, key, value):
+        setattr(self._entry.conn, key, value)
+
+    def __enter__(self):
+        return self._entry.conn.__enter__()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self._entry.conn.__exit__(exc_type, exc_val, exc_tb)
+
+
+class GreenplumConnectionPool(LoggingMixin):
+    """
+    Пул подключений:
+        - свободное подключение выдаётся повторно, пока не истёк тикет, с которым оно было открыто;
+        - подключение, простоявшее без дела дольше `health_check_after` секунд, проверяется запросом `SELECT 1`;
+        - подключение, простоявшее без дела дольше `max_idle` секунд, закрывается;
+        - тикет пользователя переиспользуется для новых подключений до окончания его действия (минус `margin`).
+    """
+    def __init__(
+            self,
+            enabled: bool = True,
+            max_idle: float = 300.0,
+            health_check_after: float = 30.0,
+            margin: float = 300.0,
+            clock: Callable[[], float] = monotonic,
+    ):
+        super().__init__()
+        self.enabled = enabled
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+        self.margin = margin
+        self.clock = clock
+        self.__lock = RLock()
+        self.__entries: Dict[PoolKey, List[_Entry]] = dict()
+        self.__credentials: Dict[PoolKey, Credential] = dict()
+
+    def get_credential(self, key: PoolKey) -> Optional[Credential]:
+        """Ещё действующий тикет пользователя"""
+        if not self.enabled:
+            return None
+        with self.__lock:
+            cred = self.__credentials.get(key)
+            if cred is None:
+                return None
+            if cred.is_valid(self.margin):
+                return cred
+            del self.__credentials[key]
+            return None
+
+    def put_credential(self, key: PoolKey, cred: Credential):
+        if not self.enabled:
+            return
+        with self.__lock:
+            self.__credentials[key] = cred
+
+    def acquire(self, key: PoolKey) -> Optional[PooledConnection]:
+        """Свободное живое подключение или None"""
+        if not self.enabled:
+            return None
+        with self.__lock:
+            self.evict()
+            for entry in list(self.__entries.get(key, [])):
+                if entry.in_use:
+                    continue
+                if self.clock() - entry.last_checked >= self.health_check_after and not self._is_alive(entry):
+                    self._discard(entry)
+                    continue
+                entry.in_use = True
+                entry.last_used = entry.last_checked = self.clock()
+                self.log.info(f"Reuse pooled connection to Greenplum for {key}")
+                return PooledConnection(self, entry)
+        return None
+
+    def add(self, key: PoolKey, conn: connection, expires_at: Optional[float] = None) -> PooledConnection:
+        """Регистрирует новое (занятое) подключение"""
+        now = self.clock()
+        entry = _Entry(key=key, conn=conn, expires_at=expires_at, last_used=now, last_checked=now)
+        with self.__lock:
+            self.__entries.setdefault(key, []).append(entry)
+        return PooledConnection(self, entry)
+
+    def release(self, entry: _Entry):
+        """Возвращает подключение в пул, незавершённая транзакция откатывается"""
+        with self.__lock:
+            try:
+                if entry.conn.closed:
+                    raise ValueError("connection is closed")
+                if entry.conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                    entry.conn.rollback()
+                if entry.conn.autocommit:
+                    entry.conn.autocommit = False
+            except Exception as e:
+                self.log.warning(f"Pooled connection to Greenplum is dropped: {e}")
+                self._discard(entry)
+                return
+            if not self.enabled:
+                self._discard(entry)
+                return
+            entry.in_use = False
+            entry.last_used = self.clock()
+
+    def evict(self):
+        """Закрывает простаивающие и устаревшие подключения, удаляет истёкшие тикеты"""
+        now_ts = time()
+        with self.__lock:
+            for entries in list(self.__entries.values()):
+                for entry in list(entries):
+                    if entry.in_use:
+                        continue
+                    if self.clock() - entry.last_used >= self.max_idle or \
+                            (entry.expires_at is not None and entry.expires_at - self.margin <= now_ts):
+                        self._discard(entry)
+            for key, cred in list(self.__credentials.items()):
+                if not cred.is_valid(self.margin, now_ts):
+                    del self.__credentials[key]
+
+    def clear(self):
+        """Закрывает все подключения и забывает все тикеты"""
+        with self.__lock:
+            for entries in list(self.__entries.values()):
+                for entry in list(entries):
+                    self._discard(entry)
+            self.__credentials.clear()
+
+    def _is_alive(self, entry: _Entry) -> bool:
+        try:
+            with closing(entry.conn.cursor()) as cur:
+                cur.execute("SELECT 1;")
+            entry.conn.rollback()
+            return True
+        except Exception as e:
+            self.log.warning(f"Pooled connection to Greenplum is broken: {e}")
+            return False
+
+    def _discard(self, entry: _Entry):
+        entries = self.__entries.get(entry.key, [])
+        if entry in entries:
+            entries.remove(entry)
+        if not entries:
+            self.__entries.pop(entry.key, None)
+        try:
+            if not entry.conn.closed:
+                entry.conn.close()
+        except Exception as e:
+            self.log.warning(f"Error closing pooled connection to Greenplum: {e}")
+
+
+greenplum_pool = GreenplumConnectionPool(
+    enabled=get_config_value("PROVIDER_GP_POOL_ENABLED", default=True) is not False,
+    max_idle=float(get_config_value("PROVIDER_GP_POOL_MAX_IDLE", default=300)),
+    health_check_after=float(get_config_value("PROVIDER_GP_POOL_HEALTH_CHECK_AFTER", default=30)),
+    margin=float(get_config_value("PROVIDER_GP_POOL_TICKET_MARGIN", default=300)),
+)
+atexit.register(greenplum_pool.clear)
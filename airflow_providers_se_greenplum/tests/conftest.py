@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+from contextlib import closing
+
+import pytest
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_se_tests_"))
+# airflow_se.db (used by the provider) creates a pooled engine on import, the tests never connect to it
+os.environ.setdefault("AIRFLOW__DATABASE__SQL_ALCHEMY_CONN", "postgresql://airflow@localhost/airflow")
+
+
+@pytest.fixture(scope="session")
+def postgres(tmp_path_factory):
+    """URI of a local PostgreSQL server started for the test run (skipped without pgserver)."""
+    pgserver = pytest.importorskip("pgserver")
+    server = pgserver.get_server(str(tmp_path_factory.mktemp("pgdata")), cleanup_mode="stop")
+    yield server.get_uri()
+    server.cleanup()
+
+
+@pytest.fixture
+def pg_hook(postgres, request):
+    """GreenplumHookSE connected to a fresh schema of the local server, without Kerberos and the pool."""
+    import psycopg2
+    from airflow.providers.se.greenplum.hooks.greenplum import GreenplumHookSE
+
+    schema = f"test_{request.node.name.split('[')[0][:40]}".lower()
+    with closing(psycopg2.connect(postgres)) as conn, closing(conn.cursor()) as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE; CREATE SCHEMA {schema}")
+        conn.commit()
+
+    hook = GreenplumHookSE(context={})
+    hook.get_conn = lambda: psycopg2.connect(postgres, options=f"-c search_path={schema}")
+    yield hook
@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+
+import datetime
+import io
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import closing
+
+import pytest
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_se_tests_"))
+# airflow_se.db (used by the provider) creates a pooled engine on import, the tests never connect to it
+os.environ.setdefault("AIRFLOW__DATABASE__SQL_ALCHEMY_CONN", "postgresql://airflow@localhost/airflow")
+
+from airflow.providers.se.greenplum.hooks.copy_stream import (  # noqa: E402
+    RowReader,
+    copy_sql,
+    encode_text_row,
+    format_cell,
+    iter_copy_out,
+    parse_text_rows,
+)
+from airflow.providers.se.greenplum.hooks.greenplum import GreenplumHookSE  # noqa: E402
+
+
+def synthetic_rows(n):
+    for i in range(n):
+        yield i, f"name_{i}", i * 0.25, datetime.date(2024, 1, 1 + i % 28), None if i % 7 == 0 else i % 2 == 0
+
+
+class Cursor:
+    """copy_expert of psycopg2 without a server: reads the source in blocks, writes `rows` rows to the target."""
+
+    def __init__(self, rows=0, fail=None):
+        self.rows = rows
+        self.fail = fail
+        self.rowcount = -1
+        self.sql = []
+        self.block_sizes = set()
+        self.loaded = 0
+
+    def copy_expert(self, sql, file, size=8192):
+        self.sql.append(sql)
+        if "FROM STDIN" in sql:
+            tail, self.loaded = "", 0
+            while True:
+                block = file.read(size)
+                if not block:
+                    break
+                self.block_sizes.add(len(block))
+                # only the row count is kept, like a server consuming the stream
+                tail += block
+                self.loaded += tail.count("\n")
+                tail = tail[tail.rfind("\n") + 1:]
+            self.rowcount = self.loaded
+        else:
+            for i in range(self.rows):
+                if self.fail is not None and i == self.fail:
+                    raise IOError("server closed the connection unexpectedly")
+                file.write(encode_text_row([str(i), f"name\t{i}", None]).encode())
+            self.rowcount = self.rows
+
+    def close(self):
+        pass
+
+
+class Conn:
+    encoding = "UTF8"
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.committed = self.closed = self.cancelled = False
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        self.committed = True
+
+    def cancel(self):
+        self.cancelled = True
+
+    def close(self):
+        self.closed = True
+
+
+def make_hook(cursor, hook_class=GreenplumHookSE):
+    conn = Conn(cursor)
+    hook = hook_class(context={})
+    hook.get_conn = lambda: conn
+    return hook, conn
+
+
+def test_copy_sql():
+    assert copy_sql("t", "FROM STDIN", "csv", ["a", "b"], {"delimiter": ";", "header": True}) == \
+        "COPY t (a, b) FROM STDIN WITH (FORMAT csv, DELIMITER ';', HEADER true)"
+    assert copy_sql("SELECT * FROM t", "TO STDOUT", "text", ["a"], {"force_quote": ["a", "b"]}) == \
+        "COPY (SELECT * FROM t) TO STDOUT WITH (FORMAT text, FORCE_QUOTE (a, b))"
+    with pytest.raises(ValueError):
+        copy_sql("t", "FROM STDIN", "parquet")
+
+
+@pytest.mark.parametrize("cell,text", [
+    (None, None),
+    ("it's", "it's"),
+    (True, "t"),
+    (7, "7"),
+    (0.5, "0.5"),
+    (datetime.date(2024, 1, 2), "2024-01-02"),
+    (datetime.datetime(2024, 1, 2, 3, 4, 5), "2024-01-02T03:04:05"),
+    (datetime.timedelta(minutes=1), "60.0 seconds"),
+    (b"\x00\xff", "\\x00ff"),
+    ([1, None, 'a"b'], '{"1",NULL,"a\\"b"}'),
+    ({"a": 1}, '{"a": 1}'),
+])
+def test_format_cell(cell, text):
+    assert format_cell(cell) == text
+
+
+@pytest.mark.parametrize("fmt", ["text", "csv"])
+def test_row_reader_blocks(fmt):
+    rows = [(1, "a\tb", None), (2, "", "line\nbreak"), (3, 'quote "x"', "back\\slash")]
+    whole = RowReader(rows, fmt).read()
+    reader = RowReader(rows, fmt)
+    blocks = iter(lambda: reader.read(5), "")
+    assert "".join(blocks) == whole
+    assert reader.rows == 3
+    if fmt == "text":
+        assert whole.splitlines()[0] == "1\ta\\tb\t\\N"
+    else:
+        # an empty string and NULL differ in csv
+        assert whole.splitlines()[1] == '"2","","line'
+        assert whole.splitlines()[0].endswith('"a\tb",')
+
+
+def test_row_reader_invalid_format():
+    with pytest.raises(ValueError):
+        RowReader([], "binary")
+    with pytest.raises(ValueError):
+        RowReader([], "text", delimiter=";")
+
+
+def test_parse_text_rows_across_chunks():
+    rows = [("1", "tab\there", None), ("2", "new\nline", "back\\slash"), ("3", "", "юникод")]
+    data = "".join(encode_text_row(r) for r in rows).encode()
+    chunks = [data[i:i + 3] for i in range(0, len(data), 3)]
+    assert list(parse_text_rows(chunks)) == rows
+    with pytest.raises(ValueError, match="truncated"):
+        list(parse_text_rows([data[:-1]]))
+
+
+def test_iter_copy_out_backpressure():
+    written = []
+
+    def run(writer):
+        for i in range(100):
+            writer.write(b"x" * 10)
+            written.append(i)
+
+    chunks = iter_copy_out(run, chunk_size=10, queue_size=2)
+    next(chunks)
+    time.sleep(0.2)
+    # the writer waits for the consumer: the queue plus the chunk being put
+    assert len(written) <= 4
+    assert sum(1 for _ in chunks) == 99
+    assert len(written) == 100
+
+
+def test_iter_copy_out_early_stop_cancels():
+    cancelled = threading.Event()
+
+    def run(writer):
+        while not cancelled.is_set():
+            writer.write(b"x" * 10)
+
+    chunks = iter_copy_out(run, cancel=cancelled.set, chunk_size=10, queue_size=2)
+    assert next(chunks) == b"x" * 10
+    chunks.close()
+    assert cancelled.is_set()
+
+
+def test_iter_copy_out_error():
+    def run(writer):
+        writer.write(b"partial")
+        raise IOError("server closed the connection unexpectedly")
+
+    with pytest.raises(IOError):
+        list(iter_copy_out(run, chunk_size=1024))
+
+
+def test_copy_from_rows():
+    cursor = Cursor()
+    hook, conn = make_hook(cursor)
+    assert hook.copy_from("t", synthetic_rows(1000), columns=["a", "b", "c", "d", "e"], chunk_size=4096) == 1000
+    assert cursor.sql == ["COPY t (a, b, c, d, e) FROM STDIN WITH (FORMAT csv)"]
+    assert max(cursor.block_sizes) == 4096
+    assert conn.committed and conn.closed
+
+
+def test_copy_from_file_object():
+    cursor = Cursor()
+    hook, _ = make_hook(cursor)
+    assert hook.copy_from("t", io.StringIO("1\ta\n2\tb\n"), fmt="text") == 2
+    hook.bulk_load("t", [(1, "a"), (2, "b"), (3, "c")])
+    assert cursor.sql[-1] == "COPY t FROM STDIN WITH (FORMAT text)"
+    assert cursor.rowcount == 3
+
+
+def test_serialize_cell_override():
+    class Hook(GreenplumHookSE):
+        @staticmethod
+        def _serialize_cell(cell, conn=None):
+            return cell.upper() if isinstance(cell, str) else cell
+
+    cursor = Cursor()
+    hook, _ = make_hook(cursor, Hook)
+    data = []
+    cursor.copy_expert = lambda sql, file, size=8192: data.append(file.read())
+    hook.copy_from("t", [("a", 1)], fmt="text")
+    assert data == ["A\t1\n"]
+
+
+def test_copy_to_rows():
+    hook, conn = make_hook(Cursor(rows=1000))
+    rows = list(hook.copy_to_rows("SELECT * FROM t", chunk_size=100))
+    assert rows[5] == ("5", "name\t5", None)
+    assert len(rows) == 1000
+    assert conn.committed and conn.closed
+
+
+def test_copy_to_error_is_raised():
+    hook, conn = make_hook(Cursor(rows=1000, fail=500))
+    with pytest.raises(IOError):
+        list(hook.copy_to("t", chunk_size=100))
+    assert conn.closed and not conn.committed
+
+
+def peak_memory(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_peak_memory_does_not_grow_with_rows():
+    def load(n):
+        hook, _ = make_hook(Cursor())
+        assert hook.copy_from("t", synthetic_rows(n), chunk_size=64 * 1024) == n
+
+    def dump(n):
+        hook, _ = make_hook(Cursor(rows=n))
+        assert sum(1 for _ in hook.copy_to_rows("t", chunk_size=64 * 1024, queue_size=4)) == n
+
+    for fn in (load, dump):
+        small, large = peak_memory(lambda: fn(10_000)), peak_memory(lambda: fn(100_000))
+        assert large < small * 1.5
+        assert large < 4 * 1024 * 1024
+
+
+# Against a local PostgreSQL server (see conftest.py)
+
+def test_pg_round_trip(pg_hook):
+    with closing(pg_hook.get_conn()) as conn, closing(conn.cursor()) as cur:
+        cur.execute("CREATE TABLE t (id int, name text, score float8, day date, flag boolean, "
+                    "data bytea, tags text[], extra jsonb)")
+        conn.commit()
+    rows = [
+        (1, "tab\there", 0.5, datetime.date(2024, 1, 2), True, b"\x00\x01", ["a", None], {"k": [1, 2]}),
+        (2, "", None, None, False, None, [], None),
+        (3, 'new\nline "q"', -1.0, datetime.date(2024, 2, 29), None, b"", ['x"y'], {}),
+    ]
+    for fmt in ("csv", "text"):
+        with closing(pg_hook.get_conn()) as conn, closing(conn.cursor()) as cur:
+            cur.execute("TRUNCATE t")
+            conn.commit()
+        assert pg_hook.copy_from("t", rows, fmt=fmt) == 3
+        loaded = pg_hook.get_records("SELECT id, name, score, day, flag, data, tags, extra FROM t ORDER BY id")
+        # bytea is fetched as memoryview
+        assert [r[:5] + (None if r[5] is None else bytes(r[5]),) + r[6:] for r in loaded] == rows
+    assert list(pg_hook.copy_to_rows("SELECT id, name, flag FROM t ORDER BY id")) == \
+        [("1", "tab\there", "t"), ("2", "", "f"), ("3", 'new\nline "q"', None)]
+
+    out = io.BytesIO()
+    pg_hook.bulk_dump("t", out)
+    # the newline inside a value is escaped in the text format
+    assert out.getvalue().count(b"\n") == 3
+    assert b"new\\nline" in out.getvalue()
+
+
+def test_pg_stream_many_rows(pg_hook):
+    n = 100_000
+    with closing(pg_hook.get_conn()) as conn, closing(conn.cursor()) as cur:
+        cur.execute("CREATE TABLE t (id int, name text, score float8, day date, flag boolean)")
+        conn.commit()
+    peak = peak_memory(lambda: pg_hook.copy_from("t", synthetic_rows(n)))
+    assert pg_hook.get_first("SELECT count(*), sum(id) FROM t") == (n, n * (n - 1) // 2)
+    assert peak < 4 * 1024 * 1024
+
+    peak = peak_memory(lambda: sum(1 for _ in pg_hook.copy_to_rows("t", queue_size=4)))
+    assert peak < 4 * 1024 * 1024
+    chunks = list(pg_hook.copy_to("t", fmt="csv", chunk_size=1024 * 1024))
+    assert len(chunks) > 1
+    assert sum(chunk.count(b"\n") for chunk in chunks) == n
+
+
+def test_pg_early_stop_cancels_copy(pg_hook):
+    chunks = pg_hook.copy_to("SELECT i, repeat('x', 100) FROM generate_series(1, 50000000) i", chunk_size=1024)
+    started = time.monotonic()
+    assert next(chunks)
+    chunks.close()
+    assert time.monotonic() - started < 30
+    assert pg_hook.get_first("SELECT 1") == (1,)
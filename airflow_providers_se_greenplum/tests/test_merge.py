@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+from contextlib import closing
+
+import pytest
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_se_tests_"))
+# airflow_se.db (used by the provider) creates a pooled engine on import, the tests never connect to it
+os.environ.setdefault("AIRFLOW__DATABASE__SQL_ALCHEMY_CONN", "postgresql://airflow@localhost/airflow")
+
+from airflow.providers.se.greenplum.hooks.merge import MergeResult, MergeStatements  # noqa: E402
+
+
+def statements(**kwargs):
+    kwargs.setdefault("columns", ["id", "day", "name", "score"])
+    kwargs.setdefault("keys", ["id", "day"])
+    return MergeStatements("s.t", stage="stage", seen="seen", **kwargs)
+
+
+def test_statements():
+    stmt = statements()
+    assert stmt.values == ["name", "score"]
+    assert stmt.create_stage() == "CREATE TEMP TABLE stage ON COMMIT DROP AS " \
+                                  "SELECT id, day, name, score FROM s.t WITH NO DATA"
+    assert stmt.update() == "UPDATE s.t t SET name = s.name, score = s.score FROM stage s " \
+                            "WHERE t.id = s.id AND t.day = s.day " \
+                            "AND (t.name IS DISTINCT FROM s.name OR t.score IS DISTINCT FROM s.score)"
+    assert stmt.insert() == "INSERT INTO s.t (id, day, name, score) SELECT s.id, s.day, s.name, s.score " \
+                            "FROM stage s WHERE NOT EXISTS (SELECT 1 FROM s.t t WHERE t.id = s.id AND t.day = s.day)"
+    assert stmt.delete_missing() == "DELETE FROM s.t t " \
+                                    "WHERE NOT EXISTS (SELECT 1 FROM seen s WHERE t.id = s.id AND t.day = s.day)"
+
+
+def test_statements_options():
+    stmt = statements(greenplum=True, update_changed_only=False, delete_condition="t.day = '2024-01-01'")
+    assert stmt.create_seen().endswith("SELECT id, day FROM s.t WITH NO DATA DISTRIBUTED BY (id, day)")
+    assert stmt.create_stage().endswith(" DISTRIBUTED BY (id, day)")
+    assert "IS DISTINCT FROM" not in stmt.update()
+    assert stmt.delete_missing().endswith(" AND (t.day = '2024-01-01')")
+    # only key columns: nothing to update
+    assert statements(columns=["id", "day"]).update() is None
+
+
+@pytest.mark.parametrize("keys", [[], ["id", "missing"]])
+def test_invalid_keys(keys):
+    with pytest.raises(ValueError):
+        statements(keys=keys)
+
+
+# Against a local PostgreSQL server (see conftest.py)
+
+@pytest.fixture
+def table(pg_hook):
+    """Target table `<schema>.t` with ids 0..9, primary key (id)"""
+    schema = pg_hook.get_first("SELECT current_schema()")[0]
+    with closing(pg_hook.get_conn()) as conn, closing(conn.cursor()) as cur:
+        cur.execute("CREATE TABLE t (id int PRIMARY KEY, grp text NOT NULL, name text, score float8)")
+        cur.execute("INSERT INTO t SELECT i, CASE WHEN i < 5 THEN 'a' ELSE 'b' END, 'name_' || i, i "
+                    "FROM generate_series(0, 9) i")
+        conn.commit()
+    return f"{schema}.t"
+
+
+def content(pg_hook, table):
+    return {r[0]: r[1:] for r in pg_hook.get_records(f"SELECT id, grp, name, score FROM {table}")}
+
+
+def test_merge_rows(pg_hook, table):
+    before = content(pg_hook, table)
+    rows = [(i, "a" if i < 5 else "b", f"name_{i}" if i % 3 else f"new_{i}", float(i)) for i in range(5, 15)]
+    result = pg_hook.merge_rows(table, rows, ["id", "grp", "name", "score"], batch_size=4)
+    # 5..9 exist, of them only 6 and 9 changed
+    assert result == MergeResult(rows=10, batches=3, inserted=5, updated=2, deleted=0)
+    after = content(pg_hook, table)
+    assert after == {**before, **{r[0]: r[1:] for r in rows}}
+
+
+def test_merge_rows_update_all(pg_hook, table):
+    rows = [(i, "a", f"name_{i}", float(i)) for i in range(3)]
+    result = pg_hook.merge_rows(table, rows, ["id", "grp", "name", "score"], update_changed_only=False)
+    assert (result.updated, result.inserted) == (3, 0)
+
+
+def test_merge_rows_delete_missing(pg_hook, table):
+    rows = [(i, "a", f"name_{i}", float(i)) for i in (1, 3, 20)]
+    result = pg_hook.merge_rows(table, rows, ["id", "grp", "name", "score"], delete_missing=True,
+                                delete_condition="t.grp = 'a'", batch_size=2)
+    assert (result.inserted, result.updated, result.deleted, result.batches) == (1, 0, 3, 2)
+    # the rows of the other group are kept
+    assert sorted(content(pg_hook, table)) == [1, 3, 5, 6, 7, 8, 9, 20]
+
+
+def test_merge_rows_key_fields(pg_hook, table):
+    # rows are matched by (grp, name) instead of the primary key
+    rows = [(2, "a", "name_2", 200.0), (50, "b", "name_50", 1.0)]
+    result = pg_hook.merge_rows(table, rows, ["id", "grp", "name", "score"], key_fields=["grp", "name"])
+    assert (result.updated, result.inserted) == (1, 1)
+    assert content(pg_hook, table)[2] == ("a", "name_2", 200.0)
+    assert content(pg_hook, table)[50] == ("b", "name_50", 1.0)
+
+
+def test_merge_rows_empty(pg_hook, table):
+    before = content(pg_hook, table)
+    result = pg_hook.merge_rows(table, [], ["id", "grp", "name", "score"], delete_missing=True,
+                                delete_condition="t.grp = 'b'")
+    assert result == MergeResult(deleted=5)
+    assert sorted(content(pg_hook, table)) == sorted(k for k in before if k < 5)
+
+
+def test_merge_rows_without_primary_key(pg_hook):
+    with closing(pg_hook.get_conn()) as conn, closing(conn.cursor()) as cur:
+        cur.execute("CREATE TABLE nokey (id int, name text)")
+        conn.commit()
+    schema = pg_hook.get_first("SELECT current_schema()")[0]
+    with pytest.raises(ValueError, match="has no primary key"):
+        pg_hook.merge_rows(f"{schema}.nokey", [(1, "a")], ["id", "name"])
+
+
+def test_failed_merge_changes_nothing(pg_hook, table):
+    before = content(pg_hook, table)
+    # grp is NOT NULL: the insert of the second batch fails after the first one was applied
+    rows = [(0, "a", "changed", 0.0), (1, "a", "changed", 1.0), (100, None, "bad", 0.0)]
+    with pytest.raises(Exception, match="null value"):
+        pg_hook.merge_rows(table, rows, ["id", "grp", "name", "score"], batch_size=2)
+    assert content(pg_hook, table) == before
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_se_tests_"))
+# airflow_se.db (used by the provider) creates a pooled engine on import, the tests never connect to it
+os.environ.setdefault("AIRFLOW__DATABASE__SQL_ALCHEMY_CONN", "postgresql://airflow@localhost/airflow")
+
+from airflow.providers.se.greenplum.hooks.greenplum import _RunUsers  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_put():
+    users = _RunUsers(clock=Clock())
+    assert users.get(("dag", "run_1")) is None
+    users.put(("dag", "run_1"), "alice")
+    assert users.get(("dag", "run_1")) == "alice"
+    assert users.get(("dag", "run_2")) is None
+
+
+def test_least_recently_used_run_is_evicted():
+    users = _RunUsers(max_size=2, clock=Clock())
+    users.put(("dag", "run_1"), "alice")
+    users.put(("dag", "run_2"), "bob")
+    # run_1 is used again, so run_2 is the least recently used one
+    assert users.get(("dag", "run_1")) == "alice"
+    users.put(("dag", "run_3"), "carol")
+    assert len(users) == 2
+    assert users.get(("dag", "run_2")) is None
+    assert users.get(("dag", "run_1")) == "alice"
+    assert users.get(("dag", "run_3")) == "carol"
+
+
+def test_expired_run_is_dropped():
+    clock = Clock()
+    users = _RunUsers(ttl=60, clock=clock)
+    users.put(("dag", "run_1"), "alice")
+    clock.now = 59
+    assert users.get(("dag", "run_1")) == "alice"
+    clock.now = 60
+    assert users.get(("dag", "run_1")) is None
+    assert len(users) == 0
+
+    # put refreshes the expiry
+    users.put(("dag", "run_1"), "bob")
+    clock.now = 110
+    assert users.get(("dag", "run_1")) == "bob"
@@ -3,12 +3,13 @@ from __future__ import annotations
 import contextlib
 import os
 import re
-import socket
+import select
 import subprocess
 import time
+import uuid
 import warnings
 from tempfile import NamedTemporaryFile, TemporaryDirectory
-from typing import TYPE_CHECKING, Any, Iterable, Mapping
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, Mapping
 
 from airflow.exceptions import AirflowProviderDeprecationWarning
 
@@ -17,16 +18,36 @@ if TYPE_CHECKING:
 
 import csv
 
+import sqlparse
+
 from airflow.configuration import conf
 from airflow.exceptions import AirflowException
 from airflow.hooks.base import BaseHook
 from airflow.providers.common.sql.hooks.sql import DbApiHook
 from airflow.security import utils
 from airflow.utils.helpers import as_flattened_list
+from airflow.utils.log.logging_mixin import LoggingMixin
 from airflow.utils.operator_helpers import AIRFLOW_VAR_NAME_FORMAT_MAPPING
 
+from airflow.providers.se.hive.hooks.metastore_pool import PooledMetastoreClient, metastore_client_pool
+from airflow.providers.se.hive.hooks.partition_index import TablePartitions, partition_index
+
 HIVE_QUEUE_PRIORITIES = ["VERY_HIGH", "HIGH", "NORMAL", "LOW", "VERY_LOW"]
 
+# pyhive type codes of the cursor description that map to a fixed Arrow type
+HIVE_ARROW_TYPES = {
+    "BOOLEAN_TYPE": "bool_",
+    "TINYINT_TYPE": "int8",
+    "SMALLINT_TYPE": "int16",
+    "INT_TYPE": "int32",
+    "BIGINT_TYPE": "int64",
+    "FLOAT_TYPE": "float32",
+    "DOUBLE_TYPE": "float64",
+    "STRING_TYPE": "string",
+    "VARCHAR_TYPE": "string",
+    "CHAR_TYPE": "string",
+}
+
 
 def get_context_from_env_var() -> dict[Any, Any]:
     """
@@ -40,6 +61,162 @@ def get_context_from_env_var() -> dict[Any, Any]:
     }
 
 
+class HiveCliSession(LoggingMixin):
+    """One interactive hive/beeline process fed with statements through stdin.
+
+    After each statement a shell ``echo`` of a unique marker is sent, the output
+    up to the marker belongs to the statement. A statement failed if its output
+    contains an error line (``Error:`` for beeline, ``FAILED:`` for the hive CLI).
+    A dead process is restarted before the next statement. A process that prints
+    nothing for ``read_timeout`` seconds is considered hung: it is killed, the
+    statement fails and the next statement starts a new process.
+
+    :param cmd: CLI command without ``-f``/``-e`` (see ``HiveCliHookSE._prepare_cli_cmd``)
+    :param use_beeline: whether ``cmd`` runs beeline or the hive CLI
+    :param read_timeout: seconds without any output after which the process is killed,
+        ``[hive] cli_session_read_timeout`` (3600) by default, 0 - wait forever
+    """
+
+    error_prefixes = ("Error:", "FAILED:")
+
+    def __init__(self, cmd: list[Any], use_beeline: bool, read_timeout: float | None = None) -> None:
+        super().__init__()
+        self.use_beeline = use_beeline
+        if read_timeout is None:
+            read_timeout = conf.getfloat("hive", "cli_session_read_timeout", fallback=3600.0)
+        self.read_timeout = float(read_timeout)
+        if use_beeline:
+            self.cmd = [*cmd, "--force=true"]
+        else:
+            self.cmd = [*cmd, "-hiveconf", "hive.cli.errors.ignore=true"]
+        self.sub_process: Any = None
+        self._tmp_dir: TemporaryDirectory | None = None
+        self._pending = b""
+
+    def is_alive(self) -> bool:
+        return self.sub_process is not None and self.sub_process.poll() is None
+
+    def _sentinel(self, marker: str) -> str:
+        if self.use_beeline:
+            return f"!sh echo {marker}\n"
+        return f"!echo {marker};\n"
+
+    def start(self) -> None:
+        """Start the CLI process and wait until it accepts statements."""
+        self.close()
+        self._tmp_dir = TemporaryDirectory(prefix="airflow_hiveop_")
+        self.log.info("Starting Hive CLI session: %s", " ".join(self.cmd))
+        self.sub_process = subprocess.Popen(
+            self.cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=self._tmp_dir.name,
+            close_fds=True,
+        )
+        self._pending = b""
+        try:
+            banner, _ = self._communicate("", verbose=False)
+        except AirflowException:
+            self.close()
+            raise
+        self.log.debug("Hive CLI session started:\n%s", banner)
+
+    def _communicate(self, statement: str, verbose: bool) -> tuple[str, bool]:
+        marker = f"__airflow_hive_session_{uuid.uuid4().hex}__"
+        self.sub_process.stdin.write((statement + self._sentinel(marker)).encode("UTF-8"))
+        self.sub_process.stdin.flush()
+        stdout = ""
+        failed = False
+        for line in self._read_lines(stdout_so_far=lambda: stdout):
+            line = line.decode()
+            if marker in line:
+                # skip the echoed sentinel command, stop at its output
+                if "echo" not in line:
+                    return stdout, failed
+                continue
+            stdout += line
+            if line.lstrip().startswith(self.error_prefixes):
+                failed = True
+            if verbose:
+                self.log.info(line.strip())
+        self.sub_process.wait()
+        raise AirflowException(
+            f"Hive CLI session exited with code {self.sub_process.returncode}\n{stdout}"
+        )
+
+    def _read_lines(self, stdout_so_far: Callable[[], str]) -> Iterator[bytes]:
+        """Lines of the process output until EOF, waiting at most ``read_timeout`` seconds for each chunk."""
+        fd = self.sub_process.stdout.fileno()
+        while True:
+            while b"\n" in self._pending:
+                line, self._pending = self._pending.split(b"\n", 1)
+                yield line + b"\n"
+            if self.read_timeout > 0:
+                ready, _, _ = select.select([fd], [], [], self.read_timeout)
+                if not ready:
+                    self.log.error("Hive CLI session printed nothing for %s seconds, killing it", self.read_timeout)
+                    self.sub_process.kill()
+                    self.sub_process.wait()
+                    raise AirflowException(
+                        f"Hive CLI session timed out after {self.read_timeout} seconds without output\n"
+                        f"{stdout_so_far()}"
+                    )
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                if self._pending:
+                    line, self._pending = self._pending, b""
+                    yield line
+                return
+            self._pending += chunk
+
+    def execute(self, statement: str, verbose: bool = True) -> tuple[str, bool]:
+        """
+        Run one statement (without the trailing semicolon).
+
+        :return: output of the statement and whether it failed
+        """
+        if not self.is_alive():
+            if self.sub_process is not None:
+                self.log.warning("Hive CLI session is dead, restarting")
+            self.start()
+        try:
+            return self._communicate(f"{statement};\n", verbose)
+        except BrokenPipeError:
+            # the process died before reading the statement, so it is safe to resend it
+            self.log.warning("Hive CLI session is dead, restarting")
+            self.start()
+            return self._communicate(f"{statement};\n", verbose)
+        except AirflowException:
+            self.close()
+            raise
+
+    def run(self, statements: Iterable[str], verbose: bool = True) -> str:
+        """Run statements in order, stop and raise at the first failed one."""
+        stdout = ""
+        for statement in statements:
+            output, failed = self.execute(statement, verbose=verbose)
+            stdout += output
+            if failed:
+                raise AirflowException(stdout)
+        return stdout
+
+    def close(self) -> None:
+        """Stop the CLI process."""
+        sub_process, self.sub_process = self.sub_process, None
+        if sub_process is not None and sub_process.poll() is None:
+            try:
+                sub_process.stdin.write(b"!quit\n" if self.use_beeline else b"quit;\n")
+                sub_process.stdin.close()
+                sub_process.wait(timeout=10)
+            except (OSError, subprocess.TimeoutExpired):
+                sub_process.kill()
+                sub_process.wait()
+        if self._tmp_dir is not None:
+            self._tmp_dir.cleanup()
+            self._tmp_dir = None
+
+
 class HiveCliHookSE(BaseHook):
     """Simple wrapper around the hive CLI.
 
@@ -63,6 +240,12 @@ class HiveCliHookSE(BaseHook):
         This can make monitoring easier.
     :param hive_cli_params: Space separated list of hive command parameters to add to the
         hive command.
+    :param session_mode: keep one interactive CLI process per hook and feed statements
+        through stdin instead of starting a new process per ``run_cli`` call.
+        Can also be set in the extra field of the connection as ``{ "session_mode": true }``.
+        Call ``close_session`` when done. A session that prints nothing for
+        ``{ "session_read_timeout": <seconds> }`` of the connection extra
+        (``[hive] cli_session_read_timeout``, 3600 by default) is killed and restarted.
     """
 
     conn_name_attr = "hive_cli_se_conn_id"
@@ -79,15 +262,20 @@ class HiveCliHookSE(BaseHook):
         mapred_job_name: str | None = None,
         hive_cli_params: str = "",
         auth: str | None = None,
+        session_mode: bool | None = None,
     ) -> None:
         super().__init__()
         conn = self.get_connection(hive_cli_se_conn_id)
         self.hive_cli_params: str = hive_cli_params
         self.use_beeline: bool = conn.extra_dejson.get("use_beeline", False)
+        self.session_mode: bool = (
+            conn.extra_dejson.get("session_mode", False) if session_mode is None else session_mode
+        )
         self.auth = auth
         self.conn = conn
         self.run_as = run_as
         self.sub_process: Any = None
+        self.session: HiveCliSession | None = None
 
         if mapred_queue_priority:
             mapred_queue_priority = mapred_queue_priority.upper()
@@ -201,7 +389,8 @@ class HiveCliHookSE(BaseHook):
         :param hive_conf: if specified these key value pairs will be passed
             to hive as ``-hiveconf "key"="value"``. Note that they will be
             passed after the ``hive_cli_params`` and thus will override
-            whatever values are specified in the database.
+            whatever values are specified in the database. In session mode
+            they are sent as ``SET key=value`` statements.
 
         >>> hh = HiveCliHookSE()
         >>> result = hh.run_cli("USE airflow;")
@@ -216,6 +405,9 @@ class HiveCliHookSE(BaseHook):
             invalid_chars = "".join(invalid_chars_list)
             raise RuntimeError(f"The schema `{schema}` contains invalid characters: {invalid_chars}")
 
+        if self.session_mode:
+            return self._run_cli_in_session(hql, schema, verbose, hive_conf)
+
         if schema:
             hql = f"USE {schema};\n{hql}"
 
@@ -224,30 +416,7 @@ class HiveCliHookSE(BaseHook):
             f.write(hql.encode("UTF-8"))
             f.flush()
             hive_cmd = self._prepare_cli_cmd()
-            env_context = get_context_from_env_var()
-            # Only extend the hive_conf if it is defined.
-            if hive_conf:
-                env_context.update(hive_conf)
-            hive_conf_params = self._prepare_hiveconf(env_context)
-            if self.mapred_queue:
-                hive_conf_params.extend(
-                    [
-                        "-hiveconf",
-                        f"mapreduce.job.queuename={self.mapred_queue}",
-                        "-hiveconf",
-                        f"mapred.job.queue.name={self.mapred_queue}",
-                        "-hiveconf",
-                        f"tez.queue.name={self.mapred_queue}",
-                    ]
-                )
-
-            if self.mapred_queue_priority:
-                hive_conf_params.extend(["-hiveconf", f"mapreduce.job.priority={self.mapred_queue_priority}"])
-
-            if self.mapred_job_name:
-                hive_conf_params.extend(["-hiveconf", f"mapred.job.name={self.mapred_job_name}"])
-
-            hive_cmd.extend(hive_conf_params)
+            hive_cmd.extend(self._prepare_hiveconf(self._get_hive_conf(hive_conf)))
             hive_cmd.extend(["-f", f.name])
 
             if verbose:
@@ -269,6 +438,73 @@ class HiveCliHookSE(BaseHook):
 
             return stdout
 
+    def _get_hive_conf(self, hive_conf: dict[Any, Any] | None = None) -> dict[Any, Any]:
+        """Collect HiveConf key/value pairs passed with every ``run_cli`` call."""
+        env_context = get_context_from_env_var()
+        # Only extend the hive_conf if it is defined.
+        if hive_conf:
+            env_context.update(hive_conf)
+        if self.mapred_queue:
+            env_context.update(
+                {
+                    "mapreduce.job.queuename": self.mapred_queue,
+                    "mapred.job.queue.name": self.mapred_queue,
+                    "tez.queue.name": self.mapred_queue,
+                }
+            )
+        if self.mapred_queue_priority:
+            env_context["mapreduce.job.priority"] = self.mapred_queue_priority
+        if self.mapred_job_name:
+            env_context["mapred.job.name"] = self.mapred_job_name
+        return env_context
+
+    @staticmethod
+    def _split_hql(hql: str) -> list[str]:
+        """Split hql into statements without trailing semicolons and comments."""
+        statements = []
+        for statement in sqlparse.split(hql):
+            statement = sqlparse.format(statement, strip_comments=True).strip().rstrip(";").strip()
+            if statement:
+                statements.append(statement)
+        return statements
+
+    def get_session(self) -> HiveCliSession:
+        """Get the interactive CLI session of this hook, start it if needed."""
+        if self.session is None:
+            self.session = HiveCliSession(
+                self._prepare_cli_cmd(),
+                use_beeline=self.use_beeline,
+                read_timeout=self.conn.extra_dejson.get("session_read_timeout"),
+            )
+        if not self.session.is_alive():
+            self.session.start()
+        return self.session
+
+    def _run_cli_in_session(
+        self,
+        hql: str,
+        schema: str | None,
+        verbose: bool,
+        hive_conf: dict[Any, Any] | None,
+    ) -> Any:
+        statements = [f"SET {k}={v}" for k, v in self._get_hive_conf(hive_conf).items()]
+        if schema:
+            statements.append(f"USE {schema}")
+        statements.extend(self._split_hql(hql))
+        session = self.get_session()
+        self.sub_process = session.sub_process
+        try:
+            return session.run(statements, verbose=verbose)
+        finally:
+            # the session may have been restarted while running
+            self.sub_process = session.sub_process
+
+    def close_session(self) -> None:
+        """Stop the interactive CLI session, if any."""
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
     def test_hql(self, hql: str) -> None:
         """Test an hql statement using the hive cli and EXPLAIN."""
         create, insert, other = [], [], []
@@ -295,7 +531,9 @@ class HiveCliHookSE(BaseHook):
                 try:
                     self.run_cli(query, verbose=False)
                 except AirflowException as e:
-                    message = e.args[0].splitlines()[-2]
+                    lines = e.args[0].splitlines()
+                    errors = [line for line in lines if line.lstrip().startswith(HiveCliSession.error_prefixes)]
+                    message = errors[-1] if self.session_mode and errors else lines[-2]
                     self.log.info(message)
                     error_loc = re.search(r"(\d+):(\d+)", message)
                     if error_loc:
@@ -451,7 +689,7 @@ class HiveCliHookSE(BaseHook):
 
     def kill(self) -> None:
         """Kill Hive cli command."""
-        if hasattr(self, "sub_process"):
+        if getattr(self, "sub_process", None) is not None:
             if self.sub_process.poll() is None:
                 print("Killing the Hive job")
                 self.sub_process.terminate()
@@ -477,8 +715,9 @@ class HiveMetastoreHookSE(BaseHook):
 
     def __init__(self, metastore_conn_id: str = default_conn_name) -> None:
         super().__init__()
+        self.metastore_conn_id = metastore_conn_id
         self.conn = self.get_connection(metastore_conn_id)
-        self.metastore = self.get_metastore_client()
+        self.metastore = self._get_pooled_client()
 
     def __getstate__(self) -> dict[str, Any]:
         # This is for pickling to work despite the thrift hive client not
@@ -489,20 +728,35 @@ class HiveMetastoreHookSE(BaseHook):
 
     def __setstate__(self, d: dict[str, Any]) -> None:
         self.__dict__.update(d)
-        self.__dict__["metastore"] = self.get_metastore_client()
+        self.__dict__["metastore"] = self._get_pooled_client()
+
+    def _get_pooled_client(self) -> PooledMetastoreClient:
+        """Return a context manager taking open clients from the process-wide pool."""
+        return PooledMetastoreClient(
+            pool=metastore_client_pool,
+            conn_id=self.metastore_conn_id,
+            hosts=[host.strip() for host in self.conn.host.split(",")],
+            port=self.conn.port,
+            factory=self._get_metastore_client_for_host,
+        )
 
     def get_metastore_client(self) -> Any:
         """Return a Hive thrift client."""
+        host = self._find_valid_host()
+
+        if not host:
+            raise AirflowException("Failed to locate the valid server.")
+
+        return self._get_metastore_client_for_host(host)
+
+    def _get_metastore_client_for_host(self, host: str) -> Any:
+        """Return a not yet opened Hive thrift client for the given host."""
         import hmsclient
         from thrift.protocol import TBinaryProtocol
         from thrift.transport import TSocket, TTransport
 
-        host = self._find_valid_host()
         conn = self.conn
 
-        if not host:
-            raise AirflowException("Failed to locate the valid server.")
-
         if "authMechanism" in conn.extra_dejson:
             warnings.warn(
                 "The 'authMechanism' option is deprecated. Please use 'auth_mechanism'.",
@@ -541,23 +795,22 @@ class HiveMetastoreHookSE(BaseHook):
 
         protocol = TBinaryProtocol.TBinaryProtocol(transport)
 
-        return hmsclient.HMSClient(iprot=protocol)
+        client = hmsclient.HMSClient(iprot=protocol)
+        # lets the pool bound the validation call of an idle client with a timeout
+        client.se_socket = conn_socket
+        return client
 
     def _find_valid_host(self) -> Any:
-        conn = self.conn
-        hosts = conn.host.split(",")
-        for host in hosts:
-            host_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.log.info("Trying to connect to %s:%s", host, conn.port)
-            if host_socket.connect_ex((host, conn.port)) == 0:
-                self.log.info("Connected to %s:%s", host, conn.port)
-                host_socket.close()
-                return host
-            else:
-                self.log.error("Could not connect to %s:%s", host, conn.port)
-        return None
+        hosts = metastore_client_pool.find_valid_hosts(self.metastore.hosts, self.conn.port)
+        return hosts[0] if hosts else None
 
     def get_conn(self) -> Any:
+        """
+        Return the pooled metastore client.
+
+        Use it as ``with hook.get_conn() as client``; a method of ``HMSClient`` called on it directly
+        takes a client from the pool for this call only.
+        """
         return self.metastore
 
     def check_for_partition(self, schema: str, table: str, partition: str) -> bool:
@@ -724,25 +977,61 @@ class HiveMetastoreHookSE(BaseHook):
         ... table_name=t, field='ds', filter_map=filter_map)
         '2015-01-01'
         """
-        with self.metastore as client:
-            table = client.get_table(dbname=schema, tbl_name=table_name)
-            key_name_set = {key.name for key in table.partitionKeys}
-            if len(table.partitionKeys) == 1:
-                field = table.partitionKeys[0].name
-            elif not field:
-                raise AirflowException("Please specify the field you want the max value for.")
-            elif field not in key_name_set:
-                raise AirflowException("Provided field is not a partition key.")
-
-            if filter_map and not set(filter_map.keys()).issubset(key_name_set):
-                raise AirflowException("Provided filter_map contains keys that are not partition key.")
-
-            part_names = client.get_partition_names(
-                schema, table_name, max_parts=HiveMetastoreHookSE.MAX_PART_COUNT
-            )
-            part_specs = [client.partition_name_to_spec(part_name) for part_name in part_names]
+        partitions = self.get_partition_index(schema, table_name)
+        key_name_set = set(partitions.keys)
+        if len(partitions.keys) == 1:
+            field = partitions.keys[0]
+        elif not field:
+            raise AirflowException("Please specify the field you want the max value for.")
+        elif field not in key_name_set:
+            raise AirflowException("Provided field is not a partition key.")
 
-        return HiveMetastoreHookSE._get_max_partition_from_part_specs(part_specs, field, filter_map)
+        if filter_map and not set(filter_map.keys()).issubset(key_name_set):
+            raise AirflowException("Provided filter_map contains keys that are not partition key.")
+
+        return partitions.max(field, filter_map)
+
+    def get_partition_index(self, schema: str, table_name: str, refresh: bool = False) -> TablePartitions:
+        """
+        Return the partitions of a table from the process-wide partition index.
+
+        The index lists partition names once and keeps the parsed specs, a listing younger than
+        ``[hive] partition_index_ttl`` seconds (0 by default) is used without the metastore.
+
+        :param schema: schema name.
+        :param table_name: table name.
+        :param refresh: list the partitions in the metastore regardless of the TTL.
+        """
+        return partition_index.get(self.metastore, self.metastore_conn_id, schema, table_name, refresh=refresh)
+
+    def closest_ds_partition(self, schema: str, table_name: str, ds: str, before: bool | None = True) -> str | None:
+        """
+        Return the ``%Y-%m-%d`` value of the first partition key closest to ``ds``.
+
+        :param schema: schema name.
+        :param table_name: table name.
+        :param ds: target date ``%Y-%m-%d``.
+        :param before: closest on or before (True), on or after (False) or either side (None) of ds.
+        """
+        partitions = self.get_partition_index(schema, table_name)
+        if not partitions.keys:
+            raise AirflowException("The table isn't partitioned")
+        return partitions.closest_ds(partitions.keys[0], ds, before)
+
+    def check_for_partition_spec(self, schema: str, table: str, partition: dict[str, Any]) -> bool:
+        """
+        Check whether a partition matching all key:value pairs of the spec exists.
+
+        A partition missing from the index is looked up again in the metastore before
+        answering False, so a new partition is never reported absent.
+
+        :param schema: Name of hive schema (database) @table belongs to
+        :param table: Name of hive table @partition belongs to
+        :param partition: partition spec, e.g. ``{'ds': '2015-01-01'}``
+        """
+        if self.get_partition_index(schema, table).exists(partition):
+            return True
+        return self.get_partition_index(schema, table, refresh=True).exists(partition)
 
     def table_exists(self, table_name: str, db: str = "default") -> bool:
         """
@@ -780,7 +1069,9 @@ class HiveMetastoreHookSE(BaseHook):
                 self.log.info(
                     "Dropping partition of table %s.%s matching the spec: %s", db, table_name, part_vals
                 )
-                return client.drop_partition(db, table_name, part_vals, delete_data)
+                result = client.drop_partition(db, table_name, part_vals, delete_data)
+            partition_index.invalidate(self.metastore_conn_id, db, table_name)
+            return result
         else:
             self.log.info("Table %s.%s does not exist!", db, table_name)
             return False
@@ -813,7 +1104,7 @@ class HiveServer2HookSE(DbApiHook):
         username: str | None = None
         password: str | None = None
 
-        db = self.get_connection(self.hiveserver2_conn_id)  # type: ignore
+        db = self.get_connection(getattr(self, self.conn_name_attr))
 
         if "authMechanism" in db.extra_dejson:
             warnings.warn(
@@ -837,7 +1128,7 @@ class HiveServer2HookSE(DbApiHook):
         if auth_mechanism == "GSSAPI":
             self.log.warning(
                 "Detected deprecated 'GSSAPI' for auth_mechanism for %s. Please use 'KERBEROS' instead",
-                self.hiveserver2_conn_id,  # type: ignore
+                getattr(self, self.conn_name_attr),
             )
             auth_mechanism = "KERBEROS"
 
@@ -857,13 +1148,33 @@ class HiveServer2HookSE(DbApiHook):
             database=schema or db.schema or "default",
         )
 
+    @staticmethod
+    def default_fetch_size() -> int:
+        """Rows fetched from HiveServer2 per round trip, ``[hive] hiveserver2_fetch_size``."""
+        return conf.getint("hive", "hiveserver2_fetch_size", fallback=1000)
+
+    @staticmethod
+    def _fetch_batches(cur: Any, fetch_size: int) -> Iterator[list[Any]]:
+        while True:
+            rows = cur.fetchmany(fetch_size)
+            if not rows:
+                return
+            yield rows
+
     def _get_results(
         self,
         sql: str | list[str],
         schema: str = "default",
         fetch_size: int | None = None,
         hive_conf: Iterable | Mapping | None = None,
+        batched: bool = False,
     ) -> Any:
+        """
+        Yield the description of the first statement returning results, then its rows.
+
+        With ``batched`` the rows are yielded as lists of up to ``fetch_size`` rows, one per fetch.
+        The connection is open until the generator is exhausted or closed.
+        """
         from pyhive.exc import ProgrammingError
 
         if isinstance(sql, str):
@@ -871,11 +1182,11 @@ class HiveServer2HookSE(DbApiHook):
         previous_description = None
         with contextlib.closing(self.get_conn(schema)) as conn, contextlib.closing(conn.cursor()) as cur:
 
-            cur.arraysize = fetch_size or 1000
+            cur.arraysize = fetch_size or self.default_fetch_size()
 
             # not all query services (e.g. impala AIRFLOW-4434) support the set command
 
-            db = self.get_connection(self.hiveserver2_conn_id)  # type: ignore
+            db = self.get_connection(getattr(self, self.conn_name_attr))
 
             if db.extra_dejson.get("run_set_variable_statements", True):
                 env_context = get_context_from_env_var()
@@ -904,7 +1215,10 @@ class HiveServer2HookSE(DbApiHook):
                         # DB API 2 raises when no results are returned
                         # we're silencing here as some statements in the list
                         # may be `SET` or DDL
-                        yield from cur
+                        if batched:
+                            yield from self._fetch_batches(cur, cur.arraysize)
+                        else:
+                            yield from cur
                     except ProgrammingError:
                         self.log.debug("get_results returned no records")
 
@@ -937,23 +1251,26 @@ class HiveServer2HookSE(DbApiHook):
         delimiter: str = ",",
         lineterminator: str = "\r\n",
         output_header: bool = True,
-        fetch_size: int = 1000,
+        fetch_size: int | None = None,
         hive_conf: dict[Any, Any] | None = None,
     ) -> None:
         """
         Execute hql in target schema and write results to a csv file.
 
+        Rows are written as they are fetched, memory use doesn't depend on the size of the result.
+
         :param sql: hql to be executed.
         :param csv_filepath: filepath of csv to write results into.
         :param schema: target schema, default to 'default'.
         :param delimiter: delimiter of the csv file, default to ','.
         :param lineterminator: lineterminator of the csv file.
         :param output_header: header of the csv file, default to True.
-        :param fetch_size: number of result rows to write into the csv file, default to 1000.
+        :param fetch_size: number of result rows fetched and written at once,
+            default to ``[hive] hiveserver2_fetch_size`` (1000).
         :param hive_conf: hive_conf to execute alone with the hql.
 
         """
-        results_iter = self._get_results(sql, schema, fetch_size=fetch_size, hive_conf=hive_conf)
+        results_iter = self._get_results(sql, schema, fetch_size=fetch_size, hive_conf=hive_conf, batched=True)
         header = next(results_iter)
         message = None
 
@@ -965,10 +1282,10 @@ class HiveServer2HookSE(DbApiHook):
                     self.log.debug("Cursor description is %s", header)
                     writer.writerow([c[0] for c in header])
 
-                for i, row in enumerate(results_iter, 1):
-                    writer.writerow(row)
-                    if i % fetch_size == 0:
-                        self.log.info("Written %s rows so far.", i)
+                for rows in results_iter:
+                    writer.writerows(rows)
+                    i += len(rows)
+                    self.log.info("Written %s rows so far.", i)
             except ValueError as exception:
                 message = str(exception)
 
@@ -979,6 +1296,180 @@ class HiveServer2HookSE(DbApiHook):
 
         self.log.info("Done. Loaded a total of %s rows.", i)
 
+    def iter_batches(
+        self,
+        sql: str | list[str],
+        schema: str = "default",
+        fetch_size: int | None = None,
+        hive_conf: Iterable | Mapping | None = None,
+    ) -> Iterator[list[Any]]:
+        """
+        Iterate over results of the provided hql in batches, without loading the whole result.
+
+        :param sql: hql to be executed.
+        :param schema: target schema, default to 'default'.
+        :param fetch_size: rows per batch (one fetch from the server), default to ``[hive] hiveserver2_fetch_size``.
+        :param hive_conf: hive_conf to execute alone with the hql.
+        :return: iterator over lists of rows; the connection is closed when it is exhausted or closed
+        """
+        results_iter = self._get_results(sql, schema, fetch_size=fetch_size, hive_conf=hive_conf, batched=True)
+        if next(results_iter, None) is not None:
+            yield from results_iter
+
+    def iter_records(
+        self,
+        sql: str | list[str],
+        schema: str = "default",
+        fetch_size: int | None = None,
+        hive_conf: Iterable | Mapping | None = None,
+    ) -> Iterator[Any]:
+        """
+        Iterate over rows of the provided hql, fetched from the server by ``fetch_size`` rows.
+
+        :param sql: hql to be executed.
+        :param schema: target schema, default to 'default'.
+        :param fetch_size: rows fetched at once, default to ``[hive] hiveserver2_fetch_size``.
+        :param hive_conf: hive_conf to execute alone with the hql.
+        :return: iterator over rows; the connection is closed when it is exhausted or closed
+        """
+        for rows in self.iter_batches(sql, schema=schema, fetch_size=fetch_size, hive_conf=hive_conf):
+            yield from rows
+
+    def iter_pandas_df(
+        self,
+        sql: str,
+        schema: str = "default",
+        chunksize: int = 100_000,
+        fetch_size: int | None = None,
+        hive_conf: dict[Any, Any] | None = None,
+        **kwargs,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Iterate over results of a Hive query as pandas dataframes of up to ``chunksize`` rows.
+
+        :param sql: hql to be executed.
+        :param schema: target schema, default to 'default'.
+        :param chunksize: max rows in a dataframe.
+        :param fetch_size: rows fetched at once, default to ``[hive] hiveserver2_fetch_size`` (at most chunksize).
+        :param hive_conf: hive_conf to execute alone with the hql.
+        :param kwargs: (optional) passed into pandas.DataFrame constructor
+        :return: iterator over pandas.DataFrame
+        """
+        try:
+            import pandas as pd
+        except ImportError as e:
+            from airflow.exceptions import AirflowOptionalProviderFeatureException
+
+            raise AirflowOptionalProviderFeatureException(e)
+
+        fetch_size = min(fetch_size or self.default_fetch_size(), chunksize)
+        results_iter = self._get_results(sql, schema, fetch_size=fetch_size, hive_conf=hive_conf, batched=True)
+        header = next(results_iter, None)
+        if header is None:
+            return
+        columns = [c[0] for c in header]
+        chunk: list[Any] = []
+        for rows in results_iter:
+            chunk.extend(rows)
+            if len(chunk) >= chunksize:
+                yield pd.DataFrame(chunk[:chunksize], columns=columns, **kwargs)
+                del chunk[:chunksize]
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns, **kwargs)
+
+    @staticmethod
+    def _arrow_schema(header: Any, rows: list[Any]) -> Any:
+        """Arrow schema of the result: by the hive type of a column, otherwise inferred from the first rows."""
+        import pyarrow as pa
+
+        fields = []
+        for i, column in enumerate(header):
+            type_name = HIVE_ARROW_TYPES.get(str(column[1]).upper())
+            if type_name:
+                type_ = getattr(pa, type_name)()
+            else:
+                type_ = pa.array([row[i] for row in rows]).type
+                if pa.types.is_null(type_):
+                    type_ = pa.string()
+            fields.append(pa.field(column[0], type_))
+        return pa.schema(fields)
+
+    def to_parquet(
+        self,
+        sql: str,
+        parquet_filepath: str,
+        schema: str = "default",
+        fetch_size: int | None = None,
+        row_group_size: int = 100_000,
+        compression: str = "snappy",
+        hive_conf: dict[Any, Any] | None = None,
+    ) -> None:
+        """
+        Execute hql in target schema and write results to a parquet file (requires pyarrow).
+
+        Rows are written by row groups as they are fetched, memory use doesn't depend on the size of the result.
+        Column types are taken from the hive types of the result, other columns are inferred from the first fetch.
+
+        :param sql: hql to be executed.
+        :param parquet_filepath: filepath of parquet file to write results into.
+        :param schema: target schema, default to 'default'.
+        :param fetch_size: rows fetched at once, default to ``[hive] hiveserver2_fetch_size`` (at most row_group_size).
+        :param row_group_size: max rows in a row group of the file.
+        :param compression: parquet compression codec.
+        :param hive_conf: hive_conf to execute alone with the hql.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            from airflow.exceptions import AirflowOptionalProviderFeatureException
+
+            raise AirflowOptionalProviderFeatureException(e)
+
+        fetch_size = min(fetch_size or self.default_fetch_size(), row_group_size)
+        results_iter = self._get_results(sql, schema, fetch_size=fetch_size, hive_conf=hive_conf, batched=True)
+        header = next(results_iter)
+
+        def to_table(rows: list[Any]) -> pa.Table:
+            return pa.Table.from_arrays(
+                [pa.array([row[i] for row in rows], type=f.type) for i, f in enumerate(arrow_schema)],
+                schema=arrow_schema,
+            )
+
+        i = 0
+        arrow_schema = None
+        writer = None
+        chunk: list[Any] = []
+        try:
+            for rows in results_iter:
+                if arrow_schema is None:
+                    arrow_schema = self._arrow_schema(header, rows)
+                    writer = pq.ParquetWriter(parquet_filepath, arrow_schema, compression=compression)
+                chunk.extend(rows)
+                i += len(rows)
+                if len(chunk) >= row_group_size:
+                    writer.write_table(to_table(chunk[:row_group_size]))
+                    del chunk[:row_group_size]
+                    self.log.info("Written %s rows so far.", i)
+            if arrow_schema is None:
+                arrow_schema = self._arrow_schema(header, [])
+                writer = pq.ParquetWriter(parquet_filepath, arrow_schema, compression=compression)
+            if chunk:
+                writer.write_table(to_table(chunk))
+        except Exception:
+            if writer is not None:
+                writer.close()
+                writer = None
+            # need to clean up the file first
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(parquet_filepath)
+            raise
+        finally:
+            if writer is not None:
+                writer.close()
+
+        self.log.info("Done. Loaded a total of %s rows.", i)
+
     def get_records(
         self, sql: str | list[str], parameters: Iterable | Mapping[str, Any] | None = None, **kwargs
     ) -> Any:
@@ -0,0 +1,251 @@
+"""Process-wide pool of Hive Metastore thrift clients."""
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Tuple
+
+from airflow.configuration import conf
+from airflow.exceptions import AirflowException
+from airflow.utils.log.logging_mixin import LoggingMixin
+
+# (connection id, Kerberos credential cache): a SASL transport is bound to the ticket it was opened with
+PoolKey = Tuple[str, Optional[str]]
+ClientFactory = Callable[[str], Any]
+
+
+@dataclass
+class _PoolSlot:
+    last_host: str | None = None
+    idle: list[tuple[Any, str, float]] = field(default_factory=list)
+
+
+def _is_transport_error(exc: BaseException) -> bool:
+    """Whether the error leaves the thrift connection in an unknown state."""
+    if isinstance(exc, (OSError, EOFError)):
+        return True
+    try:
+        from thrift.protocol.TProtocol import TProtocolException
+        from thrift.transport.TTransport import TTransportException
+    except ImportError:
+        return False
+    return isinstance(exc, (TTransportException, TProtocolException))
+
+
+class HiveMetastoreClientPool(LoggingMixin):
+    """
+    Keep open metastore thrift clients between hook instances of a process.
+
+    * a released client stays open and is handed out again for the same connection id;
+    * a new client is opened to the last healthy host of the connection, all hosts
+      are probed in parallel only when there is no such host or it fails;
+    * a client that failed with a transport error or stayed idle longer than
+      ``max_idle`` seconds is closed;
+    * an idle client is checked before it is handed out: its transport must be open and,
+      after ``validate_after`` seconds of idleness, it must answer a cheap metastore call
+      (a connection dropped by the server or a firewall is replaced by a new one).
+
+    :param max_idle: seconds an open client may stay unused in the pool
+    :param probe_timeout: timeout in seconds of a single host probe
+    :param validate_after: seconds of idleness after which a client is validated by a call, 0 - always
+    """
+
+    def __init__(self, max_idle: float = 300.0, probe_timeout: float = 5.0, validate_after: float = 30.0) -> None:
+        super().__init__()
+        self.max_idle = max_idle
+        self.probe_timeout = probe_timeout
+        self.validate_after = validate_after
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._slots: dict[PoolKey, _PoolSlot] = {}
+
+    def _slot(self, key: PoolKey) -> _PoolSlot:
+        # transports inherited from the parent process must not be shared
+        if self._pid != os.getpid():
+            self._reset()
+        return self._slots.setdefault(key, _PoolSlot())
+
+    def _probe(self, host: str, port: int) -> bool:
+        try:
+            with socket.create_connection((host, port), timeout=self.probe_timeout):
+                return True
+        except OSError:
+            return False
+
+    def find_valid_hosts(self, hosts: list[str], port: int) -> list[str]:
+        """Probe all hosts in parallel, return reachable ones in the given order."""
+        if not hosts:
+            return []
+        self.log.info("Probing metastore hosts %s on port %s", ", ".join(hosts), port)
+        with ThreadPoolExecutor(max_workers=len(hosts)) as executor:
+            reachable = list(executor.map(lambda host: self._probe(host, port), hosts))
+        valid = [host for host, ok in zip(hosts, reachable) if ok]
+        for host in hosts:
+            if host not in valid:
+                self.log.error("Could not connect to %s:%s", host, port)
+        return valid
+
+    def _open(self, factory: ClientFactory, host: str) -> Any:
+        client = factory(host)
+        client.open()
+        return client
+
+    def acquire(self, key: PoolKey, hosts: list[str], port: int, factory: ClientFactory) -> tuple[Any, str]:
+        """
+        Get an open client for the connection.
+
+        :param key: pool key of the connection
+        :param hosts: metastore hosts of the connection in order of preference
+        :param port: metastore port
+        :param factory: builds a not yet opened client for the given host
+        :return: open client and its host
+        """
+        while True:
+            now = time.monotonic()
+            expired = []
+            with self._lock:
+                slot = self._slot(key)
+                while slot.idle:
+                    client, host, released_at = slot.idle.pop()
+                    if now - released_at < self.max_idle:
+                        break
+                    expired.append(client)
+                else:
+                    client = None
+                last_host = slot.last_host
+            for old in expired:
+                self._close(old)
+            if client is None:
+                break
+            if self._is_usable(client, now - released_at):
+                return client, host
+            self.log.warning("Idle metastore client to %s is disconnected, replacing it", host)
+            self._close(client)
+
+        if last_host:
+            try:
+                return self._open(factory, last_host), last_host
+            except Exception as e:
+                self.log.warning("Metastore host %s:%s failed (%s), probing all hosts", last_host, port, e)
+        for host in self.find_valid_hosts([h for h in hosts if h], port):
+            try:
+                client = self._open(factory, host)
+            except Exception as e:
+                self.log.warning("Could not open metastore client to %s:%s: %s", host, port, e)
+                continue
+            self.log.info("Connected to %s:%s", host, port)
+            with self._lock:
+                self._slot(key).last_host = host
+            return client, host
+        with self._lock:
+            self._slot(key).last_host = None
+        raise AirflowException("Failed to locate the valid server.")
+
+    def _is_usable(self, client: Any, idle_for: float) -> bool:
+        """Whether an idle client is still connected."""
+        transport = getattr(getattr(client, "_oprot", None), "trans", None)
+        if transport is not None and not transport.isOpen():
+            return False
+        if idle_for < self.validate_after:
+            return True
+        # the socket of the client (set by the factory) bounds the call: a silently dropped connection
+        # would otherwise block on read
+        sock = getattr(client, "se_socket", None)
+        if sock is not None:
+            sock.setTimeout(self.probe_timeout * 1000)
+        try:
+            # any answer, even an error of the call itself, means the connection is alive
+            client.getMetaConf("hive.metastore.batch.retrieve.max")
+        except Exception as e:
+            return not _is_transport_error(e)
+        finally:
+            if sock is not None:
+                sock.setTimeout(None)
+        return True
+
+    def release(self, key: PoolKey, client: Any, host: str, exc: BaseException | None = None) -> None:
+        """Return the client to the pool, close it if it failed with a transport error."""
+        if exc is not None and _is_transport_error(exc):
+            self.log.warning("Evicting broken metastore client to %s: %s", host, exc)
+            self._close(client)
+            return
+        with self._lock:
+            self._slot(key).idle.append((client, host, time.monotonic()))
+
+    def clear(self) -> None:
+        """Close all idle clients."""
+        with self._lock:
+            slots, self._slots = self._slots, {}
+        for slot in slots.values():
+            for client, _, _ in slot.idle:
+                self._close(client)
+
+    def _close(self, client: Any) -> None:
+        try:
+            client.close()
+        except Exception as e:
+            self.log.debug("Error closing metastore client: %s", e)
+
+
+class PooledMetastoreClient:
+    """
+    Context manager used in place of ``HMSClient`` by ``HiveMetastoreHookSE``.
+
+    ``with hook.metastore as client`` takes an open client from the pool and gives it back on exit.
+    A method of ``HMSClient`` called on the pooled client itself (``hook.get_conn().get_table(...)``)
+    takes a client for this one call.
+    """
+
+    def __init__(
+        self,
+        pool: HiveMetastoreClientPool,
+        conn_id: str,
+        hosts: list[str],
+        port: int,
+        factory: ClientFactory,
+    ) -> None:
+        self.pool = pool
+        self.conn_id = conn_id
+        self.hosts = hosts
+        self.port = port
+        self.factory = factory
+        self._local = threading.local()
+
+    @property
+    def key(self) -> PoolKey:
+        return self.conn_id, os.environ.get("KRB5CCNAME")
+
+    def __enter__(self) -> Any:
+        key = self.key
+        client, host = self.pool.acquire(key, self.hosts, self.port, self.factory)
+        self._local.__dict__.setdefault("stack", []).append((key, client, host))
+        return client
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        key, client, host = self._local.stack.pop()
+        self.pool.release(key, client, host, exc_val)
+
+    def __getattr__(self, name: str) -> Callable[..., Any]:
+        if name.startswith("_"):
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+        def call(*args: Any, **kwargs: Any) -> Any:
+            with self as client:
+                return getattr(client, name)(*args, **kwargs)
+
+        call.__name__ = call.__qualname__ = name
+        return call
+
+
+metastore_client_pool = HiveMetastoreClientPool(
+    max_idle=conf.getfloat("hive", "metastore_pool_max_idle", fallback=300.0),
+    probe_timeout=conf.getfloat("hive", "metastore_probe_timeout", fallback=5.0),
+    validate_after=conf.getfloat("hive", "metastore_pool_validate_after", fallback=30.0),
+)
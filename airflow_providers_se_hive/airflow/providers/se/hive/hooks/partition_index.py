@@ -0,0 +1,295 @@
+"""Process-wide index of Hive table partitions for max / closest date / existence lookups."""
+from __future__ import annotations
+
+import bisect
+import datetime
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Any, ContextManager, Iterable, Mapping, Optional, Tuple
+
+from airflow.configuration import conf
+from airflow.exceptions import AirflowException
+from airflow.utils.log.logging_mixin import LoggingMixin
+
+# (connection id, database, table)
+IndexKey = Tuple[str, str, str]
+
+# get_partition_names without a limit (MAX_PART_COUNT truncates tables with more partitions)
+ALL_PARTS = -1
+
+_ESCAPED = re.compile(r"%([0-9a-fA-F]{2})")
+_DS = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def _unescape(value: str) -> str:
+    return _ESCAPED.sub(lambda m: chr(int(m.group(1), 16)), value) if "%" in value else value
+
+
+def partition_name_to_values(name: str) -> tuple[str, ...]:
+    """
+    Partition values of a partition name, as the metastore ``partition_name_to_spec`` does it.
+
+    ``ds=2024-01-01/hour=01`` -> ``("2024-01-01", "01")``, ``%XX`` escapes are decoded.
+    """
+    return tuple(_unescape(part.split("=", 1)[1]) for part in name.split("/"))
+
+
+class TablePartitions:
+    """
+    Immutable snapshot of the partitions of a table.
+
+    :param keys: partition key names
+    :param specs: partition name -> partition values in the order of ``keys``
+    :param refreshed_at: time of the metastore listing the snapshot comes from
+    """
+
+    def __init__(self, keys: list[str], specs: dict[str, tuple[str, ...]], refreshed_at: float) -> None:
+        self.keys = keys
+        self.specs = specs
+        self.refreshed_at = refreshed_at
+        self._sorted: dict[str, list[str]] = {}
+        self._dates: dict[str, list[str]] = {}
+        self._max_by: dict[tuple[str, tuple[str, ...]], dict[tuple[str, ...], str]] = {}
+        self._values: set[tuple[str, ...]] | None = None
+
+    def __len__(self) -> int:
+        return len(self.specs)
+
+    def updated(self, keys: list[str], names: Iterable[str], refreshed_at: float) -> TablePartitions:
+        """Snapshot of a new listing, only names absent from this snapshot are parsed."""
+        names = names if isinstance(names, (list, tuple, set)) else list(names)
+        known = self.specs if keys == self.keys else {}
+        if known and len(names) == len(known) and all(name in known for name in names):
+            # nothing changed: the lookup structures built for this snapshot stay valid
+            same = TablePartitions(keys, known, refreshed_at)
+            same._sorted, same._dates, same._max_by, same._values = (
+                self._sorted, self._dates, self._max_by, self._values,
+            )
+            return same
+        specs = {}
+        for name in names:
+            values = known.get(name)
+            specs[name] = values if values is not None else partition_name_to_values(name)
+        return TablePartitions(keys, specs, refreshed_at)
+
+    def _position(self, field: str) -> int:
+        if field not in self.keys:
+            raise AirflowException(f"Provided partition_key {field} is not in part_specs.")
+        return self.keys.index(field)
+
+    def sorted_values(self, field: str) -> list[str]:
+        """Distinct values of a partition key in ascending order."""
+        if field not in self._sorted:
+            i = self._position(field)
+            self._sorted[field] = sorted({values[i] for values in self.specs.values()})
+        return self._sorted[field]
+
+    def max(self, field: str, filter_map: Mapping[str, Any] | None = None) -> str | None:
+        """Maximum value of a partition key among partitions matching all pairs of ``filter_map``."""
+        if not self.specs:
+            return None
+        if not filter_map:
+            values = self.sorted_values(field)
+            return values[-1] if values else None
+        i = self._position(field)
+        if not set(filter_map).issubset(self.keys):
+            raise AirflowException(
+                f"Keys in provided filter_map {', '.join(filter_map.keys())} "
+                f"are not subset of part_spec keys: {', '.join(self.keys)}"
+            )
+        # maximums per combination of values of the filter keys, built once per snapshot
+        filter_keys = tuple(sorted(filter_map))
+        max_by = self._max_by.get((field, filter_keys))
+        if max_by is None:
+            positions = [self.keys.index(k) for k in filter_keys]
+            max_by = {}
+            for values in self.specs.values():
+                group = tuple(values[j] for j in positions)
+                current = max_by.get(group)
+                if current is None or values[i] > current:
+                    max_by[group] = values[i]
+            self._max_by[(field, filter_keys)] = max_by
+        return max_by.get(tuple(str(filter_map[k]) for k in filter_keys))
+
+    def closest_ds(self, field: str, ds: str, before: bool | None = True) -> str | None:
+        """
+        Partition date (``%Y-%m-%d``) closest to ``ds``: on or before it (True), on or after it
+        (False), or on either side (None, the earlier one on a tie). Non date values are skipped.
+        """
+        target = datetime.datetime.strptime(ds, "%Y-%m-%d").date()
+        if field not in self._dates:
+            self._dates[field] = [v for v in self.sorted_values(field) if _DS.match(v)]
+        dates = self._dates[field]
+        pos = bisect.bisect_left(dates, ds)
+        if pos < len(dates) and dates[pos] == ds:
+            return ds
+        earlier = dates[pos - 1] if pos > 0 else None
+        later = dates[pos] if pos < len(dates) else None
+        if before:
+            return earlier
+        if before is not None or earlier is None:
+            return later
+        if later is None:
+            return earlier
+
+        def distance(value: str) -> datetime.timedelta:
+            return abs(datetime.datetime.strptime(value, "%Y-%m-%d").date() - target)
+
+        return earlier if distance(earlier) <= distance(later) else later
+
+    def exists(self, spec: Mapping[str, Any]) -> bool:
+        """Whether a partition matches all pairs of ``spec`` (a full or partial partition spec)."""
+        if not set(spec).issubset(self.keys):
+            return False
+        if len(spec) == len(self.keys):
+            if self._values is None:
+                self._values = set(self.specs.values())
+            return tuple(str(spec[k]) for k in self.keys) in self._values
+        conditions = [(self.keys.index(k), str(v)) for k, v in spec.items()]
+        return any(all(values[j] == v for j, v in conditions) for values in self.specs.values())
+
+
+class HivePartitionIndex(LoggingMixin):
+    """
+    Keep partition specs of Hive tables between lookups of a process.
+
+    * a snapshot younger than ``ttl`` seconds is answered without the metastore;
+    * otherwise the partition names are listed again (one call instead of a
+      ``partition_name_to_spec`` call per partition) and only new names are parsed;
+    * with ``path`` the listings are shared through a local SQLite file between processes
+      (e.g. DAG file processors), a listing younger than ``ttl`` is loaded from the file.
+
+    :param ttl: seconds a listing is used without asking the metastore, 0 - list on every lookup
+    :param path: SQLite file shared by the processes of the host, None - memory only
+    """
+
+    def __init__(self, ttl: float = 0.0, path: str | None = None) -> None:
+        super().__init__()
+        self.ttl = ttl
+        self.path = path
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._tables: dict[IndexKey, TablePartitions] = {}
+        self._table_locks: dict[IndexKey, threading.Lock] = {}
+
+    def _table_lock(self, key: IndexKey) -> threading.Lock:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            return self._table_locks.setdefault(key, threading.Lock())
+
+    def _fresh(self, partitions: Optional[TablePartitions], now: float) -> bool:
+        return partitions is not None and now - partitions.refreshed_at < self.ttl
+
+    def get(
+        self, metastore: ContextManager[Any], conn_id: str, db: str, table: str, refresh: bool = False
+    ) -> TablePartitions:
+        """
+        Partitions of a table.
+
+        :param metastore: context manager giving a metastore client (``HiveMetastoreHookSE.metastore``)
+        :param conn_id: metastore connection id
+        :param db: database name
+        :param table: table name
+        :param refresh: list the partitions in the metastore regardless of ``ttl``
+        """
+        key = (conn_id, db.lower(), table.lower())
+        with self._table_lock(key):
+            partitions = self._tables.get(key)
+            now = time.time()
+            if not refresh and self._fresh(partitions, now):
+                return partitions
+            if not refresh and self.path and self.ttl > 0:
+                stored = self._load(key, partitions)
+                if self._fresh(stored, now):
+                    self._tables[key] = stored
+                    return stored
+            with metastore as client:
+                table_obj = client.get_table(dbname=db, tbl_name=table)
+                keys = [k.name for k in table_obj.partitionKeys]
+                names = client.get_partition_names(db, table, max_parts=ALL_PARTS) if keys else []
+            updated = (partitions or TablePartitions([], {}, 0.0)).updated(keys, names, now)
+            self.log.debug("Listed %s partitions of %s.%s", len(updated), db, table)
+            if self.path:
+                self._store(key, partitions, updated)
+            self._tables[key] = updated
+            return updated
+
+    def invalidate(self, conn_id: str, db: str, table: str) -> None:
+        """Forget the partitions of a table (e.g. after dropping partitions)."""
+        with self._lock:
+            self._tables.pop((conn_id, db.lower(), table.lower()), None)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS partition_tables ("
+            "conn_id TEXT, db TEXT, tbl TEXT, keys TEXT, refreshed_at REAL, PRIMARY KEY (conn_id, db, tbl))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS partition_names ("
+            "conn_id TEXT, db TEXT, tbl TEXT, name TEXT, PRIMARY KEY (conn_id, db, tbl, name)) WITHOUT ROWID"
+        )
+        return conn
+
+    def _load(self, key: IndexKey, partitions: Optional[TablePartitions]) -> Optional[TablePartitions]:
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute(
+                    "SELECT keys, refreshed_at FROM partition_tables WHERE conn_id = ? AND db = ? AND tbl = ?", key
+                ).fetchone()
+                if row is None or (partitions is not None and row[1] <= partitions.refreshed_at):
+                    return partitions
+                names = conn.execute(
+                    "SELECT name FROM partition_names WHERE conn_id = ? AND db = ? AND tbl = ?", key
+                )
+                return (partitions or TablePartitions([], {}, 0.0)).updated(
+                    json.loads(row[0]), (name for (name,) in names), row[1]
+                )
+        except sqlite3.Error as e:
+            self.log.warning("Partition index file %s is not readable: %s", self.path, e)
+            return partitions
+
+    def _store(self, key: IndexKey, previous: Optional[TablePartitions], current: TablePartitions) -> None:
+        try:
+            with closing(self._connect()) as conn, conn:
+                stored = conn.execute(
+                    "SELECT refreshed_at FROM partition_tables WHERE conn_id = ? AND db = ? AND tbl = ?", key
+                ).fetchone()
+                if stored is not None and stored[0] >= current.refreshed_at:
+                    return
+                if stored is not None and previous is not None and stored[0] == previous.refreshed_at:
+                    # the file holds the previous listing of this process, only the difference is written
+                    removed = previous.specs.keys() - current.specs.keys()
+                    added = current.specs.keys() - previous.specs.keys()
+                else:
+                    conn.execute("DELETE FROM partition_names WHERE conn_id = ? AND db = ? AND tbl = ?", key)
+                    removed, added = set(), current.specs.keys()
+                conn.executemany(
+                    "DELETE FROM partition_names WHERE conn_id = ? AND db = ? AND tbl = ? AND name = ?",
+                    (key + (name,) for name in removed),
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO partition_names VALUES (?, ?, ?, ?)", (key + (name,) for name in added)
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO partition_tables VALUES (?, ?, ?, ?, ?)",
+                    key + (json.dumps(current.keys), current.refreshed_at),
+                )
+        except sqlite3.Error as e:
+            self.log.warning("Partition index file %s is not writable: %s", self.path, e)
+
+
+partition_index = HivePartitionIndex(
+    ttl=conf.getfloat("hive", "partition_index_ttl", fallback=0.0),
+    path=conf.get("hive", "partition_index_path", fallback=None) or None,
+)
@@ -1,7 +1,5 @@
 from __future__ import annotations
 
-import datetime
-
 
 def max_partition(
     table, schema="default", field=None, filter_map=None, metastore_conn_id="metastore_se_default"
@@ -33,35 +31,6 @@ def max_partition(
     return hive_hook.max_partition(schema=schema, table_name=table, field=field, filter_map=filter_map)
 
 
-def _closest_date(target_dt, date_list, before_target=None) -> datetime.date | None:
-    """
-    Find the date in a list closest to the target date.
-
-    An optional parameter can be given to get the closest before or after.
-
-    :param target_dt: The target date
-    :param date_list: The list of dates to search
-    :param before_target: closest before or after the target
-    :returns: The closest date
-    """
-
-    def time_before(d):
-        return target_dt - d if d <= target_dt else datetime.timedelta.max
-
-    def time_after(d):
-        return d - target_dt if d >= target_dt else datetime.timedelta.max
-
-    def any_time(d):
-        return target_dt - d if d < target_dt else d - target_dt
-
-    if before_target is None:
-        return min(date_list, key=any_time).date()
-    if before_target:
-        return min(date_list, key=time_before).date()
-    else:
-        return min(date_list, key=time_after).date()
-
-
 def closest_ds_partition(
     table, ds, before=True, schema="default", metastore_conn_id="metastore_se_default"
 ) -> str | None:
@@ -86,16 +55,4 @@ def closest_ds_partition(
     if "." in table:
         schema, table = table.split(".")
     hive_hook = HiveMetastoreHookSE(metastore_conn_id=metastore_conn_id)
-    partitions = hive_hook.get_partitions(schema=schema, table_name=table)
-    if not partitions:
-        return None
-    part_vals = [next(iter(p.values())) for p in partitions]
-    if ds in part_vals:
-        return ds
-    else:
-        parts = [datetime.datetime.strptime(pv, "%Y-%m-%d") for pv in part_vals]
-        target_dt = datetime.datetime.strptime(ds, "%Y-%m-%d")
-        closest_ds = _closest_date(target_dt, parts, before_target=before)
-        if closest_ds is not None:
-            return closest_ds.isoformat()
-    return None
\ No newline at end of file
+    return hive_hook.closest_ds_partition(schema=schema, table_name=table, ds=ds, before=before)
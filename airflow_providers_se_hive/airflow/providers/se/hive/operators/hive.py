@@ -150,14 +150,20 @@ class HiveOperatorSE(BaseOperator):
             self.hiveconfs.update(context_to_airflow_vars(context))
 
         self.log.info("Passing HiveConf: %s", self.hiveconfs)
-        self.hook.run_cli(hql=self.hql, schema=self.schema, hive_conf=self.hiveconfs)
+        try:
+            self.hook.run_cli(hql=self.hql, schema=self.schema, hive_conf=self.hiveconfs)
+        finally:
+            self.hook.close_session()
 
     def dry_run(self) -> None:
         # Reset airflow environment variables to prevent
         # existing env vars from impacting behavior.
         self.clear_airflow_vars()
 
-        self.hook.test_hql(hql=self.hql)
+        try:
+            self.hook.test_hql(hql=self.hql)
+        finally:
+            self.hook.close_session()
 
     def on_kill(self) -> None:
         if self.hook:
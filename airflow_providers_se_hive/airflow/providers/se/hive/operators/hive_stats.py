@@ -1,12 +1,12 @@
 from __future__ import annotations
 
-import json
 import warnings
 from typing import TYPE_CHECKING, Any, Callable, Sequence
 
-from airflow.exceptions import AirflowException
+from airflow.configuration import conf
 from airflow.models import BaseOperator
 from airflow.providers.se.hive.hooks.hive import HiveMetastoreHookSE
+from airflow.providers.se.hive.operators.stats_engine import HiveStatsEngine, HiveStatsStore, MetricSet
 from airflow.providers.mysql.hooks.mysql import MySqlHook
 from airflow.providers.presto.hooks.presto import PrestoHook
 from airflow.providers.se.hive.utils.krb_auth import krb_auth
@@ -18,23 +18,36 @@ if TYPE_CHECKING:
 class HiveStatsCollectionOperatorSE(BaseOperator):
     """Gather partition statistics and insert them into MySQL.
 
-    Statistics are gathered with a dynamically generated Presto query and
-    inserted with this format. Stats overwrite themselves if you rerun the
+    Statistics are gathered with dynamically generated Presto queries: the
+    metric expressions are split into groups of at most ``max_exprs_per_query``
+    that run concurrently, see :class:`HiveStatsEngine`. They are inserted with
+    this format in one transaction. Stats overwrite themselves if you rerun the
     same date/partition.
 
     .. code-block:: sql
 
         CREATE TABLE hive_stats (
             ds VARCHAR(16),
+            dttm VARCHAR(32),
             table_name VARCHAR(500),
+            partition_repr VARCHAR(500),
+            col VARCHAR(200),
             metric VARCHAR(200),
-            value BIGINT
+            value DOUBLE
         );
 
+    ``value`` used to be ``BIGINT``: null ratios and averages are fractions, so a table created
+    with the former definition must be migrated before the upgrade, otherwise they are rounded
+    (or the insert is rejected in strict mode):
+
+    .. code-block:: sql
+
+        ALTER TABLE hive_stats MODIFY value DOUBLE;
+
     :param metastore_se_conn_id: Reference to the
         :ref:`Hive Metastore connection id <howto/connection:hive_metastore>`.
     :param table: the source table, in the format ``database.table_name``. (templated)
-    :param partition: the source partition. (templated)
+    :param partition: the source partition, or a list of partitions. (templated)
     :param extra_exprs: dict of expression to run against the table where
         keys are metric names and values are Presto compatible expressions
     :param excluded_columns: list of columns to exclude, consider
@@ -44,6 +57,13 @@ class HiveStatsCollectionOperatorSE(BaseOperator):
         If None is returned, the global defaults are applied. If an
         empty dictionary is returned, no stats are computed for that
         column.
+    :param metric_sets: metric sets (see ``stats_engine``) applied to every
+        column instead of the built-in defaults, e.g.
+        ``[NullRatioMetrics(), ApproxDistinctMetrics(), MinMaxMetrics()]``
+    :param max_exprs_per_query: maximum number of expressions in one query,
+        ``[hive] stats_max_exprs_per_query`` (50) by default
+    :param parallelism: maximum number of queries running at the same time,
+        ``[hive] stats_parallelism`` (4) by default
     """
 
     template_fields: Sequence[str] = ("table", "partition", "ds", "dttm")
@@ -60,6 +80,9 @@ class HiveStatsCollectionOperatorSE(BaseOperator):
         metastore_se_conn_id: str = "metastore_se_default",
         presto_conn_id: str = "presto_default",
         mysql_conn_id: str = "airflow_db",
+        metric_sets: Sequence[MetricSet] | None = None,
+        max_exprs_per_query: int | None = None,
+        parallelism: int | None = None,
         **kwargs: Any,
     ) -> None:
         if "col_blacklist" in kwargs:
@@ -80,6 +103,11 @@ class HiveStatsCollectionOperatorSE(BaseOperator):
         self.presto_conn_id = presto_conn_id
         self.mysql_conn_id = mysql_conn_id
         self.assignment_func = assignment_func
+        self.metric_sets = list(metric_sets) if metric_sets is not None else None
+        self.max_exprs_per_query = max_exprs_per_query or conf.getint(
+            "hive", "stats_max_exprs_per_query", fallback=50
+        )
+        self.parallelism = parallelism or conf.getint("hive", "stats_parallelism", fallback=4)
         self.ds = "{{ ds }}"
         self.dttm = "{{ execution_date.isoformat() }}"
 
@@ -87,6 +115,11 @@ class HiveStatsCollectionOperatorSE(BaseOperator):
         """Get default expressions."""
         if col in self.excluded_columns:
             return {}
+        if self.metric_sets is not None:
+            exp = {}
+            for metric_set in self.metric_sets:
+                exp.update(metric_set.exprs(col, col_type))
+            return exp
         exp = {(col, "non_null"): f"COUNT({col})"}
         if col_type in {"double", "int", "bigint", "float"}:
             exp[(col, "sum")] = f"SUM({col})"
@@ -102,12 +135,8 @@ class HiveStatsCollectionOperatorSE(BaseOperator):
 
         return exp
 
-    def execute(self, context: Context) -> None:
-        krb_auth(context)
-        metastore = HiveMetastoreHookSE(metastore_se_conn_id=self.metastore_se_conn_id)
-        table = metastore.get_table(table_name=self.table)
-        field_types = {col.name: col.type for col in table.sd.cols}
-
+    def get_exprs(self, field_types: dict[str, str]) -> dict[Any, Any]:
+        """Get metric expressions of the table and of all its columns."""
         exprs: Any = {("", "count"): "COUNT(*)"}
         for col, col_type in list(field_types.items()):
             if self.assignment_func:
@@ -118,55 +147,23 @@ class HiveStatsCollectionOperatorSE(BaseOperator):
                 assign_exprs = self.get_default_exprs(col, col_type)
             exprs.update(assign_exprs)
         exprs.update(self.extra_exprs)
-        exprs_str = ",\n        ".join(f"{v} AS {k[0]}__{k[1]}" for k, v in exprs.items())
+        return exprs
 
-        where_clause_ = [f"{k} = '{v}'" for k, v in self.partition.items()]
-        where_clause = " AND\n        ".join(where_clause_)
-        sql = f"SELECT {exprs_str} FROM {self.table} WHERE {where_clause};"
+    def execute(self, context: Context) -> None:
+        krb_auth(context)
+        metastore = HiveMetastoreHookSE(metastore_conn_id=self.metastore_se_conn_id)
+        table = metastore.get_table(table_name=self.table)
+        field_types = {col.name: col.type for col in table.sd.cols}
+        exprs = self.get_exprs(field_types)
+        partitions = self.partition if isinstance(self.partition, (list, tuple)) else [self.partition]
 
         presto = PrestoHook(presto_conn_id=self.presto_conn_id)
-        self.log.info("Executing SQL check: %s", sql)
-        row = presto.get_first(sql)
-        self.log.info("Record: %s", row)
-        if not row:
-            raise AirflowException("The query returned None")
-
-        part_json = json.dumps(self.partition, sort_keys=True)
-
-        self.log.info("Deleting rows from previous runs if they exist")
-        mysql = MySqlHook(self.mysql_conn_id)
-        sql = f"""
-        SELECT 1 FROM hive_stats
-        WHERE
-            table_name='{self.table}' AND
-            partition_repr='{part_json}' AND
-            dttm='{self.dttm}'
-        LIMIT 1;
-        """
-        if mysql.get_records(sql):
-            sql = f"""
-            DELETE FROM hive_stats
-            WHERE
-                table_name='{self.table}' AND
-                partition_repr='{part_json}' AND
-                dttm='{self.dttm}';
-            """
-            mysql.run(sql)
-
-        self.log.info("Pivoting and loading cells into the Airflow db")
-        rows = [
-            (self.ds, self.dttm, self.table, part_json) + (r[0][0], r[0][1], r[1]) for r in zip(exprs, row)
-        ]
-        mysql.insert_rows(
-            table="hive_stats",
-            rows=rows,
-            target_fields=[
-                "ds",
-                "dttm",
-                "table_name",
-                "partition_repr",
-                "col",
-                "metric",
-                "value",
-            ],
-        )
\ No newline at end of file
+        engine = HiveStatsEngine(
+            run_query=presto.get_first,
+            max_exprs_per_query=self.max_exprs_per_query,
+            parallelism=self.parallelism,
+        )
+        stats = engine.collect(self.table, partitions, exprs)
+
+        self.log.info("Replacing stats of previous runs and loading cells into the Airflow db")
+        HiveStatsStore(MySqlHook(self.mysql_conn_id)).replace(self.ds, self.dttm, self.table, stats)
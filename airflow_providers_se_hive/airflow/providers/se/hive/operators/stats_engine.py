@@ -0,0 +1,273 @@
+"""Column statistics of Hive partitions: metric sets, bounded parallel queries and an atomic stats store."""
+from __future__ import annotations
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Optional, Sequence, Tuple
+
+from airflow.exceptions import AirflowException
+from airflow.utils.log.logging_mixin import LoggingMixin
+
+# (column, metric name): "" stands for the table itself, e.g. ("", "count")
+MetricKey = Tuple[str, str]
+StatRow = Tuple[str, str, Any]
+QueryRunner = Callable[[str], Optional[Sequence[Any]]]
+
+NUMERIC_TYPES = frozenset(("tinyint", "smallint", "int", "integer", "bigint", "float", "double", "decimal", "real"))
+
+
+def base_type(col_type: str) -> str:
+    """Hive type without parameters: ``decimal(10,2)`` -> ``decimal``."""
+    return col_type.split("(", 1)[0].split("<", 1)[0].strip().lower()
+
+
+def _literal(value: Any) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def partition_repr(partition: dict[str, Any]) -> str:
+    """Partition as it is stored in the ``partition_repr`` column of the stats table."""
+    return json.dumps(partition, sort_keys=True)
+
+
+class MetricSet:
+    """
+    A family of metrics computed for a column.
+
+    Subclasses return a dict of metric keys and aggregate SQL expressions for a column,
+    an empty dict when the family does not apply to the column type.
+    """
+
+    def exprs(self, col: str, col_type: str) -> dict[MetricKey, str]:
+        raise NotImplementedError
+
+
+class NullRatioMetrics(MetricSet):
+    """Non null values count and the share of NULLs (0.0 - 1.0) of every column."""
+
+    def exprs(self, col: str, col_type: str) -> dict[MetricKey, str]:
+        return {
+            (col, "non_null"): f"COUNT({col})",
+            (col, "null_ratio"): f"AVG(CASE WHEN {col} IS NULL THEN 1.0 ELSE 0.0 END)",
+        }
+
+
+class ApproxDistinctMetrics(MetricSet):
+    """
+    Approximate count of distinct values.
+
+    :param expression: aggregate template with a ``{col}`` placeholder, ``APPROX_DISTINCT({col})``
+        of Presto by default, e.g. ``COUNT(DISTINCT {col})`` for an exact count on other engines
+    :param types: base column types the metric is computed for, all types if None
+    """
+
+    def __init__(self, expression: str = "APPROX_DISTINCT({col})", types: Iterable[str] | None = None) -> None:
+        self.expression = expression
+        self.types = frozenset(types) if types is not None else None
+
+    def exprs(self, col: str, col_type: str) -> dict[MetricKey, str]:
+        if self.types is not None and base_type(col_type) not in self.types:
+            return {}
+        return {(col, "approx_distinct"): self.expression.format(col=col)}
+
+
+class MinMaxMetrics(MetricSet):
+    """Minimum and maximum of numeric columns (the ``value`` column of the stats table is numeric)."""
+
+    def exprs(self, col: str, col_type: str) -> dict[MetricKey, str]:
+        if base_type(col_type) not in NUMERIC_TYPES:
+            return {}
+        return {(col, "min"): f"MIN({col})", (col, "max"): f"MAX({col})"}
+
+
+class HistogramMetrics(MetricSet):
+    """
+    Value counts of a numeric column in buckets between the given bounds.
+
+    Bounds ``[0, 10, 100]`` give the metrics ``hist_lt_0``, ``hist_0_10``, ``hist_10_100`` and
+    ``hist_ge_100``, so a histogram costs one pass together with the other metrics of the query.
+
+    :param bounds: ascending bucket bounds per column name
+    """
+
+    def __init__(self, bounds: dict[str, Sequence[float]]) -> None:
+        for col, col_bounds in bounds.items():
+            if not col_bounds or list(col_bounds) != sorted(col_bounds):
+                raise ValueError(f"Histogram bounds of column {col} must be a non empty ascending sequence")
+        self.bounds = {col: list(col_bounds) for col, col_bounds in bounds.items()}
+
+    def exprs(self, col: str, col_type: str) -> dict[MetricKey, str]:
+        bounds = self.bounds.get(col)
+        if not bounds or base_type(col_type) not in NUMERIC_TYPES:
+            return {}
+        exp = {(col, f"hist_lt_{bounds[0]}"): f"SUM(CASE WHEN {col} < {bounds[0]} THEN 1 ELSE 0 END)"}
+        for low, high in zip(bounds, bounds[1:]):
+            exp[(col, f"hist_{low}_{high}")] = (
+                f"SUM(CASE WHEN {col} >= {low} AND {col} < {high} THEN 1 ELSE 0 END)"
+            )
+        exp[(col, f"hist_ge_{bounds[-1]}")] = f"SUM(CASE WHEN {col} >= {bounds[-1]} THEN 1 ELSE 0 END)"
+        return exp
+
+
+@dataclass
+class StatsQuery:
+    """One aggregate query: a group of metrics of one partition."""
+
+    partition: dict[str, Any]
+    metrics: list[MetricKey]
+    sql: str
+
+
+@dataclass
+class PartitionStats:
+    """Collected metric values of a partition."""
+
+    partition: dict[str, Any]
+    values: dict[MetricKey, Any] = field(default_factory=dict)
+
+    def rows(self) -> list[StatRow]:
+        return [(col, metric, value) for (col, metric), value in self.values.items()]
+
+
+class HiveStatsEngine(LoggingMixin):
+    """
+    Compute metric expressions of table partitions.
+
+    The expressions are split into groups of at most ``max_exprs_per_query``, a group holds
+    whole columns where possible, so every query is a single bounded pass over a partition.
+    The queries of all groups and partitions run concurrently, at most ``parallelism`` at a time.
+    If a query fails the remaining ones are cancelled and nothing is returned.
+
+    :param run_query: returns the single result row of a query (e.g. ``PrestoHook.get_first``)
+    :param max_exprs_per_query: maximum number of aggregate expressions in one query
+    :param parallelism: maximum number of queries running at the same time
+    """
+
+    def __init__(self, run_query: QueryRunner, max_exprs_per_query: int = 50, parallelism: int = 4) -> None:
+        super().__init__()
+        if max_exprs_per_query < 1 or parallelism < 1:
+            raise ValueError("max_exprs_per_query and parallelism must be positive")
+        self.run_query = run_query
+        self.max_exprs_per_query = max_exprs_per_query
+        self.parallelism = parallelism
+
+    def group_metrics(self, exprs: dict[MetricKey, str]) -> list[list[MetricKey]]:
+        """Pack metrics into groups by column, a column is split only if it alone exceeds the limit."""
+        by_column: dict[str, list[MetricKey]] = {}
+        for key in exprs:
+            by_column.setdefault(key[0], []).append(key)
+        groups: list[list[MetricKey]] = []
+        current: list[MetricKey] = []
+        for keys in by_column.values():
+            if current and len(current) + len(keys) > self.max_exprs_per_query:
+                groups.append(current)
+                current = []
+            for key in keys:
+                if len(current) == self.max_exprs_per_query:
+                    groups.append(current)
+                    current = []
+                current.append(key)
+        if current:
+            groups.append(current)
+        return groups
+
+    @staticmethod
+    def where_clause(partition: dict[str, Any]) -> str:
+        conditions = [f"{k} = {_literal(v)}" for k, v in partition.items()]
+        return f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    def plan(self, table: str, partitions: Sequence[dict[str, Any]], exprs: dict[MetricKey, str]) -> list[StatsQuery]:
+        queries = []
+        groups = self.group_metrics(exprs)
+        for partition in partitions:
+            where = self.where_clause(partition)
+            for group in groups:
+                select = ", ".join(f"{exprs[key]} AS m{i}" for i, key in enumerate(group))
+                queries.append(StatsQuery(partition, group, f"SELECT {select} FROM {table}{where}"))
+        return queries
+
+    def _run(self, query: StatsQuery) -> Sequence[Any]:
+        self.log.info("Executing stats query: %s", query.sql)
+        row = self.run_query(query.sql)
+        if not row:
+            raise AirflowException(f"The query returned None: {query.sql}")
+        if len(row) != len(query.metrics):
+            raise AirflowException(f"The query returned {len(row)} values instead of {len(query.metrics)}")
+        return row
+
+    def collect(
+        self, table: str, partitions: Sequence[dict[str, Any]], exprs: dict[MetricKey, str]
+    ) -> list[PartitionStats]:
+        """Metric values of every partition, in the order of ``partitions`` and ``exprs``."""
+        queries = self.plan(table, partitions, exprs)
+        self.log.info(
+            "Collecting %s metrics of %s partition(s) of %s with %s queries",
+            len(exprs), len(partitions), table, len(queries),
+        )
+        stats = {partition_repr(p): PartitionStats(p) for p in partitions}
+        with ThreadPoolExecutor(max_workers=min(self.parallelism, len(queries) or 1)) as executor:
+            futures = [executor.submit(self._run, query) for query in queries]
+            try:
+                rows = [future.result() for future in futures]
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        for query, row in zip(queries, rows):
+            stats[partition_repr(query.partition)].values.update(zip(query.metrics, row))
+        for partition_stats in stats.values():
+            partition_stats.values = {key: partition_stats.values[key] for key in exprs}
+        return list(stats.values())
+
+
+class HiveStatsStore(LoggingMixin):
+    """
+    Stats table written through a DB-API hook (MySQL ``airflow_db`` by default in the operator).
+
+    Stats of a table, run and partitions are replaced in one transaction: the previous rows are
+    deleted and the new ones inserted before a single commit, a failure leaves the old stats.
+
+    :param hook: DB-API hook of the database holding the stats table
+    :param table: name of the stats table
+    """
+
+    fields = ("ds", "dttm", "table_name", "partition_repr", "col", "metric", "value")
+
+    def __init__(self, hook: Any, table: str = "hive_stats") -> None:
+        super().__init__()
+        self.hook = hook
+        self.table = table
+
+    def replace(self, ds: str, dttm: str, table_name: str, stats: Sequence[PartitionStats]) -> int:
+        """Replace the stats of ``table_name`` and run ``dttm``, returns the number of inserted rows."""
+        placeholder = getattr(self.hook, "placeholder", "%s")
+        delete_sql = (
+            f"DELETE FROM {self.table} WHERE table_name = {placeholder} "
+            f"AND partition_repr = {placeholder} AND dttm = {placeholder}"
+        )
+        insert_sql = (
+            f"INSERT INTO {self.table} ({', '.join(self.fields)}) "
+            f"VALUES ({', '.join([placeholder] * len(self.fields))})"
+        )
+        rows = [
+            (ds, dttm, table_name, partition_repr(s.partition), col, metric, value)
+            for s in stats
+            for col, metric, value in s.rows()
+        ]
+        with closing(self.hook.get_conn()) as conn:
+            if getattr(self.hook, "supports_autocommit", False):
+                self.hook.set_autocommit(conn, False)
+            try:
+                with closing(conn.cursor()) as cur:
+                    for s in stats:
+                        cur.execute(delete_sql, (table_name, partition_repr(s.partition), dttm))
+                    if rows:
+                        cur.executemany(insert_sql, rows)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        self.log.info("Stored %s stats rows of %s into %s", len(rows), table_name, self.table)
+        return len(rows)
@@ -57,5 +57,5 @@ class HivePartitionSensorSE(BaseSensorOperator):
             self.schema, self.table = self.table.split(".")
         self.log.info("Poking for table %s.%s, partition %s", self.schema, self.table, self.partition)
         if not hasattr(self, "hook"):
-            hook = HiveMetastoreHookSE(metastore_se_conn_id=self.metastore_se_conn_id)
-        return hook.check_for_partition(self.schema, self.table, self.partition)
\ No newline at end of file
+            self.hook = HiveMetastoreHookSE(metastore_conn_id=self.metastore_se_conn_id)
+        return self.hook.check_for_partition(self.schema, self.table, self.partition)
\ No newline at end of file
@@ -70,7 +70,7 @@ class NamedHivePartitionSensorSE(BaseSensorOperator):
         if not self.hook:
             from airflow.providers.se.hive.hooks.hive import HiveMetastoreHookSE
 
-            self.hook = HiveMetastoreHookSE(metastore_se_conn_id=self.metastore_se_conn_id)
+            self.hook = HiveMetastoreHookSE(metastore_conn_id=self.metastore_se_conn_id)
 
         schema, table, partition = self.parse_partition_name(partition)
 
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""
+Сравнение max_partition / closest_ds_partition / check_for_partition_spec по списку разделов (запрос имён и
+partition_name_to_spec на каждое имя при каждом вызове) и по индексу разделов `HivePartitionIndex`
+(TTL 0, TTL в памяти процесса и SQLite-файл, прочитанный новым процессом) на поддельном клиенте metastore.
+
+Запуск:
+    python benchmarks/partition_index.py [--partitions 100000] [--lookups 50] [--rpc-latency 0.0] [--db /tmp/p.db]
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date, timedelta
+from tempfile import mkdtemp
+from time import perf_counter, sleep
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("AIRFLOW_HOME", mkdtemp(prefix="airflow_se_bench_"))
+os.environ.setdefault("AIRFLOW__DATABASE__SQL_ALCHEMY_CONN", "postgresql://airflow@localhost/airflow")
+
+from airflow.providers.se.hive.hooks.hive import HiveMetastoreHookSE  # noqa: E402
+from airflow.providers.se.hive.hooks.partition_index import HivePartitionIndex, partition_name_to_values  # noqa: E402
+
+KEYS = ["ds", "hour", "region"]
+REGIONS = ["eu", "us", "asia", "ru"]
+FIRST_DAY = date(2010, 1, 1)
+
+
+class Key:
+    def __init__(self, name):
+        self.name = name
+
+
+class Table:
+    def __init__(self, keys):
+        self.partitionKeys = [Key(k) for k in keys]
+
+
+class FakeMetastoreClient:
+    """Клиент metastore с одной таблицей из `count` разделов ds/hour/region, считает вызовы"""
+
+    def __init__(self, count: int, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        days = count // (24 * len(REGIONS)) + 1
+        self.names = [
+            f"ds={FIRST_DAY + timedelta(days=d)}/hour={h:02}/region={r}"
+            for d in range(days) for h in range(24) for r in REGIONS
+        ][:count]
+
+    def _call(self):
+        self.calls += 1
+        if self.latency:
+            sleep(self.latency)
+
+    def get_table(self, dbname, tbl_name):
+        self._call()
+        return Table(KEYS)
+
+    def get_partition_names(self, db_name, tbl_name, max_parts):
+        self._call()
+        return list(self.names) if max_parts < 0 else self.names[:max_parts]
+
+    def partition_name_to_spec(self, part_name):
+        self._call()
+        return dict(zip(KEYS, partition_name_to_values(part_name)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def legacy_specs(client: FakeMetastoreClient) -> list:
+    client.get_table(dbname="db", tbl_name="t")
+    # прежний max_partition ограничивал список MAX_PART_COUNT, здесь список полный, чтобы сравнивать результаты
+    names = client.get_partition_names("db", "t", max_parts=-1)
+    return [client.partition_name_to_spec(name) for name in names]
+
+
+def legacy_lookup(client: FakeMetastoreClient, ds: str, spec: dict) -> tuple:
+    specs = legacy_specs(client)
+    max_ds = HiveMetastoreHookSE._get_max_partition_from_part_specs(specs, "ds", None)
+    max_hour = HiveMetastoreHookSE._get_max_partition_from_part_specs(specs, "hour", {"ds": ds})
+    dates = sorted({s["ds"] for s in specs})
+    before = [d for d in dates if d <= ds]
+    closest = before[-1] if before else None
+    exists = any(all(s.get(k) == v for k, v in spec.items()) for s in specs)
+    return max_ds, max_hour, closest, exists
+
+
+def index_lookup(index: HivePartitionIndex, client: FakeMetastoreClient, ds: str, spec: dict) -> tuple:
+    partitions = index.get(client, "metastore_default", "db", "t")
+    return (
+        partitions.max("ds"),
+        partitions.max("hour", {"ds": ds}),
+        partitions.closest_ds("ds", ds, before=True),
+        partitions.exists(spec),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--partitions", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=50, help="max/closest/exists calls per variant")
+    parser.add_argument("--legacy-lookups", type=int, default=3, help="calls of the slow variant without index")
+    parser.add_argument("--rpc-latency", type=float, default=0.0, help="seconds per metastore call")
+    parser.add_argument("--ttl", type=float, default=300.0)
+    parser.add_argument("--db", default=os.path.join(mkdtemp(prefix="partition_index_bench_"), "partitions.db"))
+    args = parser.parse_args()
+
+    client = FakeMetastoreClient(args.partitions, args.rpc_latency)
+    rng = random.Random(0)
+    days = len(client.names) // (24 * len(REGIONS)) + 1
+    queries = []
+    for _ in range(args.lookups):
+        ds = str(FIRST_DAY + timedelta(days=rng.randrange(-10, days + 10)))
+        spec = {"ds": ds, "region": rng.choice(REGIONS + ["mars"])}
+        queries.append((ds, spec))
+
+    variants = [
+        ("index, ttl 0", HivePartitionIndex(ttl=0)),
+        (f"index, ttl {args.ttl:g}", HivePartitionIndex(ttl=args.ttl)),
+    ]
+    HivePartitionIndex(ttl=args.ttl, path=args.db).get(client, "metastore_default", "db", "t")
+    # новый процесс, листинг в SQLite-файле моложе TTL
+    variants.append(("sqlite file, new process", HivePartitionIndex(ttl=args.ttl, path=args.db)))
+
+    print(f"partitions: {len(client.names)}, lookups: {args.lookups}, rpc latency: {args.rpc_latency * 1000:g} ms")
+    client.calls = 0
+    started = perf_counter()
+    expected = [legacy_lookup(client, ds, spec) for ds, spec in queries[:args.legacy_lookups]]
+    elapsed = perf_counter() - started
+    legacy_per_lookup = elapsed / len(expected)
+    print(f"{'without index':<28} {legacy_per_lookup * 1000:10.1f} ms per lookup, "
+          f"{client.calls / len(expected):10.0f} metastore calls per lookup")
+
+    for name, index in variants:
+        client.calls = 0
+        started = perf_counter()
+        results = [index_lookup(index, client, ds, spec) for ds, spec in queries]
+        elapsed = perf_counter() - started
+        assert results[:len(expected)] == expected, f"{name}: results differ from the listing without index"
+        per_lookup = elapsed / len(results)
+        print(f"{name:<28} {per_lookup * 1000:10.1f} ms per lookup, "
+              f"{client.calls / len(results):10.2f} metastore calls per lookup, "
+              f"speedup {legacy_per_lookup / per_lookup:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
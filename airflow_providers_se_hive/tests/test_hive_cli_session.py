@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_se_tests_"))
+# airflow_se.db (used by the provider) creates a pooled engine on import, the tests never connect to it
+os.environ.setdefault("AIRFLOW__DATABASE__SQL_ALCHEMY_CONN", "postgresql://airflow@localhost/airflow")
+
+from airflow.exceptions import AirflowException  # noqa: E402
+from airflow.models.connection import Connection  # noqa: E402
+from airflow.providers.se.hive.hooks.hive import HiveCliHookSE, HiveCliSession  # noqa: E402
+
+# Interactive hive/beeline stand-in: runs statements read from stdin, echoes the session markers.
+# "fail" prints an error line, "die" exits, "hang" stops printing output.
+FAKE_CLI = r'''
+import os
+import sys
+import time
+
+beeline = "--force=true" in sys.argv
+print("Connected to: Fake Hive" if beeline else "Logging initialized", flush=True)
+for line in sys.stdin:
+    line = line.strip()
+    if line in ("!quit", "quit;"):
+        break
+    if line.startswith("!sh echo ") or line.startswith("!echo "):
+        marker = line.split("echo ", 1)[1].rstrip(";")
+        if beeline:
+            print(f"0: jdbc:hive2://fake> {line}", flush=True)
+        print(marker, flush=True)
+        continue
+    statement = line.rstrip(";")
+    if statement == "fail":
+        print("Error: Error while compiling statement" if beeline else "FAILED: SemanticException", flush=True)
+    elif statement == "die":
+        sys.exit(3)
+    elif statement == "hang":
+        time.sleep(60)
+    else:
+        print(f"pid={os.getpid()} ran: {statement}", flush=True)
+'''
+
+
+@pytest.fixture
+def fake_cli(tmp_path):
+    path = tmp_path / "fake_cli.py"
+    path.write_text(FAKE_CLI)
+    return [sys.executable, "-u", str(path)]
+
+
+def pids(output):
+    return {line.split()[0] for line in output.splitlines() if line.startswith("pid=")}
+
+
+@pytest.mark.parametrize("use_beeline", [True, False])
+def test_statements_share_one_process(fake_cli, use_beeline):
+    session = HiveCliSession(fake_cli, use_beeline=use_beeline, read_timeout=10)
+    try:
+        output = session.run(["USE db", "SELECT 1"], verbose=False)
+        output += session.run(["SELECT 2"], verbose=False)
+        assert "ran: USE db" in output and "ran: SELECT 1" in output and "ran: SELECT 2" in output
+        assert "__airflow_hive_session_" not in output
+        assert len(pids(output)) == 1
+    finally:
+        session.close()
+    assert not session.is_alive()
+
+
+@pytest.mark.parametrize("use_beeline", [True, False])
+def test_failed_statement_stops_the_run(fake_cli, use_beeline):
+    session = HiveCliSession(fake_cli, use_beeline=use_beeline, read_timeout=10)
+    try:
+        with pytest.raises(AirflowException) as e:
+            session.run(["SELECT 1", "fail", "SELECT 2"], verbose=False)
+        assert "ran: SELECT 2" not in str(e.value)
+        # the process survives a failed statement
+        pid = session.sub_process.pid
+        assert "ran: SELECT 3" in session.run(["SELECT 3"], verbose=False)
+        assert session.sub_process.pid == pid
+    finally:
+        session.close()
+
+
+def test_dead_process_is_restarted(fake_cli):
+    session = HiveCliSession(fake_cli, use_beeline=True, read_timeout=10)
+    try:
+        first = session.run(["SELECT 1"], verbose=False)
+        with pytest.raises(AirflowException, match="exited with code 3"):
+            session.run(["die"], verbose=False)
+        assert not session.is_alive()
+        second = session.run(["SELECT 2"], verbose=False)
+        assert pids(first) != pids(second)
+    finally:
+        session.close()
+
+
+def test_hung_process_is_killed(fake_cli):
+    session = HiveCliSession(fake_cli, use_beeline=True, read_timeout=0.5)
+    try:
+        session.start()
+        process = session.sub_process
+        with pytest.raises(AirflowException, match="timed out"):
+            session.run(["SELECT 1", "hang"], verbose=False)
+        assert process.poll() is not None
+        assert "ran: SELECT 2" in session.run(["SELECT 2"], verbose=False)
+    finally:
+        session.close()
+
+
+def test_split_hql():
+    hql = "-- comment\nUSE db;\nSELECT ';' FROM t; /* block */\n\nINSERT INTO t VALUES (1);;"
+    assert HiveCliHookSE._split_hql(hql) == ["USE db", "SELECT ';' FROM t", "INSERT INTO t VALUES (1)"]
+
+
+def test_hook_session_mode(fake_cli, monkeypatch):
+    conn = Connection(conn_id="hive_cli_se_default", conn_type="hive_cli_se", schema="default",
+                      extra=json.dumps({"use_beeline": True, "session_mode": True, "session_read_timeout": 10}))
+    monkeypatch.setattr(HiveCliHookSE, "get_connection", classmethod(lambda cls, conn_id: conn))
+    monkeypatch.setattr(HiveCliHookSE, "_prepare_cli_cmd", lambda self: list(fake_cli))
+    hook = HiveCliHookSE(mapred_queue="etl")
+    try:
+        first = hook.run_cli("SELECT 1;", schema="db", verbose=False, hive_conf={"a": "b"})
+        assert "ran: SET a=b" in first
+        assert "ran: SET mapreduce.job.queuename=etl" in first
+        assert "ran: USE db" in first
+        assert "ran: SELECT 1" in first
+        second = hook.run_cli("SELECT 2;", verbose=False)
+        assert "ran: USE default" in second
+        assert pids(first) == pids(second)
+        assert hook.sub_process is hook.session.sub_process
+    finally:
+        hook.close_session()
+    assert hook.session is None
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+
+import csv
+import os
+import tempfile
+import tracemalloc
+
+import pytest
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_se_tests_"))
+# airflow_se.db (used by the provider) creates a pooled engine on import, the tests never connect to it
+os.environ.setdefault("AIRFLOW__DATABASE__SQL_ALCHEMY_CONN", "postgresql://airflow@localhost/airflow")
+
+from airflow.models.connection import Connection  # noqa: E402
+from airflow.providers.se.hive.hooks.hive import HiveServer2HookSE  # noqa: E402
+
+HEADER = [
+    ("t.id", "INT_TYPE", None, None, None, None, True),
+    ("t.name", "STRING_TYPE", None, None, None, None, True),
+    ("t.score", "DOUBLE_TYPE", None, None, None, None, True),
+]
+
+
+def row(i):
+    return i, f"name_{i}", i * 0.5
+
+
+class Cursor:
+    """DB-API cursor producing `rows` synthetic rows on demand, nothing is kept in memory."""
+
+    def __init__(self, rows, fail_after=None):
+        self.rows = rows
+        self.fail_after = fail_after
+        self.arraysize = 1
+        self.description = None
+        self.executed = []
+        self.fetches = []
+        self.closed = False
+        self._next = 0
+
+    def execute(self, statement):
+        self.executed.append(statement)
+        if not statement.startswith("set "):
+            self.description = HEADER
+            self._next = 0
+
+    def fetchmany(self, size):
+        if self.fail_after is not None and self._next >= self.fail_after:
+            raise ValueError("TTransportException: connection reset")
+        self.fetches.append(size)
+        end = min(self._next + size, self.rows)
+        rows = [row(i) for i in range(self._next, end)]
+        self._next = end
+        return rows
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany(self.arraysize)
+            if not rows:
+                return
+            yield from rows
+
+    def close(self):
+        self.closed = True
+
+
+class Conn:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.closed = False
+
+    def cursor(self):
+        return self._cursor
+
+    def close(self):
+        self.closed = True
+
+
+def make_hook(monkeypatch, rows, **kwargs):
+    cursor = Cursor(rows, **kwargs)
+    conn = Conn(cursor)
+    monkeypatch.setattr(
+        HiveServer2HookSE,
+        "get_connection",
+        classmethod(lambda cls, conn_id: Connection(conn_id=conn_id, conn_type="hiveserver2_se")),
+    )
+    hook = HiveServer2HookSE()
+    hook.get_conn = lambda schema=None: conn
+    return hook, cursor, conn
+
+
+def test_iter_records_fetches_in_batches(monkeypatch):
+    hook, cursor, conn = make_hook(monkeypatch, 2500)
+    records = hook.iter_records("SELECT * FROM t", fetch_size=1000, hive_conf={"a": "b"})
+    assert not cursor.executed
+    assert list(records) == [row(i) for i in range(2500)]
+    assert cursor.fetches == [1000, 1000, 1000, 1000]
+    assert "set a=b" in cursor.executed
+    assert conn.closed and cursor.closed
+
+
+def test_default_fetch_size_from_config(monkeypatch):
+    monkeypatch.setenv("AIRFLOW__HIVE__HIVESERVER2_FETCH_SIZE", "300")
+    hook, cursor, _ = make_hook(monkeypatch, 1000)
+    assert [len(rows) for rows in hook.iter_batches("SELECT * FROM t")] == [300, 300, 300, 100]
+
+
+def test_closed_iterator_closes_connection(monkeypatch):
+    hook, cursor, conn = make_hook(monkeypatch, 10_000)
+    records = hook.iter_records("SELECT * FROM t", fetch_size=100)
+    assert [next(records) for _ in range(150)] == [row(i) for i in range(150)]
+    records.close()
+    assert cursor.fetches == [100, 100]
+    assert conn.closed
+
+
+def test_iter_pandas_df(monkeypatch):
+    hook, cursor, _ = make_hook(monkeypatch, 2500)
+    frames = list(hook.iter_pandas_df("SELECT * FROM t", chunksize=1000, fetch_size=300))
+    assert [len(df) for df in frames] == [1000, 1000, 500]
+    assert list(frames[0].columns) == ["t.id", "t.name", "t.score"]
+    assert frames[2].iloc[-1].tolist() == list(row(2499))
+    assert set(cursor.fetches) == {300}
+
+
+def test_to_csv(monkeypatch, tmp_path):
+    hook, _, _ = make_hook(monkeypatch, 250)
+    path = str(tmp_path / "out.csv")
+    hook.to_csv("SELECT * FROM t", path, fetch_size=100, lineterminator="\n")
+    with open(path) as f:
+        lines = list(csv.reader(f))
+    assert lines[0] == ["t.id", "t.name", "t.score"]
+    assert lines[1:] == [[str(v) for v in row(i)] for i in range(250)]
+
+
+def test_to_parquet(monkeypatch, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    hook, _, _ = make_hook(monkeypatch, 2500)
+    path = str(tmp_path / "out.parquet")
+    hook.to_parquet("SELECT * FROM t", path, fetch_size=400, row_group_size=1000)
+    file = pq.ParquetFile(path)
+    assert [file.metadata.row_group(i).num_rows for i in range(file.num_row_groups)] == [1000, 1000, 500]
+    assert [str(f.type) for f in file.schema_arrow] == ["int32", "string", "double"]
+    assert file.read().to_pylist()[-1] == dict(zip(["t.id", "t.name", "t.score"], row(2499)))
+
+
+def test_failed_parquet_export_removes_file(monkeypatch, tmp_path):
+    pytest.importorskip("pyarrow.parquet")
+    hook, _, conn = make_hook(monkeypatch, 2500, fail_after=1000)
+    path = str(tmp_path / "out.parquet")
+    with pytest.raises(ValueError, match="connection reset"):
+        hook.to_parquet("SELECT * FROM t", path, fetch_size=500, row_group_size=500)
+    assert not os.path.exists(path)
+    assert conn.closed
+
+
+def test_get_records_is_unchanged(monkeypatch):
+    hook, _, _ = make_hook(monkeypatch, 50)
+    assert hook.get_records("SELECT * FROM t") == [row(i) for i in range(50)]
+    result = hook.get_results("SELECT * FROM t")
+    assert result["header"] == HEADER and len(result["data"]) == 50
+
+
+def peak_memory(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_streaming_peak_memory_does_not_grow_with_result(monkeypatch, tmp_path):
+    rows = 200_000
+
+    def consume(records):
+        for _ in records:
+            pass
+
+    hook, _, _ = make_hook(monkeypatch, rows)
+    loaded = peak_memory(lambda: hook.get_records("SELECT * FROM t"))
+    streamed = peak_memory(lambda: consume(hook.iter_records("SELECT * FROM t", fetch_size=1000)))
+    to_csv = peak_memory(lambda: hook.to_csv("SELECT * FROM t", str(tmp_path / "out.csv"), fetch_size=1000))
+    assert streamed < loaded / 20
+    assert to_csv < loaded / 20
+
+    hook, _, _ = make_hook(monkeypatch, rows * 2)
+    assert peak_memory(lambda: consume(hook.iter_records("SELECT * FROM t", fetch_size=1000))) < streamed * 1.5
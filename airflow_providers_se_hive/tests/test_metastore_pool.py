@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+
+import pytest
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_se_tests_"))
+
+from airflow.exceptions import AirflowException  # noqa: E402
+from airflow.providers.se.hive.hooks import metastore_pool  # noqa: E402
+from airflow.providers.se.hive.hooks.metastore_pool import (  # noqa: E402
+    HiveMetastoreClientPool,
+    PooledMetastoreClient,
+)
+
+KEY = ("metastore_se_default", None)
+
+
+class Transport:
+    def __init__(self):
+        self.open = True
+
+    def isOpen(self):
+        return self.open
+
+
+class Protocol:
+    def __init__(self):
+        self.trans = Transport()
+
+
+class Client:
+    """HMSClient without thrift: counts calls, `fail` is raised by the next call."""
+
+    def __init__(self, host, open_error=None):
+        self.host = host
+        self.open_error = open_error
+        self.opened = self.closed = False
+        self.meta_conf_calls = 0
+        self.fail = None
+        self._oprot = Protocol()
+
+    def open(self):
+        if self.open_error:
+            raise self.open_error
+        self.opened = True
+
+    def close(self):
+        self.closed = True
+
+    def getMetaConf(self, key):
+        self.meta_conf_calls += 1
+        if self.fail:
+            raise self.fail
+        return "300"
+
+    def get_table(self, schema, table):
+        if self.fail:
+            raise self.fail
+        return f"{schema}.{table}@{self.host}"
+
+
+class Factory:
+    def __init__(self, broken=()):
+        self.broken = set(broken)
+        self.clients = []
+
+    def __call__(self, host):
+        client = Client(host, ConnectionRefusedError(host) if host in self.broken else None)
+        self.clients.append(client)
+        return client
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(metastore_pool.time, "monotonic", clock)
+    return clock
+
+
+def make_pool(reachable=("h1", "h2"), **kwargs):
+    pool = HiveMetastoreClientPool(**kwargs)
+    pool.probed = []
+
+    def probe(host, port):
+        pool.probed.append(host)
+        return host in reachable
+
+    pool._probe = probe
+    return pool
+
+
+def test_released_client_is_reused(clock):
+    pool, factory = make_pool(), Factory()
+    client, host = pool.acquire(KEY, ["h1", "h2"], 9083, factory)
+    assert (client.opened, host) == (True, "h1")
+    pool.release(KEY, client, host)
+    assert pool.acquire(KEY, ["h1", "h2"], 9083, factory) == (client, "h1")
+    assert len(factory.clients) == 1
+    # the connection key includes the Kerberos ticket cache
+    other, _ = pool.acquire(("metastore_se_default", "/tmp/krb5cc_1"), ["h1", "h2"], 9083, factory)
+    assert other is not client
+
+
+def test_last_healthy_host_is_tried_first(clock):
+    pool, factory = make_pool(reachable=("h2",)), Factory()
+    client, host = pool.acquire(KEY, ["h1", "h2"], 9083, factory)
+    assert host == "h2"
+    assert sorted(pool.probed) == ["h1", "h2"]
+    pool.probed.clear()
+    second, host = pool.acquire(KEY, ["h1", "h2"], 9083, factory)
+    assert second is not client and host == "h2"
+    assert pool.probed == []
+
+
+def test_failed_last_host_probes_all_hosts(clock):
+    pool, factory = make_pool(), Factory(broken={"h1"})
+    pool._slot(KEY).last_host = "h1"
+    client, host = pool.acquire(KEY, ["h1", "h2"], 9083, factory)
+    assert host == "h2"
+    assert pool._slot(KEY).last_host == "h2"
+
+
+def test_no_valid_host(clock):
+    pool, factory = make_pool(reachable=()), Factory()
+    with pytest.raises(AirflowException):
+        pool.acquire(KEY, ["h1", "h2"], 9083, factory)
+    assert pool._slot(KEY).last_host is None
+
+
+def test_transport_error_evicts_client(clock):
+    pool, factory = make_pool(), Factory()
+    client, host = pool.acquire(KEY, ["h1"], 9083, factory)
+    pool.release(KEY, client, host, ConnectionResetError())
+    assert client.closed
+    assert pool.acquire(KEY, ["h1"], 9083, factory)[0] is not client
+
+
+def test_call_error_keeps_client(clock):
+    pool, factory = make_pool(), Factory()
+    client, host = pool.acquire(KEY, ["h1"], 9083, factory)
+    pool.release(KEY, client, host, ValueError("NoSuchObjectException"))
+    assert not client.closed
+    assert pool.acquire(KEY, ["h1"], 9083, factory)[0] is client
+
+
+def test_idle_client_expires(clock):
+    pool, factory = make_pool(max_idle=300), Factory()
+    client, host = pool.acquire(KEY, ["h1"], 9083, factory)
+    pool.release(KEY, client, host)
+    clock.now += 300
+    assert pool.acquire(KEY, ["h1"], 9083, factory)[0] is not client
+    assert client.closed
+
+
+def test_idle_client_is_validated(clock):
+    pool, factory = make_pool(validate_after=30), Factory()
+    client, host = pool.acquire(KEY, ["h1"], 9083, factory)
+    pool.release(KEY, client, host)
+    clock.now += 10
+    assert pool.acquire(KEY, ["h1"], 9083, factory)[0] is client
+    assert client.meta_conf_calls == 0
+
+    pool.release(KEY, client, host)
+    clock.now += 30
+    assert pool.acquire(KEY, ["h1"], 9083, factory)[0] is client
+    assert client.meta_conf_calls == 1
+
+    # a connection dropped by the server is replaced
+    pool.release(KEY, client, host)
+    clock.now += 30
+    client.fail = BrokenPipeError()
+    assert pool.acquire(KEY, ["h1"], 9083, factory)[0] is not client
+    assert client.closed
+
+
+def test_closed_transport_is_replaced(clock):
+    pool, factory = make_pool(), Factory()
+    client, host = pool.acquire(KEY, ["h1"], 9083, factory)
+    pool.release(KEY, client, host)
+    client._oprot.trans.open = False
+    assert pool.acquire(KEY, ["h1"], 9083, factory)[0] is not client
+
+
+def test_forked_process_does_not_share_clients(clock, monkeypatch):
+    pool, factory = make_pool(), Factory()
+    client, host = pool.acquire(KEY, ["h1"], 9083, factory)
+    pool.release(KEY, client, host)
+    monkeypatch.setattr(metastore_pool.os, "getpid", lambda: pool._pid + 1)
+    assert pool.acquire(KEY, ["h1"], 9083, factory)[0] is not client
+
+
+def test_pooled_client_context_manager(clock):
+    pool, factory = make_pool(), Factory()
+    pooled = PooledMetastoreClient(pool, "metastore_se_default", ["h1"], 9083, factory)
+    with pooled as outer:
+        with pooled as inner:
+            assert inner is not outer
+        assert pool._slot(KEY).idle[0][0] is inner
+    assert [c for c, _, _ in pool._slot(KEY).idle] == [inner, outer]
+
+
+def test_pooled_client_delegates_calls(clock):
+    pool, factory = make_pool(), Factory()
+    pooled = PooledMetastoreClient(pool, "metastore_se_default", ["h1"], 9083, factory)
+    assert pooled.get_table("db", "t") == "db.t@h1"
+    assert pooled.get_table("db", "t2") == "db.t2@h1"
+    assert len(factory.clients) == 1
+    assert len(pool._slot(KEY).idle) == 1
+
+    factory.clients[0].fail = EOFError()
+    with pytest.raises(EOFError):
+        pooled.get_table("db", "t")
+    assert factory.clients[0].closed
+    assert pool._slot(KEY).idle == []
+
+    with pytest.raises(AttributeError):
+        pooled._oprot
@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+
+import os
+import sqlite3
+import tempfile
+from contextlib import closing
+
+import pytest
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_se_tests_"))
+# airflow_se.db (used by the provider) creates a pooled engine on import, the tests never connect to it
+os.environ.setdefault("AIRFLOW__DATABASE__SQL_ALCHEMY_CONN", "postgresql://airflow@localhost/airflow")
+
+from airflow.exceptions import AirflowException  # noqa: E402
+from airflow.models.connection import Connection  # noqa: E402
+from airflow.providers.se.hive.hooks import hive as hive_hooks  # noqa: E402
+from airflow.providers.se.hive.hooks import partition_index as partition_index_module  # noqa: E402
+from airflow.providers.se.hive.hooks.hive import HiveMetastoreHookSE  # noqa: E402
+from airflow.providers.se.hive.hooks.partition_index import (  # noqa: E402
+    HivePartitionIndex,
+    TablePartitions,
+    partition_name_to_values,
+)
+from airflow.providers.se.hive.macros import hive as hive_macros  # noqa: E402
+
+KEYS = ["ds", "hour"]
+NAMES = [f"ds=2024-01-{d:02}/hour={h:02}" for d in (1, 2, 5) for h in (0, 12)] + ["ds=2024-01-09/hour=03"]
+
+
+def snapshot(names=NAMES, keys=KEYS):
+    return TablePartitions([], {}, 0.0).updated(keys, names, 1.0)
+
+
+class Key:
+    def __init__(self, name):
+        self.name = name
+
+
+class Table:
+    def __init__(self, keys):
+        self.partitionKeys = [Key(k) for k in keys]
+
+
+class Client:
+    """Metastore client holding the partition names of one table, counts the listings."""
+
+    def __init__(self, names=NAMES, keys=KEYS):
+        self.names = list(names)
+        self.keys = keys
+        self.listings = 0
+        self.tables = 0
+
+    def get_table(self, dbname, tbl_name):
+        self.tables += 1
+        return Table(self.keys)
+
+    def get_partition_names(self, db, table, max_parts):
+        self.listings += 1
+        return list(self.names) if max_parts < 0 else self.names[:max_parts]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(partition_index_module.time, "time", clock)
+    return clock
+
+
+def test_partition_name_to_values():
+    assert partition_name_to_values("ds=2024-01-01/hour=01") == ("2024-01-01", "01")
+    assert partition_name_to_values("city=New%20York/key=a%3Db%2Fc") == ("New York", "a=b/c")
+
+
+def test_max():
+    partitions = snapshot()
+    assert partitions.max("ds") == "2024-01-09"
+    assert partitions.max("hour", {"ds": "2024-01-02"}) == "12"
+    assert partitions.max("ds", {"hour": "12"}) == "2024-01-05"
+    assert partitions.max("ds", {"hour": 12}) == "2024-01-05"
+    assert partitions.max("ds", {"hour": "99"}) is None
+    assert snapshot([]).max("ds") is None
+    with pytest.raises(AirflowException, match="not in part_specs"):
+        partitions.max("minute")
+    with pytest.raises(AirflowException, match="not subset"):
+        partitions.max("ds", {"minute": "00"})
+
+
+@pytest.mark.parametrize("ds,before,closest", [
+    ("2024-01-02", True, "2024-01-02"),
+    ("2024-01-04", True, "2024-01-02"),
+    ("2024-01-04", False, "2024-01-05"),
+    ("2024-01-04", None, "2024-01-05"),
+    ("2024-01-07", None, "2024-01-05"),  # a tie goes to the earlier date
+    ("2023-12-31", True, None),
+    ("2023-12-31", None, "2024-01-01"),
+    ("2024-02-01", False, None),
+    ("2024-02-01", None, "2024-01-09"),
+])
+def test_closest_ds(ds, before, closest):
+    assert snapshot().closest_ds("ds", ds, before) == closest
+
+
+def test_closest_ds_skips_non_dates():
+    partitions = snapshot(["ds=2024-01-01", "ds=latest", "ds=2024-01-03"], ["ds"])
+    assert partitions.closest_ds("ds", "2024-01-10") == "2024-01-03"
+    assert snapshot([], ["ds"]).closest_ds("ds", "2024-01-10") is None
+
+
+def test_exists():
+    partitions = snapshot()
+    assert partitions.exists({"ds": "2024-01-05", "hour": "12"})
+    assert partitions.exists({"ds": "2024-01-09", "hour": 3}) is False
+    assert partitions.exists({"ds": "2024-01-09", "hour": "03"})
+    assert partitions.exists({"hour": "03"})
+    assert not partitions.exists({"ds": "2024-01-03"})
+    assert not partitions.exists({"minute": "00"})
+
+
+def test_updated_parses_only_new_names(monkeypatch):
+    partitions = snapshot()
+    assert partitions.max("ds") == "2024-01-09"
+    same = partitions.updated(KEYS, list(reversed(NAMES)), 2.0)
+    # an unchanged listing keeps the lookup structures
+    assert same._sorted is partitions._sorted and same.refreshed_at == 2.0
+
+    parsed = []
+    monkeypatch.setattr(partition_index_module, "partition_name_to_values",
+                        lambda name: parsed.append(name) or partition_name_to_values(name))
+    new = partitions.updated(KEYS, NAMES[1:] + ["ds=2024-01-10/hour=00"], 3.0)
+    assert parsed == ["ds=2024-01-10/hour=00"]
+    assert new.max("ds") == "2024-01-10"
+    assert "ds=2024-01-01/hour=00" not in new.specs
+    # other partition keys: everything is parsed again
+    assert partitions.updated(["day", "h"], NAMES, 4.0).max("day") == "2024-01-09"
+
+
+def test_index_ttl(clock):
+    client = Client()
+    index = HivePartitionIndex(ttl=60)
+    assert len(index.get(client, "conn", "db", "t")) == len(NAMES)
+    assert index.get(client, "conn", "DB", "T").max("ds") == "2024-01-09"
+    assert client.listings == 1
+    client.names.append("ds=2024-02-01/hour=00")
+    clock.now += 60
+    assert index.get(client, "conn", "db", "t").max("ds") == "2024-02-01"
+    assert client.listings == 2
+    index.get(client, "conn", "db", "t", refresh=True)
+    index.invalidate("conn", "db", "t")
+    index.get(client, "conn", "db", "t")
+    assert client.listings == 4
+    # connections do not share tables
+    index.get(client, "other_conn", "db", "t")
+    assert client.listings == 5
+
+
+def test_index_without_ttl_lists_every_time(clock):
+    client = Client()
+    index = HivePartitionIndex()
+    index.get(client, "conn", "db", "t")
+    index.get(client, "conn", "db", "t")
+    assert client.listings == 2
+
+
+def test_unpartitioned_table(clock):
+    client = Client(names=[], keys=[])
+    partitions = HivePartitionIndex().get(client, "conn", "db", "t")
+    assert partitions.keys == [] and len(partitions) == 0
+    assert client.listings == 0
+
+
+def stored_names(path):
+    with closing(sqlite3.connect(path)) as conn:
+        return sorted(name for (name,) in conn.execute("SELECT name FROM partition_names"))
+
+
+def test_store_shares_listing_between_processes(tmp_path, clock):
+    path = str(tmp_path / "partitions.db")
+    client = Client()
+    HivePartitionIndex(ttl=60, path=path).get(client, "conn", "db", "t")
+    assert stored_names(path) == sorted(NAMES)
+
+    # a new process reads a listing younger than the TTL from the file
+    clock.now += 30
+    other = HivePartitionIndex(ttl=60, path=path)
+    assert other.get(client, "conn", "db", "t").max("ds") == "2024-01-09"
+    assert client.listings == 1
+
+    # an older listing is not used
+    clock.now += 30
+    assert len(HivePartitionIndex(ttl=60, path=path).get(client, "conn", "db", "t")) == len(NAMES)
+    assert client.listings == 2
+
+
+def test_store_writes_only_difference(tmp_path, clock, monkeypatch):
+    path = str(tmp_path / "partitions.db")
+    client = Client()
+    index = HivePartitionIndex(ttl=60, path=path)
+    index.get(client, "conn", "db", "t")
+
+    statements = []
+    connect = HivePartitionIndex._connect
+
+    def traced(self):
+        conn = connect(self)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(HivePartitionIndex, "_connect", traced)
+    client.names = NAMES[2:] + ["ds=2024-02-01/hour=00"]
+    clock.now += 1
+    index.get(client, "conn", "db", "t", refresh=True)
+    assert stored_names(path) == sorted(client.names)
+    inserted = [s for s in statements if s.startswith("INSERT OR IGNORE INTO partition_names")]
+    deleted = [s for s in statements if s.startswith("DELETE FROM partition_names")]
+    assert len(inserted) == 1 and len(deleted) == 2
+
+    # another process has refreshed the file meanwhile: the whole listing is written
+    statements.clear()
+    index._tables[("conn", "db", "t")].refreshed_at -= 0.5
+    clock.now += 1
+    index.get(client, "conn", "db", "t", refresh=True)
+    assert len([s for s in statements if s.startswith("INSERT OR IGNORE INTO partition_names")]) == \
+        len(client.names)
+    assert stored_names(path) == sorted(client.names)
+
+
+def test_unreadable_store_falls_back_to_metastore(tmp_path, clock):
+    path = tmp_path / "partitions.db"
+    path.write_bytes(b"not a sqlite file" * 100)
+    client = Client()
+    index = HivePartitionIndex(ttl=60, path=str(path))
+    assert index.get(client, "conn", "db", "t").max("ds") == "2024-01-09"
+    assert client.listings == 1
+
+
+@pytest.fixture
+def hook(monkeypatch, clock):
+    client = Client()
+    monkeypatch.setattr(
+        HiveMetastoreHookSE,
+        "get_connection",
+        classmethod(lambda cls, conn_id: Connection(conn_id=conn_id, conn_type="hive_metastore_se", host="h1")),
+    )
+    monkeypatch.setattr(HiveMetastoreHookSE, "_get_pooled_client", lambda self: client)
+    monkeypatch.setattr(hive_hooks, "partition_index", HivePartitionIndex(ttl=60))
+    hook = HiveMetastoreHookSE()
+    hook.client = client
+    return hook
+
+
+def test_hook_max_partition(hook):
+    assert hook.max_partition("db", "t", field="ds") == "2024-01-09"
+    assert hook.max_partition("db", "t", field="hour", filter_map={"ds": "2024-01-05"}) == "12"
+    with pytest.raises(AirflowException, match="specify the field"):
+        hook.max_partition("db", "t")
+    with pytest.raises(AirflowException, match="not a partition key"):
+        hook.max_partition("db", "t", field="minute")
+    with pytest.raises(AirflowException, match="filter_map"):
+        hook.max_partition("db", "t", field="ds", filter_map={"minute": "00"})
+    assert hook.client.listings == 1
+
+
+def test_hook_check_for_partition_spec_relists(hook):
+    assert hook.check_for_partition_spec("db", "t", {"ds": "2024-01-01"})
+    hook.client.names.append("ds=2024-03-01/hour=00")
+    assert hook.check_for_partition_spec("db", "t", {"ds": "2024-03-01"})
+    assert not hook.check_for_partition_spec("db", "t", {"ds": "2024-04-01"})
+    assert hook.client.listings == 3
+
+
+def test_macros(hook):
+    assert hive_macros.max_partition("db.t", field="ds") == "2024-01-09"
+    assert hive_macros.closest_ds_partition("db.t", "2024-01-04", before=False) == "2024-01-05"
+    assert hive_macros.closest_ds_partition("db.t", "2024-01-04") == "2024-01-02"
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+
+import os
+import sqlite3
+import tempfile
+import threading
+
+import pytest
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_se_tests_"))
+# airflow_se.db (used by the provider) creates a pooled engine on import, the tests never connect to it
+os.environ.setdefault("AIRFLOW__DATABASE__SQL_ALCHEMY_CONN", "postgresql://airflow@localhost/airflow")
+
+from airflow.providers.se.hive.operators.stats_engine import (  # noqa: E402
+    ApproxDistinctMetrics,
+    HistogramMetrics,
+    HiveStatsEngine,
+    HiveStatsStore,
+    MinMaxMetrics,
+    NullRatioMetrics,
+    PartitionStats,
+    base_type,
+)
+
+COLUMNS = {f"c{i}": ("bigint" if i % 3 else "string") for i in range(30)}
+METRIC_SETS = [NullRatioMetrics(), ApproxDistinctMetrics("COUNT(DISTINCT {col})"), MinMaxMetrics(),
+               HistogramMetrics({f"c{i}": [0, 50] for i in range(30)})]
+
+
+def make_exprs() -> dict:
+    exprs = {("", "count"): "COUNT(*)"}
+    for col, col_type in COLUMNS.items():
+        for metric_set in METRIC_SETS:
+            exprs.update(metric_set.exprs(col, col_type))
+    return exprs
+
+
+class SqliteQueries:
+    """Query engine: SQLite table `events` with the columns COLUMNS and a partition column ds."""
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.sql = []
+        cols = ", ".join(f"{c} {'INTEGER' if t == 'bigint' else 'TEXT'}" for c, t in COLUMNS.items())
+        self.conn.execute(f"CREATE TABLE events (ds TEXT, {cols})")
+        rows = []
+        for ds in ("2024-01-01", "2024-01-02", "2024-01-03"):
+            for n in range(100):
+                rows.append((ds,) + tuple(
+                    None if (n + i) % 7 == 0 else (n * i if t == "bigint" else f"v{n % (i + 1)}")
+                    for i, t in enumerate(COLUMNS.values())
+                ))
+        self.conn.executemany(f"INSERT INTO events VALUES ({', '.join('?' * (len(COLUMNS) + 1))})", rows)
+        self.conn.commit()
+
+    def __call__(self, sql: str):
+        with self.lock:
+            self.sql.append(sql)
+            return self.conn.execute(sql).fetchone()
+
+
+class SqliteHook:
+    """DB-API hook of the stats store."""
+
+    placeholder = "?"
+    supports_autocommit = False
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def get_conn(self):
+        return sqlite3.connect(self.path)
+
+
+@pytest.fixture
+def queries(tmp_path):
+    return SqliteQueries(str(tmp_path / "events.db"))
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = str(tmp_path / "stats.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE hive_stats (ds TEXT, dttm TEXT, table_name TEXT, partition_repr TEXT, "
+            "col TEXT, metric TEXT, value DOUBLE NOT NULL)"
+        )
+    return HiveStatsStore(SqliteHook(path))
+
+
+def stored(store: HiveStatsStore) -> list:
+    with sqlite3.connect(store.hook.path) as conn:
+        return conn.execute("SELECT partition_repr, col, metric, value FROM hive_stats ORDER BY 1, 2, 3").fetchall()
+
+
+def test_base_type():
+    assert base_type("decimal(10,2)") == "decimal"
+    assert base_type("ARRAY<string>") == "array"
+
+
+def test_min_max_of_numeric_columns_only():
+    assert MinMaxMetrics().exprs("c", "decimal(10,2)") == {("c", "min"): "MIN(c)", ("c", "max"): "MAX(c)"}
+    for col_type in ("string", "varchar(10)", "char(1)", "date", "timestamp", "boolean"):
+        assert MinMaxMetrics().exprs("c", col_type) == {}
+
+
+def test_histogram_metrics():
+    with pytest.raises(ValueError):
+        HistogramMetrics({"c": [10, 0]})
+    exprs = HistogramMetrics({"c": [0, 10]}).exprs("c", "int")
+    assert list(exprs) == [("c", "hist_lt_0"), ("c", "hist_0_10"), ("c", "hist_ge_10")]
+    assert HistogramMetrics({"c": [0, 10]}).exprs("c", "string") == {}
+
+
+def test_group_metrics():
+    engine = HiveStatsEngine(lambda sql: None, max_exprs_per_query=5)
+    exprs = {(col, m): "1" for col, count in (("a", 2), ("b", 2), ("c", 7)) for m in map(str, range(count))}
+    groups = engine.group_metrics(exprs)
+    assert [len(g) for g in groups] == [4, 5, 2]
+    # a column is split only when it alone exceeds the limit
+    assert {k[0] for k in groups[0]} == {"a", "b"}
+    with pytest.raises(ValueError):
+        HiveStatsEngine(lambda sql: None, max_exprs_per_query=0)
+
+
+def test_grouped_queries_give_the_single_query_values(queries):
+    exprs = make_exprs()
+    partitions = [{"ds": "2024-01-01"}, {"ds": "2024-01-03"}]
+    single = HiveStatsEngine(queries, max_exprs_per_query=len(exprs)).collect("events", partitions, exprs)
+    assert len(queries.sql) == 2
+    queries.sql.clear()
+    engine = HiveStatsEngine(queries, max_exprs_per_query=10, parallelism=4)
+    grouped = engine.collect("events", partitions, exprs)
+    assert len(queries.sql) == 2 * len(engine.group_metrics(exprs))
+    assert all(len(sql.split(" AS m")) <= 11 for sql in queries.sql)
+    assert [s.values for s in grouped] == [s.values for s in single]
+    assert list(grouped[0].values) == list(exprs)
+    assert grouped[0].values[("", "count")] == 100
+    assert grouped[0].values[("c1", "null_ratio")] == pytest.approx(14 / 100)
+
+
+def test_failed_query_fails_the_collection(queries):
+    exprs = make_exprs()
+    exprs[("c1", "broken")] = "NO_SUCH_FUNCTION(c1)"
+    with pytest.raises(sqlite3.OperationalError):
+        HiveStatsEngine(queries, max_exprs_per_query=10).collect("events", [{"ds": "2024-01-01"}], exprs)
+
+
+def test_store_replaces_stats_in_one_transaction(store):
+    partition = {"ds": "2024-01-01"}
+    first = PartitionStats(partition, {("", "count"): 100, ("c1", "null_ratio"): 0.14})
+    assert store.replace("2024-01-01", "2024-01-01T00:00:00", "db.events", [first]) == 2
+    second = PartitionStats(partition, {("", "count"): 120})
+    store.replace("2024-01-01", "2024-01-01T00:00:00", "db.events", [second])
+    assert stored(store) == [('{"ds": "2024-01-01"}', "", "count", 120.0)]
+    # a failed insert keeps the previous stats
+    broken = PartitionStats(partition, {("", "count"): 130, ("c1", "max"): None})
+    with pytest.raises(sqlite3.IntegrityError):
+        store.replace("2024-01-01", "2024-01-01T00:00:00", "db.events", [broken])
+    assert stored(store) == [('{"ds": "2024-01-01"}', "", "count", 120.0)]
+
+
+def test_collected_stats_are_numeric(queries, store):
+    partitions = [{"ds": "2024-01-02"}]
+    stats = HiveStatsEngine(queries, max_exprs_per_query=20).collect("events", partitions, make_exprs())
+    store.replace("2024-01-02", "2024-01-02T00:00:00", "db.events", stats)
+    assert all(isinstance(value, float) for _, _, _, value in stored(store))
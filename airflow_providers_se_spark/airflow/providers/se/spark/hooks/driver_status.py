@@ -0,0 +1,295 @@
+"""Shared status tracking of Spark standalone cluster drivers."""
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.request
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from airflow.configuration import AIRFLOW_HOME, conf
+from airflow.exceptions import AirflowException
+from airflow.utils.log.logging_mixin import LoggingMixin
+
+DRIVER_TERMINAL_STATES = ("FINISHED", "UNKNOWN", "KILLED", "FAILED", "ERROR")
+
+# polls the status of one driver, returns the status or None if the status could not be obtained
+StatusFallback = Callable[[], Optional[str]]
+
+
+def master_status_urls(master: str, ui_port: int = 8080) -> list[str]:
+    """
+    JSON status URLs of the master web UI for a standalone master URL.
+
+    ``spark://host1:7077,host2:7077`` (masters with standby) gives one URL per host.
+    """
+    hosts = master.split("://", 1)[-1].split(",")
+    return [f"http://{host.rsplit(':', 1)[0]}:{ui_port}/json/" for host in hosts if host]
+
+
+class MasterStatusSnapshot(LoggingMixin):
+    """
+    States of all drivers known to a standalone master, from one request to the master web UI.
+
+    The response is kept in a file shared by the processes of the user on the host, so a master
+    is asked at most once per ``max_age`` by all tasks running on a worker. The file is only
+    trusted when it belongs to the current user; when the cache directory is not usable
+    the master is asked directly.
+
+    :param cache_dir: directory of the shared file, by default ``$AIRFLOW_HOME/se_spark_status``
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        cache_dir: str | None = None,
+        timeout: float = 10.0,
+        opener: Callable[..., Any] = urllib.request.urlopen,
+    ) -> None:
+        super().__init__()
+        self.urls = urls
+        self.timeout = timeout
+        self.opener = opener
+        self.cache_dir = cache_dir or os.path.join(AIRFLOW_HOME, "se_spark_status")
+        name = hashlib.sha1("\n".join(urls).encode("utf-8")).hexdigest()[:16]
+        self.path = os.path.join(self.cache_dir, f"master_{name}.json")
+        self.lock_path = f"{self.path}.lock"
+
+    def _read(self, max_age: float) -> dict[str, str] | None:
+        try:
+            stat = os.stat(self.path)
+            # driver states written by another user are not trusted
+            if stat.st_uid != os.getuid() or time.time() - stat.st_mtime > max_age:
+                return None
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, states: dict[str, str]) -> None:
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(states, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def fetch(self) -> dict[str, str] | None:
+        """Ask the masters (the alive one answers), None if none of them answered."""
+        for url in self.urls:
+            try:
+                with self.opener(url, timeout=self.timeout) as response:
+                    data = json.loads(response.read().decode("utf-8"))
+            except Exception as e:
+                self.log.debug("Spark master status %s is not available: %s", url, e)
+                continue
+            if data.get("status", "ALIVE") != "ALIVE":
+                continue
+            states = {}
+            for driver in (data.get("completeddrivers") or []) + (data.get("activedrivers") or []):
+                states[driver["id"]] = driver["state"]
+            return states
+        return None
+
+    def get(self, max_age: float) -> dict[str, str] | None:
+        """Driver states not older than ``max_age`` seconds, None if the masters are not available."""
+        states = self._read(max_age)
+        if states is not None:
+            return states
+        try:
+            os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+            with open(self.lock_path, "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    # another process could refresh the file while we were waiting for the lock
+                    states = self._read(max_age)
+                    if states is None:
+                        states = self.fetch()
+                        if states is not None:
+                            self._write(states)
+                    return states
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        except OSError as e:
+            # not writable directory, full disk...: the answer is not shared, but the drivers are polled
+            self.log.warning("Spark driver status cache %s is not usable: %s", self.path, e)
+            return states if states is not None else self.fetch()
+
+
+@dataclass
+class TrackedDriver:
+    """A driver tracked by DriverStatusTracker."""
+
+    driver_id: str
+    fallback: StatusFallback
+    poll_interval: float
+    interval: float
+    next_poll: float
+    state: str = "SUBMITTED"
+    missed: int = 0
+    error: str | None = None
+    done: threading.Event = field(default_factory=threading.Event)
+
+    def wait(self, timeout: float | None = None) -> str:
+        """Block until the driver reaches a terminal state, return it; raise if the status is lost."""
+        if not self.done.wait(timeout):
+            raise AirflowException(f"Timed out waiting for the status of the driver {self.driver_id}")
+        if self.error:
+            raise AirflowException(self.error)
+        return self.state
+
+
+class DriverStatusTracker(LoggingMixin):
+    """
+    Track the status of all drivers of a standalone master with one background thread.
+
+    Once per interval the master is asked for the states of all its drivers (MasterStatusSnapshot),
+    the per-driver ``fallback`` (``spark-submit --status``) is used only for drivers missing from
+    the answer or when the master web UI is not available.
+    The poll interval of a driver grows by ``backoff`` while its state doesn't change,
+    up to ``max_interval``, and drops back when the state changes.
+    """
+
+    def __init__(
+        self,
+        snapshot: MasterStatusSnapshot,
+        max_interval: float = 30.0,
+        backoff: float = 1.5,
+        max_missed: int = 10,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        super().__init__()
+        self.snapshot = snapshot
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_missed = max_missed
+        self.clock = clock
+        self._cond = threading.Condition(threading.Lock())
+        self._drivers: dict[str, TrackedDriver] = {}
+        self._thread: threading.Thread | None = None
+
+    def track(self, driver_id: str, fallback: StatusFallback, poll_interval: float = 1.0) -> TrackedDriver:
+        """Start tracking a driver; the first poll is in ``poll_interval`` seconds."""
+        poll_interval = max(poll_interval, 0.1)
+        driver = TrackedDriver(
+            driver_id=driver_id,
+            fallback=fallback,
+            poll_interval=poll_interval,
+            interval=poll_interval,
+            next_poll=self.clock() + poll_interval,
+        )
+        with self._cond:
+            self._drivers[driver_id] = driver
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="se_spark_driver_status", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        return driver
+
+    def untrack(self, driver_id: str) -> None:
+        with self._cond:
+            driver = self._drivers.pop(driver_id, None)
+        if driver is not None and not driver.done.is_set():
+            driver.error = f"Tracking of the driver {driver_id} was cancelled"
+            driver.done.set()
+
+    def tracked(self) -> int:
+        with self._cond:
+            return len(self._drivers)
+
+    def _update(self, driver: TrackedDriver, state: str | None, now: float) -> None:
+        if state is None:
+            driver.missed += 1
+            if driver.missed > self.max_missed:
+                driver.error = f"Failed to poll for the driver status {self.max_missed} times"
+        else:
+            driver.missed = 0
+            if state != driver.state:
+                self.log.info("Spark driver %s status: %s", driver.driver_id, state)
+                driver.state = state
+                driver.interval = driver.poll_interval
+            else:
+                driver.interval = min(driver.interval * self.backoff, self.max_interval)
+        driver.next_poll = now + driver.interval
+        if driver.error or driver.state in DRIVER_TERMINAL_STATES:
+            with self._cond:
+                self._drivers.pop(driver.driver_id, None)
+            driver.done.set()
+
+    def poll(self) -> float | None:
+        """Poll the drivers which are due, return the seconds until the next poll (None - nothing to track)."""
+        now = self.clock()
+        with self._cond:
+            due = [d for d in self._drivers.values() if d.next_poll <= now]
+        if due:
+            try:
+                states = self.snapshot.get(max_age=min(d.poll_interval for d in due))
+            except Exception as e:
+                # the per-driver fallback and max_missed still apply
+                self.log.warning("Spark master status is not available: %s", e)
+                states = None
+            for driver in due:
+                state = (states or {}).get(driver.driver_id)
+                if state is None:
+                    try:
+                        state = driver.fallback()
+                    except Exception as e:
+                        self.log.warning("Failed to poll the status of the driver %s: %s", driver.driver_id, e)
+                self._update(driver, state, self.clock())
+        with self._cond:
+            if not self._drivers:
+                return None
+            return max(min(d.next_poll for d in self._drivers.values()) - self.clock(), 0.0)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                wait = self.poll()
+            except Exception as e:
+                self.log.exception("Spark driver status poll failed: %s", e)
+                wait = 1.0
+            with self._cond:
+                if not self._drivers:
+                    self._thread = None
+                    return
+                if wait:
+                    self._cond.wait(wait)
+
+
+_trackers: dict[tuple[str, ...], DriverStatusTracker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_driver_status_tracker(master: str, status_url: str | None = None) -> DriverStatusTracker:
+    """
+    Process-wide tracker of a standalone master.
+
+    :param master: master URL of the connection (``spark://host:port[,host:port]``)
+    :param status_url: JSON status URL(s) of the master web UI, comma separated,
+        by default ``http://<master host>:<[spark] master_ui_port>/json/``
+    """
+    if status_url:
+        urls = [url.strip() for url in status_url.split(",") if url.strip()]
+    else:
+        urls = master_status_urls(master, conf.getint("spark", "master_ui_port", fallback=8080))
+    key = tuple(urls)
+    with _trackers_lock:
+        tracker = _trackers.get(key)
+        if tracker is None:
+            snapshot = MasterStatusSnapshot(
+                urls,
+                cache_dir=conf.get("spark", "driver_status_cache_dir", fallback=None),
+                timeout=conf.getfloat("spark", "driver_status_timeout", fallback=10.0),
+            )
+            tracker = _trackers[key] = DriverStatusTracker(
+                snapshot,
+                max_interval=conf.getfloat("spark", "driver_status_max_interval", fallback=30.0),
+            )
+        return tracker
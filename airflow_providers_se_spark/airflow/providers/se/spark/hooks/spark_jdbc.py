@@ -206,10 +206,14 @@ class SparkJDBCHookSE(SparkSubmitHookSE):
             arguments += ["-createTableColumnTypes", self._create_table_column_types]
         return arguments
 
-    def submit_jdbc_job(self) -> None:
-        """Submit Spark JDBC job."""
+    def submit_jdbc_job(self, **kwargs: Any) -> None:
+        """
+        Submit Spark JDBC job.
+
+        :param kwargs: extra arguments to Popen (see subprocess.Popen)
+        """
         self._application_args = self._build_jdbc_application_arguments(self._jdbc_connection)
-        self.submit(application=f"{os.path.dirname(os.path.abspath(__file__))}/spark_jdbc_script.py")
+        self.submit(application=f"{os.path.dirname(os.path.abspath(__file__))}/spark_jdbc_script.py", **kwargs)
 
     def get_conn(self) -> Any:
         pass
\ No newline at end of file
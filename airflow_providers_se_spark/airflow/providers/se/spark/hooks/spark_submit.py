@@ -4,7 +4,6 @@ import contextlib
 import os
 import re
 import subprocess
-import time
 from typing import Any, Iterator
 
 from airflow.configuration import conf as airflow_conf
@@ -13,6 +12,8 @@ from airflow.hooks.base import BaseHook
 from airflow.security.kerberos import renew_from_kt
 from airflow.utils.log.logging_mixin import LoggingMixin
 
+from airflow.providers.se.spark.hooks.driver_status import get_driver_status_tracker
+
 with contextlib.suppress(ImportError, NameError):
     from airflow.providers.cncf.kubernetes import kube_client
 
@@ -54,7 +55,8 @@ class SparkSubmitHookSE(BaseHook, LoggingMixin):
     :param name: Name of the job (default airflow-spark)
     :param num_executors: Number of executors to launch
     :param status_poll_interval: Seconds to wait between polls of driver status in cluster
-        mode (Default: 1)
+        mode (Default: 1); grows up to ``[spark] driver_status_max_interval`` while the status
+        doesn't change
     :param application_args: Arguments for the application being submitted
     :param env_vars: Environment variables for spark-submit. It
         supports yarn and k8s mode too.
@@ -130,6 +132,7 @@ class SparkSubmitHookSE(BaseHook, LoggingMixin):
         self._env_vars = env_vars
         self._verbose = verbose
         self._submit_sp: Any | None = None
+        self._submit_env: dict[str, str] | None = None
         self._yarn_application_id: str | None = None
         self._kubernetes_driver_pod: str | None = None
         self.spark_binary = spark_binary
@@ -165,6 +168,7 @@ class SparkSubmitHookSE(BaseHook, LoggingMixin):
             "deploy_mode": None,
             "spark_binary": self.spark_binary or "spark-submit",
             "namespace": None,
+            "status_url": None,
         }
 
         try:
@@ -197,6 +201,7 @@ class SparkSubmitHookSE(BaseHook, LoggingMixin):
                 )
             conn_data["spark_binary"] = self.spark_binary
             conn_data["namespace"] = extra.get("namespace")
+            conn_data["status_url"] = extra.get("status-url")
         except AirflowException:
             self.log.info(
                 "Could not load connection string %s, defaulting to %s", self._conn_id, conn_data["master"]
@@ -376,8 +381,10 @@ class SparkSubmitHookSE(BaseHook, LoggingMixin):
         """
         spark_submit_cmd = self._build_spark_submit_command(application)
 
+        # the environment of the task (e.g. KRB5CCNAME), also used by status polls and kill commands
+        self._submit_env = kwargs.get("env")
         if self._env:
-            env = os.environ.copy()
+            env = dict(self._submit_env or os.environ)
             env.update(self._env)
             kwargs["env"] = env
 
@@ -528,41 +535,42 @@ class SparkSubmitHookSE(BaseHook, LoggingMixin):
             Unable to run or restart due to an unrecoverable error
             (e.g. missing jar file)
         """
+        # The drivers of all tasks of the process are polled by one tracker: the master web UI
+        # is asked once per interval for all of them, `spark-submit --status` is the fallback.
         # When your Spark Standalone cluster is not performing well
         # due to misconfiguration or heavy loads.
         # it is possible that the polling request will timeout.
-        # Therefore we use a simple retry mechanism.
-        missed_job_status_reports = 0
-        max_missed_job_status_reports = 10
-
-        # Keep polling as long as the driver is processing
-        while self._driver_status not in ["FINISHED", "UNKNOWN", "KILLED", "FAILED", "ERROR"]:
+        # The tracker gives up after 10 missed status reports in a row.
+        tracker = get_driver_status_tracker(self._connection["master"], self._connection.get("status_url"))
+        self.log.debug("tracking status of spark driver with id %s", self._driver_id)
+        driver = tracker.track(self._driver_id, self._poll_driver_status, self._status_poll_interval)
+        self._driver_status = driver.wait()
 
-            # Sleep for n seconds as we do not want to spam the cluster
-            time.sleep(self._status_poll_interval)
+    def _poll_driver_status(self) -> str | None:
+        """
+        Poll the driver status once with the status command.
 
-            self.log.debug("polling status of spark driver with id %s", self._driver_id)
+        :return: the driver status, None if the status command failed
+        """
+        self.log.debug("polling status of spark driver with id %s", self._driver_id)
 
-            poll_drive_status_cmd = self._build_track_driver_status_command()
-            status_process: Any = subprocess.Popen(
-                poll_drive_status_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                bufsize=-1,
-                universal_newlines=True,
-            )
+        poll_drive_status_cmd = self._build_track_driver_status_command()
+        status_process: Any = subprocess.Popen(
+            poll_drive_status_cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=-1,
+            universal_newlines=True,
+            env=self._submit_env,
+        )
 
-            self._process_spark_status_log(iter(status_process.stdout))
-            returncode = status_process.wait()
+        self._process_spark_status_log(iter(status_process.stdout))
+        returncode = status_process.wait()
 
-            if returncode:
-                if missed_job_status_reports < max_missed_job_status_reports:
-                    missed_job_status_reports += 1
-                else:
-                    raise AirflowException(
-                        f"Failed to poll for the driver status {max_missed_job_status_reports} times: "
-                        f"returncode = {returncode}"
-                    )
+        if returncode:
+            self.log.warning("Failed to poll for the driver status: returncode = %s", returncode)
+            return None
+        return self._driver_status
 
     def _build_spark_driver_kill_command(self) -> list[str]:
         """
@@ -589,10 +597,15 @@ class SparkSubmitHookSE(BaseHook, LoggingMixin):
         self.log.debug("Kill Command is being called")
 
         if self._should_track_driver_status and self._driver_id:
+            get_driver_status_tracker(self._connection["master"], self._connection.get("status_url")).untrack(
+                self._driver_id
+            )
             self.log.info("Killing driver %s on cluster", self._driver_id)
 
             kill_cmd = self._build_spark_driver_kill_command()
-            with subprocess.Popen(kill_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as driver_kill:
+            with subprocess.Popen(
+                kill_cmd, env=self._submit_env, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            ) as driver_kill:
                 self.log.info(
                     "Spark driver %s killed with return code: %s", self._driver_id, driver_kill.wait()
                 )
@@ -603,13 +616,13 @@ class SparkSubmitHookSE(BaseHook, LoggingMixin):
 
             if self._yarn_application_id:
                 kill_cmd = f"yarn application -kill {self._yarn_application_id}".split()
-                env = {**os.environ, **(self._env or {})}
+                env = {**(self._submit_env or os.environ), **(self._env or {})}
                 if self._keytab is not None and self._principal is not None:
                     # we are ignoring renewal failures from renew_from_kt
                     # here as the failure could just be due to a non-renewable ticket,
                     # we still attempt to kill the yarn application
                     renew_from_kt(self._principal, self._keytab, exit_on_fail=False)
-                    env = os.environ.copy()
+                    env = dict(self._submit_env or os.environ)
                     ccacche = airflow_conf.get_mandatory_value("kerberos", "ccache")
                     env["KRB5CCNAME"] = ccacche
 
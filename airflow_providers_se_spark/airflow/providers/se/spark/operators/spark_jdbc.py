@@ -158,7 +158,7 @@ class SparkJDBCOperatorSE(SparkSubmitOperatorSE):
             # ===================================
             if self._hook is None:
                 self._hook = self._get_hook()
-            self._hook.submit_jdbc_job()
+            self._hook.submit_jdbc_job(env=dp.env)
             # ===================================
             newln = '\n'
             for k, v in dp.items():
@@ -171,7 +171,6 @@ class SparkJDBCOperatorSE(SparkSubmitOperatorSE):
                     self.log.debug(f'Find match: {match}')
                     TGSList.push_tgs(match)
                 # self.log.debug(f'List TGS\'s in DB: {TGSList.get_tgs_list()}')
-            del dp
         else:
             raise AirflowException("Missing authentication as owner the DAG")
 
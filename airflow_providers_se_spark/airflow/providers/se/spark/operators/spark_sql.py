@@ -91,7 +91,7 @@ class SparkSqlOperatorSE(BaseOperator):
             # ===================================
             if self._hook is None:
                 self._hook = self._get_hook()
-            self._hook.run_query()
+            self._hook.run_query(env=dp.env)
             # ===================================
             newln = '\n'
             for k, v in dp.items():
@@ -104,7 +104,6 @@ class SparkSqlOperatorSE(BaseOperator):
                     self.log.debug(f'Find match: {match}')
                     TGSList.push_tgs(match)
                 # self.log.debug(f'List TGS\'s in DB: {TGSList.get_tgs_list()}')
-            del dp
         else:
             raise AirflowException("Missing authentication as owner the DAG")
 
@@ -150,7 +150,7 @@ class SparkSubmitOperatorSE(BaseOperator):
             # ===================================
             if self._hook is None:
                 self._hook = self._get_hook()
-            self._hook.submit(self._application)
+            self._hook.submit(self._application, env=dp.env)
             # ===================================
             newln = '\n'
             for k, v in dp.items():
@@ -163,7 +163,6 @@ class SparkSubmitOperatorSE(BaseOperator):
                     self.log.debug(f'Find match: {match}')
                     TGSList.push_tgs(match)
                 # self.log.debug(f'List TGS\'s in DB: {TGSList.get_tgs_list()}')
-            del dp
         else:
             raise AirflowException("Missing authentication as owner the DAG")
 
@@ -2,9 +2,12 @@
 """
 
 """
-from .krb_auth import krb_auth
+from .krb_auth import krb_auth, KrbCredential, TicketCache, get_ticket_cache
 
 __all__ = [
     "krb_auth",
+    "KrbCredential",
+    "TicketCache",
+    "get_ticket_cache",
 ]
 
@@ -1,16 +1,24 @@
-
 """
-
+Аутентификация задач Spark: тикет пользователя, запустившего DAG, из SecMan.
+Файлы тикетов кэшируются на воркере (по файлу на пользователя) и переиспользуются, пока тикет действителен,
+окружение с KRB5CCNAME возвращается задаче, а не записывается в os.environ.
 """
 from __future__ import annotations
 
-from os import environ, chmod
-from typing import TYPE_CHECKING, Mapping, Dict, Optional
+import fcntl
+import os
+import re
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from hashlib import sha1
+from typing import TYPE_CHECKING, Mapping, Dict, Optional, Callable, Tuple
 
 from airflow import DAG
 
 from airflow_se.crypt import decrypt
-from airflow_se.utils import DataPaths
+from airflow_se.utils import get_ticket_expiry
 from airflow_se.config import get_config_value
 from airflow_se.secman import auth_secman, get_secman_data
 from airflow_se.commons import TICKET_PREFIX, SECMAN_KEY_FOR_TGT
@@ -26,57 +34,212 @@ if TYPE_CHECKING:
 
 __all__ = [
     "krb_auth",
+    "KrbCredential",
+    "TicketCache",
+    "get_ticket_cache",
 ]
 
-def krb_auth(context: Context) -> Optional[DataPaths]:
-    dag, dag_run = context.get("dag"), context.get("dag_run")
-    if not isinstance(dag, DAG) or not isinstance(dag_run, DagRun):
-        raise AirflowException(f'invalid context')
+# тикет переиспользуется, если до окончания его действия больше стольких секунд
+DEF_MIN_LIFETIME = 600
+# сколько хранить пользователя запуска DAG (секунд)
+DEF_RUN_USER_TTL = 7 * 24 * 3600
 
-    dag.log.info(f'DAG run type is "{dag_run.run_type}" ({dag_run.conf=})')
 
+def _fetch_from_secman(key: str) -> Optional[bytes]:
+    """Тикет из SecMan (расшифрованный), None - тикета нет"""
+    sm_tgt: Dict[str, str] = get_secman_data(SECMAN_KEY_FOR_TGT, auth_secman()) or dict()
+    v = sm_tgt.get(key)
+    return decrypt(v) if v else None
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """Файл с правами 0600 пишется рядом и подменяет целевой (читатели видят старый или новый файл целиком)"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+@dataclass
+class KrbCredential:
+    """Тикет пользователя для задачи"""
+    user: str
+    key: str  # ключ тикета в SecMan
+    ticket: str  # путь к файлу кэша Kerberos
+    expires_at: Optional[int]  # окончание действия TGT (unix timestamp), None - не удалось прочитать
+    reused: bool  # файл тикета взят из кэша воркера, без обращения к SecMan
+    env: Dict[str, str] = field(repr=False, default_factory=dict)  # окружение процессов задачи
+
+    def items(self):
+        """Ключ и путь тикета (как у DataPaths)"""
+        return {self.key: self.ticket}.items()
+
+
+class TicketCache:
+    """
+    Кэш файлов тикетов на воркере: по файлу на пользователя в директории `cache_dir` (права 0700).
+    Файл переиспользуется, пока до окончания действия TGT больше `min_lifetime` секунд (срок читается
+    из самого файла, без klist), иначе тикет заново берётся из SecMan. Обновление файла пользователя
+    выполняется под блокировкой файла, так что одновременные задачи на воркере обращаются в SecMan один раз.
+    """
+    def __init__(
+            self,
+            cache_dir: str,
+            min_lifetime: int = DEF_MIN_LIFETIME,
+            fetch: Callable[[str], Optional[bytes]] = _fetch_from_secman,
+            clock: Callable[[], float] = time.time,
+    ):
+        """
+        :cache_dir: директория файлов тикетов
+        :min_lifetime: минимальный оставшийся срок действия тикета для переиспользования (сек)
+        :fetch: получает тикет по ключу SecMan (расшифрованный), подменяется в тестах
+        :clock: часы (unix time), подменяются в тестах
+        """
+        self.cache_dir: str = cache_dir
+        self.min_lifetime: int = min_lifetime
+        self.fetch: Callable[[str], Optional[bytes]] = fetch
+        self.clock: Callable[[], float] = clock
+        self._lock = threading.Lock()  # flock не разделяет потоки одного процесса
+        os.makedirs(os.path.join(cache_dir, "runs"), mode=0o700, exist_ok=True)
+        os.chmod(cache_dir, 0o700)
+
+    @staticmethod
+    def key(user: str) -> str:
+        return f"{TICKET_PREFIX}{user}"
+
+    def path(self, user: str) -> str:
+        return os.path.join(self.cache_dir, re.sub(r"[^\w.@-]", "_", self.key(user)))
+
+    def is_valid(self, expires_at: Optional[int]) -> bool:
+        return expires_at is not None and expires_at - self.clock() > self.min_lifetime
+
+    def get(self, user: str) -> Tuple[str, Optional[int], bool]:
+        """Путь к файлу тикета пользователя, окончание действия TGT и признак переиспользования файла"""
+        path = self.path(user)
+        expires_at = get_ticket_expiry(path)
+        if self.is_valid(expires_at):
+            return path, expires_at, True
+        with self._lock, open(f"{path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # пока ждали блокировку, тикет мог обновить другой процесс
+                expires_at = get_ticket_expiry(path)
+                if self.is_valid(expires_at):
+                    return path, expires_at, True
+                data = self.fetch(self.key(user))
+                if not data:
+                    raise AirflowException(f"Ticket \"{self.key(user)}\" for user \"{user}\" is not found in SecMan")
+                _write_atomic(path, data)
+                return path, get_ticket_expiry(path), False
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def invalidate(self, user: str) -> None:
+        """Удаляет файл тикета пользователя (следующий get возьмёт тикет из SecMan)"""
+        try:
+            os.remove(self.path(user))
+        except FileNotFoundError:
+            pass
+
+    def _run_path(self, dag_id: str, run_id: str) -> str:
+        return os.path.join(self.cache_dir, "runs", sha1(f"{dag_id}\n{run_id}".encode("utf-8")).hexdigest())
+
+    def get_run_user(self, dag_id: str, run_id: str) -> Optional[str]:
+        """Пользователь, запустивший DAG run (запомненный другой задачей этого запуска на воркере)"""
+        try:
+            with open(self._run_path(dag_id, run_id), "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def put_run_user(self, dag_id: str, run_id: str, user: str, ttl: int = DEF_RUN_USER_TTL) -> None:
+        """Запоминает пользователя DAG run, заодно удаляет устаревшие записи"""
+        _write_atomic(self._run_path(dag_id, run_id), user.encode("utf-8"))
+        old = self.clock() - ttl
+        with os.scandir(os.path.join(self.cache_dir, "runs")) as it:
+            for entry in it:
+                try:
+                    if entry.stat().st_mtime < old:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+
+
+_ticket_cache: Optional[TicketCache] = None
+_ticket_cache_lock = threading.Lock()
+
+
+def get_ticket_cache() -> TicketCache:
+    """Кэш тикетов процесса, директория <SECRET_PATH>/ProviderSparkSE/ccache"""
+    global _ticket_cache
+    if _ticket_cache is None:
+        with _ticket_cache_lock:
+            if _ticket_cache is None:
+                base_path = get_config_value("SECRET_PATH") or tempfile.gettempdir()
+                _ticket_cache = TicketCache(
+                    cache_dir=os.path.join(base_path, "ProviderSparkSE", "ccache"),
+                    min_lifetime=int(get_config_value("SPARK_TICKET_MIN_LIFETIME") or DEF_MIN_LIFETIME),
+                )
+    return _ticket_cache
+
+
+def _user_of_run(dag: DAG, dag_run: DagRun, cache: TicketCache) -> str:
     if dag_run.run_type == 'scheduled':
-        user_of_run = dag_run.conf.get('user') or dag.owner
+        return dag_run.conf.get('user') or dag.owner
     elif dag_run.run_type == 'manual':
-        user_of_run = dag_run.conf.get('user')
-        if not user_of_run:
-            with create_session() as sess:
-
-                # log_info = sess.query(
-                #     Log.id, Log.event, Log.owner, Log.dttm, Log.task_id, Log.map_index,
-                #     Log.execution_date, Log.owner_display_name, Log.extra
-                # ).where(Log.dag_id == dag.dag_id).order_by(Log.dttm.desc()).all()
-                # sep = '\n    '
-                # dag.log.info(f'Result of Log info:{sep}{sep.join([str(x) for x in log_info])}')
-
-                log = sess.query(Log).where(
-                    Log.dag_id == dag.dag_id,
-                    Log.event.in_(['trigger', 'dag_run.create', ])
-                ).order_by(Log.dttm.desc()).first()
-                if log:
-                    user_of_run = log.owner
-                else:
-                    raise AirflowException('Records of DAG run not fount in table Log')
+        user_of_run = dag_run.conf.get('user') or cache.get_run_user(dag.dag_id, dag_run.run_id)
+        if user_of_run:
+            return user_of_run
+        with create_session() as sess:
+            log = sess.query(Log).where(
+                Log.dag_id == dag.dag_id,
+                Log.event.in_(['trigger', 'dag_run.create', ])
+            ).order_by(Log.dttm.desc()).first()
+            if not log:
+                raise AirflowException('Records of DAG run not fount in table Log')
+            user_of_run = log.owner
+        cache.put_run_user(dag.dag_id, dag_run.run_id, user_of_run)
+        return user_of_run
     else:
         raise AirflowException(f'Unknown run type "{dag_run.run_type}"')
 
-    k = f"{TICKET_PREFIX}{user_of_run}"
-    sm_tgt = get_secman_data(SECMAN_KEY_FOR_TGT, auth_secman())
-    if sm_tgt is None:
-        sm_tgt: Dict[str, str] = dict()
-    v = sm_tgt.get(k)
-    if v:
-        dp = DataPaths(
-            base_path=get_config_value("SECRET_PATH"),
-            name="ProviderSparkSE",
-        )
-        _k = dp.get(k)
-        with open(_k, "wb") as f:
-            f.write(decrypt(v))
-        chmod(_k, 0o600)
-        environ["KRB5CCNAME"] = _k
-        dag.log.info(f"For authenticate to Spark use ticket from SecMan \"{k}\"")
-        return dp
-    else:
-        raise AirflowException(f"Ticket \"{k}\" for user \"{user_of_run}\" is not found in SecMan")
 
+def krb_auth(context: Context, env: Optional[Mapping[str, str]] = None) -> KrbCredential:
+    """
+    Тикет пользователя, запустившего DAG, и окружение для процессов задачи (KRB5CCNAME указывает на тикет).
+    :env: базовое окружение, по умолчанию копия os.environ (сам os.environ не меняется)
+    """
+    dag, dag_run = context.get("dag"), context.get("dag_run")
+    if not isinstance(dag, DAG) or not isinstance(dag_run, DagRun):
+        raise AirflowException(f'invalid context')
+
+    dag.log.info(f'DAG run type is "{dag_run.run_type}" ({dag_run.conf=})')
+
+    cache = get_ticket_cache()
+    user_of_run = _user_of_run(dag, dag_run, cache)
+    ticket, expires_at, reused = cache.get(user_of_run)
+    task_env = dict(os.environ if env is None else env)
+    task_env["KRB5CCNAME"] = ticket
+    k = cache.key(user_of_run)
+    if reused:
+        dag.log.info(f"For authenticate to Spark use cached ticket \"{k}\" (valid until {time.ctime(expires_at)})")
+    else:
+        dag.log.info(f"For authenticate to Spark use ticket from SecMan \"{k}\"")
+    return KrbCredential(
+        user=user_of_run,
+        key=k,
+        ticket=ticket,
+        expires_at=expires_at,
+        reused=reused,
+        env=task_env,
+    )
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+
+import io
+import json
+import os
+import tempfile
+import threading
+
+import pytest
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_se_tests_"))
+
+from airflow.exceptions import AirflowException  # noqa: E402
+from airflow.providers.se.spark.hooks.driver_status import (  # noqa: E402
+    DriverStatusTracker,
+    MasterStatusSnapshot,
+    TrackedDriver,
+    master_status_urls,
+)
+
+
+class Master:
+    """Master web UI answering /json/ with the given driver states."""
+
+    def __init__(self, states=None, status="ALIVE"):
+        self.states = dict(states or {})
+        self.status = status
+        self.calls = 0
+
+    def __call__(self, url, timeout=None):
+        self.calls += 1
+        if self.states is None:
+            raise OSError("connection refused")
+        drivers = [{"id": k, "state": v} for k, v in self.states.items()]
+        return io.BytesIO(json.dumps({"status": self.status, "activedrivers": drivers}).encode())
+
+
+class Snapshot:
+    """MasterStatusSnapshot answering from a dict, raising ``error`` if set."""
+
+    def __init__(self, states=None):
+        self.states = states
+        self.error = None
+
+    def get(self, max_age):
+        if self.error:
+            raise self.error
+        return self.states
+
+
+def test_master_status_urls():
+    assert master_status_urls("spark://m1:7077,m2:7077", 8081) == ["http://m1:8081/json/", "http://m2:8081/json/"]
+
+
+def test_snapshot_is_shared_through_the_file(tmp_path):
+    master = Master({"driver-1": "RUNNING"})
+    first = MasterStatusSnapshot(["http://m1:8080/json/"], cache_dir=str(tmp_path), opener=master)
+    second = MasterStatusSnapshot(["http://m1:8080/json/"], cache_dir=str(tmp_path), opener=master)
+    assert first.get(max_age=60) == {"driver-1": "RUNNING"}
+    assert second.get(max_age=60) == {"driver-1": "RUNNING"}
+    assert master.calls == 1
+    master.states["driver-1"] = "FINISHED"
+    assert second.get(max_age=0) == {"driver-1": "FINISHED"}
+    assert master.calls == 2
+
+
+def test_snapshot_standby_master_is_skipped(tmp_path):
+    standby, alive = Master({"driver-1": "RUNNING"}, status="STANDBY"), Master({"driver-1": "FINISHED"})
+    snapshot = MasterStatusSnapshot(["http://m1/json/", "http://m2/json/"], cache_dir=str(tmp_path),
+                                    opener=lambda url, timeout: (standby if "m1" in url else alive)(url, timeout))
+    assert snapshot.get(max_age=60) == {"driver-1": "FINISHED"}
+    alive.states = standby.states = None
+    assert MasterStatusSnapshot(["http://m3/json/"], cache_dir=str(tmp_path), opener=alive).get(max_age=60) is None
+
+
+def test_snapshot_without_usable_cache_dir(tmp_path):
+    # the cache directory can't be created: the master is asked directly
+    (tmp_path / "file").write_text("")
+    master = Master({"driver-1": "RUNNING"})
+    snapshot = MasterStatusSnapshot(["http://m1/json/"], cache_dir=str(tmp_path / "file" / "status"), opener=master)
+    assert snapshot.get(max_age=60) == {"driver-1": "RUNNING"}
+    assert snapshot.get(max_age=60) == {"driver-1": "RUNNING"}
+    assert master.calls == 2
+
+
+def test_snapshot_write_failure(tmp_path, monkeypatch):
+    master = Master({"driver-1": "RUNNING"})
+    snapshot = MasterStatusSnapshot(["http://m1/json/"], cache_dir=str(tmp_path), opener=master)
+
+    def replace(src, dst):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(os, "replace", replace)
+    assert snapshot.get(max_age=60) == {"driver-1": "RUNNING"}
+    assert master.calls == 1
+    assert sorted(os.listdir(tmp_path)) == [os.path.basename(snapshot.lock_path)]
+
+
+def test_snapshot_of_another_user_is_not_trusted(tmp_path, monkeypatch):
+    snapshot = MasterStatusSnapshot(["http://m1/json/"], cache_dir=str(tmp_path), opener=Master({"d": "RUNNING"}))
+    with open(snapshot.path, "w") as f:
+        json.dump({"d": "FINISHED"}, f)
+    uid = os.getuid()
+    monkeypatch.setattr(os, "getuid", lambda: uid + 1)
+    assert snapshot.get(max_age=60) == {"d": "RUNNING"}
+
+
+def test_snapshot_default_cache_dir_is_in_airflow_home():
+    from airflow.configuration import AIRFLOW_HOME
+    assert MasterStatusSnapshot(["http://m1/json/"]).path.startswith(os.path.join(AIRFLOW_HOME, ""))
+
+
+def test_tracker_waits_for_terminal_state():
+    snapshot = Snapshot({"driver-1": "RUNNING", "driver-2": "RUNNING"})
+    tracker = DriverStatusTracker(snapshot, max_interval=0.1)
+    fallback_calls = []
+    first = tracker.track("driver-1", fallback=lambda: fallback_calls.append(1), poll_interval=0.1)
+    # a driver missing from the master answer is polled by its fallback
+    third = tracker.track("driver-3", fallback=lambda: "FAILED", poll_interval=0.1)
+    snapshot.states = {"driver-1": "FINISHED"}
+    assert first.wait(timeout=10) == "FINISHED"
+    assert third.wait(timeout=10) == "FAILED"
+    assert fallback_calls == []
+    assert tracker.tracked() == 0
+
+
+def test_tracker_survives_snapshot_errors():
+    snapshot = Snapshot()
+    snapshot.error = PermissionError(13, "Permission denied")
+    tracker = DriverStatusTracker(snapshot, max_interval=0.1, max_missed=2)
+    # the master status is lost, the fallback answers
+    assert tracker.track("driver-1", fallback=lambda: "KILLED", poll_interval=0.1).wait(timeout=10) == "KILLED"
+    # neither answers: the driver fails after max_missed polls instead of waiting forever
+    lost = tracker.track("driver-2", fallback=lambda: None, poll_interval=0.1)
+    with pytest.raises(AirflowException, match="2 times"):
+        lost.wait(timeout=10)
+    assert lost.missed == 3
+
+
+def test_tracker_backoff():
+    now = [0.0]
+    snapshot = Snapshot({"driver-1": "RUNNING"})
+    tracker = DriverStatusTracker(snapshot, max_interval=4.0, backoff=2.0, clock=lambda: now[0])
+    # registered without the background thread, polled by hand
+    driver = tracker._drivers["driver-1"] = TrackedDriver("driver-1", lambda: None, 1.0, 1.0, next_poll=1.0)
+    intervals = []
+    for _ in range(5):
+        now[0] = driver.next_poll
+        tracker.poll()
+        intervals.append(driver.interval)
+    assert intervals == [1.0, 2.0, 4.0, 4.0, 4.0]
+    snapshot.states = {"driver-1": "SUBMITTED"}
+    now[0] = driver.next_poll
+    tracker.poll()
+    assert (driver.state, driver.interval) == ("SUBMITTED", 1.0)
+
+
+def test_tracker_untrack():
+    tracker = DriverStatusTracker(Snapshot({"driver-1": "RUNNING"}), max_interval=0.1)
+    driver = tracker.track("driver-1", fallback=lambda: None, poll_interval=0.1)
+    threading.Timer(0.2, tracker.untrack, ("driver-1",)).start()
+    with pytest.raises(AirflowException, match="cancelled"):
+        driver.wait(timeout=10)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+
+import importlib
+import os
+import stat
+import tempfile
+import threading
+import time
+from datetime import datetime
+from struct import pack
+
+import pytest
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_se_tests_"))
+# airflow_se.db (used by the provider) creates a pooled engine on import, the tests never connect to it
+os.environ.setdefault("AIRFLOW__DATABASE__SQL_ALCHEMY_CONN", "postgresql://airflow@localhost/airflow")
+
+from airflow import DAG  # noqa: E402
+from airflow.exceptions import AirflowException  # noqa: E402
+from airflow.models.dagrun import DagRun  # noqa: E402
+from airflow.operators.empty import EmptyOperator  # noqa: E402
+from airflow.providers.se.spark.utils import TicketCache, krb_auth  # noqa: E402
+
+# the package exports the krb_auth function under the name of its module
+krb_auth_module = importlib.import_module("airflow.providers.se.spark.utils.krb_auth")
+
+REALM = "EXAMPLE.RU"
+NOW = 1_700_000_000
+
+
+def octets(data):
+    return pack(">I", len(data)) + data
+
+
+def principal(*components):
+    return pack(">II", 1, len(components)) + octets(REALM.encode()) + b"".join(octets(c.encode()) for c in components)
+
+
+def ticket(user, end):
+    """MIT FILE: credential cache (version 4) holding one TGT that expires at ``end``."""
+    tags = pack(">HH", 1, 8) + pack(">iI", 0, 0)
+    return (
+        pack(">H", 0x0504) + pack(">H", len(tags)) + tags + principal(user)
+        + principal(user) + principal("krbtgt", REALM)
+        + pack(">H", 18) + octets(b"k" * 32)  # keyblock
+        + pack(">IIII", end - 36000, end - 36000, end, end + 86400)  # authtime, starttime, endtime, renew_till
+        + pack(">B", 0) + pack(">I", 0x40e10000)  # is_skey, ticket flags
+        + pack(">I", 0) + pack(">I", 0)  # addresses, authdata
+        + octets(b"ticket" * 50) + octets(b"")
+    )
+
+
+class Clock:
+    def __init__(self):
+        self.now = float(NOW)
+
+    def __call__(self):
+        return self.now
+
+
+class SecMan:
+    """Ticket map of SecMan: ``fetch`` is called with the SecMan key and returns the decrypted ticket."""
+
+    def __init__(self, lifetime=36000, delay=0.0):
+        self.lifetime = lifetime
+        self.delay = delay
+        self.ends = {}
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def fetch(self, key):
+        with self.lock:
+            self.calls.append(key)
+        if self.delay:
+            time.sleep(self.delay)
+        user = key.rsplit("_", 1)[-1]
+        if user == "nobody":
+            return None
+        end = self.ends.get(user, NOW + self.lifetime)
+        return ticket(user, end)
+
+
+@pytest.fixture
+def secman():
+    return SecMan()
+
+
+@pytest.fixture
+def cache(tmp_path, secman):
+    return TicketCache(str(tmp_path / "ccache"), min_lifetime=600, fetch=secman.fetch, clock=Clock())
+
+
+def test_ticket_file_is_reused_while_valid(cache, secman):
+    path, expires_at, reused = cache.get("alice")
+    assert (expires_at, reused) == (NOW + 36000, False)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(cache.cache_dir).st_mode) == 0o700
+    assert cache.get("alice") == (path, NOW + 36000, True)
+    assert secman.calls == [cache.key("alice")]
+
+
+def test_expiring_ticket_is_fetched_again(cache, secman):
+    secman.ends["alice"] = NOW + 1000
+    path, _, _ = cache.get("alice")
+    cache.clock.now += 399
+    assert cache.get("alice")[2] is True
+    # less than min_lifetime is left
+    cache.clock.now += 1
+    secman.ends["alice"] = NOW + 36000
+    assert cache.get("alice") == (path, NOW + 36000, False)
+    assert len(secman.calls) == 2
+
+
+def test_unreadable_ticket_file_is_replaced(cache, secman):
+    path = cache.path("alice")
+    with open(path, "wb") as f:
+        f.write(b"not a ccache")
+    assert cache.get("alice") == (path, NOW + 36000, False)
+
+
+def test_invalidate(cache, secman):
+    cache.get("alice")
+    cache.invalidate("alice")
+    cache.invalidate("alice")
+    assert cache.get("alice")[2] is False
+    assert len(secman.calls) == 2
+
+
+def test_ticket_missing_in_secman(cache):
+    with pytest.raises(AirflowException, match="is not found in SecMan"):
+        cache.get("nobody")
+    assert not os.path.exists(cache.path("nobody"))
+
+
+def test_users_do_not_share_files(cache):
+    alice, bob = cache.get("alice")[0], cache.get("bob")[0]
+    assert alice != bob
+    assert cache.path("../evil").startswith(cache.cache_dir + os.sep)
+
+
+def test_concurrent_tasks_fetch_once(tmp_path):
+    secman = SecMan(delay=0.2)
+    cache = TicketCache(str(tmp_path / "ccache"), fetch=secman.fetch, clock=Clock())
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("alice"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert secman.calls == [cache.key("alice")]
+    assert len({path for path, _, _ in results}) == 1
+    assert sorted(reused for _, _, reused in results) == [False] + [True] * 7
+
+
+def test_run_user(cache):
+    assert cache.get_run_user("dag", "manual__1") is None
+    cache.put_run_user("dag", "manual__1", "alice")
+    assert cache.get_run_user("dag", "manual__1") == "alice"
+    # records older than the TTL are removed on the next write
+    old = cache._run_path("dag", "manual__1")
+    os.utime(old, (NOW - 10, NOW - 10))
+    cache.put_run_user("dag", "manual__2", "bob", ttl=5)
+    assert cache.get_run_user("dag", "manual__1") is None
+    assert cache.get_run_user("dag", "manual__2") == "bob"
+
+
+@pytest.fixture
+def context(cache, monkeypatch):
+    monkeypatch.setattr(krb_auth_module, "get_ticket_cache", lambda: cache)
+
+    def context(run_type, conf=None, run_id="run_1"):
+        dag = DAG("spark_dag", start_date=datetime(2024, 1, 1), default_args={"owner": "owner"})
+        # DAG.owner is made of the task owners
+        EmptyOperator(task_id="spark_task", dag=dag)
+        dag_run = DagRun(dag_id=dag.dag_id, run_id=run_id, run_type=run_type, conf=conf or {})
+        return {"dag": dag, "dag_run": dag_run}
+    return context
+
+
+def test_krb_auth_returns_scoped_env(context, cache, monkeypatch):
+    monkeypatch.setenv("KRB5CCNAME", "/tmp/global_ticket")
+    cred = krb_auth(context("scheduled", {"user": "alice"}))
+    assert (cred.user, cred.key, cred.reused) == ("alice", cache.key("alice"), False)
+    assert cred.env["KRB5CCNAME"] == cred.ticket == cache.path("alice")
+    assert dict(cred.items()) == {cache.key("alice"): cred.ticket}
+    assert os.environ["KRB5CCNAME"] == "/tmp/global_ticket"
+
+    other = krb_auth(context("scheduled"), env={"PATH": "/bin"})
+    assert other.user == "owner"
+    assert other.env == {"PATH": "/bin", "KRB5CCNAME": cache.path("owner")}
+    assert cred.env["KRB5CCNAME"] == cache.path("alice")
+
+
+def test_krb_auth_manual_run_uses_remembered_user(context, cache):
+    cache.put_run_user("spark_dag", "manual__1", "bob")
+    cred = krb_auth(context("manual", run_id="manual__1"))
+    assert cred.user == "bob"
+    assert krb_auth(context("manual", run_id="manual__1")).reused
+
+
+def test_krb_auth_invalid_context(context):
+    with pytest.raises(AirflowException):
+        krb_auth({"dag": None})
+    with pytest.raises(AirflowException, match="Unknown run type"):
+        krb_auth(context("backfill"))
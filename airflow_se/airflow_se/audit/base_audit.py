@@ -27,7 +27,7 @@ from airflow_se.obj_imp import (
 from airflow_se.config import get_config_value
 from airflow_se.logger import LoggingMixinSE
 from airflow_se.settings import Settings, get_settings
-from airflow_se.db import create_new_audit_record
+from airflow_se.db import write_audit_record
 
 __all__ = [
     'BaseAuditAirflow',
@@ -117,7 +117,7 @@ class BaseAuditAirflow(LoggingMixinSE):
                          extras: dict,
                          ts: datetime = datetime.now(),
                          ):
-        return create_new_audit_record(ts = ts,
+        return write_audit_record(ts = ts,
                                        host = host,
                                        remote_addr = remote_addr,
                                        remote_login = remote_login,
@@ -53,7 +53,7 @@ def change_pass_dbmd() -> int:
                     else:
                         print("    Server don't return status message.")
                     token = auth_secman()
-                    sm_data = get_secman_data(SECMAN_KEY_FOR_SECRET, token) or dict()
+                    sm_data = get_secman_data(SECMAN_KEY_FOR_SECRET, token, use_cache=False) or dict()
                     sm_data['SE_DB_METADATA_PG_USERPASS'] = encrypt(new_pass)
                     if push_secman_data(SECMAN_KEY_FOR_SECRET, sm_data, token):
                         print("    New password pushed to SecMan")
@@ -87,7 +87,7 @@ def change_pass_dbmd() -> int:
         #     print(f'{result=}')
         #     print('New password changed on Metadata DB')
         #     token = auth_secman()
-        #     sm_data = get_secman_data(SECMAN_KEY_FOR_SECRET, token) or dict()
+        #     sm_data = get_secman_data(SECMAN_KEY_FOR_SECRET, token, use_cache=False) or dict()
         #     sm_data['SE_DB_METADATA_PG_USERPASS'] = encrypt(new_pass)
         #     if push_secman_data(SECMAN_KEY_FOR_SECRET, sm_data, token):
         #         print('New password pushed to SecMan')
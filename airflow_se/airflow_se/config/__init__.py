@@ -2,9 +2,12 @@
 """
 
 """
-from .config_load import get_config_value
+from .config_load import ConfigSnapshot, config_snapshot, get_config_value, reload_config_on_sighup
 
 __all__ = [
+    'ConfigSnapshot',
+    'config_snapshot',
     'get_config_value',
+    'reload_config_on_sighup',
 ]
 
@@ -3,13 +3,14 @@
 Загрузка конфига
 """
 from os import environ as env
+from signal import signal, getsignal, SIGHUP
 from sys import modules as sys_modules, meta_path as sys_meta_path
 from types import ModuleType
 from importlib.util import spec_from_file_location, module_from_spec
 from importlib.machinery import ModuleSpec
 from importlib.abc import Loader, MetaPathFinder
 from pathlib import Path
-from typing import Union, Iterable, Any
+from typing import Optional, Union, Iterable, Callable, Dict, List, Tuple, Any
 
 from airflow_se.commons import PARAMS_PREFIXES, STR_TO_BOOL_COMPARISON
 
@@ -43,6 +44,13 @@ class StringFinder(MetaPathFinder):
             return ModuleSpec(fullname, self._loader)
 
 
+def _load_config_file(path: Path) -> ModuleType:
+    spec = spec_from_file_location(module_name, path)
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
 # загрузка конфига, если он есть, если нет, то будет пустой namespace
 try:
     airflow_home = env.get('AIRFLOW_HOME')
@@ -53,56 +61,146 @@ try:
         finder = StringFinder(StringLoader(dict(airflow_se_config='')))
         sys_meta_path.append(finder)
     else:
-        spec = spec_from_file_location(module_name, airflow_se_config_path)
-        module = module_from_spec(spec)
-        spec.loader.exec_module(module)
-        sys_modules[module_name] = module
+        sys_modules[module_name] = _load_config_file(airflow_se_config_path)
     import airflow_se_config
 except:
     print('=== !!! Configuration SE don\'t initialise !!! ===')
     raise
 
 __all__ = [
+    'ConfigSnapshot',
+    'config_snapshot',
     'get_config_value',
+    'reload_config_on_sighup',
 ]
 
-def get_config_value(key: str, prefix: Union[Iterable[str], str, None] = PARAMS_PREFIXES, default: Any = None) -> Any:
-    def comparison(v) -> Any:
-        if isinstance(v, str):
-            _v = v.strip().upper()
-            if _v == 'NONE':
-                return None
-            __v = STR_TO_BOOL_COMPARISON.get(_v)
-            if isinstance(__v, bool):
-                return __v
-        return v
-    if not isinstance(key, str) or key.isspace():
-        return comparison(default)
-    key = key.strip()
+Prefixes = Tuple[str, ...]
+
+
+def _comparison(v) -> Any:
+    if isinstance(v, str):
+        _v = v.strip().upper()
+        if _v == 'NONE':
+            return None
+        __v = STR_TO_BOOL_COMPARISON.get(_v)
+        if isinstance(__v, bool):
+            return __v
+    return v
+
+
+def _prefixes(prefix: Union[Iterable[str], str, None]) -> Prefixes:
     if prefix is None or (isinstance(prefix, str) and prefix.isspace()):
-        val = env.get(key)
-        if val is not None:
-            return comparison(val)
-        if hasattr(airflow_se_config, key):
-            return comparison(getattr(airflow_se_config, key))
-    elif isinstance(prefix, str):
-        _key = f'{prefix.strip()}{key}'
-        val = env.get(_key)
-        if val is not None:
-            return comparison(val)
-        if hasattr(airflow_se_config, _key):
-            return comparison(getattr(airflow_se_config, _key))
-    elif isinstance(prefix, Iterable):
-        for p in prefix:
-            if isinstance(p, str):
-                _key = f'{p.strip()}{key}'
-                val = env.get(_key)
-                if val is not None:
-                    return comparison(val)
-        for p in prefix:
-            if isinstance(p, str):
-                _key = f'{p.strip()}{key}'
-                if hasattr(airflow_se_config, _key):
-                    return comparison(getattr(airflow_se_config, _key))
-    return comparison(default)
+        return ('', )
+    if isinstance(prefix, str):
+        return (prefix.strip(), )
+    if isinstance(prefix, Iterable):
+        return tuple(p.strip() for p in prefix if isinstance(p, str))
+    return tuple()
+
+
+class ConfigSnapshot:
+    """
+    Разрешённые значения параметров SE.
+    Параметр ищется в переменных окружения по всем префиксам, затем в модуле `airflow_se_config`
+    один раз, дальше значение и его источник берутся из снимка.
+    refresh() - забыть снимок (например, после изменения переменных окружения в процессе),
+    reload() - перечитать `airflow_se_config.py` и забыть снимок.
+    """
+    def __init__(self, module: ModuleType, path: Optional[Path] = None):
+        self.module: ModuleType = module
+        self.path: Optional[Path] = path
+        # (ключ, префиксы) -> (значение, источник), источник None - параметр не найден
+        self.__values: Dict[Tuple[str, Prefixes], Tuple[Any, Optional[str]]] = dict()
+        self.__listeners: List[Callable[[], Any]] = list()
+
+    def lookup(self, key: str, prefixes: Prefixes) -> Tuple[Any, Optional[str]]:
+        """Поиск без снимка"""
+        for p in prefixes:
+            val = env.get(f'{p}{key}')
+            if val is not None:
+                return _comparison(val), f'env:{p}{key}'
+        for p in prefixes:
+            if hasattr(self.module, f'{p}{key}'):
+                return _comparison(getattr(self.module, f'{p}{key}')), f'{module_name}:{p}{key}'
+        return None, None
+
+    def resolve(self, key: str, prefix: Union[Iterable[str], str, None] = PARAMS_PREFIXES) -> Tuple[Any, Optional[str]]:
+        """Значение параметра и источник (`env:<имя>` или `airflow_se_config:<имя>`), источник None - не найден"""
+        if not (prefix is None or isinstance(prefix, (str, tuple))):
+            prefix = tuple(prefix) if isinstance(prefix, Iterable) else tuple()
+        values = self.__values  # refresh() подменяет словарь целиком, старый дописывать безопасно
+        try:
+            return values[(key, prefix)]
+        except KeyError:
+            ret = values[(key, prefix)] = self.lookup(key, _prefixes(prefix))
+        except TypeError:  # нехэшируемые префиксы не кэшируются
+            ret = self.lookup(key, _prefixes(prefix))
+        return ret
+
+    def source(self, key: str, prefix: Union[Iterable[str], str, None] = PARAMS_PREFIXES) -> Optional[str]:
+        """Откуда взято значение параметра, None - параметр не найден"""
+        return self.resolve(key.strip(), prefix)[1]
+
+    def items(self) -> Dict[str, Tuple[Any, Optional[str]]]:
+        """Разрешённые на текущий момент параметры: ключ -> (значение, источник)"""
+        return {key: value for (key, _), value in list(self.__values.items()) if value[1] is not None}
+
+    def add_listener(self, fn: Callable[[], Any]):
+        """Функция, которая вызывается после refresh() и reload()"""
+        self.__listeners.append(fn)
+
+    def refresh(self):
+        self.__values = dict()
+        for fn in list(self.__listeners):
+            try:
+                fn()
+            except Exception as e:
+                print(f'Error on refresh listener {fn!r} of SE configuration: {e}')
+
+    def reload(self):
+        if self.path is not None and self.path.exists():
+            self.module = sys_modules[module_name] = _load_config_file(self.path)
+        self.refresh()
+
+
+config_snapshot = ConfigSnapshot(
+    airflow_se_config,
+    airflow_se_config_path if airflow_se_config_path.exists() else None,
+)
+
 
+def get_config_value(key: str, prefix: Union[Iterable[str], str, None] = PARAMS_PREFIXES, default: Any = None) -> Any:
+    if not isinstance(key, str) or key.isspace():
+        return _comparison(default)
+    value, source = config_snapshot.resolve(key.strip(), prefix)
+    return _comparison(default) if source is None else value
+
+
+_sighup_installed = False
+
+
+def reload_config_on_sighup() -> bool:
+    """
+    Перечитывать конфиг SE по сигналу SIGHUP (предыдущий обработчик тоже вызывается).
+    Ставится только из главного потока процесса, возвращает признак успеха.
+    """
+    global _sighup_installed
+    if _sighup_installed:
+        return True
+    previous = getsignal(SIGHUP)
+
+    def handler(signum, frame):
+        try:
+            config_snapshot.reload()
+            print(f'=== Configuration SE reloaded on signal {signum} ===')
+        except Exception as e:
+            print(f'=== !!! Configuration SE don\'t reloaded: {e} !!! ===')
+        if callable(previous):
+            previous(signum, frame)
+
+    try:
+        signal(SIGHUP, handler)
+    except ValueError:  # не главный поток
+        return False
+    _sighup_installed = True
+    return True
@@ -3,6 +3,7 @@
 
 """
 from .base import Session
+from .audit_writer import AuditWriter
 from .models import Audit, CacheLDAP, TGSList
 from .functions import (
     set_new_ldap_cache,
@@ -10,6 +11,9 @@ from .functions import (
     delete_old_ldap_caches,
     clear_ldap_caches,
     create_new_audit_record,
+    create_audit_records,
+    write_audit_record,
+    audit_writer,
     get_part_messages_for_delivery,
     mark_part_messages,
 )
@@ -19,11 +23,15 @@ __all__ = [
     "Audit",
     "CacheLDAP",
     "TGSList",
+    "AuditWriter",
     "get_max_ldap_cache",
     "set_new_ldap_cache",
     "delete_old_ldap_caches",
     "clear_ldap_caches",
     "create_new_audit_record",
+    "create_audit_records",
+    "write_audit_record",
+    "audit_writer",
     "get_part_messages_for_delivery",
     "mark_part_messages",
 ]
@@ -0,0 +1,294 @@
+"""
+Пакетная запись событий аудита: буфер в памяти, сброс в БД одной вставкой по размеру или по времени,
+при недоступной БД - выгрузка буфера в локальные файлы (записи не теряются), дозапись при следующем сбросе.
+"""
+import json
+import os
+from datetime import datetime
+from glob import glob
+from threading import Condition, Lock, RLock, Thread
+from time import monotonic
+from typing import Optional, Callable, List, Any
+
+from airflow_se.logger import LoggingMixinSE
+
+__all__ = [
+    "AuditWriter",
+]
+
+_DT = "$dt"
+
+
+def _encode(obj: Any) -> Any:
+    if isinstance(obj, datetime):
+        return {_DT: obj.isoformat()}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _decode(obj: dict) -> Any:
+    if len(obj) == 1 and _DT in obj:
+        return datetime.fromisoformat(obj[_DT])
+    return obj
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class AuditWriter(LoggingMixinSE):
+    """
+    Буферизованная запись событий аудита.
+    Записи копятся в памяти и вставляются в БД пачками по `batch_size`: фоновый поток сбрасывает буфер,
+    когда в нём набралось `batch_size` записей или прошло `flush_interval` секунд с последнего сброса.
+    Если вставка не удалась, записи остаются в буфере, следующая попытка - не раньше чем через `flush_interval`.
+    Когда в буфере `buffer_limit` записей, буфер дописывается в файл `spill_dir`/audit_spill.<pid>.jsonl,
+    файлы выгрузки (свои и завершившихся процессов) дозаписываются в БД первыми при успешном сбросе,
+    испорченные строки файлов выгрузки переносятся в `spill_dir`/audit_spill.<pid>.bad.
+    При закрытии буфер сбрасывается синхронно, а если БД недоступна - выгружается в файл.
+    """
+    def __init__(
+            self,
+            insert: Callable[[List[dict]], Any],
+            batch_size: int = 500,
+            flush_interval: float = 2.0,
+            buffer_limit: int = 50000,
+            spill_dir: Optional[str] = None,
+            clock: Callable[[], float] = monotonic,
+            debug: bool = False,
+    ):
+        """
+        :insert: вставляет пачку записей (словарей значений колонок) в одной транзакции, при ошибке - исключение
+        :batch_size: количество записей в одной вставке и порог сброса буфера
+        :flush_interval: максимальное время (сек) между сбросами буфера и пауза после неудачного сброса
+        :buffer_limit: максимальное количество записей в памяти, дальше - выгрузка в файл
+        :spill_dir: директория файлов выгрузки, None - записи сверх `buffer_limit` остаются в памяти
+        :clock: монотонные часы, подменяются в тестах
+        """
+        super().__init__(debug)
+        self.insert = insert
+        self.batch_size: int = max(1, batch_size)
+        self.flush_interval: float = flush_interval
+        self.buffer_limit: int = max(self.batch_size, buffer_limit)
+        self.spill_dir: Optional[str] = spill_dir
+        self.clock: Callable[[], float] = clock
+        self._reset()
+
+    def _reset(self):
+        self.__pid: int = os.getpid()
+        self.__cond = Condition(Lock())
+        self.__flush_lock = RLock()  # один сброс за раз (фоновый поток, явный вызов, закрытие)
+        self.__spill_lock = Lock()  # дозапись в файл выгрузки процесса и его переименование
+        self.__buffer: List[dict] = list()
+        self.__retry_at: float = 0.0
+        self.__last_flush: float = self.clock()
+        self.__stopped: bool = False
+        self.__thread: Optional[Thread] = None
+
+    def __check_pid(self):
+        # после fork буфер и поток родителя недействительны: его записи сбросит сам родитель
+        if self.__pid != os.getpid():
+            self._reset()
+
+    @property
+    def spill_path(self) -> Optional[str]:
+        """Файл выгрузки текущего процесса"""
+        if self.spill_dir:
+            return os.path.join(self.spill_dir, f"audit_spill.{os.getpid()}.jsonl")
+
+    def write(self, record: dict):
+        """Добавляет запись в буфер (не блокируется на БД)"""
+        self.__check_pid()
+        spill: List[dict] = list()
+        with self.__cond:
+            self.__buffer.append(record)
+            size = len(self.__buffer)
+            if size >= self.buffer_limit and self.spill_dir:
+                spill, self.__buffer = self.__buffer, list()
+            elif size >= self.batch_size:
+                self.__cond.notify_all()
+        if spill:
+            self.spill(spill)
+        self.start()
+
+    def pending(self) -> int:
+        """Количество записей в памяти"""
+        with self.__cond:
+            return len(self.__buffer)
+
+    def spill(self, records: List[dict]):
+        """Дописывает записи в файл выгрузки процесса"""
+        if not records:
+            return
+        path = self.spill_path
+        os.makedirs(self.spill_dir, exist_ok=True)
+        data = "".join(f"{json.dumps(r, default=_encode, ensure_ascii=False)}\n" for r in records)
+        with self.__spill_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.log_warning(f"Audit DB is unavailable, {len(records)} audit records spilled to {path}")
+
+    def __claim_spilled(self) -> List[str]:
+        """
+        Забирает файлы выгрузки (переименованием, чтобы их не забрал другой процесс).
+        Забираются только файлы завершившихся процессов и свои: в файл работающего процесса может идти дозапись
+        """
+        claimed = list()
+        if not self.spill_dir or not os.path.isdir(self.spill_dir):
+            return claimed
+        pid = os.getpid()
+        for path in sorted(glob(os.path.join(self.spill_dir, "audit_spill.*.jsonl*"))):
+            # audit_spill.<pid писателя>.jsonl или audit_spill.<pid писателя>.jsonl.<pid забравшего>.ingest
+            if not path.endswith((".jsonl", ".ingest")):
+                continue
+            try:
+                owner = int(path.rsplit(".", 2)[-2])
+            except ValueError:
+                continue
+            if owner != pid and _pid_alive(owner):
+                continue
+            target = f"{path.rsplit('.jsonl', 1)[0]}.jsonl.{pid}.ingest"
+            try:
+                # свой файл не переименовывается посреди дозаписи из другого потока
+                with self.__spill_lock:
+                    os.replace(path, target)
+            except FileNotFoundError:
+                continue  # забрал другой процесс
+            claimed.append(target)
+        return claimed
+
+    def __read_spilled(self, path: str) -> List[dict]:
+        """
+        Записи файла выгрузки. Испорченные строки (например, недописанная строка процесса, убитого во время
+        выгрузки) переносятся в audit_spill.<pid>.bad и не мешают дозаписи остальных
+        """
+        records, bad = list(), list()
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line, object_hook=_decode)
+                    if not isinstance(record, dict):
+                        raise ValueError(f"audit record must be an object, not {type(record).__name__}")
+                except ValueError:
+                    bad.append(line if line.endswith("\n") else f"{line}\n")
+                    continue
+                records.append(record)
+        if bad:
+            bad_path = os.path.join(self.spill_dir, f"audit_spill.{os.getpid()}.bad")
+            with open(bad_path, "a", encoding="utf-8") as f:
+                f.write("".join(bad))
+            self.log_error(f"{len(bad)} corrupted audit records of {path} are moved to {bad_path}")
+        return records
+
+    def __ingest_spilled(self) -> int:
+        """Дозаписывает файлы выгрузки в БД, при ошибке недописанное возвращается в файл процесса"""
+        total = 0
+        for path in self.__claim_spilled():
+            try:
+                records = self.__read_spilled(path)
+            except OSError as e:
+                self.log_error(f"Spilled audit records of {path} are not readable: {e}")
+                continue
+            try:
+                while records:
+                    chunk, records = records[:self.batch_size], records[self.batch_size:]
+                    try:
+                        self.insert(chunk)
+                    except Exception:
+                        records[:0] = chunk
+                        raise
+                    total += len(chunk)
+            finally:
+                # вставленные пачки уже закоммичены, файл удаляется только когда остаток сохранён
+                self.spill(records)
+                os.remove(path)
+        return total
+
+    def flush(self, force: bool = True) -> int:
+        """
+        Сбрасывает файлы выгрузки и буфер в БД, возвращает количество вставленных записей.
+        force=False - не раньше паузы после предыдущей ошибки.
+        При ошибке записи остаются в буфере (исключение не пробрасывается).
+        """
+        self.__check_pid()
+        with self.__flush_lock:
+            if not force and self.clock() < self.__retry_at:
+                return 0
+            with self.__cond:
+                records, self.__buffer = self.__buffer, list()
+                self.__last_flush = self.clock()
+            total = 0
+            try:
+                total += self.__ingest_spilled()
+                while records:
+                    chunk = records[:self.batch_size]
+                    self.insert(chunk)
+                    records = records[len(chunk):]
+                    total += len(chunk)
+            except Exception as e:
+                self.__retry_at = self.clock() + self.flush_interval
+                self.log_error(f"Missed insert of audit records ({len(records)} are kept for retry): {e}")
+                with self.__cond:
+                    self.__buffer[:0] = records
+                    if len(self.__buffer) >= self.buffer_limit and self.spill_dir:
+                        records, self.__buffer = self.__buffer, list()
+                    else:
+                        records = list()
+                if records:
+                    self.spill(records)
+            else:
+                self.__retry_at = 0.0
+            if total:
+                self.log_debug(f"{total} audit records inserted")
+            return total
+
+    def start(self):
+        """Запускает фоновый поток сброса (если ещё не запущен)"""
+        if self.__thread is not None and self.__thread.is_alive():
+            return
+        with self.__cond:
+            if self.__stopped or (self.__thread is not None and self.__thread.is_alive()):
+                return
+            self.__thread = Thread(target=self.__run, name="se_audit_writer", daemon=True)
+            self.__thread.start()
+
+    def close(self):
+        """Останавливает фоновый поток и сбрасывает буфер, если БД недоступна - в файл выгрузки"""
+        if self.__pid != os.getpid():
+            return
+        with self.__cond:
+            self.__stopped = True
+            self.__cond.notify_all()
+            thread, self.__thread = self.__thread, None
+        if thread is not None:
+            thread.join()
+        self.flush()
+        with self.__cond:
+            records, self.__buffer = self.__buffer, list()
+        if records:
+            if self.spill_dir:
+                self.spill(records)
+            else:
+                self.log_error(f"{len(records)} audit records are lost: DB is unavailable, spill_dir is not set")
+
+    def __run(self):
+        while True:
+            with self.__cond:
+                if self.__stopped:
+                    return
+                now = self.clock()
+                due = (len(self.__buffer) >= self.batch_size or
+                       (self.__buffer and now - self.__last_flush >= self.flush_interval))
+                if not due or now < self.__retry_at:
+                    wake_at = max(self.__last_flush + self.flush_interval, self.__retry_at)
+                    self.__cond.wait(max(wake_at - now, 0.01))
+                    continue
+            self.flush(force=False)
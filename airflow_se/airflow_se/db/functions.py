@@ -2,14 +2,18 @@
 """
 
 """
+import atexit
 from copy import copy, deepcopy
 from contextlib import closing
 from datetime import datetime, timedelta
+from os import environ, path
 from sqlalchemy import desc
-from typing import Optional, Union, Tuple, Any
+from typing import Optional, Union, Tuple, List, Any
 
+from airflow_se.config import get_config_value
 from .base import Session
 from .models import Audit, CacheLDAP
+from .audit_writer import AuditWriter
 
 __all__ = [
     "get_max_ldap_cache",
@@ -17,6 +21,9 @@ __all__ = [
     "delete_old_ldap_caches",
     "clear_ldap_caches",
     "create_new_audit_record",
+    "create_audit_records",
+    "write_audit_record",
+    "audit_writer",
     "get_part_messages_for_delivery",
     "mark_part_messages",
 ]
@@ -29,6 +36,31 @@ def create_new_audit_record(**kwargs) -> dict:
             sess.commit()
             return aud.get_dict
 
+def create_audit_records(records: List[dict]):
+    """Вставка пачки записей аудита (словарей значений колонок) одной транзакцией"""
+    with closing(Session()) as sess:
+        sess.bulk_insert_mappings(Audit, records)
+        sess.commit()
+
+audit_writer = AuditWriter(
+    insert=create_audit_records,
+    batch_size=int(get_config_value("AUDIT_BATCH_SIZE", default=500)),
+    flush_interval=float(get_config_value("AUDIT_FLUSH_INTERVAL", default=2.0)),
+    buffer_limit=int(get_config_value("AUDIT_BUFFER_LIMIT", default=50000)),
+    spill_dir=get_config_value("AUDIT_SPILL_DIR",
+                               default=path.join(environ.get("AIRFLOW_HOME", "."), "se_audit_spill")),
+)
+atexit.register(audit_writer.close)
+
+def write_audit_record(**kwargs) -> dict:
+    """
+    Запись аудита через буфер `audit_writer` (в БД попадёт при ближайшем сбросе),
+    возвращает запись без id
+    """
+    aud = Audit(**kwargs)
+    audit_writer.write({c.name: getattr(aud, c.name) for c in Audit.__table__.columns if c.name != "id"})
+    return aud.get_dict
+
 def get_part_messages_for_delivery(part: int = 1000) -> list:
     with closing(Session()) as sess:
         rows = sess.query(Audit).filter(Audit.is_pushed.is_(False)).order_by(desc(Audit.id)).limit(part).all()
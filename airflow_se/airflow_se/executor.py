@@ -31,7 +31,7 @@ except:
     raise
 
 from airflow_se.secman import get_secman_data
-from airflow_se.config import get_config_value
+from airflow_se.config import get_config_value, config_snapshot, reload_config_on_sighup
 
 __all__ = ["run", ]
 
@@ -39,6 +39,7 @@ secret_path = get_config_value("SECRET_PATH")
 if not secret_path or not isinstance(secret_path, str) or secret_path.isspace():
     secret_path = '/tmp'
     environ['SE_SECRET_PATH'] = secret_path
+    config_snapshot.refresh()
     print('Configuration parameter "SECRET_PATH" don\'t set or invalid, value set equal to "/tmp"')
 
 def run():
@@ -105,6 +106,7 @@ def run():
                 param += "&sslmode=disable"
                 print("Warning!!! Metadata DB mTLS: Off (certificates not present to SecMan)")
             environ["SE_DB_METADATA_PG_USERPASS"] = decrypt(sm_data.get('SE_DB_METADATA_PG_USERPASS')).decode('utf-8')
+            config_snapshot.refresh()
             environ["AIRFLOW__DATABASE__SQL_ALCHEMY_CONN"] = f"postgresql+psycopg2://" \
                 f"{get_config_value('DB_METADATA_PG_USERNAME')}:" \
                 f"{get_config_value('DB_METADATA_PG_USERPASS')}" \
@@ -289,6 +291,8 @@ def run():
         # environ['AIRFLOW__CORE__XCOM_BACKEND'] = 'airflow_se.xcom.XComSE'
         # ограничение на длину XCom
         environ['AIRFLOW__CORE__MAX_MAP_LENGTH'] = '3'
+        # переменные окружения изменены выше, снимок конфига SE собираем заново
+        config_snapshot.refresh()
 
         if environ.get("HIDDEN_DEBUG") and environ.get("HIDDEN_DEBUG") == "True":
             print(f"{'*' * 80}")
@@ -302,6 +306,9 @@ def run():
         show_logo()
 
         cmd = argv[1] if len(argv) > 1 else None
+        if cmd and cmd.startswith("se_"):
+            # процессы SE перечитывают airflow_se_config.py по `kill -HUP`
+            reload_config_on_sighup()
         if cmd and cmd == "se_ldap":
             import airflow_se.proc_ldap as proc_ldap
             ret = proc_ldap.run()
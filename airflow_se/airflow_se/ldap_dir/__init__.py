@@ -0,0 +1,11 @@
+"""
+
+"""
+from .ldap_dir import LDAPDirectory, LDAPDirectoryHolder, parse_dn
+
+__all__ = [
+    "LDAPDirectory",
+    "LDAPDirectoryHolder",
+    "parse_dn",
+]
+
@@ -0,0 +1,180 @@
+"""
+Индексированный справочник пользователей из кэша LDAP (один на процесс)
+"""
+from datetime import datetime
+from threading import Lock
+from time import monotonic
+from types import MappingProxyType
+from typing import Optional, Callable, Union, List, Dict, Tuple, Set, Any
+
+from airflow_se.logger import LoggingMixinSE
+from airflow_se.db import get_max_ldap_cache
+
+__all__ = [
+    "LDAPDirectory",
+    "LDAPDirectoryHolder",
+    "parse_dn",
+]
+
+Array = (List, Tuple, Set)
+
+DecodeFn = Callable[..., Optional[str]]
+
+
+def parse_dn(dn: str) -> Dict[str, str]:
+    """
+    Разбирает DN на словарь атрибутов. Как и прежний разбор менеджера безопасности,
+    для повторяющихся атрибутов остаётся последнее значение; части без "=" пропускаются
+    """
+    ret = dict()
+    for part in dn.split(","):
+        key, sep, val = part.partition("=")
+        if sep:
+            ret[key] = val
+    return ret
+
+
+class LDAPDirectory:
+    """
+    Неизменяемый индекс одной версии кэша LDAP.
+    Поиск по uid, DN и группе за O(1), разбор DN выполняется один раз при построении.
+    """
+    def __init__(
+            self,
+            ts: datetime,
+            cache: Union[List[Any], Tuple[Any], Set[Any]],
+            uid_field: str,
+            group_field: str,
+            decode: DecodeFn,
+    ):
+        """
+        :ts: временная метка (версия) кэша LDAP
+        :cache: записи кэша LDAP, каждая запись - пара (DN, атрибуты)
+        :uid_field: атрибут DN, в котором хранится uid пользователя
+        :group_field: атрибут пользователя со списком групп
+        :decode: функция декодирования значений в строку (с разделителем)
+        """
+        self.__ts: datetime = ts
+        by_uid: Dict[str, Any] = dict()
+        by_dn: Dict[str, Any] = dict()
+        by_group: Dict[str, List[str]] = dict()
+        for u in cache:
+            dn = decode(u[0], ",") or ""
+            uid = parse_dn(dn).get(uid_field) or ""
+            by_dn.setdefault(dn, u)
+            if not uid or uid in by_uid:
+                # как и раньше, при дублях берём первую запись
+                continue
+            by_uid[uid] = u
+            for x in u[1].get(group_field) or ():
+                group = decode(x)
+                if group:
+                    by_group.setdefault(group, []).append(uid)
+        self.__by_uid = MappingProxyType(by_uid)
+        self.__by_dn = MappingProxyType(by_dn)
+        self.__by_group = MappingProxyType({k: tuple(v) for k, v in by_group.items()})
+        self.__size: int = len(cache)
+
+    @property
+    def ts(self) -> datetime:
+        """Временная метка (версия) кэша LDAP"""
+        return self.__ts
+
+    def __len__(self) -> int:
+        """Количество записей в исходном кэше LDAP"""
+        return self.__size
+
+    def __contains__(self, uid: str) -> bool:
+        return uid in self.__by_uid
+
+    def get_by_uid(self, uid: str) -> Optional[Any]:
+        """Запись кэша LDAP по uid пользователя"""
+        return self.__by_uid.get(uid)
+
+    def get_by_dn(self, dn: str) -> Optional[Any]:
+        """Запись кэша LDAP по DN"""
+        return self.__by_dn.get(dn)
+
+    def get_group_members(self, group: str) -> Tuple[str, ...]:
+        """uid пользователей, входящих в группу"""
+        return self.__by_group.get(group, ())
+
+
+class LDAPDirectoryHolder(LoggingMixinSE):
+    """
+    Держатель текущего справочника LDAP процесса.
+    Версия кэша в БД проверяется не чаще одного раза в `check_interval` секунд,
+    новый справочник строится один раз на версию и подменяется атомарно
+    (читатели без блокировок получают либо старый, либо новый справочник целиком).
+    """
+    def __init__(
+            self,
+            check_interval: int,
+            uid_field: str,
+            group_field: str,
+            decode: DecodeFn,
+            debug: bool = False,
+            clock: Callable[[], float] = monotonic,
+    ):
+        super().__init__(debug)
+        self.check_interval: int = check_interval
+        self.uid_field: str = uid_field
+        self.group_field: str = group_field
+        self.decode: DecodeFn = decode
+        self.clock: Callable[[], float] = clock
+        self.__directory: Optional[LDAPDirectory] = None
+        self.__checked_at: Optional[float] = None
+        self.__lock = Lock()
+
+    @property
+    def directory(self) -> Optional[LDAPDirectory]:
+        """Текущий справочник без проверки версии"""
+        return self.__directory
+
+    def is_check_due(self) -> bool:
+        return self.__checked_at is None or self.clock() - self.__checked_at >= self.check_interval
+
+    def get_directory(self) -> Optional[LDAPDirectory]:
+        """Текущий справочник, при необходимости проверяет версию кэша в БД и перестраивает справочник"""
+        if self.__directory is not None and not self.is_check_due():
+            return self.__directory
+        with self.__lock:
+            # пока ждали блокировку, другой поток мог уже всё проверить
+            if self.__directory is None or self.is_check_due():
+                self.reload()
+        return self.__directory
+
+    def reload(self, force: bool = False):
+        """Проверяет версию кэша LDAP в БД и при наличии свежей версии перестраивает справочник"""
+        current = self.__directory
+        cache_ts = get_max_ldap_cache(only_ts=True)
+        self.__checked_at = self.clock()
+        if not force and isinstance(cache_ts, datetime) and current is not None and cache_ts <= current.ts:
+            # кэш не устарел, обновляться не за чем
+            return
+        if not isinstance(cache_ts, datetime):
+            if current is None:
+                self.log_critical("Everything bad, cache LDAP not found in DB, old one not!")
+            return
+        # свежий кэш имеется, получаем из БД
+        ldap_cache_ts, ldap_cache = get_max_ldap_cache()
+        if isinstance(ldap_cache_ts, datetime) and isinstance(ldap_cache, Array) and len(ldap_cache) > 0:
+            # свежий кэш валиден, строим справочник и подменяем
+            directory = LDAPDirectory(
+                ts=ldap_cache_ts,
+                cache=ldap_cache,
+                uid_field=self.uid_field,
+                group_field=self.group_field,
+                decode=self.decode,
+            )
+            self.__directory = directory
+            self.log_info(f"The current LDAP directory has been updated to latest cache from DB, "
+                          f"timestamp {directory.ts} contains {len(directory)} records")
+        elif current is not None:
+            # свежий кэш не валиден, но старый ещё пригоден, работаем на старом
+            self.log_error(f"The latest LDAP cache from DB invalid!")
+            self.log_warning(f"Continue to work with outdated LDAP directory "
+                             f"from {current.ts} contains {len(current)} records")
+        else:
+            # всё плохо, новый кэш пуст, старого нет
+            self.log_critical(f"Everything bad, new cache LDAP invalid, old one not!")
@@ -23,7 +23,8 @@ from airflow_se.crypt import decrypt, encrypt
 from airflow_se.secman import get_secman_data, auth_secman
 from airflow_se.utils import info, info_attrs, get_env, env
 from airflow_se.commons import SECMAN_KEY_FOR_SECRET
-from airflow_se.db import create_new_audit_record, Session
+from airflow_se.db import write_audit_record, Session
+from airflow_se.s3sync import DebouncedUploader
 
 log = LoggingMixinSE(debug=True)
 #log = LoggingMixinSE.logging.getLogger().setLevel(logging.INFO)
@@ -34,6 +35,8 @@ SE_AWS_PORT = get_config_value("AWS_PORT")
 SE_AWS_BUCKET_NAME = get_config_value("AWS_BUCKET_NAME")
 SE_AWS_BUCKET_DIR = get_config_value("AWS_BUCKET_DIR")
 SE_AWS_ACCESS_ID = get_config_value("AWS_ACCESS_ID")
+SE_AWS_UPLOAD_QUIET_WINDOW = float(get_config_value("AWS_UPLOAD_QUIET_WINDOW", default=1.0))
+SE_AWS_UPLOAD_WORKERS = int(get_config_value("AWS_UPLOAD_WORKERS", default=4))
 # получение секрета из секмана
 sm_secrets = get_secman_data(SECMAN_KEY_FOR_SECRET, auth_secman())
 log.info(f"240423_1214 {info(sm_secrets)=}")
@@ -60,11 +63,7 @@ client = boto3.client(service_name="s3",
                       endpoint_url=":".join([SE_AWS_URL, SE_AWS_PORT])
                       ) # https://habr.com/ru/articles/748276/
 
-def sync_from_fs_to_s3(path: str, file: str, event_type: str) -> None:
-    file_path = os.path.join(path, file)
-    temp_file_path = os.path.join(path, '__pycache__', f'{file}_temp_for_S3')
-    # Если в бакете есть папка SE_AWS_BUCKET_DIR, файлы будут загружены туда, в противном случае можно оставить только str(file)
-    upload_file_key = "".join([SE_AWS_BUCKET_DIR, "/", file]) #"airflow_dev_003/" + str(file)
+def audit_fs_sync(key: str, file_path: str, event_type: str) -> None:
     aud_msg = {
         "ts": dt.now(),
         "host": getfqdn(),
@@ -76,35 +75,33 @@ def sync_from_fs_to_s3(path: str, file: str, event_type: str) -> None:
         "subtype_id": "F0",
         "status_op": "SUCCESS",
         "extras": {
-            "PARAMS": dict(EVENT_TYPE=f"FS sync to S3 Ozone through encode by Fernet",),
+            "PARAMS": dict(EVENT_TYPE=f"FS sync to S3 Ozone through encode by Fernet",
+                           FS_OPERATION=f"Due to: '{event_type}' file action",
+                           FS_FILE_NAME=file_path,
+                           OZONE_OBJ_NAME=key,
+                           ),
             "SESSION_ID": "not applicable",
             "USER": "not applicable",
         },
     }
-    if event_type in ["created", "modified"]:
-        log.info(f"240409_1741-01 ======== sync_from_fs_to_s3 - start if event_type in [created, modified]: =======================")
-        log.info(f"240402_1815-00, Непосредственно загружаем файл {file_path=} в S3 бакет, {event_type=}, через {temp_file_path=}")
-        with open(file_path, "rt") as f:
-            v = f.read()
-            t = f"240402_1815-01 содержимое файла {file_path=} в папке ДАГов текстовое: \n{v[0:100]=}"
-            log.info(t)
-        with open(temp_file_path, "wt") as f:
-            encrypt_v = encrypt(v)
-            t = f"240402_1815-02 содержимое файла {temp_file_path=} для S3 корзины бинарное после encrypt(v): \n{encrypt_v[0:100]=}"
-            f.write(encrypt_v)
-            log.info(t)
-        client.upload_file(temp_file_path, SE_AWS_BUCKET_NAME, upload_file_key)
-        log.info(f"240409_1741-02 ======== sync_from_fs_to_s3 - end if event_type in [created, modified]: =======================")
-    elif event_type in ["deleted", "moved"]:
-        log.info(f"240402_1815-04 удаляем файл {file_path=} из S3 бакета, {event_type=} ")
-        client.delete_object(Bucket=SE_AWS_BUCKET_NAME, Key=upload_file_key)
-    aud_msg["extras"]["PARAMS"].update(dict(FS_OPERATION=f"Due to: '{event_type}' file action",
-                                            FS_FILE_NAME=file_path,
-                                            OZONE_OBJ_NAME=upload_file_key,
-                                            ))
     msg = audit_action_add(**aud_msg)
     log.info(f"audit recorded: {msg=}")
 
+def get_uploader() -> DebouncedUploader:
+    return DebouncedUploader(
+        client=client,
+        bucket=SE_AWS_BUCKET_NAME,
+        # Если в бакете есть папка SE_AWS_BUCKET_DIR, файлы будут загружены туда
+        prefix=f"{SE_AWS_BUCKET_DIR}/" if SE_AWS_BUCKET_DIR else "",
+        root_dir=SE_DAGS_FOLDER,
+        quiet_window=SE_AWS_UPLOAD_QUIET_WINDOW,
+        workers=SE_AWS_UPLOAD_WORKERS,
+        encode=lambda data: encrypt(data).encode("utf-8"),
+        on_upload=audit_fs_sync,
+        on_delete=audit_fs_sync,
+        debug=conf_settings.debug,
+    )
+
 def audit_action_add(host: str,
                      remote_addr:str,
                      remote_login: str,
@@ -131,7 +128,7 @@ def audit_action_add(host: str,
     if airflow_audit_logs_file is not None and isinstance(airflow_audit_logs_file, str):
         with open(airflow_audit_logs_file, 'a') as f:
             f.write(''.join(['\n', str(kwargs)]))
-    return create_new_audit_record(**kwargs)
+    return write_audit_record(**kwargs)
 
 # def dags_folder() -> str:
 #     # from airflow_se.config import get_config_value
@@ -152,25 +149,39 @@ class Handler(FileSystemEventHandler):
     #     DAGS_FOLDER = conf.get('core', 'dags_folder')
     #     return DAGS_FOLDER
 
+    def __init__(self, uploader: DebouncedUploader, path: str = SE_DAGS_FOLDER):
+        super().__init__()
+        self.uploader = uploader
+        self.path = path
+
+    def is_tracked(self, src_path: str) -> bool:
+        file_name_only = src_path.split('/')[-1]
+        return not src_path.startswith(os.path.join(self.path, '__pycache__')) \
+            and not file_name_only.startswith('.') \
+            and (file_name_only.endswith('.py') or file_name_only.endswith('.ipynb'))
+
     def on_any_event(self, event):
-        path = SE_DAGS_FOLDER  # dags_folder()  # вызывает цикличность - ПОТОМ РАЗОБРАТЬСЯ ПОЧЕМУ - "/opt/airflow_dev/dags" # !!!
-        file_name_only = event.src_path.split('/')[-1]
         #not in ['opened','closed']
-        if event.is_directory is False \
-            and not event.src_path.startswith(os.path.join(path, '__pycache__')) \
-            and str(event.event_type) in ["created", "modified", "deleted", "moved"] \
-            and event.is_synthetic is False \
-            and not file_name_only.startswith('.') \
-            and (file_name_only.endswith('.py') or file_name_only.endswith('.ipynb')):
-            dir_name = os.path.dirname(event.src_path)
-            file_name = os.path.basename(event.src_path)
-            sync_from_fs_to_s3(dir_name, file_name, str(event.event_type))
+        if event.is_directory is not False or event.is_synthetic is not False:
+            return
+        event_type = str(event.event_type)
+        if event_type in ["created", "modified", "deleted"]:
+            if self.is_tracked(event.src_path):
+                self.uploader.submit(event.src_path, event_type)
+        elif event_type == "moved":
+            # переименование: старый объект удаляем, новый файл выгружаем (редакторы сохраняют через временный файл)
+            if self.is_tracked(event.src_path):
+                self.uploader.submit(event.src_path, "deleted")
+            if self.is_tracked(event.dest_path):
+                self.uploader.submit(event.dest_path, "moved")
 
 def run():
     logging.basicConfig(level=logging.INFO,
                         format='%(asctime)s - %(message)s',
                         datefmt='%Y-%m-%d %H:%M:%S')
-    event_handler = Handler() #LoggingEventHandler()
+    uploader = get_uploader()
+    uploader.start()
+    event_handler = Handler(uploader) #LoggingEventHandler()
     observer = Observer()
     path = SE_DAGS_FOLDER  # dags_folder()
     observer.schedule(event_handler, path, recursive=True)
@@ -183,6 +194,7 @@ def run():
     finally:
         observer.stop()
         observer.join()
+        uploader.stop()
         #log.info(f"Finaly file changes: {observer.__dict__=}")
 
 if __name__ == "__main__":
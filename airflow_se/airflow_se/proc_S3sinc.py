@@ -26,7 +26,8 @@ from airflow_se.settings import Settings, get_settings
 from airflow_se.secman import get_secman_data, auth_secman
 from airflow_se.utils import info, info_attrs, get_env
 from airflow_se.commons import SECMAN_KEY_FOR_SECRET
-from airflow_se.db import create_new_audit_record
+from airflow_se.db import write_audit_record
+from airflow_se.s3sync import S3SyncEngine
 
 __all__ = ["run", ]
 
@@ -40,6 +41,9 @@ SE_AWS_PORT = get_config_value("AWS_PORT")
 SE_AWS_BUCKET_NAME = get_config_value("AWS_BUCKET_NAME")
 SE_AWS_BUCKET_DIR = get_config_value("AWS_BUCKET_DIR")
 SE_AWS_ACCESS_ID = get_config_value("AWS_ACCESS_ID")
+SE_AWS_SYNC_WORKERS = int(get_config_value("AWS_SYNC_WORKERS", default=8))
+SE_AWS_SYNC_DELETE_POLICY = get_config_value("AWS_SYNC_DELETE_POLICY", default="keep")
+SE_AWS_SYNC_MANIFEST = get_config_value("AWS_SYNC_MANIFEST")
 # получение секрета из секмана
 sm_secrets = get_secman_data(SECMAN_KEY_FOR_SECRET, auth_secman())
 log.info(f"240423_1214 {info(sm_secrets)=}")
@@ -106,63 +110,59 @@ class S3sinc(LoggingMixinSE):
                             )
 
     def sync_s3_to_fs(self, bucket_name: str, dag_dir: str, sync_interval: int = 5):
+        engine = S3SyncEngine(
+            client=self.client,
+            bucket=bucket_name,
+            prefix=f"{SE_AWS_BUCKET_DIR}/" if SE_AWS_BUCKET_DIR else "",
+            target_dir=dag_dir,
+            manifest_path=SE_AWS_SYNC_MANIFEST,
+            workers=SE_AWS_SYNC_WORKERS,
+            delete_policy=SE_AWS_SYNC_DELETE_POLICY,
+            decode=decrypt,
+            debug=self.conf.debug,
+        )
         while True:
-            fs_files = set(os.listdir(dag_dir))
-            content = self.client.list_objects(Bucket=bucket_name) #s3.list_objects_v2(Bucket=bucket_name)
-            for content_list_member in content['Contents']:
-                #self.log.info(f"240409_1028-01, {content_list_member['Key']=}")
-                s3_file = subn(f'{SE_AWS_BUCKET_DIR}/', '', content_list_member['Key'], 1)[0]
-                #self.log.info(f"240409_1028-02, {s3_file=} {'is True' if s3_file else 'is False'} ")
-                if match(f'^{SE_AWS_BUCKET_DIR}/', content_list_member['Key']) and s3_file:
-                    #self.log.info(f"240402_1827-00, объект <{s3_file=}> ")
-                    if s3_file not in fs_files:
-                        self.log.info(f"240409_1010-01 ======== start - if s3_file not in fs_files =======================")
-                        file_path = os.path.join(dag_dir, s3_file)
-                        temp_file_path = os.path.join(dag_dir, '__pycache__', f'{s3_file}_temp_for_S3')
-                        upload_file_key = "".join([SE_AWS_BUCKET_DIR, "/", s3_file])
-                        self.log.info(f"240402_1827-04, объект корзины S3 {upload_file_key=} отсутствует среди файлов FS {fs_files}"
-                                      f" - добавляем его в папку {file_path=} через {temp_file_path=}")
-                        aud_msg = {
-                            "ts": datetime.datetime.now(),
-                            "host": getfqdn(),
-                            "remote_addr": "not applicable",
-                            "remote_login": "not applicable",
-                            "code_op": "other audit operations",
-                            "app_id": self.conf.kafka_app_id,
-                            "type_id": "Audit",
-                            "subtype_id": "F0",
-                            "status_op": "SUCCESS",
-                            "extras": {
-                                "PARAMS": dict(EVENT_TYPE=f"S3 Ozone sync to file system through decode by Fernet", ),
-                                "SESSION_ID": "not applicable",
-                                "USER": "S3 bucket",
-                            },
-                        }
-                        try:
-                            client.download_file(bucket_name, upload_file_key, temp_file_path) # внимание! s3_client.download_file не создаст каталог.
-                            # Его можно создать как pathlib.Path('/path/to/file.txt').parent.mkdir(parents=True, exist_ok=True).
-                            with open(temp_file_path, "rb") as f:
-                                vv = f.read()
-                                self.log.info(f"240402_1843-01 бинарное шифрованное содержимое файла {temp_file_path=}, только что пришедшего из S3 бакета: \n{vv[0:200]=}")
-                            with open(file_path, "wb") as f:
-                                v = decrypt(vv)
-                                self.log.info(f"240402_1843-02 расшифрованное содержимое файла {temp_file_path=} из S3 бакета текстовое (после decrypt),"
-                                              f" которое записываем в файл {file_path=}: \n{v[0:200].decode('utf-8')=}")
-                                f.write(v)
-                            aud_msg["extras"]["PARAMS"].update(dict(S3_OPERATION="sync S3 to FS",
-                                                                    OZONE_OBJ_NAME=upload_file_key,
-                                                                    FS_FILE_NAME=file_path,
-                                                                    ))
-                            msg = self.audit_action_add(**aud_msg)
-                            self.log.info(f"audit recorded: {msg=}")
-                        except ClientError as ce:
-                            self.log.info(f"240402_1513-01, исключение ClientError = искали объект {s3_file} корзины {SE_AWS_BUCKET_DIR} "
-                                          f"среди файлов {fs_files}\n текст ошибки: {ce=}")
-                        except Exception as e:
-                            self.log.info(f"240402_1513-02, Exception {e=}")
-                        self.log.info(f"240409_1010-02 ======== end - if s3_file not in fs_files =======================")
+            try:
+                res = engine.sync(
+                    on_download=lambda key, path: self.audit_sync(key, path, "sync S3 to FS"),
+                    on_delete=lambda key, path: self.audit_sync(key, path, "delete from FS"),
+                )
+                if res.downloaded or res.deleted or res.failed:
+                    self.log_info(f"S3 sync: listed {res.listed}, downloaded {len(res.downloaded)}, "
+                                  f"unchanged {res.unchanged}, deleted {len(res.deleted)}, failed {len(res.failed)}")
+            except ClientError as ce:
+                self.log_error(f"S3 sync of bucket {bucket_name}/{SE_AWS_BUCKET_DIR} is failed: {ce}")
+            except Exception as e:
+                self.log_exception(f"S3 sync of bucket {bucket_name}/{SE_AWS_BUCKET_DIR} is failed: {e}")
             time.sleep(sync_interval)
 
+    def audit_sync(self, key: str, path: str, operation: str):
+        aud_msg = {
+            "ts": datetime.datetime.now(),
+            "host": getfqdn(),
+            "remote_addr": "not applicable",
+            "remote_login": "not applicable",
+            "code_op": "other audit operations",
+            "app_id": self.conf.kafka_app_id,
+            "type_id": "Audit",
+            "subtype_id": "F0",
+            "status_op": "SUCCESS",
+            "extras": {
+                "PARAMS": dict(EVENT_TYPE=f"S3 Ozone sync to file system through decode by Fernet",
+                               S3_OPERATION=operation,
+                               OZONE_OBJ_NAME=key,
+                               FS_FILE_NAME=path,
+                               ),
+                "SESSION_ID": "not applicable",
+                "USER": "S3 bucket",
+            },
+        }
+        try:
+            msg = self.audit_action_add(**aud_msg)
+            self.log_info(f"audit recorded: {msg=}")
+        except Exception as e:
+            self.log_error(f"Missed audit record of {operation} {key}: {e}")
+
     @staticmethod
     def audit_action_add(host: str,
                          remote_addr: str,
@@ -190,7 +190,7 @@ class S3sinc(LoggingMixinSE):
         if airflow_audit_logs_file is not None and isinstance(airflow_audit_logs_file, str):
             with open(airflow_audit_logs_file, 'a') as f:
                 f.write(''.join(['\n', str(kwargs)]))
-        return create_new_audit_record(**kwargs)
+        return write_audit_record(**kwargs)
 
 
 s3 = boto3.resource(service_name="s3",
@@ -7,7 +7,7 @@
 from warnings import simplefilter as warnings_simplefilter
 warnings_simplefilter("ignore")
 
-from typing import Optional, Union, Dict, Any
+from typing import Optional, Union, List, Dict, Any
 from json import loads, dumps
 from argparse import ArgumentParser, Namespace
 from time import sleep
@@ -62,6 +62,8 @@ class Kafka(LoggingMixinSE):
         self.__app_start = datetime.now()
         self.__counter: int = 0
         self.__producer: Optional[Producer] = None
+        self.__delivered: List[int] = list()
+        self.__failed: int = 0
 
     @property
     def conf(self) -> Settings:
@@ -104,6 +106,11 @@ class Kafka(LoggingMixinSE):
         """Максимальное количество сообщений, которые обрабатывать за одну итерацию цикла"""
         return self.conf.kafka_page_size
 
+    @property
+    def mark_batch_size(self) -> int:
+        """Максимальное количество записей, помечаемых в БД как отправленные одним запросом"""
+        return self.conf.kafka_mark_batch_size
+
     @staticmethod
     def format_message(mess: Dict[str, Any]) -> Dict[str, Any]:
         """Форматирует сообщение"""
@@ -132,8 +139,9 @@ class Kafka(LoggingMixinSE):
         return self.__producer
 
     def delivery_report(self, err, msg):
-        """Функция-обработчик ответа от Кафки"""
+        """Функция-обработчик ответа от Кафки (копит id доставленных сообщений, в БД пишет mark_delivered)"""
         if err is not None:
+            self.__failed += 1
             self.log_error(f"""Message NOT delivered: """
                            f"""key = "{msg.key().decode("utf-8")}", value = "{msg.value().decode("utf-8")}" """
                            f"""// Error delivery to topic "{msg.topic()}"[partition "{msg.partition()}"]: {err}""")
@@ -143,47 +151,72 @@ class Kafka(LoggingMixinSE):
                 ids = loads(msg.value().decode("utf-8")).get("inner_source_id")
             except Exception as e:
                 self.log_error(f"Error parsing JSON from returned Kafka producer message: {e}")
+            self.log_debug(f"""Message delivered to topic "{msg.topic()}"[partition "{msg.partition()}"]: """
+                           f"""timestamp = "{msg.timestamp()}", key = "{msg.key().decode("utf-8")}", """
+                           f"""value = "{msg.value().decode("utf-8")}\"""")
             if isinstance(ids, int) and ids > 0:
-                self.log_debug(f"""Message delivered to topic "{msg.topic()}"[partition "{msg.partition()}"]: """ 
-                               f"""timestamp = "{msg.timestamp()}", key = "{msg.key().decode("utf-8")}", """
-                               f"""value = "{msg.value().decode("utf-8")}\"""")
-                try:
-                    mark_part_messages(ids=ids)
-                except Exception as e:
-                    self.log_error(f"Audit record with id = {ids} was delivered to Kafka "
-                                   f"and NOT updated in DB as pushed: {e}")
-                else:
-                    self.log_info(f"Audit record with id = {ids} was delivered to Kafka and updated in DB as pushed")
+                self.__delivered.append(ids)
             else:
-                self.log_debug(f"""Message delivered to topic "{msg.topic()}"[partition "{msg.partition()}"]: """
-                               f"""timestamp = "{msg.timestamp()}", key = "{msg.key().decode("utf-8")}", """
-                               f"""value = "{msg.value().decode("utf-8")}\"""")
                 self.log_error(f"""Kafka producer return invalid value for key "inner_source_id": """
                                f"""type = "{type(ids)}", value = "{ids}\"""")
 
+    def mark_delivered(self):
+        """Помечает доставленные сообщения в БД одним UPDATE на пачку, не доставленные остаются для повтора"""
+        delivered, self.__delivered = self.__delivered, list()
+        for i in range(0, len(delivered), self.mark_batch_size):
+            ids = delivered[i:i + self.mark_batch_size]
+            try:
+                mark_part_messages(ids=ids)
+            except Exception as e:
+                self.log_error(f"Audit records ({len(ids)} pcs.) with id from {min(ids)} to {max(ids)} "
+                               f"were delivered to Kafka and NOT updated in DB as pushed: {e}")
+            else:
+                self.log_info(f"Audit records ({len(ids)} pcs.) with id from {min(ids)} to {max(ids)} "
+                              f"were delivered to Kafka and updated in DB as pushed")
+
     def delivery_messages_to_kafka(self, messages: Union[list, tuple, None] = None):
-        """Отправка сообщений в Кафку"""
+        """
+        Отправка сообщений в Кафку.
+        Все сообщения пачки ставятся в очередь продюсера без блокирующих poll(), ответы Кафки собираются
+        в delivery_report() и после flush() доставленные помечаются в БД пачками.
+        """
         if isinstance(messages, (list, tuple)) and len(messages) > 0:
             self.log_info(f"Messages for delivery in the queue: {len(messages)}")
             self.log_info(f"Start delivery this messages...")
+            self.__delivered, self.__failed = list(), 0
             try:
                 producer = self.producer()
                 for mess in messages:
                     _mess = self.format_message(mess)
-                    producer.produce(topic=self.topic,
-                                     key=mess.get("code_op").encode("utf-8"),
-                                     value=dumps(_mess).encode("utf-8"),
-                                     timestamp=int(mess.get("ts").timestamp() * 1000),
-                                     callback=self.delivery_report,
-                                     )
-                    producer.poll(10)
-                    self.log_debug(f"Produce and pool message: inner_source_id={_mess.get('inner_source_id')}")
+                    kwargs = dict(topic=self.topic,
+                                  key=mess.get("code_op").encode("utf-8"),
+                                  value=dumps(_mess).encode("utf-8"),
+                                  timestamp=int(mess.get("ts").timestamp() * 1000),
+                                  callback=self.delivery_report,
+                                  )
+                    while True:
+                        try:
+                            producer.produce(**kwargs)
+                            break
+                        except BufferError:
+                            # локальная очередь продюсера заполнена, ждём ответов Кафки и пробуем снова
+                            self.log_debug("Producer queue is full, waiting for delivery reports...")
+                            producer.poll(1)
+                    # обслуживаем пришедшие ответы, не блокируясь
+                    producer.poll(0)
+                    self.log_debug(f"Produce message: inner_source_id={_mess.get('inner_source_id')}")
                 self.log_debug("Flush: 1 minute...")
-                producer.flush(60)
+                remaining = producer.flush(60)
                 self.log_debug("Producer flushed")
+                if remaining:
+                    self.log_error(f"Messages NOT delivered to Kafka in time and will be retried: {remaining}")
             except Exception as e:
                 self.log_error(f"Kafka producer error: {e}")
                 self.log_exception(e)
+            finally:
+                delivered, failed = len(self.__delivered), self.__failed
+                self.mark_delivered()
+                self.log_info(f"Messages delivered: {delivered}, failed: {failed}")
         else:
             self.log_info("No messages for delivery to Kafka")
 
@@ -6,9 +6,11 @@ from warnings import simplefilter as warnings_simplefilter
 warnings_simplefilter("ignore")
 
 from os import getpid, chmod
-from typing import Optional
+from typing import Optional, List, Dict, Set, Tuple, Any
 from argparse import ArgumentParser, Namespace
-from time import sleep
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from time import sleep, time
 from datetime import datetime
 
 from airflow_se.logger import LoggingMixinSE
@@ -16,7 +18,7 @@ from airflow_se.commons import SECMAN_KEY_FOR_TGT, EMPTY_KEY_SECMAN
 from airflow_se.crypt import encrypt, decrypt
 from airflow_se.utils import DataPaths
 from airflow_se.settings import Settings, get_settings
-from airflow_se.utils import run_kinit, run_kvno, run_klist, timedelta_to_human_format
+from airflow_se.utils import run_kinit, run_kvno, run_klist, timedelta_to_human_format, get_ticket_expiry
 from airflow_se.secman import auth_secman, get_secman_data, push_secman_data
 from airflow_se.db import TGSList
 
@@ -29,6 +31,14 @@ def run():
     return TicketMan(parser.parse_args())()
 
 
+@dataclass
+class RenewResult:
+    """Результат обновления одного тикета"""
+    key: str
+    value: Optional[str] = None  # зашифрованный тикет для записи в SecMan, None - не записываем
+    failed_tgs: Set[str] = field(default_factory=set)
+
+
 class TicketMan(LoggingMixinSE):
     """
     Обновление тикетов
@@ -119,82 +129,43 @@ class TicketMan(LoggingMixinSE):
                         inner_dir="se_ticketman",
                         name="TicketManSE",
                     )
-                    sm_tgt = get_secman_data(SECMAN_KEY_FOR_TGT, _token)
+                    sm_tgt = get_secman_data(SECMAN_KEY_FOR_TGT, _token, use_cache=False)
                     if not isinstance(sm_tgt, dict):
                         self.log_warning("SecMan don't return tickets (empty secret or not exists)")
                         sm_tgt = dict()
 
-                    for k, v in sm_tgt.items():
-                        if k == EMPTY_KEY_SECMAN:
-                            continue
-                        self.log_info(hr)
-                        full_path = dp.get(k)
-                        self.log_info(f'Ticket "{k}" processing...')
-                        try:
-                            body = decrypt(v)
-                        except Exception:
-                            self.log_error(f'Don\'t encrypt body ticket "{k}"')
-                            self.log_exception('')
-                            continue
+                    # тикеты, истекающие до окончания следующего цикла (с запасом), обновляем, остальные оставляем как есть
+                    renew_before = time() + self.proc_timeout + self.conf.ticketman_renew_margin
+                    queue: List[Tuple[str, str]] = list()
+                    for k, v, full_path, expiry in self.schedule(sm_tgt, dp):
+                        if expiry is not None and expiry > renew_before:
+                            self.log_info(f'Ticket "{k}" expires at {datetime.fromtimestamp(expiry)}, '
+                                          f'renewal is not required yet')
+                            sm_tgt_return[k] = v
                         else:
+                            queue.append((k, full_path))
+                    self.log_info(f"Tickets to renew: {len(queue)}, skipped: {len(sm_tgt_return)}")
+
+                    # список TGS один на весь цикл, неполученные TGS удаляем из списка после цикла
+                    try:
+                        tgs_list = TGSList.get_tgs_list()
+                    except Exception:
+                        self.log_exception('Missing get TGS list, tickets are renewed without TGS')
+                        tgs_list = list()
+                    failed_tgs: Set[str] = set()
+                    with ThreadPoolExecutor(max_workers=self.conf.ticketman_workers) as executor:
+                        futures = [executor.submit(self.renew_ticket, k, full_path, tgs_list) for k, full_path in queue]
+                        for future in as_completed(futures):
                             try:
-                                with open(full_path, "wb") as f:
-                                    f.write(body)
-                                chmod(full_path, 0o600)
+                                res: RenewResult = future.result()
                             except Exception:
-                                self.log_error(f'Don\'t write body ticket "{k}" to file "{full_path}"')
                                 self.log_exception('')
                                 continue
-
-                        ret = run_klist(ticket=full_path, klist=self.conf.krb_klist_path)
-                        ret_msg = f"(before) KLIST return code {ret.get('returncode')}: [ {' '.join(ret.get('command'))} ]" \
-                                  f"{self.newln + ret.get('stdout').strip() if ret.get('stdout').strip() else ''}" \
-                                  f"{self.newln + ret.get('stderr').strip() if ret.get('stderr').strip() else ''}"
-                        if ret.get("returncode") == 0:
-                            self.log_debug(ret_msg)
-                        else:
-                            self.log_error(ret_msg)
-
-                        ret = run_kinit(ticket=full_path, kinit=self.conf.krb_kinit_path, renew=True, verbose=True)
-                        ret_msg = f"KINIT return code {ret.get('returncode')}: [ {' '.join(ret.get('command'))} ]" \
-                                  f"{self.newln + ret.get('stdout').strip() if ret.get('stdout').strip() else ''}" \
-                                  f"{self.newln + ret.get('stderr').strip() if ret.get('stderr').strip() else ''}"
-                        if ret.get("returncode") == 0:
-                            self.log_debug(ret_msg)
-                            # получение TGS по списку (если не получается, то ошибку пишем только в лог, процесс не должен прерываться)
-                            for tgs in TGSList.get_tgs_list():
-                                ret = run_kvno(ticket=full_path, service=tgs)
-                                ret_msg = f"KVNO return code {ret.get('returncode')}: [ {' '.join(ret.get('command'))} ]" \
-                                          f"{self.newln + ret.get('stdout').strip() if ret.get('stdout').strip() else ''}" \
-                                          f"{self.newln + ret.get('stderr').strip() if ret.get('stderr').strip() else ''}"
-                                if ret.get("returncode") == 0:
-                                    self.log_debug(ret_msg)
-                                else:
-                                    self.log_error(ret_msg)
-                                    self.log_error(f'Missing get TGS "{tgs}" for ticket "{k}"')
-                                    TGSList.del_tgs(tgs)
-                            self.log_info(f"Ticket \"{k}\" has bin renewed")
-                            try:
-                                with open(full_path, "rb") as f:
-                                    tgt_enc = encrypt(f.read())
-                                    sm_tgt_return[k] = tgt_enc
-                            except Exception:
-                                self.log_exception(f"Exception on read file \"{full_path}\"")
-                                self.log_error(f"Ticket \"{k}\" NOT add to SecMan pushing data")
-                            else:
-                                self.log_info(f"Ticket \"{k}\" add to SecMan pushing data")
-                        else:
-                            self.log_error(ret_msg)
-                            self.log_error(f"Ticket \"{k}\" NOT renewed and NOT add to SecMan pushing data")
-
-                        ret = run_klist(ticket=full_path, klist=self.conf.krb_klist_path)
-                        ret_msg = f"(after) KLIST return code {ret.get('returncode')}: [ {' '.join(ret.get('command'))} ]" \
-                                  f"{self.newln + ret.get('stdout').strip() if ret.get('stdout').strip() else ''}" \
-                                  f"{self.newln + ret.get('stderr').strip() if ret.get('stderr').strip() else ''}"
-                        if ret.get("returncode") == 0:
-                            self.log_debug(ret_msg)
-                        else:
-                            self.log_error(ret_msg)
+                            failed_tgs.update(res.failed_tgs)
+                            if res.value is not None:
+                                sm_tgt_return[res.key] = res.value
+                    for tgs in failed_tgs:
+                        TGSList.del_tgs(tgs)
                 except Exception:
                     self.log_exception('')
 
@@ -216,3 +187,76 @@ class TicketMan(LoggingMixinSE):
             self.log_info(f"Sleep at time {ths:02}:{tms:02}:{tss:02}")
             self.log_info("<< ... ... ... ... ...  sweet dream  ... ... ... ... ... >>")
             sleep(self.proc_timeout)
+
+    def format_ret(self, name: str, ret: Dict[str, Any]) -> str:
+        return f"{name} return code {ret.get('returncode')}: [ {' '.join(ret.get('command'))} ]" \
+               f"{self.newln + ret.get('stdout').strip() if ret.get('stdout').strip() else ''}" \
+               f"{self.newln + ret.get('stderr').strip() if ret.get('stderr').strip() else ''}"
+
+    def schedule(self, sm_tgt: Dict[str, str], dp: DataPaths) -> List[Tuple[str, str, str, Optional[int]]]:
+        """
+        Расшифровывает тикеты в файлы и упорядочивает по времени окончания действия
+        (первыми идут тикеты с неизвестным временем, затем истекающие раньше)
+        :return: список (ключ, зашифрованный тикет, путь к файлу, время окончания действия)
+        """
+        ret = list()
+        for k, v in sm_tgt.items():
+            if k == EMPTY_KEY_SECMAN:
+                continue
+            full_path = dp.get(k)
+            try:
+                body = decrypt(v)
+            except Exception:
+                self.log_error(f'Don\'t encrypt body ticket "{k}"')
+                self.log_exception('')
+                continue
+            try:
+                with open(full_path, "wb") as f:
+                    f.write(body)
+                chmod(full_path, 0o600)
+            except Exception:
+                self.log_error(f'Don\'t write body ticket "{k}" to file "{full_path}"')
+                self.log_exception('')
+                continue
+            ret.append((k, v, full_path, get_ticket_expiry(full_path)))
+        ret.sort(key=lambda x: -1 if x[3] is None else x[3])
+        return ret
+
+    def renew_ticket(self, k: str, full_path: str, tgs_list: List[str]) -> RenewResult:
+        """Обновляет тикет и получает по нему TGS (выполняется в пуле потоков)"""
+        res = RenewResult(key=k)
+        self.log_info(f'Ticket "{k}" processing...')
+        ret = run_kinit(ticket=full_path, kinit=self.conf.krb_kinit_path, renew=True, verbose=True)
+        ret_msg = self.format_ret("KINIT", ret)
+        if ret.get("returncode") != 0:
+            self.log_error(ret_msg)
+            self.log_error(f"Ticket \"{k}\" NOT renewed and NOT add to SecMan pushing data")
+            return res
+        self.log_debug(ret_msg)
+        # получение TGS по списку (если не получается, то ошибку пишем только в лог, процесс не должен прерываться)
+        for tgs in tgs_list:
+            ret = run_kvno(ticket=full_path, service=tgs)
+            ret_msg = self.format_ret("KVNO", ret)
+            if ret.get("returncode") == 0:
+                self.log_debug(ret_msg)
+            else:
+                self.log_error(ret_msg)
+                self.log_error(f'Missing get TGS "{tgs}" for ticket "{k}"')
+                res.failed_tgs.add(tgs)
+        self.log_info(f"Ticket \"{k}\" has bin renewed")
+        try:
+            with open(full_path, "rb") as f:
+                res.value = encrypt(f.read())
+        except Exception:
+            self.log_exception(f"Exception on read file \"{full_path}\"")
+            self.log_error(f"Ticket \"{k}\" NOT add to SecMan pushing data")
+        else:
+            self.log_info(f"Ticket \"{k}\" add to SecMan pushing data")
+        if self.conf.debug:
+            ret = run_klist(ticket=full_path, klist=self.conf.krb_klist_path)
+            ret_msg = self.format_ret("(after) KLIST", ret)
+            if ret.get("returncode") == 0:
+                self.log_debug(ret_msg)
+            else:
+                self.log_error(ret_msg)
+        return res
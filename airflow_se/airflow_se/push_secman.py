@@ -26,7 +26,7 @@ def run():
             raise
         from airflow_se.secman import auth_secman, get_secman_data, push_secman_data
         token = auth_secman()
-        sm_data = get_secman_data(SECMAN_KEY_FOR_SECRET, token) or dict()
+        sm_data = get_secman_data(SECMAN_KEY_FOR_SECRET, token, use_cache=False) or dict()
         # если есть DELETE-NON-EXISTING, то не сохраняем то, что есть в СекМане
         for x in argv[1:]:
             if x.strip().upper() == "DELETE-NON-EXISTING":
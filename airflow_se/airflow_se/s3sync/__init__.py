@@ -0,0 +1,14 @@
+"""
+
+"""
+from .engine import DELETE_POLICIES, S3Object, S3Manifest, SyncResult, S3SyncEngine
+from .uploader import DebouncedUploader
+
+__all__ = [
+    "DELETE_POLICIES",
+    "S3Object",
+    "S3Manifest",
+    "SyncResult",
+    "S3SyncEngine",
+    "DebouncedUploader",
+]
@@ -0,0 +1,246 @@
+"""
+Синхронизация префикса корзины S3 с локальной директорией
+(постраничный листинг, манифест ETag/размер/время изменения, параллельная загрузка, атомарная подмена файлов)
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, asdict, field
+from tempfile import NamedTemporaryFile
+from typing import Optional, Callable, List, Dict, Tuple, Any
+
+from airflow_se.logger import LoggingMixinSE
+
+__all__ = [
+    "DELETE_POLICIES",
+    "S3Object",
+    "S3Manifest",
+    "SyncResult",
+    "S3SyncEngine",
+]
+
+# keep - локальные файлы не удаляются никогда (как раньше),
+# delete - удаляются файлы, ранее загруженные синхронизацией, объектов которых больше нет в корзине
+DELETE_POLICIES = ("keep", "delete", )
+
+
+@dataclass(frozen=True)
+class S3Object:
+    """Версия объекта корзины"""
+    key: str
+    etag: str
+    size: int
+    last_modified: str
+
+
+@dataclass
+class SyncResult:
+    """Итог одного прохода синхронизации"""
+    listed: int = 0
+    downloaded: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    deleted: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+
+
+def _write_atomic(path: str, data: bytes):
+    """Пишет файл рядом во временный и подменяет им целевой (читатели видят либо старый, либо новый файл)"""
+    dir_name, base_name = os.path.split(path)
+    with NamedTemporaryFile(dir=dir_name, prefix=f".{base_name}.", suffix=".s3sync", delete=False) as f:
+        try:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            os.unlink(f.name)
+            raise
+    try:
+        os.replace(f.name, path)
+    except BaseException:
+        os.unlink(f.name)
+        raise
+
+
+class S3Manifest:
+    """Сохранённые версии объектов, загруженных синхронизацией (JSON файл)"""
+    def __init__(self, path: str):
+        self.path: str = path
+        self.objects: Dict[str, S3Object] = dict()
+
+    def load(self) -> "S3Manifest":
+        try:
+            with open(self.path, "r") as f:
+                self.objects = {k: S3Object(**v) for k, v in json.load(f).items()}
+        except FileNotFoundError:
+            self.objects = dict()
+        return self
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        data = json.dumps({k: asdict(v) for k, v in sorted(self.objects.items())}, indent=1)
+        _write_atomic(self.path, data.encode("utf-8"))
+
+
+class S3SyncEngine(LoggingMixinSE):
+    """
+    Синхронизация объектов корзины с префиксом `prefix` в директорию `target_dir`.
+    Загружаются объекты, версии (ETag и размер) которых отличаются от манифеста или файла которых нет,
+    содержимое проходит через `decode` (например, расшифровку) и подменяет файл атомарно.
+    Если содержимое не изменилось, файл не перезаписывается (время изменения не трогаем).
+    """
+    def __init__(
+            self,
+            client: Any,
+            bucket: str,
+            prefix: str,
+            target_dir: str,
+            manifest_path: Optional[str] = None,
+            workers: int = 8,
+            delete_policy: str = "keep",
+            page_size: int = 1000,
+            decode: Optional[Callable[[bytes], bytes]] = None,
+            debug: bool = False,
+    ):
+        """
+        :client: клиент boto3 S3 (потокобезопасен) или совместимый объект
+        :bucket: имя корзины
+        :prefix: префикс ключей (директория в корзине), с "/" на конце или пустой
+        :target_dir: локальная директория
+        :manifest_path: путь к файлу манифеста, по умолчанию `target_dir`/__pycache__/.s3sync_manifest.json
+        :workers: количество параллельных загрузок
+        :delete_policy: политика удаления локальных файлов, см. DELETE_POLICIES
+        :page_size: количество ключей на страницу листинга
+        :decode: преобразование содержимого объекта перед записью в файл
+        """
+        super().__init__(debug)
+        if delete_policy not in DELETE_POLICIES:
+            raise ValueError(f"Unknown delete policy \"{delete_policy}\", must be one of {DELETE_POLICIES}")
+        self.client = client
+        self.bucket: str = bucket
+        self.prefix: str = prefix
+        self.target_dir: str = target_dir
+        self.workers: int = max(1, workers)
+        self.delete_policy: str = delete_policy
+        self.page_size: int = page_size
+        self.decode: Callable[[bytes], bytes] = decode or (lambda x: x)
+        self.manifest: S3Manifest = S3Manifest(
+            manifest_path or os.path.join(target_dir, "__pycache__", ".s3sync_manifest.json")
+        ).load()
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Локальный путь файла объекта, None - объект не синхронизируется (директория или путь вне target_dir)"""
+        rel = key[len(self.prefix):]
+        if not key.startswith(self.prefix) or not rel or rel.endswith("/"):
+            return None
+        parts = rel.split("/")
+        if any(p in ("", ".", "..") for p in parts):
+            return None
+        return os.path.join(self.target_dir, *parts)
+
+    def list_objects(self) -> Dict[str, S3Object]:
+        """Все объекты с префиксом (постранично, без ограничения в 1000 ключей)"""
+        objects: Dict[str, S3Object] = dict()
+        kwargs = dict(Bucket=self.bucket, Prefix=self.prefix, MaxKeys=self.page_size)
+        while True:
+            page = self.client.list_objects_v2(**kwargs)
+            for item in page.get("Contents") or ():
+                objects[item["Key"]] = S3Object(
+                    key=item["Key"],
+                    etag=item.get("ETag", ""),
+                    size=item.get("Size", 0),
+                    last_modified=str(item.get("LastModified", "")),
+                )
+            if not page.get("IsTruncated"):
+                return objects
+            kwargs["ContinuationToken"] = page["NextContinuationToken"]
+
+    def plan(self, remote: Dict[str, S3Object]) -> Tuple[List[S3Object], List[str]]:
+        """Объекты для загрузки и ключи, файлы которых надо удалить"""
+        to_download, to_delete = list(), list()
+        for key, obj in remote.items():
+            path = self.local_path(key)
+            if path is None:
+                continue
+            known = self.manifest.objects.get(key)
+            if known is None or known.etag != obj.etag or known.size != obj.size or not os.path.isfile(path):
+                to_download.append(obj)
+        if self.delete_policy == "delete":
+            if remote:
+                to_delete = [key for key in self.manifest.objects if key not in remote]
+            elif self.manifest.objects:
+                self.log_warning(f"Bucket listing {self.bucket}/{self.prefix} is empty, deletions are skipped")
+        return to_download, to_delete
+
+    def download(self, obj: S3Object) -> Tuple[S3Object, bool]:
+        """Загружает объект, возвращает фактическую версию и признак изменения файла"""
+        path = self.local_path(obj.key)
+        response = self.client.get_object(Bucket=self.bucket, Key=obj.key)
+        body = response["Body"].read()
+        # версия, которую реально скачали (объект мог измениться после листинга)
+        obj = S3Object(
+            key=obj.key,
+            etag=response.get("ETag", obj.etag),
+            size=response.get("ContentLength", len(body)),
+            last_modified=str(response.get("LastModified", obj.last_modified)),
+        )
+        data = self.decode(body)
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                if f.read() == data:
+                    return obj, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(path, data)
+        return obj, True
+
+    def sync(
+            self,
+            on_download: Optional[Callable[[str, str], None]] = None,
+            on_delete: Optional[Callable[[str, str], None]] = None,
+    ) -> SyncResult:
+        """
+        Один проход синхронизации
+        :on_download: вызывается (в вызывающем потоке) для каждого изменённого файла с ключом и путём
+        :on_delete: вызывается для каждого удалённого файла с ключом и путём
+        """
+        result = SyncResult()
+        manifest_changed = False
+        remote = self.list_objects()
+        result.listed = len(remote)
+        to_download, to_delete = self.plan(remote)
+        result.unchanged = sum(1 for key in remote if self.local_path(key)) - len(to_download)
+        if to_download:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(to_download))) as executor:
+                futures = {executor.submit(self.download, obj): obj for obj in to_download}
+                for future in as_completed(futures):
+                    key = futures[future].key
+                    try:
+                        obj, changed = future.result()
+                    except Exception as e:
+                        self.log_error(f"Missed download of {self.bucket}/{key}: {e}")
+                        result.failed[key] = str(e)
+                        continue
+                    self.manifest.objects[key] = obj
+                    manifest_changed = True
+                    if changed:
+                        result.downloaded.append(key)
+                        if on_download:
+                            on_download(key, self.local_path(key))
+                    else:
+                        result.unchanged += 1
+        for key in to_delete:
+            path = self.local_path(key)
+            try:
+                if path and os.path.isfile(path):
+                    os.remove(path)
+            except OSError as e:
+                self.log_error(f"Missed delete of {path}: {e}")
+                result.failed[key] = str(e)
+                continue
+            del self.manifest.objects[key]
+            manifest_changed = True
+            result.deleted.append(key)
+            if on_delete:
+                on_delete(key, path)
+        if manifest_changed:
+            self.manifest.save()
+        return result
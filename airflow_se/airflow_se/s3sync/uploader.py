@@ -0,0 +1,205 @@
+"""
+Выгрузка изменённых файлов директории в корзину S3 с подавлением дребезга событий файловой системы
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from threading import Condition, Lock, Thread
+from time import monotonic
+from typing import Optional, Callable, Dict, Set, Tuple, Any
+
+from airflow_se.logger import LoggingMixinSE
+
+__all__ = [
+    "DebouncedUploader",
+]
+
+UPLOAD, DELETE = "upload", "delete"
+
+
+class DebouncedUploader(LoggingMixinSE):
+    """
+    Очередь выгрузки файлов в корзину.
+    События по одному пути копятся, пока путь не простоит без событий `quiet_window` секунд,
+    после чего пачка событий превращается в одну операцию по последнему событию (выгрузка или удаление).
+    Файл, содержимое которого совпадает с последним выгруженным, повторно не выгружается.
+    Операции выполняются пулом из `workers` потоков, по одному пути одновременно не более одной операции.
+    """
+    def __init__(
+            self,
+            client: Any,
+            bucket: str,
+            prefix: str,
+            root_dir: str,
+            quiet_window: float = 1.0,
+            workers: int = 4,
+            encode: Optional[Callable[[bytes], bytes]] = None,
+            on_upload: Optional[Callable[[str, str, str], None]] = None,
+            on_delete: Optional[Callable[[str, str, str], None]] = None,
+            clock: Callable[[], float] = monotonic,
+            debug: bool = False,
+    ):
+        """
+        :client: клиент boto3 S3 (потокобезопасен) или совместимый объект
+        :bucket: имя корзины
+        :prefix: префикс ключей (директория в корзине), с "/" на конце или пустой
+        :root_dir: локальная директория, пути файлов в ней соответствуют ключам
+        :quiet_window: сколько секунд путь должен простоять без событий перед операцией
+        :workers: количество потоков выгрузки
+        :encode: преобразование содержимого файла перед выгрузкой (например, шифрование)
+        :on_upload: вызывается после выгрузки с ключом, путём и типом последнего события
+        :on_delete: вызывается после удаления с ключом, путём и типом последнего события
+        :clock: монотонные часы, подменяются в тестах
+        """
+        super().__init__(debug)
+        self.client = client
+        self.bucket: str = bucket
+        self.prefix: str = prefix
+        self.root_dir: str = root_dir
+        self.quiet_window: float = quiet_window
+        self.encode: Callable[[bytes], bytes] = encode or (lambda x: x)
+        self.on_upload = on_upload
+        self.on_delete = on_delete
+        self.clock: Callable[[], float] = clock
+        self.__executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="se_fs_sync")
+        self.__cond = Condition(Lock())
+        self.__callback_lock = Lock()
+        # путь -> (операция, тип последнего события, момент, после которого операцию можно выполнять)
+        self.__pending: Dict[str, Tuple[str, str, float]] = dict()
+        self.__in_flight: Set[str] = set()
+        self.__hashes: Dict[str, str] = dict()  # путь -> хэш последнего выгруженного содержимого
+        self.__stopped: bool = False
+        self.__thread: Optional[Thread] = None
+
+    def key(self, path: str) -> str:
+        rel = os.path.relpath(path, self.root_dir).replace(os.sep, "/")
+        return f"{self.prefix}{rel}"
+
+    def submit(self, path: str, event_type: str):
+        """Регистрирует событие файловой системы (created, modified, deleted)"""
+        op = DELETE if event_type == "deleted" else UPLOAD
+        with self.__cond:
+            self.__pending[path] = (op, event_type, self.clock() + self.quiet_window)
+            self.__cond.notify_all()
+
+    def pending(self) -> int:
+        """Количество путей, ожидающих операции или выполняемых сейчас"""
+        with self.__cond:
+            return len(self.__pending.keys() | self.__in_flight)
+
+    def __take_due(self, force: bool = False) -> Tuple[Dict[str, Tuple[str, str]], Optional[float]]:
+        """Забирает созревшие операции (под блокировкой), возвращает их и ближайший срок следующей"""
+        now = self.clock()
+        due, next_deadline = dict(), None
+        for path, (op, event_type, deadline) in list(self.__pending.items()):
+            if path in self.__in_flight:
+                continue  # дождёмся завершения текущей операции по пути
+            if force or deadline <= now:
+                due[path] = (op, event_type)
+                del self.__pending[path]
+                self.__in_flight.add(path)
+            elif next_deadline is None or deadline < next_deadline:
+                next_deadline = deadline
+        return due, next_deadline
+
+    def dispatch(self, force: bool = False) -> int:
+        """Отправляет созревшие операции в пул (force - не дожидаясь окончания окна), возвращает их количество"""
+        with self.__cond:
+            due, _ = self.__take_due(force)
+        for path, (op, event_type) in due.items():
+            self.__executor.submit(self.__process, path, op, event_type)
+        return len(due)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Выполняет все накопленные операции не дожидаясь окна и ждёт их завершения"""
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            self.dispatch(force=True)
+            with self.__cond:
+                if not self.__pending and not self.__in_flight:
+                    return True
+                wait = None if deadline is None else deadline - monotonic()
+                if wait is not None and wait <= 0:
+                    return False
+                self.__cond.wait(wait)
+
+    def __process(self, path: str, op: str, event_type: str):
+        try:
+            if op == DELETE:
+                self.delete(path, event_type)
+            else:
+                self.upload(path, event_type)
+        except Exception as e:
+            self.log_error(f"Missed {op} of {path} to S3: {e}")
+        finally:
+            with self.__cond:
+                self.__in_flight.discard(path)
+                self.__cond.notify_all()
+
+    def upload(self, path: str, event_type: str = "modified") -> bool:
+        """Выгружает файл, если его содержимое изменилось с последней выгрузки"""
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            self.log_debug(f"File {path} is gone before upload, skipped")
+            return False
+        digest = sha256(data).hexdigest()
+        if self.__hashes.get(path) == digest:
+            self.log_debug(f"File {path} is not changed since last upload, skipped")
+            return False
+        key = self.key(path)
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=self.encode(data))
+        self.__hashes[path] = digest
+        self.log_info(f"File {path} uploaded to {self.bucket}/{key}")
+        if self.on_upload:
+            with self.__callback_lock:
+                self.on_upload(key, path, event_type)
+        return True
+
+    def delete(self, path: str, event_type: str = "deleted") -> bool:
+        """Удаляет объект файла из корзины (если файл снова не появился)"""
+        if os.path.isfile(path):
+            # файл пересоздан после удаления, значит это выгрузка
+            return self.upload(path, event_type)
+        key = self.key(path)
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+        self.__hashes.pop(path, None)
+        self.log_info(f"Object {self.bucket}/{key} deleted")
+        if self.on_delete:
+            with self.__callback_lock:
+                self.on_delete(key, path, event_type)
+        return True
+
+    def start(self):
+        """Запускает фоновый поток, отправляющий созревшие операции в пул"""
+        if self.__thread is not None and self.__thread.is_alive():
+            return
+        self.__stopped = False
+        self.__thread = Thread(target=self.__run, name="se_fs_sync_dispatcher", daemon=True)
+        self.__thread.start()
+
+    def stop(self, flush: bool = True):
+        """Останавливает фоновый поток, по умолчанию выполнив накопленные операции"""
+        with self.__cond:
+            self.__stopped = True
+            self.__cond.notify_all()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        if flush:
+            self.flush()
+        self.__executor.shutdown(wait=True)
+
+    def __run(self):
+        while True:
+            with self.__cond:
+                if self.__stopped:
+                    return
+                due, next_deadline = self.__take_due()
+                if not due:
+                    # ждём ближайшего срока или нового события/завершения операции
+                    self.__cond.wait(None if next_deadline is None else max(next_deadline - self.clock(), 0.01))
+                    continue
+            for path, (op, event_type) in due.items():
+                self.__executor.submit(self.__process, path, op, event_type)
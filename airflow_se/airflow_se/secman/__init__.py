@@ -2,9 +2,11 @@
 """
 
 """
-from .secman import auth_secman, get_secman_data, push_secman_data
+from .secman import SecManClient, secman_client, auth_secman, get_secman_data, push_secman_data
 
 __all__ = [
+    "SecManClient",
+    "secman_client",
     "auth_secman",
     "get_secman_data",
     "push_secman_data",
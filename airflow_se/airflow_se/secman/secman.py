@@ -1,9 +1,10 @@
-
 """
 Интеграция с SecMan
 """
-from os import environ as env
+from os import environ as env, getpid
 from os.path import exists
+from threading import Lock, Event
+from time import monotonic
 import logging
 import json
 import yaml
@@ -11,11 +12,13 @@ import requests
 
 requests.packages.urllib3.disable_warnings()
 
-from typing import Optional, Union, Dict, Any
+from typing import Optional, Union, Callable, Dict, Tuple, Any
 
 from airflow_se.commons import VERSION
 
 __all__ = [
+    "SecManClient",
+    "secman_client",
     "auth_secman",
     "get_secman_data",
     "push_secman_data",
@@ -32,136 +35,260 @@ _role_id = env.get("SE_SECMAN_ROLE_ID")
 _secret_id = env.get("SE_SECMAN_SECRET_ID")
 _cert = env.get("SE_SECMAN_SSL_CERT_PATH")
 _key = env.get("SE_SECMAN_SSL_KEY_PATH")
+_timeout = float(env.get("SE_SECMAN_TIMEOUT") or 60)
+_read_ttl = float(env.get("SE_SECMAN_READ_TTL") or 60)
+_token_ttl = float(env.get("SE_SECMAN_TOKEN_TTL") or 300)
+_token_margin = float(env.get("SE_SECMAN_TOKEN_MARGIN") or 30)
 
-def auth_secman() -> Optional[str]:
-    """Auth to SecMan, return token"""
-    secrets = dict(
-        role_id=_role_id.strip() if _role_id else None,
-        secret_id=_secret_id.strip() if _secret_id else None,
-    )
-    auth_params = dict(
-        url=f"{_base_url}{_path_auth}",
-        headers={
-            "Content-Type": "application/json",
-            "x-vault-namespace": _namespace,
-            "user-agent": f"airflow_se/{VERSION}",
-            "charset": "utf-8",
-        },
-        verify=False if _cert is None or _key is None else None,
-        cert=(_cert, _key) if _cert and _key else None,
-        data=json.dumps(secrets),
-        timeout=60,
-    )
-    auth_response = requests.post(**auth_params)
-    if auth_response.status_code != 200:
-        log.error(f"Missed SecMan authentication: {auth_response.status_code}, {auth_response.text.strip()}"
-                  f"\nInfo: url={_base_url}{_path_auth}, namespace={_namespace}")
-        return None
-    # else:
-    #     log.info("SecMan authentication successfully complete")
-    _token = auth_response.json().get("auth").get("client_token") if \
-        isinstance(auth_response.json().get("auth"), dict) else None
-    if not _token:
-        log.error(f"Missed SecMan authentication: SecMan don't return authentication token ->"
-                  f"\n{auth_response.status_code}, {auth_response.text.strip()}"
-                  f"\nInfo: url={_base_url}{_path_auth}, namespace={_namespace}")
-        return None
-    return _token
-
-def get_secman_data(key: str, auth_token: Optional[str] = None) -> Optional[Dict[str, str]]:
-    """Get SecMan data"""
-    # log.info("=" * 80)
-    # log.info("<< Get SecMan data >>")
-    if not isinstance(key, str) or key.isspace():
-        log.error("Parameter `key` is invalid")
-        # log.info("=" * 80)
-        return None
-    _token = auth_token if auth_token else auth_secman()
-    if not _token:
-        # log.info("=" * 80)
-        return None
 
-    params = dict(
-        url=f"{_base_url}{_path}/{_secman_key}_{key.strip()}",
-        headers={
-            "Content-Type": "application/json",
-            "X-Vault-Token": _token,
-            "x-vault-namespace": _namespace,
-            "user-agent": f"airflow_se/{VERSION}",
-            "charset": "utf-8",
-        },
-        verify=False if _cert is None or _key is None else None,
-        cert=(_cert, _key) if _cert and _key else None,
-        timeout=60,
-    )
-    # log.info(f"SecMan get secrets from: {params.get('url')}")
-    response = requests.get(**params)
-    if response.status_code != 200:
-        log.error(f"Missed get SecMan data: {response.status_code}, {response.text.strip()}")
-        # log.info("=" * 80)
+class _SingleFlight:
+    """
+    Одновременные одинаковые запросы выполняются один раз, остальные ждут и получают тот же результат
+    (или то же исключение, если запрос не удался)
+    """
+    def __init__(self):
+        self.__lock = Lock()
+        self.__calls: Dict[Any, Tuple[Event, list]] = dict()
+
+    def do(self, key: Any, fn: Callable[[], Any]) -> Any:
+        with self.__lock:
+            call = self.__calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.__calls[key] = (Event(), [None, None])  # результат, исключение
+        done, result = call
+        if not leader:
+            done.wait()
+            if result[1] is not None:
+                raise result[1]
+            return result[0]
+        try:
+            result[0] = fn()
+            return result[0]
+        except BaseException as e:
+            result[1] = e
+            raise
+        finally:
+            with self.__lock:
+                del self.__calls[key]
+            done.set()
+
+
+class SecManClient:
+    """
+    Клиент SecMan (один на процесс):
+        - HTTP-сессия с пулом соединений;
+        - токен кэшируется до окончания его аренды (lease_duration минус `token_margin` секунд),
+          если SecMan не вернул срок аренды, то на `token_ttl` секунд;
+        - прочитанные секреты кэшируются на `read_ttl` секунд по ключу, запись ключа сбрасывает его кэш;
+        - одновременные одинаковые запросы (аутентификация, чтение одного ключа) выполняются один раз.
+    """
+    def __init__(
+            self,
+            read_ttl: float = _read_ttl,
+            token_ttl: float = _token_ttl,
+            token_margin: float = _token_margin,
+            timeout: float = _timeout,
+            clock: Callable[[], float] = monotonic,
+    ):
+        self.read_ttl: float = read_ttl
+        self.token_ttl: float = token_ttl
+        self.token_margin: float = token_margin
+        self.timeout: float = timeout
+        self.clock: Callable[[], float] = clock
+        self.__reset()
+
+    def __reset(self):
+        self.__pid: int = getpid()
+        self.__lock = Lock()
+        self.__session: Optional[requests.Session] = None
+        self.__token: Optional[Tuple[str, float]] = None  # (токен, момент окончания аренды)
+        self.__data: Dict[str, Tuple[Dict[str, str], float]] = dict()  # ключ -> (данные, момент устаревания)
+        self.__flight = _SingleFlight()
+
+    def __check_pid(self):
+        # после fork-а сокеты сессии и блокировки родителя использовать нельзя
+        if self.__pid != getpid():
+            self.__reset()
+
+    @property
+    def session(self) -> requests.Session:
+        self.__check_pid()
+        with self.__lock:
+            if self.__session is None:
+                session = requests.Session()
+                session.verify = False if _cert is None or _key is None else True
+                session.cert = (_cert, _key) if _cert and _key else None
+                session.headers.update({
+                    "Content-Type": "application/json",
+                    "x-vault-namespace": _namespace,
+                    "user-agent": f"airflow_se/{VERSION}",
+                    "charset": "utf-8",
+                })
+                self.__session = session
+            return self.__session
+
+    @staticmethod
+    def url(key: str) -> str:
+        return f"{_base_url}{_path}/{_secman_key}_{key.strip()}"
+
+    def invalidate(self, key: Optional[str] = None):
+        """Сбрасывает кэш чтения ключа (всех ключей, если ключ не задан)"""
+        self.__check_pid()
+        with self.__lock:
+            if key is None:
+                self.__data.clear()
+            else:
+                self.__data.pop(key.strip(), None)
+
+    def invalidate_token(self, token: Optional[str] = None):
+        """Забывает токен (только если это именно он, когда токен задан)"""
+        self.__check_pid()
+        with self.__lock:
+            if self.__token is not None and (token is None or self.__token[0] == token):
+                self.__token = None
+
+    def close(self):
+        """Закрывает HTTP-сессию и очищает кэши"""
+        self.__check_pid()
+        with self.__lock:
+            session = self.__session
+            self.__session, self.__token = None, None
+            self.__data.clear()
+        if session is not None:
+            session.close()
+
+    def auth(self) -> Optional[str]:
+        """Auth to SecMan, return token"""
+        self.__check_pid()
+        cached = self.__token
+        if cached is not None and cached[1] > self.clock():
+            return cached[0]
+        return self.__flight.do(("auth", ), self.__auth)
+
+    def __auth(self) -> Optional[str]:
+        secrets = dict(
+            role_id=_role_id.strip() if _role_id else None,
+            secret_id=_secret_id.strip() if _secret_id else None,
+        )
+        started = self.clock()
+        auth_response = self.session.post(
+            url=f"{_base_url}{_path_auth}",
+            data=json.dumps(secrets),
+            timeout=self.timeout,
+        )
+        if auth_response.status_code != 200:
+            log.error(f"Missed SecMan authentication: {auth_response.status_code}, {auth_response.text.strip()}"
+                      f"\nInfo: url={_base_url}{_path_auth}, namespace={_namespace}")
+            return None
+        _auth = auth_response.json().get("auth")
+        _token = _auth.get("client_token") if isinstance(_auth, dict) else None
+        if not _token:
+            log.error(f"Missed SecMan authentication: SecMan don't return authentication token ->"
+                      f"\n{auth_response.status_code}, {auth_response.text.strip()}"
+                      f"\nInfo: url={_base_url}{_path_auth}, namespace={_namespace}")
+            return None
+        lease = _auth.get("lease_duration")
+        # срок аренды отсчитываем от момента отправки запроса, с запасом
+        ttl = float(lease) - self.token_margin if isinstance(lease, (int, float)) and lease > 0 else self.token_ttl
+        if ttl > 0:
+            with self.__lock:
+                self.__token = (_token, started + ttl)
+        return _token
+
+    def get(self, key: str, auth_token: Optional[str] = None, use_cache: bool = True) -> Optional[Dict[str, str]]:
+        """Get SecMan data (копия, её можно менять)"""
+        if not isinstance(key, str) or key.isspace():
+            log.error("Parameter `key` is invalid")
+            return None
+        self.__check_pid()
+        key = key.strip()
+        if use_cache and self.read_ttl > 0:
+            cached = self.__data.get(key)
+            if cached is not None and cached[1] > self.clock():
+                return dict(cached[0])
+        data = self.__flight.do(("get", key, auth_token), lambda: self.__get(key, auth_token))
+        return dict(data) if data is not None else None
+
+    def __get(self, key: str, auth_token: Optional[str]) -> Optional[Dict[str, str]]:
+        _token = auth_token if auth_token else self.auth()
+        if not _token:
+            return None
+        started = self.clock()
+        response = self.session.get(url=self.url(key), headers={"X-Vault-Token": _token}, timeout=self.timeout)
+        if response.status_code == 403 and self.__token is not None and self.__token[0] == _token:
+            # токен из кэша отозван раньше окончания аренды, аутентифицируемся заново и повторяем
+            self.invalidate_token(_token)
+            _token = self.auth()
+            if not _token:
+                return None
+            response = self.session.get(url=self.url(key), headers={"X-Vault-Token": _token}, timeout=self.timeout)
+        if response.status_code != 200:
+            log.error(f"Missed get SecMan data: {response.status_code}, {response.text.strip()}")
+            return None
+        data = response.json().get("data")
+        if isinstance(data, dict) and len(data) > 0:
+            log.info("Get SecMan data: Successfully complete")
+            if self.read_ttl > 0:
+                with self.__lock:
+                    self.__data[key] = (data, started + self.read_ttl)
+            return data
+        elif isinstance(data, dict) and len(data) == 0:
+            log.warning(f"SecMan data is empty: {response.status_code}, {response.text.strip()}")
+        else:
+            log.error(f"Missed get SecMan data: {response.status_code}, {response.text.strip()}")
         return None
-    data = response.json().get("data")
-    if isinstance(data, dict) and len(data) > 0:
-        log.info("Get SecMan data: Successfully complete")
-        # log.info("=" * 80)
-        return data
-    elif isinstance(data, dict) and len(data) == 0:
-        log.warning(f"SecMan data is empty: {response.status_code}, {response.text.strip()}")
-    else:
-        log.error(f"Missed get SecMan data: {response.status_code}, {response.text.strip()}")
-    # log.info("=" * 80)
-    return None
+
+    def push(self, key: str, data: Union[Dict[str, Any], str], auth_token: Optional[str] = None) -> bool:
+        """Push SecMan data"""
+        if not isinstance(key, str) or key.isspace():
+            log.error("Parameter `key` is invalid")
+            return False
+
+        if not isinstance(data, (dict, str)):
+            log.error("Parameter `data` is invalid")
+            return False
+
+        _token = auth_token if auth_token else self.auth()
+        if not _token:
+            return False
+
+        if isinstance(data, str) and exists(data):
+            with open(data, "rb") as f:
+                data = yaml.load(f, Loader=yaml.FullLoader)
+                log.info(f"SecMan data loaded from file {f.name}")
+
+        if isinstance(data, dict) and len(data) > 0:
+            data = {k: json.dumps(v) if isinstance(v, (dict, list, set)) else str(v) for k, v in data.items()}
+
+        # что бы ни ответил SecMan, закэшированное значение ключа больше не достоверно
+        self.invalidate(key)
+        response = self.session.post(
+            url=self.url(key),
+            headers={"X-Vault-Token": _token},
+            timeout=self.timeout,
+            data=json.dumps(data) if isinstance(data, dict) else data,
+        )
+        self.invalidate(key)
+        if response.status_code == 204:
+            log.info(f"Push SecMan data: Successfully complete")
+        else:
+            log.error(f"Missed push SecMan data: {response.status_code}, {response.text.strip()}")
+            return False
+        return True
+
+
+secman_client = SecManClient()
+
+
+def auth_secman() -> Optional[str]:
+    """Auth to SecMan, return token (из кэша, пока не истекла аренда)"""
+    return secman_client.auth()
+
+def get_secman_data(key: str, auth_token: Optional[str] = None, use_cache: bool = True) -> Optional[Dict[str, str]]:
+    """Get SecMan data (use_cache=False - прочитать в обход кэша, например, перед изменением и записью)"""
+    return secman_client.get(key, auth_token, use_cache)
 
 def push_secman_data(key: str, data: Union[Dict[str, Any], str], auth_token: Optional[str] = None) -> bool:
     """Push SecMan data"""
-    # log.info("=" * 80)
-    # log.info("<< Push SecMan data >>")
-
-    if not isinstance(key, str) or key.isspace():
-        log.error("Parameter `key` is invalid")
-        # log.info("=" * 80)
-        return False
-
-    if not isinstance(data, (dict, str)):
-        log.error("Parameter `data` is invalid")
-        # log.info("=" * 80)
-        return False
-
-    _token = auth_token if auth_token else auth_secman()
-    if not _token:
-        # log.info("=" * 80)
-        return False
-
-    if isinstance(data, str) and exists(data):
-        with open(data, "rb") as f:
-            data = yaml.load(f, Loader=yaml.FullLoader)
-            log.info(f"SecMan data loaded from file {f.name}")
-
-    if isinstance(data, dict) and len(data) > 0:
-        data = {k: json.dumps(v) if isinstance(v, (dict, list, set)) else str(v) for k, v in data.items()}
-
-    params = dict(
-        url=f"{_base_url}{_path}/{_secman_key}_{key.strip()}",
-        headers={
-            "Content-Type": "application/json",
-            "X-Vault-Token": _token,
-            "x-vault-namespace": _namespace,
-            "user-agent": f"airflow_se/{VERSION}",
-            "charset": "utf-8",
-        },
-        verify=False if _cert is None or _key is None else None,
-        cert=(_cert, _key) if _cert and _key else None,
-        timeout=60,
-        data=json.dumps(data) if isinstance(data, dict) else data,
-    )
-    # log.info(f"Push SecMan data to: {params.get('url')}")
-    response = requests.post(**params)
-    if response.status_code == 204:
-        log.info(f"Push SecMan data: Successfully complete")
-    else:
-        log.error(f"Missed push SecMan data: {response.status_code}, {response.text.strip()}")
-        # log.info("=" * 80)
-        return False
-    # log.info("=" * 80)
-    return True
-
+    return secman_client.push(key, data, auth_token)
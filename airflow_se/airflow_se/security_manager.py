@@ -29,7 +29,8 @@ from flask.helpers import flash
 from airflow_se.obj_imp import AFScrtMngr, User, Role, Permission
 from airflow_se.crypt import encrypt
 from airflow_se.settings import Settings, get_settings
-from airflow_se.db import get_max_ldap_cache as sqla_get_max_ldap_cache, TGSList
+from airflow_se.db import TGSList
+from airflow_se.ldap_dir import LDAPDirectoryHolder
 from airflow_se.utils import run_kinit, run_klist, run_kvno, timedelta_to_human_format, DataPaths, info
 from airflow_se.audit import AuditAirflow
 from airflow_se.secman import auth_secman, get_secman_data, push_secman_data
@@ -54,8 +55,7 @@ class AirflowSecurityManagerSE(AFScrtMngr):
         # self.__path = f"{path.abspath(__file__)}::{self.__class__.__name__} >> "
         self.__ext_flask_app: Optional[Flask] = current_app
         self.__ext_settings: Optional[Settings] = get_settings(flask_app=self.ext_flask_app)
-        self.__ext_ldap_cache_ts: Optional[datetime] = None
-        self.__ext_ldap_cache: Optional[Union[List[Any], Tuple[Any], Set[Any]]] = None
+        self.__ext_ldap_directory: Optional[LDAPDirectoryHolder] = None
         self.__ext_tkt_path: DataPaths = DataPaths(
             base_path=self.ext_conf.secret_path if isinstance(self.ext_conf.secret_path, str) else "/tmp",
             name="AirflowSecurityManagerSE"
@@ -267,7 +267,7 @@ class AirflowSecurityManagerSE(AFScrtMngr):
         # пушим в SecMan полученный тикет
         try:
             _token = auth_secman()
-            sm_tgt: Dict[str, str] = get_secman_data(SECMAN_KEY_FOR_TGT, _token) or dict()
+            sm_tgt: Dict[str, str] = get_secman_data(SECMAN_KEY_FOR_TGT, _token, use_cache=False) or dict()
             if EMPTY_KEY_SECMAN in sm_tgt.keys():
                 _ = sm_tgt.pop(EMPTY_KEY_SECMAN)
             with open(tkt_file, "rb") as f:
@@ -422,6 +422,45 @@ class AirflowSecurityManagerSE(AFScrtMngr):
             return sep.join(a) if len(a) > 0 else None
         self.log.error(f"method decode_str({val=}, {sep=}): parameter \"val\" invalid, type {type(val)}")
 
+    @property
+    def ext_ldap_directory(self) -> LDAPDirectoryHolder:
+        """Справочник пользователей LDAP процесса"""
+        if not isinstance(self.__ext_ldap_directory, LDAPDirectoryHolder):
+            self.__ext_ldap_directory = LDAPDirectoryHolder(
+                check_interval=self.ext_conf.ldap_directory_check_interval,
+                uid_field=self.ext_conf.ldap_uid_field,
+                group_field=self.ext_conf.ldap_group_field,
+                decode=self.ext_decode_str,
+                debug=self.ext_conf.debug,
+            )
+        return self.__ext_ldap_directory
+
+    def ext_ldap_user_from_entry(self, uid: str, u: Any) -> dict:
+        """Данные пользователя из записи кэша LDAP"""
+        first_name = self.ext_decode_str(u[1].get(self.ext_conf.ldap_firstname_field), " ") or ""
+        last_name = self.ext_decode_str(u[1].get(self.ext_conf.ldap_lastname_field), " ") or ""
+        email = self.ext_decode_str(u[1].get(self.ext_conf.ldap_email_field), "; ") or ""
+        roles = set()
+        ldap_groups = set()
+        for x in u[1].get(self.ext_conf.ldap_group_field) or ():
+            x_str = self.ext_decode_str(x)
+            ldap_groups.add(x_str)
+            role_from_map = self.ext_conf.ldap_roles_mapping.get(x_str)
+            if role_from_map:
+                if isinstance(role_from_map, str):
+                    roles.add(role_from_map.strip())
+                elif isinstance(role_from_map, Array):
+                    roles.update(map(str.strip, role_from_map))
+        if len(roles) == 0 and self.ext_conf.user_registration is True and self.ext_conf.user_registration_role:
+            roles.add(self.ext_conf.user_registration_role)
+        return {"username": uid,
+                "first_name": first_name,
+                "last_name": last_name,
+                "email": email,
+                "roles": list(roles),
+                "ldap_groups": list(ldap_groups),
+                }
+
     def ext_ldap_user_extract(self, username: str) -> Optional[dict]:
         """Получение данных пользователя из кэша LDAP"""
         if self.ext_conf.ldap_is_auth is False:
@@ -433,85 +472,24 @@ class AirflowSecurityManagerSE(AFScrtMngr):
                     "ldap_groups": list(),
                     }
         try:
-            # пробуем получить свежий кэш LDAP
+            # получаем справочник LDAP (версия кэша в БД проверяется не чаще заданного интервала)
             self.log.info("Checking cache LDAP...")
-            cache_ts = sqla_get_max_ldap_cache(only_ts=True)
-            if isinstance(cache_ts, datetime) and (
-                    (isinstance(self.__ext_ldap_cache_ts, datetime) and cache_ts > self.__ext_ldap_cache_ts) or
-                    not isinstance(self.__ext_ldap_cache_ts, datetime)
-            ):
-                # свежий кэш имеется, получаем из БД
-                ldap_cache_ts, ldap_cache = sqla_get_max_ldap_cache()
-                if isinstance(ldap_cache_ts, datetime) and isinstance(ldap_cache, Array) and len(ldap_cache) > 0:
-                    # свежий кэш валиден, обновляем
-                    self.__ext_ldap_cache_ts, self.__ext_ldap_cache = ldap_cache_ts, ldap_cache
-                    self.log.info(f"The current LDAP cache has been updated to latest from DB, "
-                                  f"timestamp {self.__ext_ldap_cache_ts} contains {len(self.__ext_ldap_cache)} records")
-                elif isinstance(self.__ext_ldap_cache_ts, datetime) and isinstance(self.__ext_ldap_cache, Array) and \
-                            len(self.__ext_ldap_cache) > 0:
-                    # свежий кэш не валиден, но старый ещё пригоден, работаем на старом
-                    self.log.error(f"The latest LDAP cache from DB invalid!")
-                    self.log.warning(f"Continue to work with outdated LDAP cache "
-                                     f"from {self.__ext_ldap_cache_ts} contains {len(self.__ext_ldap_cache)} records")
-                    self.ext_log_debug(f"{ldap_cache_ts=} -> {ldap_cache=}")
-                else:
-                    # всё плохо, новый кэш пуст, старого нет
-                    self.log.critical(f"Everything bad, new cache LDAP invalid, old one not!")
-                    # flash("Everything bad, new cache LDAP invalid, old one not!", "error")
-            else:
-                # кэш не устарел, обновляться не за чем
-                self.log.info(f"The current LDAP cache of actual state. Use current LDAP cache "
-                              f"from {self.__ext_ldap_cache_ts} contains {len(self.__ext_ldap_cache)} records")
-            # проверяем текущий кэш
-            if isinstance(self.__ext_ldap_cache_ts, datetime) and isinstance(self.__ext_ldap_cache, Array) and \
-                    len(self.__ext_ldap_cache) > 0:
-                # текущий кэш не пустой
-                self.ext_log_debug(f"The current LDAP cache "
-                                   f"from {self.__ext_ldap_cache_ts} contains {len(self.__ext_ldap_cache)} records")
-            else:
+            directory = self.ext_ldap_directory.get_directory()
+            if directory is None:
                 # текущий кэш пустой, продолжать не имеет смысла
                 self.log.critical(f"Check cache LDAP failed! Can't continue authorization!")
                 # flash("Check cache LDAP failed! Can't continue authorization!", "error")
                 return None
-            ret = dict()
-            for u in self.__ext_ldap_cache:
-                uid_str = self.ext_decode_str(u[0], ",") or ""
-                uid_dct = {y[0]: y[1] for y in (x.split("=") for x in uid_str.split(","))}
-                uid = uid_dct.get(self.ext_conf.ldap_uid_field) or ""
-                if uid != username:
-                    continue
-                first_name = self.ext_decode_str(u[1].get(self.ext_conf.ldap_firstname_field), " ") or ""
-                last_name = self.ext_decode_str(u[1].get(self.ext_conf.ldap_lastname_field), " ") or ""
-                email = self.ext_decode_str(u[1].get(self.ext_conf.ldap_email_field), "; ") or ""
-                self.ext_log_debug(f"User data obtained from LDAP cache: {uid=}")
-                roles = set()
-                ldap_groups = set()
-                for x in u[1].get(self.ext_conf.ldap_group_field):
-                    x_str = self.ext_decode_str(x)
-                    ldap_groups.add(x_str)
-                    role_from_map = self.ext_conf.ldap_roles_mapping.get(x_str)
-                    if role_from_map:
-                        if isinstance(role_from_map, str):
-                            roles.add(role_from_map.strip())
-                        elif isinstance(role_from_map, Array):
-                            roles.update(map(str.strip, role_from_map))
-                if len(roles) == 0 and self.ext_conf.user_registration is True and self.ext_conf.user_registration_role:
-                    roles.add(self.ext_conf.user_registration_role)
-                ret.update({"username": uid,
-                            "first_name": first_name,
-                            "last_name": last_name,
-                            "email": email,
-                            "roles": list(roles),
-                            "ldap_groups": list(ldap_groups),
-                            })
-                break
-            if len(ret) == 0:
+            self.ext_log_debug(f"The current LDAP cache from {directory.ts} contains {len(directory)} records")
+            u = directory.get_by_uid(username)
+            if u is None:
                 self.log.error(f"User \"{username}\" NOT found in LDAP cache")
                 # flash(f"User \"{username}\" NOT found in LDAP cache", "error")
                 return None
-            else:
-                self.log.info(f"User \"{username}\" extracted from LDAP cache, user roles: {ret.get('roles')}")
-                return ret
+            self.ext_log_debug(f"User data obtained from LDAP cache: uid={username!r}")
+            ret = self.ext_ldap_user_from_entry(username, u)
+            self.log.info(f"User \"{username}\" extracted from LDAP cache, user roles: {ret.get('roles')}")
+            return ret
         except Exception as e:
             self.log.error(f"Failed extract user \"{username}\" from LDAP cache. Error: {e}")
             # flash(f"Failed extract user \"{username}\" from LDAP cache", "error")
@@ -527,76 +505,16 @@ class AirflowSecurityManagerSE(AFScrtMngr):
                     "ldap_groups": list(),
                     }
         try:
-            # пробуем получить свежий кэш LDAP
-            cache_ts = sqla_get_max_ldap_cache(only_ts=True)
-            if isinstance(cache_ts, datetime) and (
-                    (isinstance(self.__ext_ldap_cache_ts, datetime) and cache_ts > self.__ext_ldap_cache_ts) or
-                    not isinstance(self.__ext_ldap_cache_ts, datetime)
-            ):
-                # свежий кэш имеется, получаем из БД
-                ldap_cache_ts, ldap_cache = sqla_get_max_ldap_cache()
-                if isinstance(ldap_cache_ts, datetime) and isinstance(ldap_cache, Array) and len(ldap_cache) > 0:
-                    # свежий кэш валиден, обновляем
-                    self.__ext_ldap_cache_ts, self.__ext_ldap_cache = ldap_cache_ts, ldap_cache
-                elif isinstance(self.__ext_ldap_cache_ts, datetime) and isinstance(self.__ext_ldap_cache, Array) and \
-                            len(self.__ext_ldap_cache) > 0:
-                    # свежий кэш не валиден, но старый ещё пригоден, работаем на старом
-                    self.log.error(f"The latest LDAP cache from DB invalid!")
-                    self.log.warning(f"Continue to work with outdated LDAP cache from "
-                                     f"{self.__ext_ldap_cache_ts} contains {len(self.__ext_ldap_cache)} records")
-                    self.ext_log_debug(f"{ldap_cache_ts=} -> {ldap_cache=}")
-                else:
-                    # всё плохо, новый кэш пуст, старого нет
-                    self.log.critical(f"Everything bad, new cache LDAP invalid, old one not!")
-            else:
-                # кэш не устарел, обновляться не за чем
-                pass
-            # проверяем текущий кэш
-            if isinstance(self.__ext_ldap_cache_ts, datetime) and isinstance(self.__ext_ldap_cache, Array) and \
-                    len(self.__ext_ldap_cache) > 0:
-                # текущий кэш не пустой
-                self.ext_log_debug(f"The current LDAP cache "
-                                   f"from {self.__ext_ldap_cache_ts} contains {len(self.__ext_ldap_cache)} records")
-            else:
+            directory = self.ext_ldap_directory.get_directory()
+            if directory is None:
                 # текущий кэш пустой, продолжать не имеет смысла
                 self.log.critical(f"Check cache LDAP failed!!")
                 return None
-            ret = dict()
-            for u in self.__ext_ldap_cache:
-                uid_str = self.ext_decode_str(u[0], ",") or ""
-                uid_dct = {y[0]: y[1] for y in (x.split("=") for x in uid_str.split(","))}
-                uid = uid_dct.get(self.ext_conf.ldap_uid_field) or ""
-                if uid != username:
-                    continue
-                first_name = self.ext_decode_str(u[1].get(self.ext_conf.ldap_firstname_field), " ") or ""
-                last_name = self.ext_decode_str(u[1].get(self.ext_conf.ldap_lastname_field), " ") or ""
-                email = self.ext_decode_str(u[1].get(self.ext_conf.ldap_email_field), "; ") or ""
-                roles = set()
-                ldap_groups = set()
-                for x in u[1].get(self.ext_conf.ldap_group_field):
-                    x_str = self.ext_decode_str(x)
-                    ldap_groups.add(x_str)
-                    role_from_map = self.ext_conf.ldap_roles_mapping.get(x_str)
-                    if role_from_map:
-                        if isinstance(role_from_map, str):
-                            roles.add(role_from_map.strip())
-                        elif isinstance(role_from_map, Array):
-                            roles.update(map(str.strip, role_from_map))
-                if len(roles) == 0 and self.ext_conf.user_registration is True and self.ext_conf.user_registration_role:
-                    roles.add(self.ext_conf.user_registration_role)
-                ret.update({"username": uid,
-                            "first_name": first_name,
-                            "last_name": last_name,
-                            "email": email,
-                            "roles": list(roles),
-                            "ldap_groups": list(ldap_groups),
-                            })
-                break
-            if len(ret) == 0:
+            u = directory.get_by_uid(username)
+            if u is None:
                 self.log.error(f"User \"{username}\" NOT found in LDAP cache")
                 return None
-            else:
-                return ret
+            return self.ext_ldap_user_from_entry(username, u)
         except Exception as e:
             self.log.error(f"Failed extract user \"{username}\" from LDAP cache. Error: {e}")
             return None
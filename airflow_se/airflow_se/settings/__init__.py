@@ -6,6 +6,7 @@ from typing import Optional
 from flask import Flask, Config
 from airflow.configuration import AirflowConfigParser
 
+from airflow_se.config import config_snapshot
 from .settings_class import Settings
 
 __all__ = [
@@ -30,5 +31,7 @@ def get_settings(
         airflow_config=airflow_config,
         silent=silent,
     )
+    # после перечитывания конфига (refresh/SIGHUP) параметры вычисляются заново
+    config_snapshot.add_listener(__settings_instance.refresh)
     return __settings_instance
 
@@ -51,6 +51,7 @@ from .settings_defaults import (
     DEF_LDAP_UID_FIELD,
     DEF_LDAP_BIND_USER_PATH_KRB5CC,
     DEF_LDAP_GROUP_FIELD,
+    DEF_LDAP_DIRECTORY_CHECK_INTERVAL,
     DEF_LDAP_REFRESH_CACHE_ON_START,
     DEF_LDAP_PROCESS_TIMEOUT,
     DEF_LDAP_PROCESS_RETRY,
@@ -61,9 +62,12 @@ from .settings_defaults import (
     DEF_KAFKA_PROCESS_TIMEOUT,
     DEF_KAFKA_PROCESS_RETRY,
     DEF_KAFKA_PAGE_SIZE,
+    DEF_KAFKA_MARK_BATCH_SIZE,
     DEF_TICKETMAN_SCAN_DIRS,
     DEF_TICKETMAN_PROCESS_TIMEOUT,
     DEF_TICKETMAN_PROCESS_RETRY,
+    DEF_TICKETMAN_WORKERS,
+    DEF_TICKETMAN_RENEW_MARGIN,
     DEF_DEBUG,
     DEF_DEBUG_MASK,
     DEF_BLOCK_CHANGE_POLICY,
@@ -198,6 +202,11 @@ class Settings(LoggingMixin):
         """Конфигурация Airflow, файл `airflow.cfg`"""
         return self.__airflow_config
 
+    def refresh(self):
+        """Сбрасывает вычисленные параметры, при следующем обращении они будут прочитаны заново"""
+        for attr in [k for k in self.__dict__ if k.startswith("_lazy_")]:
+            self.__dict__.pop(attr, None)
+
     def get_param_af(self, section: str, key: str, default: Optional[str] = None) -> Result:
         """Получает из файла `airflow.cfg` значение по секции и ключу."""
         _section, _key, _default, _res = check_str(section), check_str(key), check_str(default), Result.Ok()
@@ -967,6 +976,31 @@ class Settings(LoggingMixin):
         self.log_debug(*res.error)
         return "memberOf"
 
+    @lazy_property
+    def ldap_directory_check_interval(self) -> int:
+        """
+        # Как часто (в секундах) веб-сервер проверяет в БД наличие свежего кэша LDAP
+        # Тип int, диапазон от 0 до 3600 (0 - проверять при каждом обращении)
+        # Параметр не обязательный
+        # По умолчанию 30
+        """
+        _res = self.get_int("LDAP_DIRECTORY_CHECK_INTERVAL", DEF_LDAP_DIRECTORY_CHECK_INTERVAL)
+        if _res.success:
+            res = check_range_int(_res.value, min_value=0, max_value=3600,
+                                  def_value=DEF_LDAP_DIRECTORY_CHECK_INTERVAL)
+            if res.success:
+                return res.value
+            else:
+                self.log_warning(f"{self.__path}ldap_directory_check_interval() >> parameter "
+                                 f"\"LDAP_DIRECTORY_CHECK_INTERVAL\" must be range 0...3600 -> "
+                                 f"value automatically set to equal {DEF_LDAP_DIRECTORY_CHECK_INTERVAL}")
+        else:
+            _res.error = f"{self.__path}ldap_directory_check_interval() >> parameter "\
+                         f"\"LDAP_DIRECTORY_CHECK_INTERVAL\" not found, "\
+                         f"set default value as {DEF_LDAP_DIRECTORY_CHECK_INTERVAL}"
+            self.log_debug(*_res.error)
+        return DEF_LDAP_DIRECTORY_CHECK_INTERVAL
+
     @lazy_property
     def ldap_tls_cacertdir(self) -> Optional[str]:
         """Сертификаты: """
@@ -1267,6 +1301,28 @@ class Settings(LoggingMixin):
             self.log_debug(*_res.error)
         return 1000
 
+    @lazy_property
+    def kafka_mark_batch_size(self) -> int:
+        """
+        # Максимальное количество доставленных сообщений, помечаемых в БД как отправленные одним запросом
+        # Тип int, диапазон от 1 до 10000
+        # Параметр не обязательный
+        # По умолчанию 1000
+        """
+        _res = self.get_int("KAFKA_MARK_BATCH_SIZE", DEF_KAFKA_MARK_BATCH_SIZE)
+        if _res.success:
+            res = check_range_int(_res.value, min_value=1, max_value=10000, def_value=DEF_KAFKA_MARK_BATCH_SIZE)
+            if res.success:
+                return res.value
+            else:
+                self.log_warning(f"{self.__path}kafka_mark_batch_size() >> parameter \"KAFKA_MARK_BATCH_SIZE\" "
+                                 f"must be range 1...10000 -> value automatically set to equal 1000")
+        else:
+            _res.error = f"{self.__path}kafka_mark_batch_size() >> parameter \"KAFKA_MARK_BATCH_SIZE\" not found, "\
+                         f"set default value as 1000"
+            self.log_debug(*_res.error)
+        return 1000
+
     #################################################################################################
     ###                                 Настройки TicketMan                                       ###
     #################################################################################################
@@ -1314,6 +1370,51 @@ class Settings(LoggingMixin):
                            f"not found -> value automatically set to equal None")
         return None
 
+    @lazy_property
+    def ticketman_workers(self) -> int:
+        """
+        # Количество тикетов, обновляемых одновременно
+        # Тип int, диапазон от 1 до 64
+        # Параметр не обязательный
+        # По умолчанию 8
+        """
+        _res = self.get_int("TICKETMAN_WORKERS", DEF_TICKETMAN_WORKERS)
+        if _res.success:
+            res = check_range_int(_res.value, min_value=1, max_value=64, def_value=DEF_TICKETMAN_WORKERS)
+            if res.success:
+                return res.value
+            else:
+                self.log_warning(f"{self.__path}ticketman_workers() >> parameter \"TICKETMAN_WORKERS\" "
+                                 f"must be range 1...64 -> value automatically set to equal 8")
+        else:
+            _res.error = f"{self.__path}ticketman_workers() >> parameter \"TICKETMAN_WORKERS\" not found, "\
+                         f"set default value as 8"
+            self.log_debug(*_res.error)
+        return 8
+
+    @lazy_property
+    def ticketman_renew_margin(self) -> int:
+        """
+        # Запас в секундах: тикет обновляется, если он истечёт раньше, чем через
+        # (TICKETMAN_PROCESS_TIMEOUT + TICKETMAN_RENEW_MARGIN) секунд, иначе пропускается до следующего цикла
+        # Тип int, диапазон от 0 до 86400 (сутки)
+        # Параметр не обязательный
+        # По умолчанию 3600 (1 час)
+        """
+        _res = self.get_int("TICKETMAN_RENEW_MARGIN", DEF_TICKETMAN_RENEW_MARGIN)
+        if _res.success:
+            res = check_range_int(_res.value, min_value=0, max_value=86400, def_value=DEF_TICKETMAN_RENEW_MARGIN)
+            if res.success:
+                return res.value
+            else:
+                self.log_warning(f"{self.__path}ticketman_renew_margin() >> parameter \"TICKETMAN_RENEW_MARGIN\" "
+                                 f"must be range 0...86400 -> value automatically set to equal 3600")
+        else:
+            _res.error = f"{self.__path}ticketman_renew_margin() >> parameter \"TICKETMAN_RENEW_MARGIN\" not found, "\
+                         f"set default value as 3600"
+            self.log_debug(*_res.error)
+        return 3600
+
     @lazy_property
     def ticketman_scan_dirs(self) -> Optional[Set[str]]:
         """
@@ -22,6 +22,7 @@ __all__ = [
     "DEF_LDAP_UID_FIELD",
     "DEF_LDAP_BIND_USER_PATH_KRB5CC",
     "DEF_LDAP_GROUP_FIELD",
+    "DEF_LDAP_DIRECTORY_CHECK_INTERVAL",
     "DEF_LDAP_REFRESH_CACHE_ON_START",
     "DEF_LDAP_PROCESS_TIMEOUT",
     "DEF_LDAP_PROCESS_RETRY",
@@ -32,9 +33,12 @@ __all__ = [
     "DEF_KAFKA_PROCESS_TIMEOUT",
     "DEF_KAFKA_PROCESS_RETRY",
     "DEF_KAFKA_PAGE_SIZE",
+    "DEF_KAFKA_MARK_BATCH_SIZE",
     "DEF_TICKETMAN_SCAN_DIRS",
     "DEF_TICKETMAN_PROCESS_TIMEOUT",
     "DEF_TICKETMAN_PROCESS_RETRY",
+    "DEF_TICKETMAN_WORKERS",
+    "DEF_TICKETMAN_RENEW_MARGIN",
     "DEF_DEBUG",
     "DEF_DEBUG_MASK",
     "DEF_BLOCK_CHANGE_POLICY",
@@ -81,6 +85,7 @@ DEF_LDAP_EMAIL_FIELD = "mail"
 DEF_LDAP_UID_FIELD = "uid"
 DEF_LDAP_BIND_USER_PATH_KRB5CC = "/tmp/airflow_spn_ccache"
 DEF_LDAP_GROUP_FIELD = "memberOf"
+DEF_LDAP_DIRECTORY_CHECK_INTERVAL = 30
 
 DEF_LDAP_REFRESH_CACHE_ON_START = False
 DEF_LDAP_PROCESS_TIMEOUT = 600
@@ -97,6 +102,7 @@ DEF_LDAP_DELETE_CACHES_DAYS_AGO = timedelta(days=30)
 DEF_KAFKA_PROCESS_TIMEOUT = 300
 DEF_KAFKA_PROCESS_RETRY = None
 DEF_KAFKA_PAGE_SIZE = 1000
+DEF_KAFKA_MARK_BATCH_SIZE = 1000
 
 #################################################################################################
 ###                                 Настройки TicketMan                                       ###
@@ -105,6 +111,8 @@ DEF_KAFKA_PAGE_SIZE = 1000
 DEF_TICKETMAN_SCAN_DIRS = None
 DEF_TICKETMAN_PROCESS_TIMEOUT = 25200
 DEF_TICKETMAN_PROCESS_RETRY = None
+DEF_TICKETMAN_WORKERS = 8
+DEF_TICKETMAN_RENEW_MARGIN = 3600
 
 #################################################################################################
 ###                                 Общие параметры.                                          ###
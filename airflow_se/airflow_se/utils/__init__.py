@@ -5,6 +5,7 @@
 from .logo import show_logo
 from .cmd import run_command
 from .krb import run_kinit, run_klist, run_kvno
+from .ccache import get_ticket_expiry
 from .time import timedelta_to_human_format
 from .env import get_all_envs, update_envs, get_env, add_env, pop_env
 from .os_use import get_pid
@@ -20,6 +21,7 @@ __all__ = [
     'run_kinit',
     'run_klist',
     'run_kvno',
+    'get_ticket_expiry',
     'timedelta_to_human_format',
     'get_all_envs',
     'update_envs',
@@ -0,0 +1,97 @@
+"""
+Чтение срока действия тикета напрямую из файла кэша Kerberos (формат FILE: версий 3 и 4),
+чтобы не запускать ради этого утилиту klist.
+"""
+from struct import unpack_from
+from typing import Optional, List, Tuple
+
+__all__ = [
+    'get_ticket_expiry',
+]
+
+_CONF_REALM = 'X-CACHECONF:'
+
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+
+    def eof(self) -> bool:
+        return self.pos >= len(self.data)
+
+    def u8(self) -> int:
+        (v, ) = unpack_from('>B', self.data, self.pos)
+        self.pos += 1
+        return v
+
+    def u16(self) -> int:
+        (v, ) = unpack_from('>H', self.data, self.pos)
+        self.pos += 2
+        return v
+
+    def u32(self) -> int:
+        (v, ) = unpack_from('>I', self.data, self.pos)
+        self.pos += 4
+        return v
+
+    def octets(self) -> bytes:
+        size = self.u32()
+        if self.pos + size > len(self.data):
+            raise ValueError('unexpected end of ccache file')
+        v = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return v
+
+    def principal(self) -> Tuple[str, List[str]]:
+        _ = self.u32()  # name type
+        count = self.u32()
+        realm = self.octets().decode('utf-8', 'replace')
+        return realm, [self.octets().decode('utf-8', 'replace') for _ in range(count)]
+
+
+def get_ticket_expiry(ticket: str) -> Optional[int]:
+    """
+    Возвращает время окончания действия TGT (unix timestamp) из файла кэша Kerberos.
+    Если TGT в кэше нет, то минимальное время окончания среди остальных билетов.
+    None - файл не найден, пустой или формат не поддерживается.
+    """
+    try:
+        with open(ticket, 'rb') as f:
+            r = _Reader(f.read())
+        version = r.u16()
+        if version not in (0x0503, 0x0504):
+            return None
+        if version == 0x0504:
+            header_size = r.u16()
+            r.pos += header_size  # заголовок с тегами пропускаем
+        client_realm, _ = r.principal()
+        tgt_end: Optional[int] = None
+        min_end: Optional[int] = None
+        while not r.eof():
+            r.principal()  # client
+            server_realm, server = r.principal()
+            r.u16()  # enctype
+            if version == 0x0503:
+                r.u16()  # в версии 3 enctype записан дважды
+            r.octets()  # key
+            _, _, end_time, _ = r.u32(), r.u32(), r.u32(), r.u32()  # authtime, starttime, endtime, renew_till
+            r.u8()  # is_skey
+            r.u32()  # ticket flags
+            for _ in range(r.u32()):  # addresses
+                r.u16()
+                r.octets()
+            for _ in range(r.u32()):  # authdata
+                r.u16()
+                r.octets()
+            r.octets()  # ticket
+            r.octets()  # second ticket
+            if server_realm == _CONF_REALM:
+                continue
+            if len(server) == 2 and server[0] == 'krbtgt' and server[1] == client_realm:
+                tgt_end = end_time
+            min_end = end_time if min_end is None else min(min_end, end_time)
+        return tgt_end if tgt_end is not None else min_end
+    except Exception:
+        # файла нет или он битый (OSError, ValueError, struct.error)
+        return None
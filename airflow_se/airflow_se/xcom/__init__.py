@@ -1,8 +1,17 @@
-
 """
 
 """
-from .xcom import XComSE
-
-__all__ = ['XComSE', ]
+from .xcom import XComSE, cleanup_orphaned_blobs
+from .codec import ORPHAN_POLICIES, XComCodec, get_xcom_codec
+from .blob_store import BlobStore, LocalBlobStore, S3BlobStore
 
+__all__ = [
+    'XComSE',
+    'cleanup_orphaned_blobs',
+    'ORPHAN_POLICIES',
+    'XComCodec',
+    'get_xcom_codec',
+    'BlobStore',
+    'LocalBlobStore',
+    'S3BlobStore',
+]
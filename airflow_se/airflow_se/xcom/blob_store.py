@@ -0,0 +1,144 @@
+"""
+Хранилища больших значений XCom (в БД метаданных остаётся только ссылка на объект)
+"""
+import os
+import re
+from tempfile import NamedTemporaryFile
+from typing import Iterable, Iterator, Any
+
+__all__ = [
+    "BlobStore",
+    "LocalBlobStore",
+    "S3BlobStore",
+]
+
+
+class BlobStore:
+    """Хранилище объектов по ключу (ключ - путь вида `a/b/c`)"""
+    name: str = "base"
+
+    @staticmethod
+    def safe(part: Any) -> str:
+        """Часть ключа без символов, недопустимых в пути и в ключе S3"""
+        return re.sub(r"[^\w.=-]", "_", str(part)) or "_"
+
+    def put(self, key: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    def get(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    def delete(self, keys: Iterable[str]) -> None:
+        raise NotImplementedError
+
+    def list(self, older_than: float) -> Iterator[str]:
+        """Ключи объектов, изменённых раньше `older_than` (unix time)"""
+        raise NotImplementedError
+
+
+class LocalBlobStore(BlobStore):
+    """Объекты в файлах локальной (или общей, смонтированной на все воркеры) директории"""
+    name = "local"
+
+    def __init__(self, path: str):
+        self.path: str = os.path.abspath(path)
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.path, key))
+        if not path.startswith(self.path + os.sep):
+            raise ValueError(f"Key \"{key}\" is outside of the store")
+        return path
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        with NamedTemporaryFile(dir=os.path.dirname(path), prefix=".", suffix=".tmp", delete=False) as f:
+            try:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            except BaseException:
+                os.unlink(f.name)
+                raise
+        os.replace(f.name, path)
+
+    def get(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def delete(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            path = self._path(key)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            # пустые директории запусков не копим
+            dir_name = os.path.dirname(path)
+            while dir_name != self.path:
+                try:
+                    os.rmdir(dir_name)
+                except OSError:
+                    break
+                dir_name = os.path.dirname(dir_name)
+
+    def list(self, older_than: float) -> Iterator[str]:
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                if name.startswith("."):
+                    continue  # незаконченная запись
+                path = os.path.join(root, name)
+                try:
+                    if os.stat(path).st_mtime >= older_than:
+                        continue
+                except FileNotFoundError:
+                    continue
+                yield os.path.relpath(path, self.path).replace(os.sep, "/")
+
+
+class S3BlobStore(BlobStore):
+    """Объекты в корзине S3 совместимого хранилища"""
+    name = "s3"
+
+    def __init__(self, client: Any, bucket: str, prefix: str = "", page_size: int = 1000):
+        """
+        :client: клиент boto3 S3 (потокобезопасен) или совместимый объект
+        :bucket: имя корзины
+        :prefix: префикс ключей (директория в корзине), с "/" на конце или пустой
+        :page_size: количество ключей на страницу листинга и на запрос удаления
+        """
+        self.client = client
+        self.bucket: str = bucket
+        self.prefix: str = prefix
+        self.page_size: int = page_size
+
+    def put(self, key: str, data: bytes) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=f"{self.prefix}{key}", Body=data)
+
+    def get(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=f"{self.prefix}{key}")["Body"].read()
+
+    def delete(self, keys: Iterable[str]) -> None:
+        batch = list()
+        for key in keys:
+            batch.append({"Key": f"{self.prefix}{key}"})
+            if len(batch) >= self.page_size:
+                self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": batch, "Quiet": True})
+                batch = list()
+        if batch:
+            self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": batch, "Quiet": True})
+
+    def list(self, older_than: float) -> Iterator[str]:
+        kwargs = dict(Bucket=self.bucket, Prefix=self.prefix, MaxKeys=self.page_size)
+        while True:
+            page = self.client.list_objects_v2(**kwargs)
+            for obj in page.get("Contents") or []:
+                modified = obj["LastModified"]
+                if hasattr(modified, "timestamp"):
+                    modified = modified.timestamp()
+                if modified < older_than:
+                    yield obj["Key"][len(self.prefix):]
+            if not page.get("IsTruncated"):
+                break
+            kwargs["ContinuationToken"] = page["NextContinuationToken"]
@@ -0,0 +1,197 @@
+"""
+Упаковка значений XCom: сжатие, шифрование (Fernet, см. `airflow_se.crypt`) и вынос больших значений в хранилище
+"""
+import os
+import zlib
+from threading import Lock
+from typing import Optional
+
+from airflow_se.crypt import encrypt, decrypt
+from airflow_se.config import get_config_value, config_snapshot
+from airflow_se.logger import LoggingMixinSE
+
+from .blob_store import BlobStore, LocalBlobStore, S3BlobStore
+
+__all__ = [
+    "ORPHAN_POLICIES",
+    "MAGIC",
+    "REF_PREFIX",
+    "XComCodec",
+    "get_xcom_codec",
+]
+
+# keep - объекты хранилища не удаляются никогда,
+# delete - удаляются объекты удалённых записей XCom и объекты, на которые не ссылается ни одна запись
+ORPHAN_POLICIES = ("keep", "delete", )
+
+# заголовок упакованного значения: MAGIC + флаги + ":"
+# z - сжато zlib, e - зашифровано, r - значение в хранилище (дальше ключ объекта)
+MAGIC = b"SE1:"
+REF_PREFIX = MAGIC + b"r:"
+
+DEF_COMPRESS_THRESHOLD = 1024
+DEF_OFFLOAD_THRESHOLD = 1024 * 1024
+DEF_ORPHAN_MIN_AGE = 24 * 3600
+
+
+class XComCodec(LoggingMixinSE):
+    """
+    Значение длиннее `compress_threshold` байт сжимается, затем (если `encrypt`) шифруется.
+    Упакованное значение длиннее `offload_threshold` байт кладётся в `store`, в БД пишется ссылка на объект.
+    Значения без заголовка (записанные до XComSE) возвращаются как есть.
+    """
+    def __init__(
+            self,
+            compress_threshold: Optional[int] = DEF_COMPRESS_THRESHOLD,
+            offload_threshold: Optional[int] = DEF_OFFLOAD_THRESHOLD,
+            store: Optional[BlobStore] = None,
+            encrypt_values: bool = True,
+            compress_level: int = 6,
+            orphan_policy: str = "delete",
+            orphan_min_age: int = DEF_ORPHAN_MIN_AGE,
+            debug: bool = False,
+    ):
+        """
+        :compress_threshold: минимальная длина сжимаемого значения (байт), None - не сжимать
+        :offload_threshold: минимальная длина значения, выносимого в хранилище (байт), None - не выносить
+        :store: хранилище больших значений, None - значения всегда остаются в БД
+        :encrypt_values: шифровать значения
+        :compress_level: уровень сжатия zlib
+        :orphan_policy: политика удаления объектов хранилища, см. ORPHAN_POLICIES
+        :orphan_min_age: объект без ссылки удаляется, если он старше стольких секунд
+            (запись XCom появляется в БД позже объекта)
+        """
+        super().__init__(debug)
+        if orphan_policy not in ORPHAN_POLICIES:
+            raise ValueError(f"Unknown orphan policy \"{orphan_policy}\", must be one of {ORPHAN_POLICIES}")
+        self.compress_threshold: Optional[int] = compress_threshold
+        self.offload_threshold: Optional[int] = offload_threshold
+        self.store: Optional[BlobStore] = store
+        self.encrypt_values: bool = encrypt_values
+        self.compress_level: int = compress_level
+        self.orphan_policy: str = orphan_policy
+        self.orphan_min_age: int = orphan_min_age
+
+    def pack(self, data: bytes) -> bytes:
+        flags = b""
+        if self.compress_threshold is not None and len(data) >= self.compress_threshold:
+            compressed = zlib.compress(data, self.compress_level)
+            if len(compressed) < len(data):
+                data, flags = compressed, flags + b"z"
+        if self.encrypt_values:
+            data, flags = encrypt(data).encode("ascii"), flags + b"e"
+        return MAGIC + flags + b":" + data
+
+    @staticmethod
+    def unpack(data: bytes) -> bytes:
+        if not data.startswith(MAGIC):
+            return data
+        flags, _, data = data[len(MAGIC):].partition(b":")
+        if b"r" in flags:
+            raise ValueError("Value is a reference to the blob store, use decode")
+        if b"e" in flags:
+            data = decrypt(data)
+        if b"z" in flags:
+            data = zlib.decompress(data)
+        return data
+
+    @staticmethod
+    def reference(data: Optional[bytes]) -> Optional[str]:
+        """Ключ объекта хранилища, если значение вынесено в хранилище"""
+        if isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:len(REF_PREFIX)]) == REF_PREFIX:
+            return bytes(data[len(REF_PREFIX):]).decode("utf-8")
+        return None
+
+    def encode(self, data: bytes, blob_key: str) -> bytes:
+        """Упакованное значение для записи в БД (или ссылка на объект `blob_key` в хранилище)"""
+        packed = self.pack(data)
+        if self.store is None or self.offload_threshold is None or len(packed) < self.offload_threshold:
+            return packed
+        self.store.put(blob_key, packed)
+        self.log_debug(f"XCom value of {len(packed)} bytes is offloaded to {self.store.name} store: {blob_key}")
+        return REF_PREFIX + blob_key.encode("utf-8")
+
+    def decode(self, data: Optional[bytes]) -> Optional[bytes]:
+        if data is None:
+            return None
+        data = bytes(data)
+        key = self.reference(data)
+        if key is not None:
+            if self.store is None:
+                raise ValueError(f"XCom value is in the blob store (\"{key}\"), but the store is not configured")
+            data = self.store.get(key)
+        return self.unpack(data)
+
+
+def _optional_int(key: str, default: int) -> Optional[int]:
+    value = get_config_value(key, default=default)
+    return None if value is None or value is False or int(value) < 0 else int(value)
+
+
+def _s3_client():
+    import boto3
+    from airflow_se.secman import get_secman_data, auth_secman
+    from airflow_se.commons import SECMAN_KEY_FOR_SECRET
+    secret_key = (get_secman_data(SECMAN_KEY_FOR_SECRET, auth_secman()) or dict()).get("SE_AWS_SECRET_KEY")
+    if not secret_key:
+        raise ValueError("not found SE_AWS_SECRET_KEY in Secman")
+    return boto3.client(
+        service_name="s3",
+        aws_secret_access_key=decrypt(secret_key).decode("utf-8"),
+        aws_access_key_id=get_config_value("AWS_ACCESS_ID"),
+        endpoint_url=":".join([get_config_value("AWS_URL"), str(get_config_value("AWS_PORT"))]),
+    )
+
+
+def _store_from_config() -> Optional[BlobStore]:
+    kind = get_config_value("XCOM_BLOB_STORE")
+    if not kind:
+        return None
+    if kind == "local":
+        return LocalBlobStore(
+            get_config_value("XCOM_BLOB_PATH") or os.path.join(os.environ.get("AIRFLOW_HOME", "."), "xcom_se")
+        )
+    if kind == "s3":
+        return S3BlobStore(
+            client=_s3_client(),
+            bucket=get_config_value("XCOM_BLOB_BUCKET") or get_config_value("AWS_BUCKET_NAME"),
+            prefix=get_config_value("XCOM_BLOB_PREFIX", default="xcom/"),
+        )
+    raise ValueError(f"Unknown XCom blob store \"{kind}\", must be one of ('local', 's3')")
+
+
+_codec: Optional[XComCodec] = None
+_codec_lock = Lock()
+
+
+def _reset_codec():
+    global _codec
+    _codec = None
+
+
+config_snapshot.add_listener(_reset_codec)
+
+
+def get_xcom_codec() -> XComCodec:
+    """
+    Упаковщик процесса по параметрам конфига SE (пересоздаётся при обновлении конфига):
+    XCOM_COMPRESS_THRESHOLD, XCOM_OFFLOAD_THRESHOLD (байт, отрицательное значение - отключено),
+    XCOM_ENCRYPT, XCOM_BLOB_STORE (local, s3 или пусто), XCOM_BLOB_PATH (для local),
+    XCOM_BLOB_BUCKET и XCOM_BLOB_PREFIX (для s3, подключение как у синхронизации DAG с S3),
+    XCOM_BLOB_ORPHAN_POLICY, XCOM_BLOB_ORPHAN_MIN_AGE (сек)
+    """
+    global _codec
+    codec = _codec
+    if codec is None:
+        with _codec_lock:
+            codec = _codec
+            if codec is None:
+                codec = _codec = XComCodec(
+                    compress_threshold=_optional_int("XCOM_COMPRESS_THRESHOLD", DEF_COMPRESS_THRESHOLD),
+                    offload_threshold=_optional_int("XCOM_OFFLOAD_THRESHOLD", DEF_OFFLOAD_THRESHOLD),
+                    store=_store_from_config(),
+                    encrypt_values=get_config_value("XCOM_ENCRYPT", default=True) is not False,
+                    orphan_policy=get_config_value("XCOM_BLOB_ORPHAN_POLICY", default="delete"),
+                    orphan_min_age=int(get_config_value("XCOM_BLOB_ORPHAN_MIN_AGE", default=DEF_ORPHAN_MIN_AGE)),
+                )
+    return codec
@@ -1,34 +1,104 @@
-
 """
-
+Бэкенд XCom: значения сериализуются штатно (JSON/pickle Airflow), сжимаются, шифруются,
+большие значения выносятся в хранилище (см. `get_xcom_codec`)
 """
-from typing import Any
-from ..obj_imp import BaseXCom
+from argparse import ArgumentParser
+from time import time
+from types import SimpleNamespace
+from typing import Any, Optional, List
+from uuid import uuid4
+
+from sqlalchemy import func
+
+from ..obj_imp import BaseXCom, create_session
+from .blob_store import BlobStore
+from .codec import XComCodec, REF_PREFIX, get_xcom_codec
 
-__all__ = ['XComSE', ]
+__all__ = [
+    'XComSE',
+    'cleanup_orphaned_blobs',
+    'run',
+]
+
+
+def blob_key(key: Any, task_id: Any, dag_id: Any, run_id: Any, map_index: Any) -> str:
+    """Ключ объекта хранилища для значения (уникальный, повторная запись XCom не перетирает прежний объект)"""
+    safe = BlobStore.safe
+    map_index = -1 if map_index is None else map_index
+    return f"{safe(dag_id)}/{safe(run_id)}/{safe(task_id)}/{safe(map_index)}/{safe(key)}.{uuid4().hex}"
 
 
 class XComSE(BaseXCom):
     """
-
+    XCom с упаковкой значений.
+    В БД лежит `SE1:<флаги>:<данные>` или ссылка `SE1:r:<ключ>` на объект хранилища,
+    значения, записанные без упаковки, читаются как раньше.
     """
 
     @staticmethod
     def serialize_value(
         value,
-        key = None,
-        task_id = None,
-        dag_id = None,
-        run_id = None,
-        map_index = None,
+        key=None,
+        task_id=None,
+        dag_id=None,
+        run_id=None,
+        map_index=None,
         **kwargs
     ) -> Any:
-        return '{}'
+        data = BaseXCom.serialize_value(
+            value, key=key, task_id=task_id, dag_id=dag_id, run_id=run_id, map_index=map_index,
+        )
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        return get_xcom_codec().encode(data, blob_key(key, task_id, dag_id, run_id, map_index))
 
     @staticmethod
     def deserialize_value(result) -> Any:
-        return dict()
+        return BaseXCom._deserialize_value(SimpleNamespace(value=get_xcom_codec().decode(result.value)), False)
 
     def orm_deserialize_value(self) -> Any:
-        return dict()
+        # список XCom в веб интерфейсе не тянет объекты из хранилища
+        ref = XComCodec.reference(self.value)
+        if ref is not None:
+            return f'<XComSE blob: {ref}>'
+        return BaseXCom._deserialize_value(SimpleNamespace(value=get_xcom_codec().decode(self.value)), True)
+
+    @classmethod
+    def purge(cls, xcom, session=None) -> None:
+        """Удаление объекта хранилища удаляемой записи (вызывается Airflow 2.8+ при перезаписи и очистке XCom)"""
+        ref = XComCodec.reference(xcom.value)
+        codec = get_xcom_codec()
+        if ref is not None and codec.store is not None and codec.orphan_policy == 'delete':
+            codec.store.delete([ref])
+
+
+def cleanup_orphaned_blobs(codec: Optional[XComCodec] = None, session=None, dry_run: bool = False) -> List[str]:
+    """
+    Объекты хранилища, на которые не ссылается ни одна запись XCom и которые старше `orphan_min_age`.
+    По политике `delete` (и если не `dry_run`) они удаляются, по политике `keep` только возвращаются.
+    """
+    codec = codec or get_xcom_codec()
+    if codec.store is None:
+        return list()
+    older_than = time() - codec.orphan_min_age
+    if session is None:
+        with create_session() as sess:
+            return cleanup_orphaned_blobs(codec, sess, dry_run)
+    referenced = set()
+    # substr, а не like: like по бинарному столбцу работает не во всех СУБД
+    query = session.query(BaseXCom.value).filter(func.substr(BaseXCom.value, 1, len(REF_PREFIX)) == REF_PREFIX)
+    for (value, ) in query.yield_per(1000):
+        referenced.add(XComCodec.reference(value))
+    orphans = [key for key in codec.store.list(older_than) if key not in referenced]
+    if orphans and codec.orphan_policy == 'delete' and not dry_run:
+        codec.store.delete(orphans)
+        codec.log_info(f'Deleted {len(orphans)} orphaned XCom blobs from {codec.store.name} store')
+    return orphans
+
 
+def run():
+    parser = ArgumentParser(description='Cleanup of orphaned XCom blobs of XComSE')
+    parser.add_argument('--dry-run', dest='dry_run', action='store_true', help='only list orphaned blobs')
+    cla = parser.parse_args()
+    for key in cleanup_orphaned_blobs(dry_run=cla.dry_run):
+        print(key)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+Сравнение записи аудита по одной записи (сессия и коммит на запись, как `create_new_audit_record`)
+и через `AuditWriter` (вставка пачками) на SQLite.
+
+Запуск:
+    python benchmarks/audit_writer_sqlite.py [--records 50000] [--batch-size 500] [--db /tmp/audit_bench.db]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from socket import getfqdn
+from tempfile import mkdtemp
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from airflow_se.db.audit_writer import AuditWriter  # noqa: E402
+
+DDL = """
+CREATE TABLE IF NOT EXISTS se_audit (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts TIMESTAMP NOT NULL,
+    is_pushed BOOLEAN NOT NULL,
+    host VARCHAR(255) NOT NULL,
+    remote_addr VARCHAR(50) NOT NULL,
+    remote_login VARCHAR(100) NOT NULL,
+    code_op VARCHAR(100) NOT NULL,
+    app_id VARCHAR(100) NOT NULL,
+    type_id VARCHAR(50) NOT NULL,
+    subtype_id VARCHAR(50) NOT NULL,
+    status_op VARCHAR(50) NOT NULL,
+    extras_json TEXT NOT NULL
+)
+"""
+COLUMNS = ("ts", "is_pushed", "host", "remote_addr", "remote_login", "code_op",
+           "app_id", "type_id", "subtype_id", "status_op", "extras_json", )
+INSERT = f"INSERT INTO se_audit ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+
+def make_record(i: int) -> dict:
+    return dict(
+        ts=datetime.now(),
+        is_pushed=False,
+        host=getfqdn(),
+        remote_addr="127.0.0.1",
+        remote_login=f"user_{i % 100}",
+        code_op="other audit operations",
+        app_id="airflow",
+        type_id="Audit",
+        subtype_id="F0",
+        status_op="SUCCESS",
+        extras_json=json.dumps({"PARAMS": {"EVENT": f"benchmark event {i}"}, "SESSION_ID": str(i)}),
+    )
+
+
+def connect(db: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db, check_same_thread=False)
+    conn.execute(DDL)
+    conn.execute("DELETE FROM se_audit")
+    conn.commit()
+    return conn
+
+
+def bench_per_record(db: str, n: int) -> float:
+    connect(db).close()
+    started = perf_counter()
+    for i in range(n):
+        # как create_new_audit_record: новое подключение из пула и коммит на каждую запись
+        with sqlite3.connect(db) as conn:
+            conn.execute(INSERT, tuple(make_record(i)[c] for c in COLUMNS))
+        conn.close()
+    return perf_counter() - started
+
+
+def bench_batched(db: str, n: int, batch_size: int) -> float:
+    def insert(records):
+        with sqlite3.connect(db) as conn:
+            conn.executemany(INSERT, [tuple(r[c] for c in COLUMNS) for r in records])
+        conn.close()
+
+    connect(db).close()
+    writer = AuditWriter(insert=insert, batch_size=batch_size, flush_interval=0.5,
+                         buffer_limit=max(n, batch_size), spill_dir=mkdtemp(prefix="audit_bench_"))
+    started = perf_counter()
+    for i in range(n):
+        writer.write(make_record(i))
+    writer.close()
+    return perf_counter() - started
+
+
+def count(db: str) -> int:
+    with sqlite3.connect(db) as conn:
+        return conn.execute("SELECT count(*) FROM se_audit").fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--db", default=os.path.join(mkdtemp(prefix="audit_bench_"), "audit.db"))
+    args = parser.parse_args()
+
+    t_one = bench_per_record(args.db, args.records)
+    assert count(args.db) == args.records
+    t_batch = bench_batched(args.db, args.records, args.batch_size)
+    assert count(args.db) == args.records
+    print(f"records: {args.records}, batch size: {args.batch_size}, db: {args.db}")
+    print(f"per-record: {t_one:8.3f} s, {args.records / t_one:10.0f} records/s")
+    print(f"batched:    {t_batch:8.3f} s, {args.records / t_batch:10.0f} records/s")
+    print(f"speedup:    {t_one / t_batch:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+"""
+Сравнение отправки неотправленных записей аудита в Кафку по одной (produce + poll(10) и UPDATE на запись,
+как `se_kafka` до конвейера) и конвейером `Kafka.delivery_messages_to_kafka` (produce без блокирующих poll(),
+UPDATE на пачку) с асинхронным продюсером-заглушкой и таблицей se_audit в SQLite.
+
+Параметры `Kafka` задаются через переменные окружения SE_KAFKA_*, как у `se_kafka`.
+
+Запуск:
+    python benchmarks/kafka_delivery.py [--records 10000] [--latency-ms 1] [--mark-batch-size 1000] [--db /tmp/a.db]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from argparse import Namespace
+from collections import deque
+from datetime import datetime
+from socket import getfqdn
+from tempfile import mkdtemp
+from time import monotonic, perf_counter, sleep
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# отдельный AIRFLOW_HOME: настройки SE берутся только из переменных окружения бенчмарка
+os.environ["AIRFLOW_HOME"] = mkdtemp(prefix="kafka_bench_")
+open(os.path.join(os.environ["AIRFLOW_HOME"], "webserver_config.py"), "w").close()
+# пакет airflow_se.db создаёт engine с параметрами пула при импорте (к БД бенчмарк не подключается)
+os.environ.setdefault("AIRFLOW__DATABASE__SQL_ALCHEMY_CONN", "postgresql://airflow@localhost/airflow")
+
+from airflow_se import proc_kafka  # noqa: E402
+
+DDL = """
+CREATE TABLE IF NOT EXISTS se_audit (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts TIMESTAMP NOT NULL,
+    is_pushed BOOLEAN NOT NULL,
+    host VARCHAR(255) NOT NULL,
+    remote_addr VARCHAR(50) NOT NULL,
+    remote_login VARCHAR(100) NOT NULL,
+    code_op VARCHAR(100) NOT NULL,
+    app_id VARCHAR(100) NOT NULL,
+    type_id VARCHAR(50) NOT NULL,
+    subtype_id VARCHAR(50) NOT NULL,
+    status_op VARCHAR(50) NOT NULL,
+    extras_json TEXT NOT NULL
+)
+"""
+COLUMNS = ("ts", "is_pushed", "host", "remote_addr", "remote_login", "code_op",
+           "app_id", "type_id", "subtype_id", "status_op", "extras_json", )
+INSERT = f"INSERT INTO se_audit ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+
+def make_record(i: int) -> tuple:
+    """Неотправленная запись аудита в порядке COLUMNS"""
+    return (datetime.now().isoformat(sep=" "), False, getfqdn(), "127.0.0.1", f"user_{i % 100}",
+            "other audit operations", "airflow", "Audit", "F0", "SUCCESS",
+            json.dumps({"PARAMS": {"EVENT": f"benchmark event {i}"}, "SESSION_ID": str(i)}))
+
+
+class FakeMessage:
+    def __init__(self, topic: str, key: bytes, value: bytes, timestamp: int):
+        self.__topic, self.__key, self.__value, self.__timestamp = topic, key, value, timestamp
+
+    def topic(self):
+        return self.__topic
+
+    def partition(self):
+        return 0
+
+    def key(self):
+        return self.__key
+
+    def value(self):
+        return self.__value
+
+    def timestamp(self):
+        return 1, self.__timestamp
+
+
+class FakeProducer:
+    """
+    Асинхронный продюсер: ответ Кафки на сообщение приходит через `latency` секунд после produce(),
+    callback вызывается из poll()/flush(), как в confluent_kafka.Producer
+    """
+    def __init__(self, latency: float, queue_size: int = 100000):
+        self.latency = latency
+        self.queue_size = queue_size
+        self.pending = deque()
+
+    def produce(self, topic, key, value, timestamp, callback):
+        if len(self.pending) >= self.queue_size:
+            raise BufferError("Local: Queue full")
+        self.pending.append((monotonic() + self.latency, FakeMessage(topic, key, value, timestamp), callback))
+
+    def poll(self, timeout: float = -1) -> int:
+        """Вызывает callback пришедших ответов, если ответов нет - ждёт первый не дольше `timeout`"""
+        served, deadline = 0, monotonic() + timeout
+        while self.pending:
+            due, msg, callback = self.pending[0]
+            now = monotonic()
+            if due > now:
+                if served or now >= deadline:
+                    break
+                sleep(min(due, deadline) - now)
+                continue
+            self.pending.popleft()
+            callback(None, msg)
+            served += 1
+        return served
+
+    def flush(self, timeout: float = -1) -> int:
+        deadline = monotonic() + timeout
+        while self.pending and monotonic() < deadline:
+            self.poll(deadline - monotonic())
+        return len(self.pending)
+
+
+def deliver_sequential(kafka: proc_kafka.Kafka, messages: list):
+    """Отправка до конвейера: блокирующий poll(10) на каждое сообщение, UPDATE на каждый ответ"""
+    def report_and_mark(err, msg):
+        if err is None:
+            proc_kafka.mark_part_messages(ids=json.loads(msg.value().decode("utf-8")).get("inner_source_id"))
+
+    producer = kafka.producer()
+    for mess in messages:
+        producer.produce(topic=kafka.topic,
+                         key=mess.get("code_op").encode("utf-8"),
+                         value=json.dumps(kafka.format_message(mess)).encode("utf-8"),
+                         timestamp=int(mess.get("ts").timestamp() * 1000),
+                         callback=report_and_mark,
+                         )
+        producer.poll(10)
+    producer.flush(60)
+
+
+def sqlite_mark(db: str):
+    """`mark_part_messages` на SQLite: подключение и коммит на вызов, как сессия на вызов"""
+    def mark(ids):
+        ids = [ids] if isinstance(ids, int) else list(ids)
+        with sqlite3.connect(db) as conn:
+            conn.execute(f"UPDATE se_audit SET is_pushed = 1 WHERE id IN ({', '.join('?' * len(ids))}) "
+                         f"AND is_pushed = 0", ids)
+        conn.close()
+    return mark
+
+
+def pending(db: str, part: int) -> list:
+    """Как `get_part_messages_for_delivery`: неотправленные записи в виде `Audit.get_dict`"""
+    with sqlite3.connect(db) as conn:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute("SELECT * FROM se_audit WHERE is_pushed = 0 ORDER BY id DESC LIMIT ?", (part,)).fetchall()
+    conn.close()
+    ret = list()
+    for row in rows:
+        mess = dict(row)
+        mess["ts"] = datetime.fromisoformat(mess["ts"])
+        mess["extras"] = json.loads(mess.pop("extras_json"))
+        ret.append(mess)
+    return ret
+
+
+def reset(db: str, n: int):
+    with sqlite3.connect(db) as conn:
+        conn.execute(DDL)
+        conn.execute("DELETE FROM se_audit")
+        conn.executemany(INSERT, [make_record(i) for i in range(n)])
+    conn.close()
+
+
+def pushed(db: str) -> int:
+    with sqlite3.connect(db) as conn:
+        return conn.execute("SELECT count(*) FROM se_audit WHERE is_pushed = 1").fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="delivery report latency of the producer")
+    parser.add_argument("--mark-batch-size", type=int, default=1000)
+    parser.add_argument("--db", default=os.path.join(mkdtemp(prefix="kafka_bench_"), "audit.db"))
+    args = parser.parse_args()
+
+    os.environ["SE_KAFKA_TOPIC"] = "se_audit"
+    os.environ["SE_KAFKA_PRODUCER_SETTINGS"] = json.dumps({"bootstrap.servers": "localhost:9092"})
+    os.environ["SE_KAFKA_MARK_BATCH_SIZE"] = str(args.mark_batch_size)
+    latency = args.latency_ms / 1000
+    # продюсер-заглушка вместо confluent_kafka.Producer, записи помечаются в SQLite вместо БД Airflow
+    proc_kafka.Producer = lambda settings: FakeProducer(latency)
+    proc_kafka.mark_part_messages = sqlite_mark(args.db)
+
+    reset(args.db, args.records)
+    kafka = proc_kafka.Kafka(Namespace(se_kafka="se_kafka", pid=None))
+    assert kafka.mark_batch_size == args.mark_batch_size
+    messages = pending(args.db, args.records)
+    started = perf_counter()
+    deliver_sequential(kafka, messages)
+    t_seq = perf_counter() - started
+    assert pushed(args.db) == args.records
+
+    reset(args.db, args.records)
+    kafka = proc_kafka.Kafka(Namespace(se_kafka="se_kafka", pid=None))
+    messages = pending(args.db, args.records)
+    started = perf_counter()
+    kafka.delivery_messages_to_kafka(messages)
+    t_pipe = perf_counter() - started
+    assert pushed(args.db) == args.records
+
+    print(f"records: {args.records}, delivery latency: {args.latency_ms} ms, "
+          f"mark batch size: {args.mark_batch_size}, db: {args.db}")
+    print(f"sequential: {t_seq:8.3f} s, {args.records / t_seq:10.0f} records/s")
+    print(f"pipelined:  {t_pipe:8.3f} s, {args.records / t_pipe:10.0f} records/s")
+    print(f"speedup:    {t_seq / t_pipe:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""
+Задержка поиска пользователя в кэше LDAP: перебором записей кэша (как `ext_ldap_user_extract`
+и `ext_ldap_user_extract_silent` до справочника) и по индексу `LDAPDirectory`, на синтетическом кэше.
+
+Запуск:
+    python benchmarks/ldap_directory.py [--entries 200000] [--lookups 100000] [--scan-lookups 50]
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import datetime
+from statistics import mean, median
+from tempfile import mkdtemp
+from time import perf_counter
+from typing import Iterable, Optional, Union
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("AIRFLOW_HOME", mkdtemp(prefix="ldap_bench_"))
+# пакет airflow_se.db создаёт engine с параметрами пула при импорте (к БД бенчмарк не подключается)
+os.environ.setdefault("AIRFLOW__DATABASE__SQL_ALCHEMY_CONN", "postgresql://airflow@localhost/airflow")
+
+from airflow_se.ldap_dir import LDAPDirectory  # noqa: E402
+
+UID_FIELD = "CN"
+GROUP_FIELD = "memberOf"
+GROUPS = 500
+
+
+def decode(val: Union[Iterable[Union[str, bytes, None]], str, bytes, None], sep: str = ",") -> Optional[str]:
+    """Как `ext_decode_str` менеджера безопасности"""
+    if isinstance(val, (str, bytes)):
+        val = [val]
+    a = [v for v in ((x.decode("utf-8") if isinstance(x, bytes) else x).strip() for x in val or () if x) if v]
+    return sep.join(a) if a else None
+
+
+def make_cache(count: int, rng: random.Random) -> list:
+    """Записи кэша LDAP в виде результата ldap search: (DN, атрибуты), значения - списки bytes"""
+    cache = list()
+    for i in range(count):
+        uid = f"user_{i:07d}"
+        dn = [f"{UID_FIELD}={uid}".encode(), b"OU=Users", b"OU=Sigma", b"DC=delta", b"DC=sbrf", b"DC=ru"]
+        groups = [f"CN=group_{rng.randrange(GROUPS)},OU=Groups,DC=delta,DC=sbrf,DC=ru".encode() for _ in range(5)]
+        cache.append((dn, {
+            "givenName": [f"First {i}".encode()],
+            "sn": [f"Last {i}".encode()],
+            "mail": [f"{uid}@example.com".encode()],
+            GROUP_FIELD: groups,
+        }))
+    return cache
+
+
+def scan_lookup(cache: list, username: str) -> Optional[tuple]:
+    """Поиск перебором: разбор DN каждой записи до совпадения uid"""
+    for u in cache:
+        uid_str = decode(u[0], ",") or ""
+        uid_dct = {y[0]: y[1] for y in (x.split("=") for x in uid_str.split(","))}
+        uid = uid_dct.get(UID_FIELD) or ""
+        if uid != username:
+            continue
+        return u
+    return None
+
+
+def latencies(lookup, names: list) -> list:
+    ret = list()
+    for name in names:
+        started = perf_counter()
+        found = lookup(name)
+        ret.append(perf_counter() - started)
+        assert found is not None, name
+    return ret
+
+
+def report(title: str, values: list):
+    values = sorted(values)
+    p99 = values[min(len(values) - 1, int(len(values) * 0.99))]
+    print(f"{title:<10} {len(values):>8} lookups, mean {mean(values) * 1e6:12.1f} us, "
+          f"median {median(values) * 1e6:12.1f} us, p99 {p99 * 1e6:12.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=200000)
+    parser.add_argument("--lookups", type=int, default=100000, help="lookups by the directory index")
+    parser.add_argument("--scan-lookups", type=int, default=50, help="lookups by scanning the cache")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    cache = make_cache(args.entries, rng)
+    uids = [f"user_{i:07d}" for i in range(args.entries)]
+
+    started = perf_counter()
+    directory = LDAPDirectory(ts=datetime.now(), cache=cache, uid_field=UID_FIELD,
+                              group_field=GROUP_FIELD, decode=decode)
+    t_build = perf_counter() - started
+    assert directory.get_by_uid(uids[-1]) is scan_lookup(cache, uids[-1])
+
+    scan = latencies(lambda name: scan_lookup(cache, name), [rng.choice(uids) for _ in range(args.scan_lookups)])
+    index = latencies(directory.get_by_uid, [rng.choice(uids) for _ in range(args.lookups)])
+
+    print(f"entries: {args.entries}, directory build: {t_build:.3f} s (once per LDAP cache version)")
+    report("scan:", scan)
+    report("directory:", index)
+    print(f"speedup:   {mean(scan) / mean(index):12.0f}x (mean)")
+
+
+if __name__ == "__main__":
+    main()
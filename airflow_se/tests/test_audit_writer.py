@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+import json
+import os
+import tempfile
+from datetime import datetime
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_se_tests_"))
+# пакет airflow_se.db создаёт engine с параметрами пула при импорте (к БД тесты не подключаются)
+os.environ.setdefault("AIRFLOW__DATABASE__SQL_ALCHEMY_CONN", "postgresql://airflow@localhost/airflow")
+
+from airflow_se.db.audit_writer import AuditWriter  # noqa: E402
+
+
+class Inserts:
+    """Вставка в список, `fail` - вставка падает"""
+    def __init__(self):
+        self.rows = list()
+        self.fail = False
+
+    def __call__(self, chunk):
+        if self.fail:
+            raise ConnectionError("DB is down")
+        self.rows.extend(chunk)
+
+
+def test_corrupted_spill_lines(tmp_path):
+    spill_dir = tmp_path / "spill"
+    spill_dir.mkdir()
+    dt = datetime(2024, 1, 1, 12, 30)
+    # файл процесса, убитого посреди выгрузки: последняя строка недописана
+    (spill_dir / "audit_spill.999999999.jsonl").write_text(
+        json.dumps({"n": 1, "dt": {"$dt": dt.isoformat()}}) + "\n"
+        + "[1, 2]\n"
+        + json.dumps({"n": 2}) + "\n"
+        + '{"n": 3, "dt": {"$d',
+        encoding="utf-8",
+    )
+    inserts = Inserts()
+    writer = AuditWriter(inserts, batch_size=10, spill_dir=str(spill_dir))
+    writer.write({"n": 4})
+    assert writer.flush() == 3
+    assert inserts.rows == [{"n": 1, "dt": dt}, {"n": 2}, {"n": 4}]
+    assert sorted(os.listdir(spill_dir)) == [f"audit_spill.{os.getpid()}.bad"]
+    assert (spill_dir / f"audit_spill.{os.getpid()}.bad").read_text(encoding="utf-8").splitlines() == [
+        "[1, 2]", '{"n": 3, "dt": {"$d',
+    ]
+    # следующие сбросы не спотыкаются о прежний файл
+    writer.write({"n": 5})
+    assert writer.flush() == 1
+    writer.close()
+
+
+def test_spill_and_ingest(tmp_path):
+    inserts = Inserts()
+    writer = AuditWriter(inserts, batch_size=2, buffer_limit=2, spill_dir=str(tmp_path))
+    inserts.fail = True
+    for n in range(5):
+        writer.write({"n": n})
+    writer.flush()
+    assert os.path.exists(writer.spill_path)
+    inserts.fail = False
+    assert writer.flush() == 5
+    assert sorted(r["n"] for r in inserts.rows) == list(range(5))
+    assert os.listdir(tmp_path) == []
+    writer.close()
+
+
+def test_spill_files_of_running_processes_are_not_claimed(tmp_path):
+    parent = tmp_path / f"audit_spill.{os.getppid()}.jsonl"
+    dead = tmp_path / "audit_spill.999999999.jsonl"
+    parent.write_text(json.dumps({"n": "parent"}) + "\n", encoding="utf-8")
+    dead.write_text(json.dumps({"n": "dead"}) + "\n", encoding="utf-8")
+    inserts = Inserts()
+    writer = AuditWriter(inserts, spill_dir=str(tmp_path))
+    assert writer.flush() == 1
+    assert inserts.rows == [{"n": "dead"}]
+    # в файл работающего процесса идёт дозапись, его сбросит сам процесс
+    assert os.listdir(tmp_path) == [parent.name]
+    writer.close()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+from struct import pack
+
+import pytest
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_se_tests_"))
+
+from airflow_se.utils.ccache import get_ticket_expiry  # noqa: E402
+
+REALM = "EXAMPLE.RU"
+CLIENT = ("user",)
+
+
+def octets(data: bytes) -> bytes:
+    return pack(">I", len(data)) + data
+
+
+def principal(realm: str, components) -> bytes:
+    return pack(">II", 1, len(components)) + octets(realm.encode()) + b"".join(octets(c.encode()) for c in components)
+
+
+def credential(version: int, server, end: int, server_realm: str = REALM) -> bytes:
+    """Запись билета в формате FILE: кэша Kerberos (MIT)"""
+    keyblock = pack(">H", 18) + (pack(">H", 18) if version == 3 else b"") + octets(b"k" * 32)
+    start = max(0, end - 36000)
+    return (
+        principal(REALM, CLIENT) + principal(server_realm, server) + keyblock
+        + pack(">IIII", start, start, end, end + 86400)  # authtime, starttime, endtime, renew_till
+        + pack(">B", 0) + pack(">I", 0x40e10000)  # is_skey, ticket flags
+        + pack(">I", 1) + pack(">H", 2) + octets(b"\x7f\x00\x00\x01")  # addresses
+        + pack(">I", 0)  # authdata
+        + octets(b"ticket" * 50) + octets(b"")
+    )
+
+
+def ccache(version: int, *credentials: bytes) -> bytes:
+    data = pack(">H", 0x0500 | version)
+    if version == 4:
+        # тег 1 - смещение часов KDC
+        tags = pack(">HH", 1, 8) + pack(">iI", 0, 0)
+        data += pack(">H", len(tags)) + tags
+    return data + principal(REALM, CLIENT) + b"".join(credentials)
+
+
+def tgt(version: int, end: int) -> bytes:
+    return credential(version, ("krbtgt", REALM), end)
+
+
+def config_entry(version: int) -> bytes:
+    return credential(version, ("krb5_ccache_conf_data", "pa_type", f"krbtgt/{REALM}@{REALM}"), 0,
+                      server_realm="X-CACHECONF:")
+
+
+@pytest.fixture
+def write(tmp_path):
+    def write(data: bytes) -> str:
+        path = str(tmp_path / "krb5cc")
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+    return write
+
+
+@pytest.mark.parametrize("version", [3, 4])
+def test_tgt(write, version):
+    assert get_ticket_expiry(write(ccache(version, tgt(version, 1700000000)))) == 1700000000
+
+
+@pytest.mark.parametrize("version", [3, 4])
+def test_tgt_is_not_first(write, version):
+    data = ccache(
+        version,
+        config_entry(version),
+        credential(version, ("HTTP", "host.example.ru"), 1600000000),
+        credential(version, ("krbtgt", "OTHER.RU"), 1500000000),
+        tgt(version, 1700000000),
+    )
+    assert get_ticket_expiry(write(data)) == 1700000000
+
+
+@pytest.mark.parametrize("version", [3, 4])
+def test_without_tgt_min_end_time(write, version):
+    data = ccache(
+        version,
+        config_entry(version),
+        credential(version, ("HTTP", "a.example.ru"), 1600000000),
+        credential(version, ("HTTP", "b.example.ru"), 1500000000),
+    )
+    assert get_ticket_expiry(write(data)) == 1500000000
+
+
+@pytest.mark.parametrize("version", [3, 4])
+def test_truncated(write, version):
+    data = ccache(version, tgt(version, 1700000000), credential(version, ("HTTP", "host.example.ru"), 1600000000))
+    for size in (1, 3, len(data) // 2, len(data) - 1):
+        assert get_ticket_expiry(write(data[:size])) is None
+
+
+def test_only_default_principal(write):
+    assert get_ticket_expiry(write(ccache(4))) is None
+
+
+def test_unsupported(write, tmp_path):
+    assert get_ticket_expiry(str(tmp_path / "missing")) is None
+    assert get_ticket_expiry(write(b"")) is None
+    # версия 2 (порядок байт хоста) не поддерживается
+    assert get_ticket_expiry(write(pack(">H", 0x0502) + tgt(3, 1700000000))) is None
+    assert get_ticket_expiry(write(b"not a ccache file")) is None
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+from types import ModuleType
+from pathlib import Path
+
+import pytest
+from importlib.util import find_spec
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_se_tests_"))
+
+from flask import Config  # noqa: E402
+from airflow_se.config import ConfigSnapshot, config_snapshot, get_config_value  # noqa: E402
+from airflow_se.settings import Settings  # noqa: E402
+
+requires_benchmark = pytest.mark.skipif(find_spec("pytest_benchmark") is None,
+                                        reason="pytest-benchmark is not installed")
+
+
+def make_module(**attrs) -> ModuleType:
+    module = ModuleType("airflow_se_config")
+    module.__dict__.update(attrs)
+    return module
+
+
+def test_resolve_source(monkeypatch):
+    snapshot = ConfigSnapshot(make_module(AUTH_TEST_PARAM="module", TEST_FLAG="yes"))
+    monkeypatch.delenv("SE_TEST_PARAM", raising=False)
+    assert snapshot.resolve("TEST_PARAM") == ("module", "airflow_se_config:AUTH_TEST_PARAM")
+    assert snapshot.resolve("TEST_FLAG") == (True, "airflow_se_config:TEST_FLAG")
+    assert snapshot.resolve("TEST_MISSING") == (None, None)
+    assert snapshot.source("TEST_PARAM", "_SE_") is None
+
+
+def test_snapshot_refresh(monkeypatch):
+    snapshot = ConfigSnapshot(make_module(AUTH_TEST_PARAM="module"))
+    monkeypatch.delenv("SE_TEST_PARAM", raising=False)
+    assert snapshot.resolve("TEST_PARAM")[1] == "airflow_se_config:AUTH_TEST_PARAM"
+    # снимок не перечитывает окружение сам
+    monkeypatch.setenv("SE_TEST_PARAM", "env")
+    assert snapshot.resolve("TEST_PARAM")[0] == "module"
+    calls = []
+    snapshot.add_listener(lambda: calls.append(1))
+    snapshot.refresh()
+    assert snapshot.resolve("TEST_PARAM") == ("env", "env:SE_TEST_PARAM")
+    assert calls == [1]
+
+
+def test_snapshot_reload(tmp_path):
+    path = Path(tmp_path, "airflow_se_config.py")
+    path.write_text("SE_TEST_RELOAD = 'one'\n")
+    snapshot = ConfigSnapshot(make_module(SE_TEST_RELOAD="one"), path)
+    assert snapshot.resolve("TEST_RELOAD")[0] == "one"
+    path.write_text("SE_TEST_RELOAD = 'two'\n")
+    snapshot.reload()
+    assert snapshot.resolve("TEST_RELOAD") == ("two", "airflow_se_config:SE_TEST_RELOAD")
+
+
+def test_get_config_value_default(monkeypatch):
+    monkeypatch.setenv("SE_TEST_NONE", "None")
+    config_snapshot.refresh()
+    assert get_config_value("TEST_NONE", default="default") is None
+    assert get_config_value("TEST_NOT_SET", default="default") == "default"
+    assert get_config_value("TEST_NOT_SET", default="off") is False
+
+
+@pytest.fixture
+def settings(tmp_path):
+    return Settings(flask_app_config=Config(str(tmp_path)), silent=True)
+
+
+@requires_benchmark
+@pytest.mark.benchmark(group="settings-property")
+def test_settings_property_unresolved(benchmark, settings):
+    """Стоимость обращения к свойству при полном поиске параметра (как до снимка конфига)"""
+
+    def access():
+        config_snapshot.refresh()
+        settings.refresh()
+        return settings.debug_mask
+
+    assert benchmark(access) == "DEBUG >> {}"
+
+
+@requires_benchmark
+@pytest.mark.benchmark(group="settings-property")
+def test_settings_property_snapshot(benchmark, settings):
+    """Стоимость обращения к свойству, параметр берётся из снимка конфига"""
+
+    def access():
+        settings.refresh()
+        return settings.debug_mask
+
+    assert benchmark(access) == "DEBUG >> {}"
+
+
+@requires_benchmark
+@pytest.mark.benchmark(group="settings-property")
+def test_settings_property_cached(benchmark, settings):
+    """Стоимость повторного обращения к вычисленному свойству"""
+    assert benchmark(lambda: settings.debug_mask) == "DEBUG >> {}"
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+from datetime import datetime
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_se_tests_"))
+# пакет airflow_se.db создаёт engine с параметрами пула при импорте (к БД тесты не подключаются)
+os.environ.setdefault("AIRFLOW__DATABASE__SQL_ALCHEMY_CONN", "postgresql://airflow@localhost/airflow")
+
+from airflow_se.ldap_dir import LDAPDirectory, LDAPDirectoryHolder, parse_dn  # noqa: E402
+from airflow_se.ldap_dir import ldap_dir  # noqa: E402
+
+TS1 = datetime(2024, 1, 1)
+TS2 = datetime(2024, 1, 2)
+
+
+def decode(val, sep=","):
+    if isinstance(val, (str, bytes)):
+        val = [val]
+    a = [v for v in ((x.decode("utf-8") if isinstance(x, bytes) else x).strip() for x in val or () if x) if v]
+    return sep.join(a) if a else None
+
+
+def entry(uid, *groups, ou="Users"):
+    return [f"CN={uid}".encode(), f"OU={ou}".encode(), b"DC=example", b"DC=ru"], \
+        {"mail": [f"{uid}@example.ru".encode()], "memberOf": [g.encode() for g in groups]}
+
+
+def make_directory(cache, ts=TS1):
+    return LDAPDirectory(ts=ts, cache=cache, uid_field="CN", group_field="memberOf", decode=decode)
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class LDAPCacheDB(object):
+    """`get_max_ldap_cache` на словаре вместо БД"""
+    def __init__(self, ts, cache):
+        self.ts, self.cache = ts, cache
+        self.calls = []
+
+    def __call__(self, only_ts=False):
+        self.calls.append(only_ts)
+        if only_ts:
+            return self.ts
+        return self.ts, self.cache
+
+
+def test_parse_dn_last_value_wins():
+    # как прежний разбор {y[0]: y[1] ...}: повторяющийся атрибут - последнее значение
+    assert parse_dn("CN=user,OU=Users,OU=Sigma,DC=example,DC=ru") == {"CN": "user", "OU": "Sigma", "DC": "ru"}
+
+
+def test_parse_dn_skips_parts_without_value():
+    assert parse_dn("CN=user,broken,OU=") == {"CN": "user", "OU": ""}
+    assert parse_dn("") == {}
+
+
+def test_directory_lookups():
+    cache = [entry("alice", "admins", "users"), entry("bob", "users"), entry("bob", "admins", ou="Other")]
+    directory = make_directory(cache)
+    assert len(directory) == 3
+    assert directory.ts == TS1
+    assert "alice" in directory and "carol" not in directory
+    # при дублях uid берётся первая запись
+    assert directory.get_by_uid("bob") is cache[1]
+    assert directory.get_by_dn("CN=bob,OU=Other,DC=example,DC=ru") is cache[2]
+    assert directory.get_by_uid("carol") is None
+    assert directory.get_group_members("users") == ("alice", "bob")
+    assert directory.get_group_members("admins") == ("alice",)
+    assert directory.get_group_members("nobody") == ()
+
+
+def test_holder_rebuilds_once_per_cache_version(monkeypatch):
+    db = LDAPCacheDB(TS1, [entry("alice")])
+    monkeypatch.setattr(ldap_dir, "get_max_ldap_cache", db)
+    clock = Clock()
+    holder = LDAPDirectoryHolder(check_interval=60, uid_field="CN", group_field="memberOf",
+                                 decode=decode, clock=clock)
+    first = holder.get_directory()
+    assert first.get_by_uid("alice") is not None
+    assert db.calls == [True, False]
+
+    # до истечения check_interval БД не опрашивается
+    clock.now = 30
+    assert holder.get_directory() is first
+    assert db.calls == [True, False]
+
+    # версия кэша не изменилась - справочник не перестраивается
+    clock.now = 60
+    assert holder.get_directory() is first
+    assert db.calls == [True, False, True]
+
+    db.ts, db.cache = TS2, [entry("bob")]
+    clock.now = 120
+    second = holder.get_directory()
+    assert second is not first
+    assert second.ts == TS2
+    assert "bob" in second and "alice" not in second
+
+
+def test_holder_keeps_directory_when_new_cache_is_invalid(monkeypatch):
+    db = LDAPCacheDB(TS1, [entry("alice")])
+    monkeypatch.setattr(ldap_dir, "get_max_ldap_cache", db)
+    clock = Clock()
+    holder = LDAPDirectoryHolder(check_interval=60, uid_field="CN", group_field="memberOf",
+                                 decode=decode, clock=clock)
+    first = holder.get_directory()
+
+    db.ts, db.cache = TS2, []
+    clock.now = 60
+    assert holder.get_directory() is first
+
+    db.ts = None
+    clock.now = 120
+    assert holder.get_directory() is first
+
+
+def test_holder_without_cache(monkeypatch):
+    monkeypatch.setattr(ldap_dir, "get_max_ldap_cache", LDAPCacheDB(None, None))
+    holder = LDAPDirectoryHolder(check_interval=60, uid_field="CN", group_field="memberOf", decode=decode)
+    assert holder.get_directory() is None
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+import json
+import os
+import tempfile
+from argparse import Namespace
+from datetime import datetime
+
+import pytest
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_se_tests_"))
+# пакет airflow_se.db создаёт engine с параметрами пула при импорте (к БД тесты не подключаются)
+os.environ.setdefault("AIRFLOW__DATABASE__SQL_ALCHEMY_CONN", "postgresql://airflow@localhost/airflow")
+
+from flask import Config  # noqa: E402
+from airflow_se import proc_kafka  # noqa: E402
+from airflow_se.config import config_snapshot  # noqa: E402
+from airflow_se.settings import Settings  # noqa: E402
+
+
+class FakeMessage(object):
+    def __init__(self, topic, key, value):
+        self._topic, self._key, self._value = topic, key, value
+
+    def topic(self):
+        return self._topic
+
+    def partition(self):
+        return 0
+
+    def key(self):
+        return self._key
+
+    def value(self):
+        return self._value
+
+    def timestamp(self):
+        return 1, 0
+
+
+class FakeProducer(object):
+    """Продюсер без Кафки: ответы приходят в poll()/flush(), сообщения с id из `fail` не доставляются"""
+    def __init__(self, queue_size=100, fail=(), lost=()):
+        self.queue_size = queue_size
+        self.fail, self.lost = set(fail), set(lost)
+        self.pending = []
+        self.produced = []
+        self.polls = []
+
+    def produce(self, topic, key, value, timestamp, callback):
+        if len(self.pending) >= self.queue_size:
+            raise BufferError("Local: Queue full")
+        self.pending.append((FakeMessage(topic, key, value), callback))
+        self.produced.append(json.loads(value)["inner_source_id"])
+
+    def poll(self, timeout=-1):
+        self.polls.append(timeout)
+        # без блокировки (poll(0)) ответы ещё не пришли
+        if timeout == 0:
+            return 0
+        pending, self.pending = self.pending, []
+        for msg, callback in pending:
+            inner_id = json.loads(msg.value())["inner_source_id"]
+            if inner_id in self.lost:
+                self.pending.append((msg, callback))
+            else:
+                callback("Broker: Message timed out" if inner_id in self.fail else None, msg)
+        return len(pending) - len(self.pending)
+
+    def flush(self, timeout=-1):
+        self.poll(timeout)
+        return len(self.pending)
+
+
+def message(i):
+    """Запись аудита в виде `Audit.get_dict`"""
+    return dict(id=i, ts=datetime(2024, 1, 2, 3, 4, 5), host="host", remote_addr="127.0.0.1", remote_login="user",
+                code_op="other audit operations", app_id="airflow", type_id="Audit", subtype_id="F0",
+                status_op="SUCCESS", extras={"PARAMS": {"EVENT": f"event {i}"}})
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    monkeypatch.setenv("SE_KAFKA_TOPIC", "se_audit")
+    monkeypatch.setenv("SE_KAFKA_PRODUCER_SETTINGS", json.dumps({"bootstrap.servers": "localhost:9092"}))
+    monkeypatch.setenv("SE_KAFKA_MARK_BATCH_SIZE", "2")
+    config_snapshot.refresh()
+    monkeypatch.setattr(proc_kafka, "get_settings", lambda: Settings(flask_app_config=Config(str(tmp_path)),
+                                                                     silent=True))
+    marked = []
+    monkeypatch.setattr(proc_kafka, "mark_part_messages", lambda ids: marked.append(list(ids)))
+    yield marked
+    monkeypatch.undo()
+    config_snapshot.refresh()
+
+
+def make_kafka(monkeypatch, producer):
+    settings = []
+    monkeypatch.setattr(proc_kafka, "Producer", lambda conf: settings.append(conf) or producer)
+    kafka = proc_kafka.Kafka(Namespace(se_kafka="se_kafka", pid=None))
+    return kafka, settings
+
+
+def test_settings_from_environment(env, monkeypatch):
+    kafka, _ = make_kafka(monkeypatch, FakeProducer())
+    assert kafka.topic == "se_audit"
+    assert kafka.mark_batch_size == 2
+    assert kafka.producer_settings == {"bootstrap.servers": "localhost:9092"}
+
+
+def test_format_message():
+    mess = proc_kafka.Kafka.format_message(message(7))
+    assert mess["inner_source_id"] == 7
+    assert mess["OPERATION_DATE"] == "02.01.2024 03-04-05"
+    assert mess["PARAMS"] == {"EVENT": "event 7"}
+    assert mess["USER_LOGIN"] == "user"
+
+
+def test_delivered_messages_marked_in_batches(env, monkeypatch):
+    producer = FakeProducer()
+    kafka, settings = make_kafka(monkeypatch, producer)
+    kafka.delivery_messages_to_kafka([message(i) for i in range(1, 6)])
+    assert settings == [{"bootstrap.servers": "localhost:9092"}]
+    assert producer.produced == [1, 2, 3, 4, 5]
+    # produce не блокируется: ответы собираются только в flush()
+    assert set(producer.polls[:-1]) == {0}
+    assert env == [[1, 2], [3, 4], [5]]
+
+
+def test_failed_and_lost_messages_are_not_marked(env, monkeypatch):
+    kafka, _ = make_kafka(monkeypatch, FakeProducer(fail={2}, lost={4}))
+    kafka.delivery_messages_to_kafka([message(i) for i in range(1, 6)])
+    assert env == [[1, 3], [5]]
+
+
+def test_full_queue_waits_for_delivery_reports(env, monkeypatch):
+    producer = FakeProducer(queue_size=2)
+    kafka, _ = make_kafka(monkeypatch, producer)
+    kafka.delivery_messages_to_kafka([message(i) for i in range(1, 6)])
+    assert producer.produced == [1, 2, 3, 4, 5]
+    assert 1 in producer.polls
+    assert sum(env, []) == [1, 2, 3, 4, 5]
+
+
+def test_mark_error_does_not_stop_other_batches(env, monkeypatch):
+    marked = []
+
+    def mark(ids):
+        if 1 in ids:
+            raise RuntimeError("db is down")
+        marked.append(list(ids))
+
+    monkeypatch.setattr(proc_kafka, "mark_part_messages", mark)
+    kafka, _ = make_kafka(monkeypatch, FakeProducer())
+    kafka.delivery_messages_to_kafka([message(i) for i in range(1, 6)])
+    assert marked == [[3, 4], [5]]
+
+
+def test_no_messages(env, monkeypatch):
+    kafka, settings = make_kafka(monkeypatch, FakeProducer())
+    kafka.delivery_messages_to_kafka([])
+    kafka.delivery_messages_to_kafka(None)
+    assert settings == []
+    assert env == []
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import tempfile
+import time
+from argparse import Namespace
+from hashlib import md5
+
+import pytest
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_se_tests_"))
+# пакет airflow_se.db создаёт engine с параметрами пула при импорте (к БД тесты не подключаются)
+os.environ.setdefault("AIRFLOW__DATABASE__SQL_ALCHEMY_CONN", "postgresql://airflow@localhost/airflow")
+
+from flask import Config  # noqa: E402
+from airflow_se import proc_ticketman  # noqa: E402
+from airflow_se.commons import EMPTY_KEY_SECMAN, SECMAN_KEY_FOR_TGT  # noqa: E402
+from airflow_se.config import config_snapshot  # noqa: E402
+from airflow_se.crypt import decrypt, encrypt  # noqa: E402
+from airflow_se.settings import Settings  # noqa: E402
+from tests.test_ccache import ccache, tgt  # noqa: E402
+
+# Утилиты Kerberos без KDC: пишут в журнал (утилита, md5 тикета, начало, конец) и спят SLEEP секунд.
+# kinit -R не обновляет тикет с "broken" в теле, а обновлённый помечает префиксом "renewed:",
+# kvno не получает TGS сервиса "bad/svc".
+FAKE_KINIT = r'''#!{python}
+import hashlib, os, sys, time
+path = sys.argv[sys.argv.index("-c") + 1]
+with open(path, "rb") as f:
+    data = f.read()
+start = time.time()
+time.sleep(float(os.environ["FAKE_KRB_SLEEP"]))
+with open(os.environ["FAKE_KRB_LOG"], "a") as f:
+    f.write(f"kinit {{hashlib.md5(data).hexdigest()}} {{start}} {{time.time()}}\n")
+if b"broken" in data:
+    print("kinit: Ticket expired while renewing credentials", file=sys.stderr)
+    sys.exit(1)
+with open(path, "wb") as f:
+    f.write(b"renewed:" + data)
+'''
+
+FAKE_KVNO = r'''#!{python}
+import os, sys
+service = sys.argv[-1]
+with open(os.environ["FAKE_KRB_LOG"], "a") as f:
+    f.write(f"kvno {{service}} 0 0\n")
+if service == "bad/svc":
+    print(f"kvno: Server not found in Kerberos database while getting credentials for {{service}}", file=sys.stderr)
+    sys.exit(1)
+print(f"{{service}}@EXAMPLE.RU: kvno = 1")
+'''
+
+
+class TGSList(object):
+    tgs = []
+    deleted = []
+
+    @classmethod
+    def get_tgs_list(cls):
+        return list(cls.tgs)
+
+    @classmethod
+    def del_tgs(cls, tgs):
+        cls.deleted.append(tgs)
+
+
+class SecMan(object):
+    """Секрет с тикетами в SecMan"""
+    def __init__(self, tickets):
+        self.tickets = {k: encrypt(v) for k, v in tickets.items()}
+        self.pushed = []
+
+    def get(self, key, token, use_cache=True):
+        assert (key, token, use_cache) == (SECMAN_KEY_FOR_TGT, "token", False)
+        return dict(self.tickets)
+
+    def push(self, key, data, token):
+        self.pushed.append(dict(data))
+        return True
+
+
+@pytest.fixture
+def krb(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for name, script in (("kinit", FAKE_KINIT), ("kvno", FAKE_KVNO)):
+        path = bin_dir / name
+        path.write_text(script.format(python=sys.executable))
+        path.chmod(0o755)
+    log = tmp_path / "krb.log"
+    log.touch()
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_KRB_LOG", str(log))
+    monkeypatch.setenv("FAKE_KRB_SLEEP", "0")
+    monkeypatch.setenv("SE_SECRET_PATH", str(tmp_path / "secret"))
+    monkeypatch.setenv("SE_TICKETMAN_PROCESS_RETRY", "1")
+    monkeypatch.setenv("SE_TICKETMAN_WORKERS", "1")
+    config_snapshot.refresh()
+    monkeypatch.setattr(proc_ticketman, "get_settings", lambda: Settings(flask_app_config=Config(str(tmp_path)),
+                                                                         silent=True))
+    monkeypatch.setattr(proc_ticketman, "sleep", lambda seconds: None)
+    monkeypatch.setattr(proc_ticketman, "auth_secman", lambda: "token")
+    monkeypatch.setattr(TGSList, "tgs", [])
+    monkeypatch.setattr(TGSList, "deleted", [])
+    monkeypatch.setattr(proc_ticketman, "TGSList", TGSList)
+
+    def read_log():
+        with open(log) as f:
+            return [line.split() for line in f]
+
+    yield read_log
+    monkeypatch.undo()
+    config_snapshot.refresh()
+
+
+def run_cycle(monkeypatch, tickets):
+    secman = SecMan(tickets)
+    monkeypatch.setattr(proc_ticketman, "get_secman_data", secman.get)
+    monkeypatch.setattr(proc_ticketman, "push_secman_data", secman.push)
+    proc_ticketman.TicketMan(Namespace(se_ticketman="se_ticketman", pid=None))()
+    assert len(secman.pushed) == 1
+    return secman
+
+
+def ticket(end, mark=b""):
+    return ccache(4, tgt(4, int(end))) + mark
+
+
+def digest(data):
+    return md5(data).hexdigest()
+
+
+def test_tickets_renewed_earliest_expiry_first(krb, monkeypatch):
+    now = time.time()
+    tickets = {
+        "late": ticket(now + 3000),
+        "early": ticket(now + 1000),
+        "unknown": b"not a ccache",
+        "middle": ticket(now + 2000),
+    }
+    secman = run_cycle(monkeypatch, tickets)
+    order = {digest(v): k for k, v in tickets.items()}
+    assert [order[line[1]] for line in krb() if line[0] == "kinit"] == ["unknown", "early", "middle", "late"]
+    pushed = secman.pushed[0]
+    assert sorted(pushed) == sorted(tickets)
+    assert all(decrypt(pushed[k]) == b"renewed:" + v for k, v in tickets.items())
+
+
+def test_tickets_far_from_expiry_are_skipped(krb, monkeypatch):
+    # тикет переживает следующий цикл (TICKETMAN_PROCESS_TIMEOUT) с запасом (TICKETMAN_RENEW_MARGIN)
+    now = time.time()
+    tickets = {"soon": ticket(now + 600), "far": ticket(now + 25200 + 3600 + 600)}
+    secman = run_cycle(monkeypatch, tickets)
+    assert [line[1] for line in krb()] == [digest(tickets["soon"])]
+    pushed = secman.pushed[0]
+    assert decrypt(pushed["soon"]) == b"renewed:" + tickets["soon"]
+    # пропущенный тикет записывается обратно без изменений
+    assert pushed["far"] == secman.tickets["far"]
+
+
+def test_tickets_renewed_concurrently(krb, monkeypatch):
+    monkeypatch.setenv("FAKE_KRB_SLEEP", "0.3")
+    monkeypatch.setenv("SE_TICKETMAN_WORKERS", "4")
+    config_snapshot.refresh()
+    now = time.time()
+    tickets = {f"user_{i}": ticket(now + 100 * (i + 1)) for i in range(4)}
+    started = time.monotonic()
+    secman = run_cycle(monkeypatch, tickets)
+    assert time.monotonic() - started < 4 * 0.3
+    runs = [(float(line[2]), float(line[3])) for line in krb()]
+    assert len(runs) == 4
+    assert max(start for start, _ in runs) < min(end for _, end in runs)
+    assert len(secman.pushed[0]) == 4
+
+
+def test_failed_renewal_and_tgs(krb, monkeypatch):
+    TGSList.tgs = ["HTTP/a.example.ru", "bad/svc"]
+    now = time.time()
+    tickets = {"ok": ticket(now + 600), "other": ticket(now + 700), "broken": ticket(now + 500, b"broken")}
+    secman = run_cycle(monkeypatch, tickets)
+    kvno = [line[1] for line in krb() if line[0] == "kvno"]
+    assert sorted(kvno) == sorted(TGSList.tgs * 2)
+    # тикет, который не удалось обновить, не записывается в SecMan
+    assert sorted(secman.pushed[0]) == ["ok", "other"]
+    # TGS, который не получен, удаляется из списка один раз за цикл
+    assert TGSList.deleted == ["bad/svc"]
+
+
+def test_no_tickets_pushes_empty_key(krb, monkeypatch):
+    secman = run_cycle(monkeypatch, {})
+    assert secman.pushed == [{EMPTY_KEY_SECMAN: ""}]
+    assert krb() == []
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+import io
+import os
+import tempfile
+import threading
+
+import pytest
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_se_tests_"))
+
+from airflow_se.s3sync import S3Manifest, S3SyncEngine  # noqa: E402
+
+PREFIX = "dags/"
+
+
+class S3Client(object):
+    """Корзина S3 в памяти: list_objects_v2 постранично и get_object"""
+    def __init__(self, objects=None):
+        self.objects = {}
+        self.lists = []
+        self.gets = []
+        self.broken = set()
+        self.lock = threading.Lock()
+        for key, body in (objects or {}).items():
+            self.put(key, body)
+
+    def put(self, key, body, etag=None):
+        self.objects[key] = (body, etag or f'"{abs(hash(body))}"')
+
+    def list_objects_v2(self, Bucket, Prefix, MaxKeys, ContinuationToken=None):
+        self.lists.append(ContinuationToken)
+        keys = sorted(k for k in self.objects if k.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        page = keys[start:start + MaxKeys]
+        ret = {"Contents": [{"Key": k, "ETag": self.objects[k][1], "Size": len(self.objects[k][0]),
+                             "LastModified": "2024-01-01 00:00:00+00:00"} for k in page]}
+        if start + MaxKeys < len(keys):
+            ret.update(IsTruncated=True, NextContinuationToken=str(start + MaxKeys))
+        return ret
+
+    def get_object(self, Bucket, Key):
+        with self.lock:
+            self.gets.append(Key)
+        if Key in self.broken:
+            raise IOError(f"NoSuchKey: {Key}")
+        body, etag = self.objects[Key]
+        return {"Body": io.BytesIO(body), "ETag": etag, "ContentLength": len(body)}
+
+
+def make_engine(client, target_dir, **kwargs):
+    return S3SyncEngine(client=client, bucket="bucket", prefix=PREFIX, target_dir=str(target_dir), **kwargs)
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_paginated_listing_and_download(tmp_path):
+    client = S3Client({f"dags/dag_{i}.py": f"dag {i}".encode() for i in range(5)})
+    client.put("dags/sub/common.py", b"common")
+    client.put("other/skip.py", b"skip")
+    engine = make_engine(client, tmp_path, page_size=2)
+    downloaded = []
+    result = engine.sync(on_download=lambda key, path: downloaded.append(key))
+    assert client.lists == [None, "2", "4"]
+    assert result.listed == 6
+    assert sorted(result.downloaded) == sorted(downloaded) == sorted(k for k in client.objects if k.startswith(PREFIX))
+    assert read(tmp_path / "dag_3.py") == b"dag 3"
+    assert read(tmp_path / "sub" / "common.py") == b"common"
+    assert not (tmp_path / "skip.py").exists()
+    assert set(S3Manifest(engine.manifest.path).load().objects) == set(result.downloaded)
+
+
+def test_unchanged_objects_are_not_downloaded(tmp_path):
+    client = S3Client({"dags/a.py": b"a", "dags/b.py": b"b"})
+    make_engine(client, tmp_path).sync()
+    client.gets.clear()
+    # новый движок читает манифест прошлого прохода
+    result = make_engine(client, tmp_path).sync()
+    assert client.gets == []
+    assert result.downloaded == [] and result.unchanged == 2
+
+
+def test_changed_object_is_replaced(tmp_path):
+    client = S3Client({"dags/a.py": b"a", "dags/b.py": b"b"})
+    engine = make_engine(client, tmp_path)
+    engine.sync()
+    client.put("dags/a.py", b"a2")
+    result = engine.sync()
+    assert client.gets[-1] == "dags/a.py"
+    assert result.downloaded == ["dags/a.py"]
+    assert read(tmp_path / "a.py") == b"a2"
+
+
+def test_same_content_is_not_rewritten(tmp_path):
+    client = S3Client({"dags/a.py": b"a"})
+    engine = make_engine(client, tmp_path)
+    engine.sync()
+    os.utime(tmp_path / "a.py", (1, 1))
+    # новый ETag, то же содержимое (например, повторная загрузка файла в корзину)
+    client.put("dags/a.py", b"a", etag='"other"')
+    result = engine.sync()
+    assert result.downloaded == [] and result.unchanged == 1
+    assert os.stat(tmp_path / "a.py").st_mtime == 1
+    assert engine.manifest.objects["dags/a.py"].etag == '"other"'
+
+
+def test_missing_local_file_is_downloaded_again(tmp_path):
+    client = S3Client({"dags/a.py": b"a"})
+    engine = make_engine(client, tmp_path)
+    engine.sync()
+    os.remove(tmp_path / "a.py")
+    assert engine.sync().downloaded == ["dags/a.py"]
+    assert read(tmp_path / "a.py") == b"a"
+
+
+@pytest.mark.parametrize("policy,kept", [("keep", True), ("delete", False)])
+def test_delete_policy(tmp_path, policy, kept):
+    client = S3Client({"dags/a.py": b"a", "dags/b.py": b"b"})
+    engine = make_engine(client, tmp_path, delete_policy=policy)
+    engine.sync()
+    (tmp_path / "local.py").write_bytes(b"not synced")
+    del client.objects["dags/b.py"]
+    deleted = []
+    result = engine.sync(on_delete=lambda key, path: deleted.append(key))
+    assert (tmp_path / "b.py").exists() == kept
+    assert result.deleted == deleted == ([] if kept else ["dags/b.py"])
+    # файлы, которые синхронизация не загружала, не удаляются
+    assert (tmp_path / "local.py").exists()
+
+
+def test_empty_listing_deletes_nothing(tmp_path):
+    client = S3Client({"dags/a.py": b"a"})
+    engine = make_engine(client, tmp_path, delete_policy="delete")
+    engine.sync()
+    client.objects.clear()
+    assert engine.sync().deleted == []
+    assert (tmp_path / "a.py").exists()
+
+
+def test_unsafe_keys_are_skipped(tmp_path):
+    target = tmp_path / "dags"
+    client = S3Client({"dags/../evil.py": b"x", "dags/./a.py": b"x", "dags/dir/": b"", "dags/ok.py": b"ok"})
+    result = make_engine(client, target).sync()
+    assert result.downloaded == ["dags/ok.py"]
+    assert not (tmp_path / "evil.py").exists()
+
+
+def test_failed_download_is_retried_next_time(tmp_path):
+    client = S3Client({"dags/a.py": b"a", "dags/b.py": b"b"})
+    client.broken.add("dags/b.py")
+    engine = make_engine(client, tmp_path)
+    result = engine.sync()
+    assert result.downloaded == ["dags/a.py"]
+    assert list(result.failed) == ["dags/b.py"]
+    assert "dags/b.py" not in engine.manifest.objects
+    client.broken.clear()
+    assert engine.sync().downloaded == ["dags/b.py"]
+
+
+def test_decode(tmp_path):
+    client = S3Client({"dags/a.py": b"encrypted"})
+    make_engine(client, tmp_path, decode=lambda body: body.upper()).sync()
+    assert read(tmp_path / "a.py") == b"ENCRYPTED"
+
+
+def test_unknown_delete_policy(tmp_path):
+    with pytest.raises(ValueError):
+        make_engine(S3Client(), tmp_path, delete_policy="purge")
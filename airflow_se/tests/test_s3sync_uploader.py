@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_se_tests_"))
+
+from airflow_se.s3sync import DebouncedUploader  # noqa: E402
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class S3Client(object):
+    """Корзина S3 в памяти, `block` задерживает put_object до release"""
+    def __init__(self):
+        self.objects = {}
+        self.calls = []
+        self.fail = set()
+        self.block = None
+        self.started = threading.Event()
+
+    def put_object(self, Bucket, Key, Body):
+        self.calls.append(("put", Key))
+        self.started.set()
+        if self.block is not None:
+            self.block.wait(5)
+        if Key in self.fail:
+            raise IOError(f"AccessDenied: {Key}")
+        self.objects[Key] = Body
+
+    def delete_object(self, Bucket, Key):
+        self.calls.append(("delete", Key))
+        self.objects.pop(Key, None)
+
+
+def make_uploader(tmp_path, client, clock=None, **kwargs):
+    return DebouncedUploader(client=client, bucket="bucket", prefix="dags/", root_dir=str(tmp_path),
+                             quiet_window=1.0, clock=clock or Clock(), **kwargs)
+
+
+def test_burst_of_events_is_one_upload(tmp_path):
+    clock, client = Clock(), S3Client()
+    uploader = make_uploader(tmp_path, client, clock)
+    path = str(tmp_path / "dag.py")
+    try:
+        for i in range(5):
+            with open(path, "w") as f:
+                f.write(f"version {i}")
+            uploader.submit(path, "created" if i == 0 else "modified")
+            clock.now += 0.5
+        # путь ещё не простоял без событий quiet_window
+        assert uploader.dispatch() == 0
+        clock.now += 0.5
+        assert uploader.dispatch() == 1
+        assert uploader.flush(5)
+        assert client.calls == [("put", "dags/dag.py")]
+        assert client.objects["dags/dag.py"] == b"version 4"
+    finally:
+        uploader.stop()
+
+
+def test_last_event_wins(tmp_path):
+    clock, client = Clock(), S3Client()
+    uploader = make_uploader(tmp_path, client, clock)
+    path = str(tmp_path / "dag.py")
+    try:
+        with open(path, "w") as f:
+            f.write("dag")
+        uploader.submit(path, "created")
+        uploader.submit(path, "modified")
+        os.remove(path)
+        uploader.submit(path, "deleted")
+        assert uploader.flush(5)
+        assert client.calls == [("delete", "dags/dag.py")]
+
+        # удалён и создан заново до выполнения операции - выгрузка
+        uploader.submit(path, "deleted")
+        with open(path, "w") as f:
+            f.write("dag again")
+        assert uploader.flush(5)
+        assert client.calls[-1] == ("put", "dags/dag.py")
+    finally:
+        uploader.stop()
+
+
+def test_unchanged_content_is_not_uploaded(tmp_path):
+    client = S3Client()
+    uploaded = []
+    uploader = make_uploader(tmp_path, client, encode=lambda data: data[::-1],
+                             on_upload=lambda key, path, event: uploaded.append((key, event)))
+    (tmp_path / "sub").mkdir()
+    path = str(tmp_path / "sub" / "dag.py")
+    try:
+        with open(path, "w") as f:
+            f.write("abc")
+        uploader.submit(path, "created")
+        uploader.flush(5)
+        os.utime(path)
+        uploader.submit(path, "modified")
+        uploader.flush(5)
+        assert client.calls == [("put", "dags/sub/dag.py")]
+        assert client.objects["dags/sub/dag.py"] == b"cba"
+        assert uploaded == [("dags/sub/dag.py", "created")]
+    finally:
+        uploader.stop()
+
+
+def test_one_operation_per_path_at_a_time(tmp_path):
+    client = S3Client()
+    client.block = threading.Event()
+    uploader = make_uploader(tmp_path, client, workers=4)
+    path = str(tmp_path / "dag.py")
+    try:
+        with open(path, "w") as f:
+            f.write("v1")
+        uploader.submit(path, "created")
+        assert uploader.dispatch(force=True) == 1
+        assert client.started.wait(5)
+        with open(path, "w") as f:
+            f.write("v2")
+        uploader.submit(path, "modified")
+        # выгрузка v1 ещё идёт, вторая операция по пути ждёт
+        assert uploader.dispatch(force=True) == 0
+        assert uploader.pending() == 1
+        client.block.set()
+        assert uploader.flush(5)
+        assert client.calls == [("put", "dags/dag.py")] * 2
+        assert client.objects["dags/dag.py"] == b"v2"
+        assert uploader.pending() == 0
+    finally:
+        client.block.set()
+        uploader.stop()
+
+
+def test_failed_upload_is_retried_on_next_event(tmp_path):
+    client = S3Client()
+    client.fail.add("dags/dag.py")
+    uploader = make_uploader(tmp_path, client)
+    path = str(tmp_path / "dag.py")
+    try:
+        with open(path, "w") as f:
+            f.write("dag")
+        uploader.submit(path, "created")
+        assert uploader.flush(5)
+        assert "dags/dag.py" not in client.objects
+        client.fail.clear()
+        uploader.submit(path, "modified")
+        assert uploader.flush(5)
+        assert client.objects["dags/dag.py"] == b"dag"
+    finally:
+        uploader.stop()
+
+
+def test_background_dispatcher(tmp_path):
+    client = S3Client()
+    uploader = DebouncedUploader(client=client, bucket="bucket", prefix="dags/", root_dir=str(tmp_path),
+                                 quiet_window=0.05)
+    paths = [str(tmp_path / f"dag_{i}.py") for i in range(3)]
+    uploader.start()
+    try:
+        for path in paths:
+            with open(path, "w") as f:
+                f.write(path)
+            uploader.submit(path, "created")
+        deadline = time.monotonic() + 5
+        while len(client.objects) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert sorted(client.objects) == ["dags/dag_0.py", "dags/dag_1.py", "dags/dag_2.py"]
+    finally:
+        uploader.stop()
+    assert uploader.pending() == 0
+
+
+def test_stop_flushes_pending_events(tmp_path):
+    client = S3Client()
+    uploader = make_uploader(tmp_path, client)
+    path = str(tmp_path / "dag.py")
+    with open(path, "w") as f:
+        f.write("dag")
+    uploader.start()
+    uploader.submit(path, "created")
+    uploader.stop()
+    assert client.objects == {"dags/dag.py": b"dag"}
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_se_tests_"))
+
+from airflow_se.secman.secman import SecManClient, _SingleFlight  # noqa: E402
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Response(object):
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data
+        self.text = str(data)
+
+    def json(self):
+        return self.data
+
+
+class Session(object):
+    """HTTP-сессия SecMan: токены выдаются по порядку, секреты читаются из словаря"""
+    def __init__(self, secrets=None, lease=300, delay=0.0):
+        self.secrets = dict(secrets or {})
+        self.lease = lease
+        self.delay = delay
+        self.revoked = set()
+        self.tokens = 0
+        self.calls = []
+        self.closed = False
+
+    def post(self, url, data=None, timeout=None, headers=None):
+        if headers is None:
+            self.calls.append("auth")
+            self.tokens += 1
+            return Response(200, {"auth": {"client_token": f"token_{self.tokens}", "lease_duration": self.lease}})
+        self.calls.append(("push", url))
+        return Response(204)
+
+    def get(self, url, headers=None, timeout=None):
+        self.calls.append(("get", url, headers["X-Vault-Token"]))
+        if self.delay:
+            time.sleep(self.delay)
+        if headers["X-Vault-Token"] in self.revoked:
+            return Response(403, {"errors": ["permission denied"]})
+        key = url.rsplit("_", 1)[-1]
+        if key not in self.secrets:
+            return Response(404, {"errors": []})
+        return Response(200, {"data": dict(self.secrets[key])})
+
+    def close(self):
+        self.closed = True
+
+
+def make_client(session, **kwargs):
+    client = SecManClient(clock=kwargs.pop("clock", Clock()), **kwargs)
+    client._SecManClient__session = session
+    return client
+
+
+def test_single_flight_runs_once():
+    flight = _SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", fn))) for _ in range(8)]
+    threads[0].start()
+    assert started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    # ждущие должны успеть встать в очередь за первым вызовом
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert calls == [1]
+    assert results == ["value"] * 8
+
+
+def test_single_flight_error_is_raised_for_waiters():
+    flight = _SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def fn():
+        started.set()
+        release.wait(5)
+        raise ValueError("secman is down")
+
+    def call():
+        try:
+            flight.do("key", fn)
+        except ValueError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    assert started.wait(5)
+    waiters = [threading.Thread(target=call) for _ in range(3)]
+    for t in waiters:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in [leader] + waiters:
+        t.join(5)
+    assert errors == ["secman is down"] * 4
+    # следующий вызов выполняется заново
+    assert flight.do("key", lambda: "ok") == "ok"
+
+
+def test_token_cached_until_lease_end():
+    clock = Clock()
+    session = Session(lease=300)
+    client = make_client(session, clock=clock, token_margin=30)
+    assert client.auth() == "token_1"
+    clock.now += 269
+    assert client.auth() == "token_1"
+    clock.now += 1
+    assert client.auth() == "token_2"
+    assert session.calls == ["auth", "auth"]
+
+
+def test_token_ttl_without_lease():
+    clock = Clock()
+    client = make_client(Session(lease=None), clock=clock, token_ttl=60)
+    assert client.auth() == "token_1"
+    clock.now += 59
+    assert client.auth() == "token_1"
+    clock.now += 1
+    assert client.auth() == "token_2"
+
+
+def test_reads_cached_for_read_ttl():
+    clock = Clock()
+    session = Session(secrets={"tgt": {"user": "ticket"}})
+    client = make_client(session, clock=clock, read_ttl=60)
+    data = client.get("tgt")
+    assert data == {"user": "ticket"}
+    # возвращается копия, кэш не портится
+    data["user"] = "changed"
+    assert client.get("tgt") == {"user": "ticket"}
+    assert [c for c in session.calls if c != "auth"] == [("get", client.url("tgt"), "token_1")]
+
+    assert client.get("tgt", use_cache=False) == {"user": "ticket"}
+    clock.now += 60
+    client.get("tgt")
+    assert len([c for c in session.calls if c != "auth"]) == 3
+
+
+def test_missing_key_is_not_cached():
+    session = Session()
+    client = make_client(session)
+    assert client.get("tgt") is None
+    session.secrets["tgt"] = {"user": "ticket"}
+    assert client.get("tgt") == {"user": "ticket"}
+
+
+def test_revoked_token_is_renewed():
+    session = Session(secrets={"tgt": {"user": "ticket"}})
+    client = make_client(session)
+    assert client.auth() == "token_1"
+    session.revoked.add("token_1")
+    assert client.get("tgt") == {"user": "ticket"}
+    assert session.calls[-3:] == [("get", client.url("tgt"), "token_1"), "auth",
+                                  ("get", client.url("tgt"), "token_2")]
+    assert client.auth() == "token_2"
+
+
+def test_push_invalidates_cache():
+    session = Session(secrets={"tgt": {"user": "ticket"}})
+    client = make_client(session)
+    assert client.get("tgt") == {"user": "ticket"}
+    session.secrets["tgt"] = {"user": "new ticket"}
+    assert client.push("tgt", {"user": "new ticket"})
+    assert client.get("tgt") == {"user": "new ticket"}
+
+
+def test_concurrent_reads_of_one_key():
+    session = Session(secrets={"tgt": {"user": "ticket"}}, delay=0.1)
+    client = make_client(session)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.get("tgt"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert results == [{"user": "ticket"}] * 8
+    assert session.calls.count("auth") == 1
+    assert len([c for c in session.calls if c != "auth"]) == 1
+
+
+@pytest.mark.parametrize("key", [None, "   "])
+def test_invalid_key(key):
+    client = make_client(Session())
+    assert client.get(key) is None
+    assert client.push(key, {"a": 1}) is False
+
+
+def test_close():
+    session = Session(secrets={"tgt": {"user": "ticket"}})
+    client = make_client(session)
+    client.get("tgt")
+    client.close()
+    assert session.closed
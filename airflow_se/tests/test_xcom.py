@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+from datetime import datetime, timezone
+
+import pytest
+
+os.environ.setdefault("AIRFLOW_HOME", tempfile.mkdtemp(prefix="airflow_se_tests_"))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from airflow.models import import_all_models  # noqa: E402
+from airflow.models.base import Base  # noqa: E402
+from airflow_se.xcom import xcom as xcom_module, codec as codec_module  # noqa: E402
+from airflow_se.xcom import XComSE, XComCodec, LocalBlobStore, cleanup_orphaned_blobs  # noqa: E402
+
+SIZES = [0, 100, 5_000, 200_000, 3_000_000]
+
+
+def make_value(size: int):
+    return {"rows": [f"row {i:08d}" for i in range(size // 12)], "size": size}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalBlobStore(str(tmp_path / "blobs"))
+
+
+@pytest.fixture
+def codec(store, monkeypatch):
+    codec = XComCodec(compress_threshold=1024, offload_threshold=64 * 1024, store=store, orphan_min_age=0)
+    monkeypatch.setattr(codec_module, "_codec", codec)
+    return codec
+
+
+@pytest.fixture
+def session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'airflow.db'}")
+    import_all_models()
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as session:
+        yield session
+
+
+def add_xcom(session, key: str, value, run_id: str = "manual__2024-01-01T00:00:00+00:00") -> XComSE:
+    xcom = XComSE(
+        dag_run_id=1, task_id="task", map_index=-1, key=key, dag_id="dag", run_id=run_id,
+        value=XComSE.serialize_value(value, key=key, task_id="task", dag_id="dag", run_id=run_id, map_index=-1),
+        timestamp=datetime.now(timezone.utc),
+    )
+    session.add(xcom)
+    session.commit()
+    return xcom
+
+
+def test_pack_flags(codec):
+    assert codec.pack(b"x" * 10).startswith(b"SE1:e:")
+    assert codec.pack(b"x" * 10_000).startswith(b"SE1:ze:")
+    assert codec.unpack(codec.pack(b"x" * 10_000)) == b"x" * 10_000
+    assert XComCodec(encrypt_values=False).pack(b"{}") == b"SE1::{}"
+    # значение, записанное до XComSE
+    assert codec.decode(b'{"a": 1}') == b'{"a": 1}'
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_round_trip(codec, store, session, size):
+    value = make_value(size)
+    add_xcom(session, f"value_{size}", value)
+    # так значение читает XCom.get_value
+    row = session.query(XComSE.value).filter(XComSE.key == f"value_{size}").one()
+    assert XComSE.deserialize_value(row) == value
+    offloaded = XComCodec.reference(row.value)
+    assert (offloaded is not None) == (size >= 200_000)
+    stored = store.get(offloaded) if offloaded else row.value
+    assert b"row 0000" not in stored
+    if size >= 5_000:
+        assert stored.startswith(b"SE1:ze:")
+    # так значение читает веб интерфейс
+    session.expunge_all()
+    orm_value = session.query(XComSE).filter(XComSE.key == f"value_{size}").one().value
+    assert orm_value == (f"<XComSE blob: {offloaded}>" if offloaded else value)
+
+
+def test_orphans(codec, store, session):
+    add_xcom(session, "kept", make_value(3_000_000))
+    orphan = add_xcom(session, "removed", make_value(3_000_000))
+    orphan_key = XComCodec.reference(orphan.value)
+    session.delete(orphan)
+    session.commit()
+    assert len(list(store.list(float("inf")))) == 2
+
+    codec.orphan_policy = "keep"
+    assert cleanup_orphaned_blobs(codec, session) == [orphan_key]
+    assert len(list(store.list(float("inf")))) == 2
+
+    codec.orphan_policy = "delete"
+    assert cleanup_orphaned_blobs(codec, session, dry_run=True) == [orphan_key]
+    assert cleanup_orphaned_blobs(codec, session) == [orphan_key]
+    assert cleanup_orphaned_blobs(codec, session) == []
+    row = session.query(XComSE.value).filter(XComSE.key == "kept").one()
+    assert XComSE.deserialize_value(row) == make_value(3_000_000)
+
+    codec.orphan_min_age = 3600
+    add_xcom(session, "fresh", make_value(3_000_000))
+    session.query(XComSE).filter(XComSE.key == "fresh").delete()
+    assert cleanup_orphaned_blobs(codec, session) == []
+
+
+def test_purge(codec, store, session):
+    xcom = add_xcom(session, "purged", make_value(3_000_000))
+    XComSE.purge(xcom, session)
+    assert list(store.list(float("inf"))) == []
+
+
+def test_blob_key():
+    key = xcom_module.blob_key("return_value", "task", "dag", "manual__2024-01-01T00:00:00+00:00", None)
+    assert key.startswith("dag/manual__2024-01-01T00_00_00_00_00/task/-1/return_value.")